@@ -59,6 +59,9 @@ from app.di import get_db, get_admin_ids, get_admin_usernames
 admin_router = Router(name="admin")
 logger = logging.getLogger("app.admin")
 
+# Сколько последних операций /rate можно удалить одной командой /del_rate N
+DEL_RATE_MAX_OPERATIONS = 20
+
 
 async def _build_user_deal_text_for_admin_update(db, deal: dict) -> tuple[str, object]:
 	from app.main import (
@@ -746,87 +749,6 @@ async def _bot_disabled(db) -> bool:
 	return setting == "1"
 
 
-async def _check_deposit_periodically(
-	bot: Bot,
-	wallet_address: str,
-	user_tg_id: int,
-	deal_id: int
-) -> None:
-	"""
-	Периодически проверяет наличие транзакции для адреса кошелька
-	Использует настройки из БД
-	
-	Args:
-		bot: Экземпляр бота для отправки сообщений
-		wallet_address: Адрес кошелька Bitcoin
-		user_tg_id: Telegram ID пользователя
-		deal_id: ID сделки
-	"""
-	import asyncio
-	from app.mempool_check import check_btc_transaction
-	from app.di import get_db
-	
-	db = get_db()
-	
-	# Получаем настройки из БД
-	check_interval_str = await db.get_setting("mempool_check_interval_minutes", "0.5")
-	max_attempts_str = await db.get_setting("mempool_max_attempts", "20")
-	initial_delay_str = await db.get_setting("mempool_initial_delay_minutes", "0.17")
-	
-	try:
-		check_interval_minutes = float(check_interval_str) if check_interval_str else 0.5
-	except (ValueError, TypeError):
-		check_interval_minutes = 0.5
-	
-	try:
-		max_attempts = int(max_attempts_str) if max_attempts_str else 20
-	except (ValueError, TypeError):
-		max_attempts = 20
-	
-	try:
-		initial_delay_minutes = float(initial_delay_str) if initial_delay_str else 0.17
-	except (ValueError, TypeError):
-		initial_delay_minutes = 0.17
-	
-	# Конвертируем минуты в секунды
-	interval_seconds = int(check_interval_minutes * 60)
-	initial_delay_seconds = int(initial_delay_minutes * 60)
-	
-	logger.info(f"🔄 Запущена периодическая проверка транзакции для deal_id={deal_id}, адрес={wallet_address}")
-	logger.info(f"🔄 Настройки: интервал={check_interval_minutes} мин, максимум={max_attempts} раз, отсрочка={initial_delay_minutes} мин")
-	
-	# Первая задержка перед началом проверки
-	await asyncio.sleep(initial_delay_seconds)
-	
-	for attempt in range(1, max_attempts + 1):
-		try:
-			has_transactions, error = await check_btc_transaction(wallet_address)
-			
-			if has_transactions:
-				mempool_url = f"https://mempool.space/address/{wallet_address}"
-				await bot.send_message(
-					chat_id=user_tg_id,
-					text=f"✅ Получено первое подтверждение транзакции!\n\n🔗 Проверить: {mempool_url}"
-				)
-				logger.info(f"✅ Оповещение о зачислении отправлено пользователю {user_tg_id} для deal_id={deal_id} (попытка {attempt})")
-				return  # Успешно, прекращаем проверку
-			elif error:
-				logger.debug(f"🔄 Попытка {attempt}/{max_attempts}: транзакция еще не найдена для deal_id={deal_id}, ошибка: {error}")
-			else:
-				logger.debug(f"🔄 Попытка {attempt}/{max_attempts}: транзакция еще не найдена для deal_id={deal_id}")
-			
-			# Задержка перед следующей проверкой (кроме последней попытки)
-			if attempt < max_attempts:
-				await asyncio.sleep(interval_seconds)
-		except Exception as e:
-			logger.error(f"❌ Ошибка при проверке транзакции (попытка {attempt}/{max_attempts}) для deal_id={deal_id}: {e}", exc_info=True)
-			# Задержка перед следующей попыткой даже при ошибке
-			if attempt < max_attempts:
-				await asyncio.sleep(interval_seconds)
-	
-	logger.warning(f"⚠️ Превышено максимальное количество попыток ({max_attempts}) для deal_id={deal_id}, транзакция не найдена")
-
-
 async def _one_card_for_all_status_text(db) -> str:
 	entries = []
 	for country_code, label in (("BYN", "🇧🇾 BYN"), ("RUB", "🇷🇺 RUB")):
@@ -1504,20 +1426,43 @@ async def cmd_del_rate(message: Message, state: FSMContext):
 		await message.answer("⚠️ Google Sheets не настроен (отсутствует GOOGLE_SHEET_ID или GOOGLE_CREDENTIALS_PATH)")
 		return
 	
+	# /del_rate N - удалить N последних операций (по умолчанию одну)
+	args = (message.text or "").split(maxsplit=1)
+	count = 1
+	if len(args) > 1 and args[1].strip():
+		value = args[1].strip()
+		if not value.isdigit() or int(value) < 1:
+			await message.answer(f"Использование: /del_rate [количество операций, до {DEL_RATE_MAX_OPERATIONS}]")
+			return
+		count = min(int(value), DEL_RATE_MAX_OPERATIONS)
+	
 	# Проверяем, есть ли история операций
 	db = get_db()
-	last_history = await db.get_last_rate_history()
+	histories = await db.get_last_rate_histories(count)
 	
-	if not last_history:
+	if not histories:
 		await message.answer("⚠️ Нет истории операций /rate для удаления")
 		return
 	
-	# Сохраняем ID истории в состояние для использования при подтверждении
-	await state.update_data(history_id=last_history["id"], operations_history=last_history["operations"])
+	# Объединяем ячейки всех операций, чтобы удалить их одним запросом
+	operations_history = []
+	for history in histories:
+		operations_history.extend(json.loads(history["operations"]))
+	
+	# Сохраняем историю в состояние для использования при подтверждении
+	await state.update_data(
+		history_ids=[history["id"] for history in histories],
+		histories_meta=[{"created_at": history["created_at"], "note": history["note"]} for history in histories],
+		operations_history=json.dumps(operations_history, ensure_ascii=False)
+	)
 	
 	# Спрашиваем первое подтверждение
 	await state.set_state(DeleteRateStates.first_confirmation)
-	await message.answer("⚠️ Вы действительно хотите удалить последнюю операцию расхода?", reply_markup=delete_confirmation_kb())
+	if len(histories) == 1:
+		question = "⚠️ Вы действительно хотите удалить последнюю операцию расхода?"
+	else:
+		question = f"⚠️ Вы действительно хотите удалить последние {len(histories)} операций расхода?"
+	await message.answer(question, reply_markup=delete_confirmation_kb())
 
 
 @admin_router.callback_query(DeleteRateStates.first_confirmation, F.data == "delete:confirm:yes")
@@ -1545,10 +1490,11 @@ async def delete_rate_second_confirmation_yes(cb: CallbackQuery, state: FSMConte
 	
 	settings = get_settings()
 	data = await state.get_data()
-	history_id = data.get("history_id")
+	history_ids = data.get("history_ids")
+	histories_meta = data.get("histories_meta") or []
 	operations_history_json = data.get("operations_history")
 	
-	if not history_id or not operations_history_json:
+	if not history_ids or not operations_history_json:
 		await cb.message.edit_text("❌ Ошибка: не найдена история операции")
 		await state.clear()
 		await cb.answer()
@@ -1557,12 +1503,9 @@ async def delete_rate_second_confirmation_yes(cb: CallbackQuery, state: FSMConte
 	try:
 		# Парсим JSON с историей операций
 		operations_history = json.loads(operations_history_json)
-		
-		# Получаем информацию о последней истории для отображения даты (до удаления из БД)
 		db = get_db()
-		last_history = await db.get_last_rate_history()
 		
-		# Удаляем ячейки из Google Sheets
+		# Удаляем ячейки всех выбранных операций из Google Sheets
 		result = await delete_last_rate_operation(
 			settings.google_sheet_id,
 			settings.google_credentials_path,
@@ -1572,28 +1515,32 @@ async def delete_rate_second_confirmation_yes(cb: CallbackQuery, state: FSMConte
 		
 		if result.get("success"):
 			deleted_cells_info = result.get("deleted_cells_info", [])
-			# Удаляем запись из БД
-			await db.delete_rate_history(history_id)
+			# Удаляем записи из БД
+			await db.delete_rate_histories(history_ids)
 			
 			# Формируем подробный отчет
 			from datetime import datetime
-			created_at = last_history.get("created_at") if last_history else None
-			if created_at:
-				date_str = datetime.fromtimestamp(created_at).strftime("%d.%m.%Y %H:%M")
-			else:
-				date_str = "неизвестно"
 			
-			# Получаем примечание из истории
-			note = last_history.get("note") if last_history else None
-			if note and note.strip():
-				note_text = note.strip()
-			else:
-				note_text = None
+			def format_history_date(meta: dict) -> str:
+				created_at = meta.get("created_at")
+				if created_at:
+					return datetime.fromtimestamp(created_at).strftime("%d.%m.%Y %H:%M")
+				return "неизвестно"
 			
-			report_lines = [f"✅ Успешно удалена последняя операция расхода", f"От: {date_str}"]
+			# Получаем примечания из истории
+			notes = [meta["note"].strip() for meta in histories_meta if meta.get("note") and meta["note"].strip()]
 			
-			# Добавляем примечание, если оно есть
-			if note_text:
+			if len(history_ids) == 1:
+				report_lines = [f"✅ Успешно удалена последняя операция расхода", f"От: {format_history_date(histories_meta[0] if histories_meta else {})}"]
+			else:
+				report_lines = [f"✅ Успешно удалено последних операций расхода: {len(history_ids)}"]
+				if histories_meta:
+					report_lines.append(
+						f"С {format_history_date(histories_meta[-1])} по {format_history_date(histories_meta[0])}"
+					)
+			
+			# Добавляем примечания, если они есть
+			for note_text in notes:
 				report_lines.append(f"📝 Примечание: {note_text}")
 			
 			report_lines.append("")
@@ -2283,33 +2230,28 @@ async def _get_debtors_list_text_kb():
 	return text, kb.as_markup()
 
 
-def _parse_float(value: str, default: float) -> float:
-	try:
-		return float(value) if value is not None else default
-	except (ValueError, TypeError):
-		return default
-
-
 async def _get_buy_calc_settings(db) -> dict:
+	settings = db.get_settings_snapshot()
 	return {
-		"buy_markup_percent_small": _parse_float(await db.get_setting("buy_markup_percent_small", "20"), 20),
-		"buy_markup_percent_101_449": _parse_float(await db.get_setting("buy_markup_percent_101_449", "15"), 15),
-		"buy_markup_percent_450_699": _parse_float(await db.get_setting("buy_markup_percent_450_699", "14"), 14),
-		"buy_markup_percent_700_999": _parse_float(await db.get_setting("buy_markup_percent_700_999", "13"), 13),
-		"buy_markup_percent_1000_1499": _parse_float(await db.get_setting("buy_markup_percent_1000_1499", "12"), 12),
-		"buy_markup_percent_1500_1999": _parse_float(await db.get_setting("buy_markup_percent_1500_1999", "11"), 11),
-		"buy_markup_percent_2000_plus": _parse_float(await db.get_setting("buy_markup_percent_2000_plus", "10"), 10),
-		"buy_min_usd": _parse_float(await db.get_setting("buy_min_usd", "15"), 15),
-		"buy_extra_fee_usd_low": _parse_float(await db.get_setting("buy_extra_fee_usd_low", "50"), 50),
-		"buy_extra_fee_usd_mid": _parse_float(await db.get_setting("buy_extra_fee_usd_mid", "67"), 67),
-		"buy_extra_fee_low_byn": _parse_float(await db.get_setting("buy_extra_fee_low_byn", "10"), 10),
-		"buy_extra_fee_mid_byn": _parse_float(await db.get_setting("buy_extra_fee_mid_byn", "5"), 5),
-		"buy_extra_fee_low_rub": _parse_float(await db.get_setting("buy_extra_fee_low_rub", "10"), 10),
-		"buy_extra_fee_mid_rub": _parse_float(await db.get_setting("buy_extra_fee_mid_rub", "5"), 5),
-		"buy_alert_usd_threshold": _parse_float(await db.get_setting("buy_alert_usd_threshold", "400"), 400),
-		"buy_usd_to_byn_rate": _parse_float(await db.get_setting("buy_usd_to_byn_rate", "2.97"), 2.97),
-		"buy_usd_to_rub_rate": _parse_float(await db.get_setting("buy_usd_to_rub_rate", "95"), 95),
-		"crypto_rates_update_interval": int(_parse_float(await db.get_setting("crypto_rates_update_interval", "5"), 5)),
+		"buy_markup_percent_small": settings.get_float("buy_markup_percent_small", 20),
+		"buy_markup_percent_101_449": settings.get_float("buy_markup_percent_101_449", 15),
+		"buy_markup_percent_450_699": settings.get_float("buy_markup_percent_450_699", 14),
+		"buy_markup_percent_700_999": settings.get_float("buy_markup_percent_700_999", 13),
+		"buy_markup_percent_1000_1499": settings.get_float("buy_markup_percent_1000_1499", 12),
+		"buy_markup_percent_1500_1999": settings.get_float("buy_markup_percent_1500_1999", 11),
+		"buy_markup_percent_2000_plus": settings.get_float("buy_markup_percent_2000_plus", 10),
+		"buy_min_usd": settings.get_float("buy_min_usd", 15),
+		"buy_extra_fee_usd_low": settings.get_float("buy_extra_fee_usd_low", 50),
+		"buy_extra_fee_usd_mid": settings.get_float("buy_extra_fee_usd_mid", 67),
+		"buy_extra_fee_low_byn": settings.get_float("buy_extra_fee_low_byn", 10),
+		"buy_extra_fee_mid_byn": settings.get_float("buy_extra_fee_mid_byn", 5),
+		"buy_extra_fee_low_rub": settings.get_float("buy_extra_fee_low_rub", 10),
+		"buy_extra_fee_mid_rub": settings.get_float("buy_extra_fee_mid_rub", 5),
+		"buy_alert_usd_threshold": settings.get_float("buy_alert_usd_threshold", 400),
+		"buy_usd_to_byn_rate": settings.get_float("buy_usd_to_byn_rate", 2.97),
+		"buy_usd_to_rub_rate": settings.get_float("buy_usd_to_rub_rate", 95),
+		"crypto_rates_update_interval": settings.get_int("crypto_rates_update_interval", 5),
+		"crypto_price_max_stale_minutes": settings.get_int("crypto_price_max_stale_minutes", 30),
 	}
 
 
@@ -2336,7 +2278,8 @@ async def settings_buy_calc(cb: CallbackQuery):
 		f"🚨 Алерт от $: {settings['buy_alert_usd_threshold']}\n"
 		f"💱 USD→BYN: {settings['buy_usd_to_byn_rate']} (авто)\n"
 		f"💱 USD→RUB: {settings['buy_usd_to_rub_rate']} (авто)\n"
-		f"🪙 Обновление курсов крипты: каждые {settings['crypto_rates_update_interval']} мин\n\n"
+		f"🪙 Обновление курсов крипты: каждые {settings['crypto_rates_update_interval']} мин\n"
+		f"⏳ Устаревший курс используется до: {settings['crypto_price_max_stale_minutes']} мин\n\n"
 		"Выберите параметр для редактирования:",
 		reply_markup=buy_calc_settings_kb(settings),
 	)
@@ -3664,7 +3607,7 @@ async def alert_amount_save(message: Message, state: FSMContext, bot: Bot):
 			"UPDATE orders SET amount_currency = ? WHERE id = ?",
 			(new_amount, order_id)
 		)
-		await db._db.commit()
+		await db._commit()
 		
 		logger.info(f"✅ Сумма крупной заявки {order_id} обновлена: {int(current_amount)} {currency_symbol} -> {int(new_amount)} {currency_symbol}")
 		
@@ -3934,7 +3877,7 @@ async def alert_crypto_save(message: Message, state: FSMContext, bot: Bot):
 		"UPDATE orders SET amount = ? WHERE id = ?",
 		(new_crypto_amount, order_id)
 	)
-	await db._db.commit()
+	await db._commit()
 	
 	current_str = f"{current_crypto_amount:.8f}".rstrip('0').rstrip('.') if current_crypto_amount < 1 else f"{current_crypto_amount:.2f}".rstrip('0').rstrip('.')
 	new_str = f"{new_crypto_amount:.8f}".rstrip('0').rstrip('.') if new_crypto_amount < 1 else f"{new_crypto_amount:.2f}".rstrip('0').rstrip('.')
@@ -4572,7 +4515,7 @@ async def deal_alert_amount_save(message: Message, state: FSMContext, bot: Bot):
 				"UPDATE orders SET amount_currency = ? WHERE id = ?",
 				(new_amount, order_id)
 			)
-			await db._db.commit()
+			await db._commit()
 		except Exception as e:
 			logger.warning(
 				f"⚠️ Не удалось синхронизировать сумму по order_id={order_id} для deal_id={deal_id}: {e}"
@@ -4805,7 +4748,7 @@ async def deal_alert_crypto_save(message: Message, state: FSMContext, bot: Bot):
 				"UPDATE orders SET amount = ? WHERE id = ?",
 				(new_amount, order_id)
 			)
-			await db._db.commit()
+			await db._commit()
 		except Exception as e:
 			logger.warning(
 				f"⚠️ Не удалось синхронизировать количество по order_id={order_id} для deal_id={deal_id}: {e}"
@@ -4898,7 +4841,7 @@ async def deal_alert_debt_save(message: Message, state: FSMContext, bot: Bot):
 					"UPDATE orders SET amount_currency = ? WHERE id = ?",
 					(new_amount_currency, order_id)
 				)
-				await db._db.commit()
+				await db._commit()
 				logger.info(f"✅ Синхронизирована сумма по order_id={order_id} для deal_id={deal_id}: {new_amount_currency}")
 			except Exception as e:
 				logger.warning(f"⚠️ Не удалось синхронизировать сумму по order_id={order_id} для deal_id={deal_id}: {e}")
@@ -5381,14 +5324,9 @@ async def deal_alert_complete(cb: CallbackQuery, bot: Bot):
 			wallet_address = message_data.get("wallet_address")
 			crypto_type = message_data.get("crypto_type", "")
 			if wallet_address and crypto_type == "BTC":
-				# Запускаем фоновую задачу для периодической проверки транзакции
-				import asyncio
-				asyncio.create_task(_check_deposit_periodically(
-					bot=bot,
-					wallet_address=wallet_address,
-					user_tg_id=deal["user_tg_id"],
-					deal_id=deal_id
-				))
+				# Ставим адрес на отслеживание: проверку выполняет общий воркер (app.deposit_watcher)
+				from app.deposit_watcher import watch_deposit
+				await watch_deposit(wallet_address, deal["user_tg_id"], deal_id)
 	except Exception:
 		pass
 	# Обновляем существующее сообщение админа после завершения сделки (второе обновление с отчётом Google Sheets)
@@ -6886,7 +6824,7 @@ async def add_data_confirm(cb: CallbackQuery, state: FSMContext, bot: Bot):
 		logger.info(f"🔍 После суммирования cash_list: {len(cash_list)} записей")
 	
 	from app.config import get_settings
-	from app.google_sheets import write_all_to_google_sheet_one_row, write_to_google_sheet_rate_mode
+	from app.sheets_outbox import enqueue_sheets_write
 	
 	settings = get_settings()
 	if not settings.google_sheet_id or not settings.google_credentials_path:
@@ -6899,49 +6837,24 @@ async def add_data_confirm(cb: CallbackQuery, state: FSMContext, bot: Bot):
 	# Данные уже собраны в списки выше
 	logger.info(f"🔍 Формирование cash_list: cash_list={cash_list}")
 	
-	# Записываем в Google Sheets
+	# Ставим операцию в очередь записи: она сразу сохраняется в БД, а в Google Sheets ее переносит фоновый воркер
 	logger.info(f"🔍 Данные для записи (mode={mode}): crypto_list={crypto_list}, xmr_list={xmr_list}, cash_list={cash_list}, card_cash_pairs={card_cash_pairs}")
+	payload = {
+		"crypto_list": crypto_list,
+		"xmr_list": xmr_list,
+		"cash_list": cash_list,
+		"card_cash_pairs": card_cash_pairs
+	}
 	try:
 		if mode == "rate":
 			# Получаем примечание из state (если было введено)
 			note = data.get("note", None)
 			if note:
 				note = note.strip() if note.strip() else None
-			
-			result = await write_to_google_sheet_rate_mode(
-				settings.google_sheet_id,
-				settings.google_credentials_path,
-				crypto_list,
-				xmr_list,
-				cash_list,
-				card_cash_pairs,
-				settings.google_sheet_name,
-				note=note,
-				bot=bot,
-				chat_id=cb.message.chat.id
-			)
-		elif mode == "move":
-			# Для режима move получаем настройки из БД
-			db = get_db()
-			move_start_row_str = await db.get_google_sheets_setting("move_start_row", "375")
-			move_max_row_str = await db.get_google_sheets_setting("move_max_row", "406")
-			move_start_row = int(move_start_row_str) if move_start_row_str else 375
-			move_max_row = int(move_max_row_str) if move_max_row_str else 406
-			
-			result = await write_all_to_google_sheet_one_row(
-				settings.google_sheet_id,
-				settings.google_credentials_path,
-				crypto_list,
-				xmr_list,
-				cash_list,
-				card_cash_pairs,
-				mode=mode,
-				sheet_name=settings.google_sheet_name,
-				bot=bot,
-				chat_id=cb.message.chat.id
-			)
-		else:
+			payload["note"] = note
+		elif mode != "move":
 			# Для режима add определяем диапазон строк по дню недели из БД
+			# (день фиксируется при подтверждении, даже если запись уйдет в таблицу позже)
 			current_date = datetime.now()
 			weekday = current_date.weekday()  # 0=Monday, 1=Tuesday, ..., 6=Sunday
 			
@@ -7023,478 +6936,487 @@ async def add_data_confirm(cb: CallbackQuery, state: FSMContext, bot: Bot):
 			
 			logger.info(f"📊 Рассчитанный профит для /add: {calculated_profit} USD, столбец: {profit_column}")
 			
-			result = await write_all_to_google_sheet_one_row(
-				settings.google_sheet_id,
-				settings.google_credentials_path,
-				crypto_list,
-				xmr_list,
-				cash_list,
-				card_cash_pairs,
-				mode="add",
-				sheet_name=settings.google_sheet_name,
-				bot=bot,
-				chat_id=cb.message.chat.id,
-				profit_column=profit_column,
-				calculated_profit=calculated_profit
-			)
-			
-			# Проверяем, есть ли свободная строка в диапазоне
-			if not result.get("success"):
-				error_message = result.get("message", "Неизвестная ошибка")
-				if "Нет свободных строк" in error_message or "свободных строк" in error_message.lower():
-					# Нет места в диапазоне для текущего дня недели
-					try:
-						await cb.message.edit_text(
-							f"⚠️ Нет свободных строк в диапазоне для {day_name} (строки {add_start_row}-{add_max_row}).\n\n"
-							f"Пожалуйста, освободите место в таблице или попробуйте позже.",
-							reply_markup=admin_menu_kb()
-						)
-					except Exception:
-						# Если не удалось отредактировать сообщение, отправляем новое
-						await cb.message.answer(
-							f"⚠️ Нет свободных строк в диапазоне для {day_name} (строки {add_start_row}-{add_max_row}).\n\n"
-							f"Пожалуйста, освободите место в таблице или попробуйте позже.",
-							reply_markup=admin_menu_kb()
-						)
-					await state.clear()
-					try:
-						await cb.answer()
-					except Exception:
-						pass
-					return
+			payload.update({
+				"weekday": weekday,
+				"day_name": day_name,
+				"add_start_row": add_start_row,
+				"add_max_row": add_max_row,
+				"profit_column": profit_column,
+				"calculated_profit": calculated_profit
+			})
 		
-		if result.get("success"):
-			# Сохраняем пополнения карт в БД (только для mode == "add" и только положительные суммы)
-			db = get_db()
-			if mode == "add":
-				for pair in card_cash_pairs:
-					card_data = pair.get("card")
-					cash_data = pair.get("cash")
-					if card_data and cash_data:
-						card_id = card_data.get("card_id")
-						cash_value = cash_data.get("value", 0)
-						# Сохраняем только положительные суммы (пополнения)
-						if card_id and cash_value > 0:
-							try:
-								await db.log_card_replenishment(card_id, float(cash_value))
-								logger.info(f"✅ Пополнение сохранено: card_id={card_id}, amount={cash_value}")
-							except Exception as e:
-								logger.warning(f"⚠️ Ошибка сохранения пополнения card_id={card_id}, amount={cash_value}: {e}")
-			
-			# Отправляем промежуточное уведомление о формировании отчета
+		entry_id = await enqueue_sheets_write(
+			mode,
+			payload,
+			chat_id=cb.message.chat.id,
+			message_id=cb.message.message_id
+		)
+	except Exception as e:
+		logger.exception(f"Ошибка постановки операции в очередь записи Google Sheets: {e}")
+		await state.clear()
+		try:
+			await cb.answer("❌ Произошла ошибка при записи", show_alert=True)
+		except Exception:
+			# Если callback устарел, просто обновляем сообщение
 			try:
-				await cb.message.edit_text("⏳ Формирование отчета...", reply_markup=None)
+				await cb.message.edit_text("❌ Произошла ошибка при записи", reply_markup=admin_menu_kb())
 			except Exception:
 				pass
-			
-			# Формируем отчет о записи
-			from app.google_sheets import read_card_balance, read_profit
-			current_date = datetime.now().strftime("%d.%m.%Y")
-			
-			written_cells = result.get("written_cells", [])
-			row = result.get("row")
-			column_rows = result.get("column_rows", {})  # Для режима rate: {column: row}
-			
-			report_lines = []
-			
-			if mode == "add" and row:
-				report_lines.append(f"<code>📍 Строка: {row}</code>")
-			
-			if written_cells:
-				for cell_info in written_cells:
-					report_lines.append(f"<code> • {cell_info}</code>")
-			else:
-				report_lines.append("⚠️ Нет записанных данных")
-			
-			# Читаем балансы карт и профиты
-			# Получаем настройки из БД
-			balance_row_str = await db.get_google_sheets_setting("balance_row", "4")
-			profit_column_str = await db.get_google_sheets_setting("profit_column", "BC")
-			balance_row = int(balance_row_str) if balance_row_str else 4
-			profit_column = profit_column_str if profit_column_str else "BC"
-			
-			# Читаем балансы для всех карт из card_cash_pairs (batch чтение)
-			from app.google_sheets import read_card_balances_batch, read_profits_batch
-			
-			card_balances = {}
-			balance_cell_addresses = []
-			card_mapping = {}  # {cell_address: (card_name, column, card_id)}
-			
-			for pair in card_cash_pairs:
-				card_data = pair.get("card")
-				if card_data:
-					card_name = card_data.get("card_name", "")
-					card_id = card_data.get("card_id")
-					column = card_data.get("column")
-					if column:
-						cell_address = f"{column}{balance_row}"
-						balance_cell_addresses.append(cell_address)
-						card_mapping[cell_address] = (card_name, column, card_id)
-			
-			# Получаем информацию о группах для всех карт (оптимизированно - одним запросом)
-			card_groups_info = {}  # {card_id: group_name}
-			# Собираем все уникальные card_id
-			card_ids = []
-			for pair in card_cash_pairs:
-				card_data = pair.get("card")
-				if card_data:
-					card_id = card_data.get("card_id")
-					if card_id and card_id not in card_ids:
-						card_ids.append(card_id)
-			
-			# Получаем все карты с группами одним batch запросом
-			if card_ids:
-				card_groups_info = await db.get_cards_groups_batch(card_ids)
-			
-			# Читаем все балансы одним batch запросом
-			if balance_cell_addresses:
-				balances = await read_card_balances_batch(
-					settings.google_sheet_id,
-					settings.google_credentials_path,
-					balance_cell_addresses,
-					settings.google_sheet_name
-				)
-				for cell_address, (card_name, column, card_id) in card_mapping.items():
-					balance = balances.get(cell_address)
-					if balance:
-						group_name = card_groups_info.get(card_id, "") if card_id else ""
-						card_balances[card_name] = {
-							"balance": balance,
-							"column": column,
-							"group_name": group_name
-						}
-			
-			# Читаем профиты (batch чтение)
-			profits = {}
-			profit_cell_addresses = []
-			
-			if mode in ["add", "move"] and row:
-				# В режимах /add и /move все данные в одной строке
-				cell_address = f"{profit_column}{row}"
-				profit_cell_addresses.append(cell_address)
-			elif mode == "rate" and column_rows:
-				# В режиме /rate может быть несколько строк для разных столбцов
-				for column, written_row in column_rows.items():
-					cell_address = f"{profit_column}{written_row}"
-					profit_cell_addresses.append(cell_address)
-			
-			# Читаем все профиты одним batch запросом
-			if profit_cell_addresses:
-				profits_dict = await read_profits_batch(
-					settings.google_sheet_id,
-					settings.google_credentials_path,
-					profit_cell_addresses,
-					settings.google_sheet_name
-				)
-				profits = profits_dict
-			
-			# Читаем балансы для наличных (оптимизированно - batch запрос)
-			cash_balances = {}
-			cash_balance_cell_addresses = []
-			cash_mapping = {}  # {cell_address: (cash_name, column)}
-			
-			# Собираем все cash_name и получаем столбцы одним запросом
-			cash_names = [cash.get("cash_name", "") for cash in cash_list if cash.get("cash_name")]
-			cash_columns_dict = {}
-			if cash_names:
-				cash_columns_dict = await db.get_cash_columns_batch(cash_names)
-			
-			for cash in cash_list:
-				cash_name = cash.get("cash_name", "")
-				if cash_name:
-					# Получаем столбец из batch результата
-					cash_column_info = cash_columns_dict.get(cash_name)
-				if cash_column_info:
-					column = cash_column_info.get("column")
-					if column:
-						cell_address = f"{column}{balance_row}"
-						cash_balance_cell_addresses.append(cell_address)
-						cash_mapping[cell_address] = (cash_name, column)
-			
-			# Читаем все балансы наличных одним batch запросом
-			if cash_balance_cell_addresses:
-				cash_balances_dict = await read_card_balances_batch(
-					settings.google_sheet_id,
-					settings.google_credentials_path,
-					cash_balance_cell_addresses
-				)
-				for cell_address, (cash_name, column) in cash_mapping.items():
-					balance = cash_balances_dict.get(cell_address)
-					if balance:
-						cash_balances[cash_name] = balance
-			
-			# Читаем балансы для криптовалют (оптимизированно - batch запрос)
-			crypto_balances = {}
-			crypto_balance_cell_addresses = []
-			crypto_mapping = {}  # {cell_address: (crypto_type, column)}
-			
-			# Собираем все crypto_type и получаем столбцы одним запросом
-			crypto_types = []
-			# Обрабатываем обычные криптовалюты (BTC, LTC и т.д.)
-			for crypto in crypto_list:
-				crypto_type = crypto.get("currency", "")
-				if crypto_type:
-					crypto_types.append(crypto_type)
-			
-			# Обрабатываем XMR (формат XMR-1, XMR-2, XMR-3)
-			for xmr in xmr_list:
-				xmr_number = xmr.get("xmr_number")
-				if xmr_number:
-					crypto_types.append(f"XMR-{xmr_number}")
-			
-			# Получаем все столбцы одним batch запросом
-			crypto_columns_dict = {}
-			if crypto_types:
-				crypto_columns_dict = await db.get_crypto_columns_batch(crypto_types)
-			
-			# Формируем cell_addresses на основе полученных столбцов
-			for crypto in crypto_list:
-				crypto_type = crypto.get("currency", "")
-				if crypto_type:
-					column = crypto_columns_dict.get(crypto_type)
-					if column:
-						cell_address = f"{column}{balance_row}"
-						crypto_balance_cell_addresses.append(cell_address)
-						crypto_mapping[cell_address] = (crypto_type, column)
-			
-			for xmr in xmr_list:
-				xmr_number = xmr.get("xmr_number")
-				if xmr_number:
-					crypto_type = f"XMR-{xmr_number}"
-					column = crypto_columns_dict.get(crypto_type)
-					if column:
-						cell_address = f"{column}{balance_row}"
-						crypto_balance_cell_addresses.append(cell_address)
-						crypto_mapping[cell_address] = (crypto_type, column)
-			
-			# Читаем все балансы криптовалют одним batch запросом
-			if crypto_balance_cell_addresses:
-				crypto_balances_dict = await read_card_balances_batch(
-					settings.google_sheet_id,
-					settings.google_credentials_path,
-					crypto_balance_cell_addresses
-				)
-				for cell_address, (crypto_type, column) in crypto_mapping.items():
-					balance = crypto_balances_dict.get(cell_address)
-					if balance:
-						crypto_balances[crypto_type] = balance
-			
-			# Добавляем информацию о балансах в отчет
-			if card_balances or cash_balances or crypto_balances:
-				report_lines.append("")
+		return
+	
+	await state.clear()
+	try:
+		await cb.message.edit_text(
+			f"🕓 Операция поставлена в очередь записи (№{entry_id}).\n"
+			f"Отчет о записанных ячейках появится в этом сообщении.",
+			reply_markup=None
+		)
+	except Exception:
+		pass
+
+
+async def _edit_outbox_message(
+	bot: Bot,
+	chat_id: Optional[int],
+	message_id: Optional[int],
+	text: str,
+	reply_markup: Optional[InlineKeyboardMarkup] = None,
+	parse_mode: Optional[str] = None
+) -> None:
+	"""Заменяет сообщение об операции из очереди записи; если не получилось - отправляет новое"""
+	if not chat_id:
+		return
+	if message_id:
+		try:
+			await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id, reply_markup=reply_markup, parse_mode=parse_mode)
+			return
+		except Exception as edit_error:
+			# Обрабатываем ошибки сети при отправке сообщения
+			logger.warning(f"Ошибка отправки сообщения с отчетом: {edit_error}")
+	# Пытаемся отправить новое сообщение вместо редактирования
+	try:
+		await bot.send_message(chat_id, text, reply_markup=reply_markup, parse_mode=parse_mode)
+	except Exception as answer_error:
+		logger.error(f"Не удалось отправить отчет: {answer_error}")
+
+
+async def on_sheets_outbox_failed(bot: Bot, entry: Dict[str, Any], result: Dict[str, Any]) -> None:
+	"""Сообщает администратору, что операцию из очереди не удалось записать в Google Sheets"""
+	mode = entry.get("mode")
+	payload = entry.get("payload") or {}
+	error = result.get("error") or result.get("message")
+	if result.get("no_free_row"):
+		# Нет места в диапазоне для дня недели, в который была подтверждена операция
+		text = (
+			f"⚠️ Нет свободных строк в диапазоне для {payload.get('day_name', '')} "
+			f"(строки {payload.get('add_start_row')}-{payload.get('add_max_row')}).\n\n"
+			f"Пожалуйста, освободите место в таблице или попробуйте позже."
+		)
+	else:
+		text = f"❌ Ошибка записи в Google Sheets (операция №{entry.get('id')})"
+		if error:
+			text += f"\n\n{error}"
+	await _edit_outbox_message(bot, entry.get("chat_id"), entry.get("message_id"), text, reply_markup=admin_menu_kb())
+
+
+async def on_sheets_outbox_done(bot: Bot, entry: Dict[str, Any], result: Dict[str, Any]) -> None:
+	"""Формирует отчет по операции /add, /rate или /move после ее записи из очереди в Google Sheets"""
+	from app.config import get_settings
+	
+	settings = get_settings()
+	db = get_db()
+	mode = entry.get("mode")
+	payload = entry.get("payload") or {}
+	chat_id = entry.get("chat_id")
+	message_id = entry.get("message_id")
+	crypto_list = payload.get("crypto_list", [])
+	xmr_list = payload.get("xmr_list", [])
+	cash_list = payload.get("cash_list", [])
+	card_cash_pairs = payload.get("card_cash_pairs", [])
+	
+	# Отправляем промежуточное уведомление о формировании отчета
+	if chat_id and message_id:
+		try:
+			await bot.edit_message_text("⏳ Формирование отчета...", chat_id=chat_id, message_id=message_id)
+		except Exception:
+			pass
+	
+	# Формируем отчет о записи
+	written_cells = result.get("written_cells", [])
+	row = result.get("row")
+	column_rows = result.get("column_rows", {})  # Для режима rate: {column: row}
+	
+	report_lines = []
+	
+	if mode == "add" and row:
+		report_lines.append(f"<code>📍 Строка: {row}</code>")
+	
+	if written_cells:
+		for cell_info in written_cells:
+			report_lines.append(f"<code> • {cell_info}</code>")
+	else:
+		report_lines.append("⚠️ Нет записанных данных")
+	
+	# Читаем балансы карт и профиты
+	# Получаем настройки из БД
+	balance_row_str = await db.get_google_sheets_setting("balance_row", "4")
+	profit_column_str = await db.get_google_sheets_setting("profit_column", "BC")
+	balance_row = int(balance_row_str) if balance_row_str else 4
+	profit_column = profit_column_str if profit_column_str else "BC"
+	
+	# Читаем балансы для всех карт из card_cash_pairs (batch чтение)
+	from app.google_sheets import read_card_balances_batch, read_profits_batch
+	
+	card_balances = {}
+	balance_cell_addresses = []
+	card_mapping = {}  # {cell_address: (card_name, column, card_id)}
+	
+	for pair in card_cash_pairs:
+		card_data = pair.get("card")
+		if card_data:
+			card_name = card_data.get("card_name", "")
+			card_id = card_data.get("card_id")
+			column = card_data.get("column")
+			if column:
+				cell_address = f"{column}{balance_row}"
+				balance_cell_addresses.append(cell_address)
+				card_mapping[cell_address] = (card_name, column, card_id)
+	
+	# Получаем информацию о группах для всех карт (оптимизированно - одним запросом)
+	card_groups_info = {}  # {card_id: group_name}
+	# Собираем все уникальные card_id
+	card_ids = []
+	for pair in card_cash_pairs:
+		card_data = pair.get("card")
+		if card_data:
+			card_id = card_data.get("card_id")
+			if card_id and card_id not in card_ids:
+				card_ids.append(card_id)
+	
+	# Получаем все карты с группами одним batch запросом
+	if card_ids:
+		card_groups_info = await db.get_cards_groups_batch(card_ids)
+	
+	# Читаем все балансы одним batch запросом
+	if balance_cell_addresses:
+		balances = await read_card_balances_batch(
+			settings.google_sheet_id,
+			settings.google_credentials_path,
+			balance_cell_addresses,
+			settings.google_sheet_name
+		)
+		for cell_address, (card_name, column, card_id) in card_mapping.items():
+			balance = balances.get(cell_address)
+			if balance:
+				group_name = card_groups_info.get(card_id, "") if card_id else ""
+				card_balances[card_name] = {
+					"balance": balance,
+					"column": column,
+					"group_name": group_name
+				}
+	
+	# Читаем профиты (batch чтение)
+	profits = {}
+	profit_cell_addresses = []
+	
+	if mode in ["add", "move"] and row:
+		# В режимах /add и /move все данные в одной строке
+		cell_address = f"{profit_column}{row}"
+		profit_cell_addresses.append(cell_address)
+	elif mode == "rate" and column_rows:
+		# В режиме /rate может быть несколько строк для разных столбцов
+		for column, written_row in column_rows.items():
+			cell_address = f"{profit_column}{written_row}"
+			profit_cell_addresses.append(cell_address)
+	
+	# Читаем все профиты одним batch запросом
+	if profit_cell_addresses:
+		profits_dict = await read_profits_batch(
+			settings.google_sheet_id,
+			settings.google_credentials_path,
+			profit_cell_addresses,
+			settings.google_sheet_name
+		)
+		profits = profits_dict
+	
+	# Читаем балансы для наличных (оптимизированно - batch запрос)
+	cash_balances = {}
+	cash_balance_cell_addresses = []
+	cash_mapping = {}  # {cell_address: (cash_name, column)}
+	
+	# Собираем все cash_name и получаем столбцы одним запросом
+	cash_names = [cash.get("cash_name", "") for cash in cash_list if cash.get("cash_name")]
+	cash_columns_dict = {}
+	if cash_names:
+		cash_columns_dict = await db.get_cash_columns_batch(cash_names)
+	
+	for cash in cash_list:
+		cash_name = cash.get("cash_name", "")
+		if cash_name:
+			# Получаем столбец из batch результата
+			cash_column_info = cash_columns_dict.get(cash_name)
+		if cash_column_info:
+			column = cash_column_info.get("column")
+			if column:
+				cell_address = f"{column}{balance_row}"
+				cash_balance_cell_addresses.append(cell_address)
+				cash_mapping[cell_address] = (cash_name, column)
+	
+	# Читаем все балансы наличных одним batch запросом
+	if cash_balance_cell_addresses:
+		cash_balances_dict = await read_card_balances_batch(
+			settings.google_sheet_id,
+			settings.google_credentials_path,
+			cash_balance_cell_addresses
+		)
+		for cell_address, (cash_name, column) in cash_mapping.items():
+			balance = cash_balances_dict.get(cell_address)
+			if balance:
+				cash_balances[cash_name] = balance
+	
+	# Читаем балансы для криптовалют (оптимизированно - batch запрос)
+	crypto_balances = {}
+	crypto_balance_cell_addresses = []
+	crypto_mapping = {}  # {cell_address: (crypto_type, column)}
+	
+	# Собираем все crypto_type и получаем столбцы одним запросом
+	crypto_types = []
+	# Обрабатываем обычные криптовалюты (BTC, LTC и т.д.)
+	for crypto in crypto_list:
+		crypto_type = crypto.get("currency", "")
+		if crypto_type:
+			crypto_types.append(crypto_type)
+	
+	# Обрабатываем XMR (формат XMR-1, XMR-2, XMR-3)
+	for xmr in xmr_list:
+		xmr_number = xmr.get("xmr_number")
+		if xmr_number:
+			crypto_types.append(f"XMR-{xmr_number}")
+	
+	# Получаем все столбцы одним batch запросом
+	crypto_columns_dict = {}
+	if crypto_types:
+		crypto_columns_dict = await db.get_crypto_columns_batch(crypto_types)
+	
+	# Формируем cell_addresses на основе полученных столбцов
+	for crypto in crypto_list:
+		crypto_type = crypto.get("currency", "")
+		if crypto_type:
+			column = crypto_columns_dict.get(crypto_type)
+			if column:
+				cell_address = f"{column}{balance_row}"
+				crypto_balance_cell_addresses.append(cell_address)
+				crypto_mapping[cell_address] = (crypto_type, column)
+	
+	for xmr in xmr_list:
+		xmr_number = xmr.get("xmr_number")
+		if xmr_number:
+			crypto_type = f"XMR-{xmr_number}"
+			column = crypto_columns_dict.get(crypto_type)
+			if column:
+				cell_address = f"{column}{balance_row}"
+				crypto_balance_cell_addresses.append(cell_address)
+				crypto_mapping[cell_address] = (crypto_type, column)
+	
+	# Читаем все балансы криптовалют одним batch запросом
+	if crypto_balance_cell_addresses:
+		crypto_balances_dict = await read_card_balances_batch(
+			settings.google_sheet_id,
+			settings.google_credentials_path,
+			crypto_balance_cell_addresses
+		)
+		for cell_address, (crypto_type, column) in crypto_mapping.items():
+			balance = crypto_balances_dict.get(cell_address)
+			if balance:
+				crypto_balances[crypto_type] = balance
+	
+	# Добавляем информацию о балансах в отчет
+	if card_balances or cash_balances or crypto_balances:
+		report_lines.append("")
+		
+		if card_balances:
+			for card_name, data in card_balances.items():
+				group_name = data.get("group_name", "")
+				# Формируем строку с балансом
+				if group_name:
+					report_lines.append(f"  💳 Баланс <code>{card_name} ({group_name}) = {data['balance']}</code>")
+				else:
+					report_lines.append(f"  💳 Баланс <code>{card_name} = {data['balance']}</code>")
+		
+		if cash_balances:
+			for cash_name, balance in cash_balances.items():
+				report_lines.append(f"  💳 Баланс <code>{cash_name} = {balance}</code>")
+		
+		if crypto_balances:
+			for crypto_type, balance in crypto_balances.items():
+				report_lines.append(f"  💳 Баланс <code>{crypto_type} = {balance}</code>")
+		
+		# Добавляем статистику пополнений после всех балансов (только для mode == "add")
+		if mode == "add" and card_balances:
+			replenishment_lines = []
+			# Собираем все card_id для batch запроса
+			card_ids_for_stats = []
+			card_name_to_id = {}  # {card_name: card_id}
+			for card_name, data in card_balances.items():
+				# Находим card_id для этой карты из card_mapping
+				card_id = None
+				for cell_address, (mapped_card_name, column, mapped_card_id) in card_mapping.items():
+					if mapped_card_name == card_name:
+						card_id = mapped_card_id
+						break
 				
-				if card_balances:
-					for card_name, data in card_balances.items():
+				if card_id:
+					card_ids_for_stats.append(card_id)
+					card_name_to_id[card_name] = card_id
+			
+			# Получаем статистику пополнений одним batch запросом
+			replenishment_stats_dict = {}
+			if card_ids_for_stats:
+				try:
+					replenishment_stats_dict = await db.get_cards_replenishment_stats_batch(card_ids_for_stats)
+				except Exception as e:
+					logger.warning(f"⚠️ Ошибка batch получения статистики пополнений: {e}")
+			
+			# Формируем строки статистики
+			for card_name, data in card_balances.items():
+				card_id = card_name_to_id.get(card_name)
+				if card_id:
+					replenishment_stats = replenishment_stats_dict.get(card_id)
+					if replenishment_stats:
+						month_total = replenishment_stats.get("month_total", 0.0)
+						all_time_total = replenishment_stats.get("all_time_total", 0.0)
+						# Форматируем числа (убираем лишние нули после запятой)
+						month_str = f"{month_total:.2f}".rstrip('0').rstrip('.') if month_total != int(month_total) else str(int(month_total))
+						all_time_str = f"{all_time_total:.2f}".rstrip('0').rstrip('.') if all_time_total != int(all_time_total) else str(int(all_time_total))
+						
 						group_name = data.get("group_name", "")
-						# Формируем строку с балансом
 						if group_name:
-							report_lines.append(f"  💳 Баланс <code>{card_name} ({group_name}) = {data['balance']}</code>")
+							replenishment_lines.append(f"  💳 {card_name} ({group_name}):")
 						else:
-							report_lines.append(f"  💳 Баланс <code>{card_name} = {data['balance']}</code>")
+							replenishment_lines.append(f"  💳 {card_name}:")
+						replenishment_lines.append(f"    💳❇️ Пополнение за месяц: <code>{month_str}</code>")
+						replenishment_lines.append(f"    💳✳️ Общее пополнение: <code>{all_time_str}</code>")
+			
+			# Добавляем статистику пополнений в отчет, если есть данные
+			if replenishment_lines:
+				report_lines.append("")
+				report_lines.extend(replenishment_lines)
+	
+	# Добавляем раздел с профитом
+	profit_section_lines = []
+	
+	# Профит сделки (для режимов /add и /move)
+	# Используем рассчитанный профит из result, если он есть
+	result_calculated_profit = result.get("calculated_profit")
+	if result_calculated_profit is not None and mode == "add":
+		row_num = result.get("row")
+		profit_col = await db.get_google_sheets_setting("profit_column", "BC")
+		cell_address = f"{profit_col}{row_num}" if row_num else "BC?"
+		profit_section_lines.append(f"  💹 <b>Профит сделки ({cell_address}) = {result_calculated_profit} USD </b>💹\n")
+	elif profits and mode in ["add", "move"]:
+		# Fallback: используем профит из таблицы, если рассчитанный недоступен
+		for cell_address, profit_value in profits.items():
+			profit_section_lines.append(f"  💹 <b>Профит сделки ({cell_address}) = {profit_value} USD </b>💹\n")
+	
+	# Профит за сегодня и средний профит (только для режима /add)
+	if mode == "add":
+			try:
+				# Определяем текущий день недели
+				today = datetime.now()
+				weekday = today.weekday()  # 0 = Monday, 6 = Sunday
 				
-				if cash_balances:
-					for cash_name, balance in cash_balances.items():
-						report_lines.append(f"  💳 Баланс <code>{cash_name} = {balance}</code>")
+				day_names = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+				day_name = day_names[weekday]
 				
-				if crypto_balances:
-					for crypto_type, balance in crypto_balances.items():
-						report_lines.append(f"  💳 Баланс <code>{crypto_type} = {balance}</code>")
+				# Собираем все адреса ячеек для профитов для batch чтения
+				profit_cells_to_read = {}  # {cell_address: day_name}
 				
-				# Добавляем статистику пополнений после всех балансов (только для mode == "add")
-				if mode == "add" and card_balances:
-					replenishment_lines = []
-					# Собираем все card_id для batch запроса
-					card_ids_for_stats = []
-					card_name_to_id = {}  # {card_name: card_id}
-					for card_name, data in card_balances.items():
-						# Находим card_id для этой карты из card_mapping
-						card_id = None
-						for cell_address, (mapped_card_name, column, mapped_card_id) in card_mapping.items():
-							if mapped_card_name == card_name:
-								card_id = mapped_card_id
-								break
-						
-						if card_id:
-							card_ids_for_stats.append(card_id)
-							card_name_to_id[card_name] = card_id
-					
-					# Получаем статистику пополнений одним batch запросом
-					replenishment_stats_dict = {}
-					if card_ids_for_stats:
-						try:
-							replenishment_stats_dict = await db.get_cards_replenishment_stats_batch(card_ids_for_stats)
-						except Exception as e:
-							logger.warning(f"⚠️ Ошибка batch получения статистики пополнений: {e}")
-					
-					# Формируем строки статистики
-					for card_name, data in card_balances.items():
-						card_id = card_name_to_id.get(card_name)
-						if card_id:
-							replenishment_stats = replenishment_stats_dict.get(card_id)
-							if replenishment_stats:
-								month_total = replenishment_stats.get("month_total", 0.0)
-								all_time_total = replenishment_stats.get("all_time_total", 0.0)
-								# Форматируем числа (убираем лишние нули после запятой)
-								month_str = f"{month_total:.2f}".rstrip('0').rstrip('.') if month_total != int(month_total) else str(int(month_total))
-								all_time_str = f"{all_time_total:.2f}".rstrip('0').rstrip('.') if all_time_total != int(all_time_total) else str(int(all_time_total))
-								
-								group_name = data.get("group_name", "")
-								if group_name:
-									replenishment_lines.append(f"  💳 {card_name} ({group_name}):")
-								else:
-									replenishment_lines.append(f"  💳 {card_name}:")
-								replenishment_lines.append(f"    💳❇️ Пополнение за месяц: <code>{month_str}</code>")
-								replenishment_lines.append(f"    💳✳️ Общее пополнение: <code>{all_time_str}</code>")
+				# Получаем ячейку профита за текущий день
+				profit_cell_key = f"profit_{day_name}"
+				profit_cell = await db.get_google_sheets_setting(profit_cell_key)
+				if profit_cell:
+					profit_cells_to_read[profit_cell] = day_name
+				
+				# Собираем адреса ячеек для среднего профита (если не понедельник)
+				if weekday != 0:  # 0 = понедельник
+					profit_days_all = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+					# Берем только дни с понедельника до текущего дня включительно
+					profit_days = profit_days_all[:weekday + 1]
 					
-					# Добавляем статистику пополнений в отчет, если есть данные
-					if replenishment_lines:
-						report_lines.append("")
-						report_lines.extend(replenishment_lines)
-			
-			# Добавляем раздел с профитом
-			profit_section_lines = []
-			
-			# Профит сделки (для режимов /add и /move)
-			# Используем рассчитанный профит из result, если он есть
-			result_calculated_profit = result.get("calculated_profit")
-			if result_calculated_profit is not None and mode == "add":
-				row_num = result.get("row")
-				profit_col = await db.get_google_sheets_setting("profit_column", "BC")
-				cell_address = f"{profit_col}{row_num}" if row_num else "BC?"
-				profit_section_lines.append(f"  💹 <b>Профит сделки ({cell_address}) = {result_calculated_profit} USD </b>💹\n")
-			elif profits and mode in ["add", "move"]:
-				# Fallback: используем профит из таблицы, если рассчитанный недоступен
-				for cell_address, profit_value in profits.items():
-					profit_section_lines.append(f"  💹 <b>Профит сделки ({cell_address}) = {profit_value} USD </b>💹\n")
-			
-			# Профит за сегодня и средний профит (только для режима /add)
-			if mode == "add":
-					try:
-						# Определяем текущий день недели
-						today = datetime.now()
-						weekday = today.weekday()  # 0 = Monday, 6 = Sunday
-						
-						day_names = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-						day_name = day_names[weekday]
-						
-						# Собираем все адреса ячеек для профитов для batch чтения
-						profit_cells_to_read = {}  # {cell_address: day_name}
-						
-						# Получаем ячейку профита за текущий день
-						profit_cell_key = f"profit_{day_name}"
+					for day in profit_days:
+						profit_cell_key = f"profit_{day}"
 						profit_cell = await db.get_google_sheets_setting(profit_cell_key)
-						if profit_cell:
-							profit_cells_to_read[profit_cell] = day_name
+						if profit_cell and profit_cell not in profit_cells_to_read:
+							profit_cells_to_read[profit_cell] = day
+				
+				# Читаем все профиты одним batch запросом
+				if profit_cells_to_read:
+					from app.google_sheets import read_profits_batch
+					cell_addresses = list(profit_cells_to_read.keys())
+					profits_data = await read_profits_batch(
+						settings.google_sheet_id,
+						settings.google_credentials_path,
+						cell_addresses,
+						settings.google_sheet_name
+					)
+					
+					# Обрабатываем профит за сегодня
+					if day_name in profit_cells_to_read.values():
+						# Находим ячейку для сегодняшнего дня
+						today_cell = None
+						for cell, day in profit_cells_to_read.items():
+							if day == day_name:
+								today_cell = cell
+								break
 						
-						# Собираем адреса ячеек для среднего профита (если не понедельник)
-						if weekday != 0:  # 0 = понедельник
-							profit_days_all = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-							# Берем только дни с понедельника до текущего дня включительно
-							profit_days = profit_days_all[:weekday + 1]
-							
-							for day in profit_days:
-								profit_cell_key = f"profit_{day}"
-								profit_cell = await db.get_google_sheets_setting(profit_cell_key)
-								if profit_cell and profit_cell not in profit_cells_to_read:
-									profit_cells_to_read[profit_cell] = day
+						if today_cell and today_cell in profits_data:
+							profit_today = profits_data[today_cell]
+							if profit_today:
+								try:
+									profit_value = float(str(profit_today).replace(",", ".").replace(" ", ""))
+									formatted_profit = f"{int(round(profit_value)):,}".replace(",", " ")
+									profit_section_lines.append(f"  📈 Профит за сегодня: <code>{formatted_profit} USD</code>")
+								except (ValueError, AttributeError):
+									profit_section_lines.append(f"  📈 Профит за сегодня: <code>{profit_today} USD</code>")
+					
+					# Обрабатываем средний профит (если не понедельник)
+					if weekday != 0:
+						profit_values = []
+						for cell_address, day in profit_cells_to_read.items():
+							if cell_address in profits_data:
+								profit_value = profits_data[cell_address]
+								if profit_value:
+									try:
+										value = float(str(profit_value).replace(",", ".").replace(" ", ""))
+										profit_values.append(value)
+									except (ValueError, AttributeError):
+										pass
 						
-						# Читаем все профиты одним batch запросом
-						if profit_cells_to_read:
-							from app.google_sheets import read_profits_batch
-							cell_addresses = list(profit_cells_to_read.keys())
-							profits_data = await read_profits_batch(
-								settings.google_sheet_id,
-								settings.google_credentials_path,
-								cell_addresses,
-								settings.google_sheet_name
-							)
-							
-							# Обрабатываем профит за сегодня
-							if day_name in profit_cells_to_read.values():
-								# Находим ячейку для сегодняшнего дня
-								today_cell = None
-								for cell, day in profit_cells_to_read.items():
-									if day == day_name:
-										today_cell = cell
-										break
-								
-								if today_cell and today_cell in profits_data:
-									profit_today = profits_data[today_cell]
-									if profit_today:
-										try:
-											profit_value = float(str(profit_today).replace(",", ".").replace(" ", ""))
-											formatted_profit = f"{int(round(profit_value)):,}".replace(",", " ")
-											profit_section_lines.append(f"  📈 Профит за сегодня: <code>{formatted_profit} USD</code>")
-										except (ValueError, AttributeError):
-											profit_section_lines.append(f"  📈 Профит за сегодня: <code>{profit_today} USD</code>")
-							
-							# Обрабатываем средний профит (если не понедельник)
-							if weekday != 0:
-								profit_values = []
-								for cell_address, day in profit_cells_to_read.items():
-									if cell_address in profits_data:
-										profit_value = profits_data[cell_address]
-										if profit_value:
-											try:
-												value = float(str(profit_value).replace(",", ".").replace(" ", ""))
-												profit_values.append(value)
-											except (ValueError, AttributeError):
-												pass
-								
-								if profit_values:
-									avg_profit = sum(profit_values) / len(profit_values)
-									formatted_avg = f"{int(round(avg_profit)):,}".replace(",", " ")
-									profit_section_lines.append(f"  📊 Средний профит в день: <code>{formatted_avg} USD</code>")
-					except Exception as e:
-						logger.warning(f"Ошибка получения профита за сегодня и среднего профита: {e}")
-			
-			# Добавляем раздел с профитом в отчет, если есть данные
-			if profit_section_lines:
-				report_lines.append("")
-				report_lines.extend(profit_section_lines)
-			
-			# Проверяем наличие ошибок
-			failed_writes = result.get("failed_writes", [])
-			error_message = result.get("message")
-			if error_message:
-				report_lines.append(f"\n❌ Ошибка: {error_message}")
-			if failed_writes:
-				report_lines.append("\n❌ Не записано:")
-				for failed in failed_writes:
-					report_lines.append(f"  • {failed}")
-			
-			report_text = "\n".join(report_lines)
-			
-			# Callback уже был обработан в начале функции
-			await state.clear()
-			try:
-				await cb.message.edit_text(report_text, reply_markup=admin_menu_kb(), parse_mode="HTML")
-			except Exception as edit_error:
-				# Обрабатываем ошибки сети при отправке сообщения
-				logger.warning(f"Ошибка отправки сообщения с отчетом: {edit_error}")
-				# Пытаемся отправить новое сообщение вместо редактирования
-				try:
-					await cb.message.answer(report_text, reply_markup=admin_menu_kb(), parse_mode="HTML")
-				except Exception as answer_error:
-					logger.error(f"Не удалось отправить отчет: {answer_error}")
-		else:
-			await state.clear()
-			try:
-				await cb.answer("❌ Ошибка записи в Google Sheets", show_alert=True)
-			except Exception:
-				# Если callback устарел, просто обновляем сообщение
-				await cb.message.edit_text("❌ Ошибка записи в Google Sheets", reply_markup=admin_menu_kb())
-	except Exception as e:
-		logger.exception(f"Ошибка записи в Google Sheets: {e}")
-		await state.clear()
-		try:
-			await cb.answer("❌ Произошла ошибка при записи", show_alert=True)
-		except Exception:
-			# Если callback устарел, просто обновляем сообщение
-			try:
-				await cb.message.edit_text("❌ Произошла ошибка при записи", reply_markup=admin_menu_kb())
-			except Exception:
-				pass
+						if profit_values:
+							avg_profit = sum(profit_values) / len(profit_values)
+							formatted_avg = f"{int(round(avg_profit)):,}".replace(",", " ")
+							profit_section_lines.append(f"  📊 Средний профит в день: <code>{formatted_avg} USD</code>")
+			except Exception as e:
+				logger.warning(f"Ошибка получения профита за сегодня и среднего профита: {e}")
+	
+	# Добавляем раздел с профитом в отчет, если есть данные
+	if profit_section_lines:
+		report_lines.append("")
+		report_lines.extend(profit_section_lines)
+	
+	# Проверяем наличие ошибок
+	failed_writes = result.get("failed_writes", [])
+	error_message = result.get("message")
+	if error_message:
+		report_lines.append(f"\n❌ Ошибка: {error_message}")
+	if failed_writes:
+		report_lines.append("\n❌ Не записано:")
+		for failed in failed_writes:
+			report_lines.append(f"  • {failed}")
+	
+	report_text = "\n".join(report_lines)
+
+	await _edit_outbox_message(bot, chat_id, message_id, report_text, reply_markup=admin_menu_kb(), parse_mode="HTML")
 
 
 @admin_router.callback_query(F.data == "admin:cards")
@@ -7580,7 +7502,7 @@ async def admin_expenses(cb: CallbackQuery):
 	
 	db = get_db()
 	from app.config import get_settings
-	from app.google_sheets import read_cell_value
+	from app.google_sheets import read_cell_value, SHEETS_PRIORITY_STATS
 	
 	settings = get_settings()
 	
@@ -7600,7 +7522,8 @@ async def admin_expenses(cb: CallbackQuery):
 			settings.google_sheet_id,
 			settings.google_credentials_path,
 			expenses_cell,
-			settings.google_sheet_name
+			settings.google_sheet_name,
+			priority=SHEETS_PRIORITY_STATS
 		)
 		
 		if value is None:
@@ -7627,7 +7550,7 @@ async def admin_cons_command(msg: Message, bot: Bot, state: FSMContext):
 	
 	db = get_db()
 	from app.config import get_settings
-	from app.google_sheets import read_cell_value
+	from app.google_sheets import read_cell_value, SHEETS_PRIORITY_STATS
 	
 	settings = get_settings()
 	
@@ -7647,7 +7570,8 @@ async def admin_cons_command(msg: Message, bot: Bot, state: FSMContext):
 			settings.google_sheet_id,
 			settings.google_credentials_path,
 			expenses_cell,
-			settings.google_sheet_name
+			settings.google_sheet_name,
+			priority=SHEETS_PRIORITY_STATS
 		)
 		
 		if value is None:
@@ -8854,7 +8778,7 @@ async def requisite_delete(cb: CallbackQuery):
 		
 		# Очищаем user_message
 		await db._db.execute("UPDATE cards SET user_message = NULL WHERE id = ?", (card_id,))
-		await db._db.commit()
+		await db._commit()
 		
 		await cb.answer("Основной реквизит удален ✅", show_alert=True)
 		# Возвращаемся к списку реквизитов
@@ -9180,6 +9104,51 @@ async def admin_users_noop(cb: CallbackQuery):
 	await cb.answer()
 
 
+async def _read_stats_sections(
+	sheet_id: str,
+	credentials_path: str,
+	sections: Dict[str, List[str]],
+	sheet_name: Optional[str] = None
+) -> Tuple[Dict[str, Optional[str]], float, set]:
+	"""
+	Читает ячейки нескольких разделов статистики одним запросом через снапшот.
+	Если общий запрос не удался, разделы читаются по отдельности, чтобы ошибка
+	одного раздела не скрыла остальные.
+	
+	Returns:
+		(значения {адрес: значение}, время актуальности данных, разделы, которые не удалось прочитать)
+	"""
+	from app.google_sheets import read_stats_snapshot
+	
+	cell_addresses = list(dict.fromkeys(address for cells in sections.values() for address in cells))
+	try:
+		values, as_of = await read_stats_snapshot(sheet_id, credentials_path, cell_addresses, sheet_name)
+		return values, as_of, set()
+	except Exception as e:
+		logger.warning(f"⚠️ Ошибка чтения статистики одним запросом, читаем разделы по отдельности: {e}")
+	
+	values = {}
+	as_of = None
+	failed_sections = set()
+	last_error = None
+	for section, cells in sections.items():
+		if not cells:
+			continue
+		try:
+			section_values, section_as_of = await read_stats_snapshot(sheet_id, credentials_path, cells, sheet_name)
+		except Exception as e:
+			logger.exception(f"Ошибка чтения раздела статистики {section}: {e}")
+			failed_sections.add(section)
+			last_error = e
+			continue
+		values.update(section_values)
+		as_of = section_as_of if as_of is None else min(as_of, section_as_of)
+	if as_of is None:
+		# Не прочитан ни один раздел
+		raise last_error
+	return values, as_of, failed_sections
+
+
 async def _update_crypto_values_in_stats(
 	bot: Bot,
 	chat_id: int,
@@ -9192,29 +9161,103 @@ async def _update_crypto_values_in_stats(
 ):
 	"""
 	Обновляет значения криптовалют в сообщении статистики после их загрузки.
+	Балансы криптовалют и наличных и профиты дней читаются одним запросом через снапшот статистики.
 	"""
-	from app.google_sheets import get_crypto_values_from_row_4, read_card_balance
 	from app.di import get_db
 	
 	try:
-		logger.info(f"Начинаем загрузку значений криптовалют из строки 4. Криптовалют: {len(crypto_columns)}")
-		crypto_values = await get_crypto_values_from_row_4(
-			sheet_id,
-			credentials_path,
-			crypto_columns,
-			sheet_name
-		)
+		db = get_db()
+		
+		# Адреса ячеек криптовалют (строка 4)
+		crypto_mapping = {}  # {crypto_type: cell_address}
+		for crypto in crypto_columns:
+			crypto_type = crypto.get("crypto_type", "")
+			column = crypto.get("column", "")
+			if not column:
+				logger.warning(f"Пропущена криптовалюта {crypto_type}: нет столбца")
+				continue
+			crypto_mapping[crypto_type] = f"{column}4"
 		
-		logger.info(f"Получены значения криптовалют: {crypto_values}")
+		# Определяем текущий день недели
+		today = datetime.now()
+		weekday = today.weekday()  # 0 = Monday, 6 = Sunday
+		
+		day_names = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+		day_name = day_names[weekday]
+		
+		# Собираем все адреса ячеек для профитов для batch чтения
+		profit_cells_to_read = {}  # {cell_address: day_name}
+		
+		# Получаем ячейку профита за текущий день
+		profit_cell_key = f"profit_{day_name}"
+		profit_cell = await db.get_google_sheets_setting(profit_cell_key)
+		if profit_cell:
+			profit_cells_to_read[profit_cell] = day_name
+		
+		# Собираем адреса ячеек для среднего профита (если не понедельник)
+		if weekday != 0:  # 0 = понедельник
+			# Берем только дни с понедельника до текущего дня включительно
+			for day in day_names[:weekday + 1]:
+				profit_cell_key = f"profit_{day}"
+				profit_cell = await db.get_google_sheets_setting(profit_cell_key)
+				if profit_cell and profit_cell not in profit_cells_to_read:
+					profit_cells_to_read[profit_cell] = day
+		
+		# Адреса балансов наличных БЕЛКИ и БАКСЫ
+		balance_row_str = await db.get_google_sheets_setting("balance_row", "4")
+		balance_row = int(balance_row_str) if balance_row_str else 4
+		
+		belki_info = await db.get_cash_column("БЕЛКИ")
+		baksy_info = await db.get_cash_column("БАКСЫ")
+		
+		cash_mapping = {}  # {cell_address: (cash_name, currency, emoji)}
+		
+		# БЕЛКИ: если не найдено в базе, используем хардкод AP (BYN)
+		if belki_info:
+			column = belki_info.get("column")
+			currency = belki_info.get("currency", "BYN")
+		else:
+			column = "AP"
+			currency = "BYN"
+			logger.debug("БЕЛКИ не найдено в базе, используем хардкод: AP (BYN)")
+		
+		if column:
+			cash_mapping[f"{column}{balance_row}"] = ("БЕЛКИ", currency, "🐿")
+		
+		# БАКСЫ: если не найдено в базе, используем хардкод AQ (USD)
+		if baksy_info:
+			column = baksy_info.get("column")
+			currency = baksy_info.get("currency", "USD")
+		else:
+			column = "AQ"
+			currency = "USD"
+			logger.debug("БАКСЫ не найдено в базе, используем хардкод: AQ (USD)")
+		
+		if column:
+			cash_mapping[f"{column}{balance_row}"] = ("БАКСЫ", currency, "💵")
+		
+		# Читаем все ячейки одним batch запросом (свежие значения - из снапшота)
+		sections = {
+			"crypto": list(crypto_mapping.values()),
+			"profit": list(profit_cells_to_read.keys()),
+			"cash": list(cash_mapping.keys())
+		}
+		logger.info(f"Начинаем загрузку значений для статистики. Криптовалют: {len(crypto_mapping)}")
+		values, as_of, failed_sections = await _read_stats_sections(sheet_id, credentials_path, sections, sheet_name)
+		values = {address: ((value.strip() or None) if value is not None else None) for address, value in values.items()}
 		
 		# Формируем строки для раздела "Крипта"
 		# Не добавляем заголовок, так как он уже есть в base_lines
 		crypto_lines = []
+		if "crypto" in failed_sections:
+			crypto_lines.append("<i>Ошибка загрузки данных</i>")
+			crypto_columns = []
 		
 		for crypto in crypto_columns:
 			crypto_type = crypto.get("crypto_type", "")
 			column = crypto.get("column", "")
-			value = crypto_values.get(crypto_type)
+			cell_address = crypto_mapping.get(crypto_type)
+			value = values.get(cell_address) if cell_address else None
 			
 			logger.debug(f"Обработка {crypto_type}: column={column}, value={value}, type={type(value)}")
 			
@@ -9237,159 +9280,61 @@ async def _update_crypto_values_in_stats(
 				logger.warning(f"Значение для {crypto_type} пустое или None (column={column})")
 				crypto_lines.append(f"<code>{crypto_type} = —</code>")
 		
-		# Читаем профит за день и средний профит со вторника
+		# Профит за день и средний профит с понедельника
 		profit_lines = []
-		db = get_db()
-		
-		# Определяем текущий день недели
-		from datetime import datetime
-		today = datetime.now()
-		weekday = today.weekday()  # 0 = Monday, 6 = Sunday
-		
-		day_names = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-		day_name = day_names[weekday]
-		day_name_ru = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"][weekday]
-		
-		# Собираем все адреса ячеек для профитов для batch чтения
-		profit_cells_to_read = {}  # {cell_address: day_name}
-		import re
-		
-		# Получаем ячейку профита за текущий день
-		profit_cell_key = f"profit_{day_name}"
-		profit_cell = await db.get_google_sheets_setting(profit_cell_key)
-		if profit_cell:
-			profit_cells_to_read[profit_cell] = day_name
-		
-		# Собираем адреса ячеек для среднего профита (если не понедельник)
-		if weekday != 0:  # 0 = понедельник
-			profit_days_all = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-			# Берем только дни с понедельника до текущего дня включительно
-			profit_days = profit_days_all[:weekday + 1]
+		if "profit" in failed_sections:
+			profit_lines.append("<i>📈 Профит: ошибка загрузки данных</i>")
+		
+		# Обрабатываем профит за сегодня
+		today_cell = None
+		for cell, day in profit_cells_to_read.items():
+			if day == day_name:
+				today_cell = cell
+				break
+		
+		if today_cell:
+			profit_today = values.get(today_cell)
+			if profit_today:
+				try:
+					profit_value = float(str(profit_today).replace(",", ".").replace(" ", ""))
+					formatted_profit = f"{int(round(profit_value)):,}".replace(",", " ")
+					profit_lines.append(f"<code>📈 Профит за сегодня: {formatted_profit} USD</code>")
+				except (ValueError, AttributeError):
+					profit_lines.append(f"<code>📈 Профит за сегодня: {profit_today} USD</code>")
+		
+		# Обрабатываем средний профит (если не понедельник)
+		if weekday != 0:
+			profit_values = []
+			for cell_address in profit_cells_to_read:
+				profit_value = values.get(cell_address)
+				if profit_value:
+					try:
+						profit_values.append(float(str(profit_value).replace(",", ".").replace(" ", "")))
+					except (ValueError, AttributeError):
+						pass
 			
-			for day in profit_days:
-				profit_cell_key = f"profit_{day}"
-				profit_cell = await db.get_google_sheets_setting(profit_cell_key)
-				if profit_cell and profit_cell not in profit_cells_to_read:
-					profit_cells_to_read[profit_cell] = day
+			if profit_values:
+				avg_profit = sum(profit_values) / len(profit_values)
+				formatted_avg = f"{int(round(avg_profit)):,}".replace(",", " ")
+				profit_lines.append(f"<code>📊 Средний: {formatted_avg} USD</code>")
 		
-		# Читаем все профиты одним batch запросом
-		if profit_cells_to_read:
-			try:
-				from app.google_sheets import read_profits_batch
-				cell_addresses = list(profit_cells_to_read.keys())
-				profits_data = await read_profits_batch(
-					sheet_id,
-					credentials_path,
-					cell_addresses,
-					sheet_name
-				)
-				
-				# Обрабатываем профит за сегодня
-				if day_name in profit_cells_to_read.values():
-					# Находим ячейку для сегодняшнего дня
-					today_cell = None
-					for cell, day in profit_cells_to_read.items():
-						if day == day_name:
-							today_cell = cell
-							break
-					
-					if today_cell and today_cell in profits_data:
-						profit_today = profits_data[today_cell]
-						if profit_today:
-							try:
-								profit_value = float(str(profit_today).replace(",", ".").replace(" ", ""))
-								formatted_profit = f"{int(round(profit_value)):,}".replace(",", " ")
-								profit_lines.append(f"<code>📈 Профит за сегодня: {formatted_profit} USD</code>")
-							except (ValueError, AttributeError):
-								profit_lines.append(f"<code>📈 Профит за сегодня: {profit_today} USD</code>")
-				
-				# Обрабатываем средний профит (если не понедельник)
-				if weekday != 0:
-					profit_values = []
-					for cell_address, day in profit_cells_to_read.items():
-						if cell_address in profits_data:
-							profit_value = profits_data[cell_address]
-							if profit_value:
-								try:
-									value = float(str(profit_value).replace(",", ".").replace(" ", ""))
-									profit_values.append(value)
-								except (ValueError, AttributeError):
-									pass
-					
-					if profit_values:
-						avg_profit = sum(profit_values) / len(profit_values)
-						formatted_avg = f"{int(round(avg_profit)):,}".replace(",", " ")
-						profit_lines.append(f"<code>📊 Средний: {formatted_avg} USD</code>")
-			except Exception as e:
-				logger.warning(f"Ошибка batch чтения профитов: {e}")
-		
-		# Читаем балансы наличных БЕЛКИ и БАКСЫ
+		# Балансы наличных БЕЛКИ и БАКСЫ
 		cash_lines = []
-		try:
-			from app.google_sheets import read_card_balances_batch
-			
-			# Получаем balance_row из настроек
-			balance_row_str = await db.get_google_sheets_setting("balance_row", "4")
-			balance_row = int(balance_row_str) if balance_row_str else 4
-			
-			# Получаем информацию о наличных из базы
-			belki_info = await db.get_cash_column("БЕЛКИ")
-			baksy_info = await db.get_cash_column("БАКСЫ")
-			
-			cash_cell_addresses = []
-			cash_mapping = {}  # {cell_address: (cash_name, currency, emoji)}
-			
-			# БЕЛКИ: если не найдено в базе, используем хардкод AP (BYN)
-			if belki_info:
-				column = belki_info.get("column")
-				currency = belki_info.get("currency", "BYN")
-			else:
-				column = "AP"
-				currency = "BYN"
-				logger.debug("БЕЛКИ не найдено в базе, используем хардкод: AP (BYN)")
-			
-			if column:
-				cell_address = f"{column}{balance_row}"
-				cash_cell_addresses.append(cell_address)
-				cash_mapping[cell_address] = ("БЕЛКИ", currency, "🐿")
-			
-			# БАКСЫ: если не найдено в базе, используем хардкод AQ (USD)
-			if baksy_info:
-				column = baksy_info.get("column")
-				currency = baksy_info.get("currency", "USD")
+		if "cash" in failed_sections:
+			cash_lines.append("<i>Наличные: ошибка загрузки данных</i>")
+			cash_mapping = {}
+		for cell_address, (cash_name, currency, emoji) in cash_mapping.items():
+			balance = values.get(cell_address)
+			if balance:
+				try:
+					# Пытаемся форматировать как число
+					num_value = float(str(balance).replace(",", ".").replace(" ", ""))
+					formatted_value = f"{int(round(num_value)):,}".replace(",", " ")
+					cash_lines.append(f"<code>{emoji} {cash_name} ({currency}) = {formatted_value}</code>")
+				except (ValueError, AttributeError):
+					cash_lines.append(f"<code>{emoji} {cash_name} ({currency}) = {balance}</code>")
 			else:
-				column = "AQ"
-				currency = "USD"
-				logger.debug("БАКСЫ не найдено в базе, используем хардкод: AQ (USD)")
-			
-			if column:
-				cell_address = f"{column}{balance_row}"
-				cash_cell_addresses.append(cell_address)
-				cash_mapping[cell_address] = ("БАКСЫ", currency, "💵")
-			
-			# Читаем балансы наличных одним batch запросом
-			if cash_cell_addresses:
-				cash_balances = await read_card_balances_batch(
-					sheet_id,
-					credentials_path,
-					cash_cell_addresses,
-					sheet_name
-				)
-				
-				for cell_address, (cash_name, currency, emoji) in cash_mapping.items():
-					balance = cash_balances.get(cell_address)
-					if balance:
-						try:
-							# Пытаемся форматировать как число
-							num_value = float(str(balance).replace(",", ".").replace(" ", ""))
-							formatted_value = f"{int(round(num_value)):,}".replace(",", " ")
-							cash_lines.append(f"<code>{emoji} {cash_name} ({currency}) = {formatted_value}</code>")
-						except (ValueError, AttributeError):
-							cash_lines.append(f"<code>{emoji} {cash_name} ({currency}) = {balance}</code>")
-					else:
-						cash_lines.append(f"<code>{emoji} {cash_name} ({currency}) = —</code>")
-		except Exception as e:
-			logger.warning(f"Ошибка чтения балансов наличных: {e}")
+				cash_lines.append(f"<code>{emoji} {cash_name} ({currency}) = —</code>")
 		
 		# Объединяем базовые строки, строки с криптовалютами, наличными и профитом
 		all_lines = base_lines + crypto_lines
@@ -9399,6 +9344,8 @@ async def _update_crypto_values_in_stats(
 		if profit_lines:
 			all_lines.append("")  # Пустая строка перед профитом
 			all_lines.extend(profit_lines)
+		all_lines.append("")
+		all_lines.append(f"<i>🕓 Данные на {datetime.fromtimestamp(as_of).strftime('%H:%M:%S')}</i>")
 		text = "\n".join(all_lines)
 		
 		# Обновляем сообщение
@@ -9737,7 +9684,7 @@ async def admin_cons_command(msg: Message, state: FSMContext):
 	
 	db = get_db()
 	from app.config import get_settings
-	from app.google_sheets import read_card_balances_batch
+	from app.google_sheets import read_card_balances_batch, SHEETS_PRIORITY_STATS
 	
 	settings = get_settings()
 	
@@ -9760,7 +9707,8 @@ async def admin_cons_command(msg: Message, state: FSMContext):
 			settings.google_sheet_id,
 			settings.google_credentials_path,
 			[expenses_cell],
-			settings.google_sheet_name
+			settings.google_sheet_name,
+			priority=SHEETS_PRIORITY_STATS
 		)
 		
 		expenses_value = expenses_dict.get(expenses_cell)
@@ -9803,7 +9751,7 @@ async def admin_stat_bk_command(msg: Message, bot: Bot, state: FSMContext):
 	
 	db = get_db()
 	from app.config import get_settings
-	from app.google_sheets import read_card_balances_batch
+	from app.google_sheets import read_stats_snapshot
 	
 	settings = get_settings()
 	
@@ -9856,15 +9804,17 @@ async def admin_stat_bk_command(msg: Message, bot: Bot, state: FSMContext):
 		else:
 			cards_without_column.append(card_name)
 	
-	# Читаем все балансы одним batch запросом
+	# Читаем все балансы одним batch запросом (свежие значения - из снапшота без запроса к таблице)
 	balances = {}
+	balances_as_of = None
 	if cell_addresses:
 		try:
-			balances = await read_card_balances_batch(
+			snapshot_values, balances_as_of = await read_stats_snapshot(
 				settings.google_sheet_id,
 				settings.google_credentials_path,
 				cell_addresses
 			)
+			balances = {address: (value.strip() if value is not None else None) for address, value in snapshot_values.items()}
 		except Exception as e:
 			logger.exception(f"Ошибка batch чтения балансов: {e}")
 
@@ -9986,6 +9936,10 @@ async def admin_stat_bk_command(msg: Message, bot: Bot, state: FSMContext):
 	if not cards_by_group and not cards_without_group and not cards_without_column:
 		lines.append("Нет данных о картах.")
 	
+	if balances_as_of:
+		lines.append("")
+		lines.append(f"🕓 Данные на {datetime.fromtimestamp(balances_as_of).strftime('%H:%M:%S')}")
+	
 	text = "\n".join(lines)
 	total_cards_with_balance = sum(len(cards) for cards in cards_by_group.values()) + len(cards_without_group)
 	logger.info(f"📊 Отправка балансов карт: групп={len(cards_by_group)}, карт с балансом={total_cards_with_balance}, без столбца={len(cards_without_column)}")
@@ -11125,7 +11079,7 @@ async def order_edit_amount_save(message: Message, state: FSMContext, bot: Bot):
 		"UPDATE orders SET amount_currency = ? WHERE id = ?",
 		(new_amount, order_id)
 	)
-	await db._db.commit()
+	await db._commit()
 	
 	logger.info(f"✅ Сумма сделки {order_id} обновлена: {int(current_amount)} {currency_symbol} -> {int(new_amount)} {currency_symbol}")
 	
@@ -11193,7 +11147,7 @@ async def order_edit_crypto_amount_save(message: Message, state: FSMContext, bot
 		"UPDATE orders SET amount = ? WHERE id = ?",
 		(new_crypto_amount, order_id)
 	)
-	await db._db.commit()
+	await db._commit()
 	
 	current_str = f"{current_crypto_amount:.8f}".rstrip('0').rstrip('.') if current_crypto_amount < 1 else f"{current_crypto_amount:.2f}".rstrip('0').rstrip('.')
 	new_str = f"{new_crypto_amount:.8f}".rstrip('0').rstrip('.') if new_crypto_amount < 1 else f"{new_crypto_amount:.2f}".rstrip('0').rstrip('.')
@@ -11424,14 +11378,14 @@ async def order_debt_amount_save(message: Message, state: FSMContext, bot: Bot):
 		"UPDATE orders SET amount_currency = ? WHERE id = ?",
 		(new_amount_currency, order_id)
 	)
-	await db._db.commit()
+	await db._commit()
 	if existing_debt:
 		# Обновляем существующий долг
 		await db._db.execute(
 			"UPDATE debts SET debt_amount = ?, currency_symbol = ? WHERE order_id = ?",
 			(debt_amount, debt_currency, order_id)
 		)
-		await db._db.commit()
+		await db._commit()
 		logger.info(f"✅ Долг для заявки {order_id} обновлен: {int(debt_amount)} {debt_currency}")
 		await message.answer(f"✅ Долг обновлен: {int(debt_amount)} {debt_currency}")
 	else:
@@ -11707,7 +11661,7 @@ async def _update_user_order_message(bot: Bot, order_id: int, db):
 						"UPDATE orders SET proof_confirmation_message_id = ? WHERE id = ?",
 						(sent_msg.message_id, order_id)
 					)
-					await db._db.commit()
+					await db._commit()
 				except Exception:
 					pass
 	except Exception as e:
@@ -13048,7 +13002,7 @@ async def forward_select_card(cb: CallbackQuery, state: FSMContext, bot: Bot):
 					"INSERT INTO users(tg_id, username, full_name, last_interaction_at) VALUES(?, ?, ?, ?)",
 					(None, None, hidden_user_name, int(time.time())),
 				)
-				await db._db.commit()
+				await db._commit()
 				user_id = cur.lastrowid
 				await db.bind_user_to_card(user_id, card_id)
 				logger.info(f"✅ Создан новый скрытый пользователь '{hidden_user_name}' (user_id={user_id}) и привязана карта {card_id}")
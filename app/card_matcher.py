@@ -0,0 +1,116 @@
+"""
+Поиск карты по тексту сообщения (шаблоны message_card).
+
+Шаблоны компилируются один раз: обычные (подстрока без учета регистра) - в автомат
+Ахо-Корасик, который находит все совпадения за один проход по тексту при любом числе
+шаблонов; регулярные выражения - в список заранее скомпилированных re.Pattern.
+Приоритет как и раньше: сначала обычные шаблоны, среди них - более новый (больший id),
+затем регулярные выражения в том же порядке.
+"""
+import logging
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("app.card_matcher")
+
+# Приоритет "нет совпадения" (больше любого индекса шаблона)
+_NO_MATCH = 1 << 62
+
+
+class AhoCorasick:
+	"""
+	Автомат Ахо-Корасик для поиска набора подстрок.
+
+	Каждому шаблону соответствует приоритет - его индекс в списке (меньше - важнее);
+	search() возвращает индекс самого приоритетного из найденных шаблонов.
+	"""
+
+	def __init__(self, patterns: Sequence[str]) -> None:
+		self._goto: List[Dict[str, int]] = [{}]
+		self._fail: List[int] = [0]
+		# Лучший (минимальный) индекс шаблона, оканчивающегося в состоянии, с учетом суффиксов
+		self._best: List[int] = [_NO_MATCH]
+		for index, pattern in enumerate(patterns):
+			self._add(pattern, index)
+		self._build_fail_links()
+
+	def _add(self, pattern: str, index: int) -> None:
+		state = 0
+		for char in pattern:
+			next_state = self._goto[state].get(char)
+			if next_state is None:
+				next_state = len(self._goto)
+				self._goto[state][char] = next_state
+				self._goto.append({})
+				self._fail.append(0)
+				self._best.append(_NO_MATCH)
+			state = next_state
+		self._best[state] = min(self._best[state], index)
+
+	def _build_fail_links(self) -> None:
+		queue = list(self._goto[0].values())
+		for state in queue:
+			for char, next_state in self._goto[state].items():
+				queue.append(next_state)
+				fail = self._fail[state]
+				while fail and char not in self._goto[fail]:
+					fail = self._fail[fail]
+				candidate = self._goto[fail].get(char, 0)
+				self._fail[next_state] = candidate if candidate != next_state else 0
+				self._best[next_state] = min(self._best[next_state], self._best[self._fail[next_state]])
+
+	def search(self, text: str) -> Optional[int]:
+		"""Индекс самого приоритетного шаблона, входящего в text, или None"""
+		goto, fail, best_out = self._goto, self._fail, self._best
+		best = best_out[0]  # Пустой шаблон входит в любой текст
+		state = 0
+		for char in text:
+			while state and char not in goto[state]:
+				state = fail[state]
+			state = goto[state].get(char, 0)
+			if best_out[state] < best:
+				best = best_out[state]
+				if best == 0:
+					break
+		return best if best != _NO_MATCH else None
+
+
+class CardMatcher:
+	"""Скомпилированные шаблоны message_card и карты, на которые они указывают"""
+
+	def __init__(
+		self,
+		cards: Sequence[Tuple[int, str, str]],
+		patterns: Sequence[Tuple[str, int, int]]
+	) -> None:
+		"""
+		Args:
+			cards: Карты (id, name, details)
+			patterns: Шаблоны (pattern, is_regex, card_id) в порядке приоритета (id DESC)
+		"""
+		self._cards: Dict[int, Tuple[int, str, str]] = {card[0]: tuple(card) for card in cards}
+		# Шаблоны без карты никогда не срабатывали - не включаем их
+		plain: List[Tuple[str, int]] = []
+		self._regexes: List[Tuple[re.Pattern, int]] = []
+		for pattern, is_regex, card_id in patterns:
+			if card_id not in self._cards:
+				continue
+			if not is_regex:
+				plain.append((pattern.lower(), card_id))
+				continue
+			try:
+				self._regexes.append((re.compile(pattern), card_id))
+			except re.error as e:
+				logger.debug(f"Invalid card pattern {pattern!r} skipped: {e}")
+		self._plain_card_ids = [card_id for _, card_id in plain]
+		self._automaton = AhoCorasick([pattern for pattern, _ in plain])
+
+	def match(self, text: str) -> Optional[Tuple[int, str, str]]:
+		"""Карта (id, name, details) по тексту сообщения или None"""
+		index = self._automaton.search(text.lower())
+		if index is not None:
+			return self._cards[self._plain_card_ids[index]]
+		for regex, card_id in self._regexes:
+			if regex.search(text):
+				return self._cards[card_id]
+		return None
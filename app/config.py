@@ -11,6 +11,7 @@ class Settings(BaseModel):
 	admin_ids: List[int]
 	admin_usernames: List[str] = []
 	database_path: str = "./data/bot.db"
+	db_reader_pool_size: int = 2  # Соединений SQLite только для чтения (0 - одно соединение на все)
 	google_sheet_id: str = ""
 	google_credentials_path: str = ""
 	google_sheet_name: str = ""  # Название листа в таблице (если пусто, используется первый лист)
@@ -25,6 +26,23 @@ class Settings(BaseModel):
 	rate_limit_callbacks_period: int = 60  # Период в секундах для callback
 	rate_limit_deals_max: int = 5  # Максимум созданий сделок
 	rate_limit_deals_period: int = 60  # Период в секундах для создания сделок
+	
+	# Квоты Google Sheets API (запросов в минуту на сервисный аккаунт)
+	google_sheets_read_quota: int = 60
+	google_sheets_write_quota: int = 60
+	# Время жизни снапшота балансов и профитов для /stat_bk и /stat_k (секунды, 0 - без кэша)
+	stats_snapshot_ttl: int = 60
+	
+	# Бэкенд Google Sheets: "google" - настоящий API, "fake" - локальная таблица в памяти (app/sheets_fake.py)
+	google_sheets_backend: str = "google"
+	google_sheets_fake_latency_ms: int = 0  # Задержка каждого запроса к локальной таблице
+	google_sheets_fake_429_rate: float = 0.0  # Доля запросов, завершающихся 429
+	google_sheets_fake_503_rate: float = 0.0  # Доля запросов, завершающихся 503
+	google_sheets_fake_data_path: str = ""  # JSON с начальными данными {sheet_id: {лист: {"A1": значение}}}
+	
+	# Поток тикеров курсов (WebSocket, формат Binance combined stream); "" - выключен,
+	# "fake" - локальный поток (только вместе с google_sheets_backend="fake")
+	price_stream_url: str = ""
 
 	@field_validator("admin_ids", mode="before")
 	@classmethod
@@ -79,4 +97,14 @@ def get_settings() -> Settings:
 		rate_limit_callbacks_period=int(os.getenv("RATE_LIMIT_CALLBACKS_PERIOD", "60")),
 		rate_limit_deals_max=int(os.getenv("RATE_LIMIT_DEALS_MAX", "5")),
 		rate_limit_deals_period=int(os.getenv("RATE_LIMIT_DEALS_PERIOD", "60")),
+		google_sheets_read_quota=int(os.getenv("GOOGLE_SHEETS_READ_QUOTA", "60")),
+		google_sheets_write_quota=int(os.getenv("GOOGLE_SHEETS_WRITE_QUOTA", "60")),
+		stats_snapshot_ttl=int(os.getenv("STATS_SNAPSHOT_TTL", "60")),
+		google_sheets_backend=os.getenv("GOOGLE_SHEETS_BACKEND", "google"),
+		google_sheets_fake_latency_ms=int(os.getenv("GOOGLE_SHEETS_FAKE_LATENCY_MS", "0")),
+		google_sheets_fake_429_rate=float(os.getenv("GOOGLE_SHEETS_FAKE_429_RATE", "0")),
+		google_sheets_fake_503_rate=float(os.getenv("GOOGLE_SHEETS_FAKE_503_RATE", "0")),
+		google_sheets_fake_data_path=os.getenv("GOOGLE_SHEETS_FAKE_DATA_PATH", ""),
+		price_stream_url=os.getenv("PRICE_STREAM_URL", ""),
+		db_reader_pool_size=int(os.getenv("DB_READER_POOL_SIZE", "2")),
 	)
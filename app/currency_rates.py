@@ -2,17 +2,23 @@
 Модуль для автоматического получения курсов валют из интернета
 """
 import asyncio
+import hashlib
+import json
 import logging
 import re
-from typing import Optional, Tuple
+import time
+from typing import Any, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 
 try:
 	import aiohttp
-	from bs4 import BeautifulSoup
+	import lxml.html
 except ImportError:
 	aiohttp = None
-	BeautifulSoup = None
+	lxml = None
+
+from app.di import get_db, get_http
+from app.single_flight import get_single_flight
 
 logger = logging.getLogger("app.currency_rates")
 
@@ -31,6 +37,24 @@ _cache_timestamp_byn: Optional[datetime] = None
 _cache_timestamp_rub: Optional[datetime] = None
 CACHE_DURATION = timedelta(minutes=30)
 
+# Одновременные запросы одного курса объединяются в один запрос к myfin.by
+_rates_flight = get_single_flight("currency_rates")
+
+# Элемент с курсом USD→BYN на myfin.by
+BYN_RATE_XPATH = "//*[@id='bank-row-62']/td[3]/span"
+# Курс USD/RUB обычно в диапазоне 60-120
+RUB_RATE_MIN = 60
+RUB_RATE_MAX = 120
+_RUB_CONTEXT_WORDS = ['курс', 'usd', 'рубл', 'доллар', 'продаж', 'покупк', 'цб', 'банк']
+# Кандидаты для курса RUB: span/div/td с коротким текстом (число), в порядке документа
+_RUB_CANDIDATES_XPATH = "//*[self::span or self::div or self::td][string-length(normalize-space(.)) <= 16]"
+# XPath элемента, в котором курс RUB был найден в прошлый раз (проверяется первым)
+_rub_rate_xpath: Optional[str] = None
+
+# HTTP-кэш страниц курсов: ETag/Last-Modified, хэш тела и разобранный курс.
+# Хранится в settings (fx_page_cache_<валюта>), переживает перезапуск бота
+_page_cache: Dict[str, Dict[str, Any]] = {}
+
 
 async def get_usd_to_byn_rate(bot=None) -> Optional[float]:
 	"""
@@ -39,85 +63,222 @@ async def get_usd_to_byn_rate(bot=None) -> Optional[float]:
 	Returns:
 		Курс валюты или None в случае ошибки
 	"""
-	global _rate_cache_byn, _cache_timestamp_byn, _failure_count_byn, _last_alert_sent_byn
+	return await _rates_flight.do("USD_BYN", lambda: _fetch_usd_to_byn_rate(bot))
+
+
+def _parse_byn_rate(html: str) -> Tuple[Optional[float], Optional[str]]:
+	"""
+	Извлекает курс USD→BYN из страницы myfin.by (выполняется в пуле потоков).
+	
+	Returns:
+		(курс, None) или (None, описание проблемы)
+	"""
+	tree = lxml.html.fromstring(html)
+	spans = tree.xpath(BYN_RATE_XPATH)
+	if not spans:
+		if not tree.xpath("//*[@id='bank-row-62']"):
+			return None, "Не найден элемент bank-row-62 на странице myfin.by"
+		return None, "Не найден span с курсом в bank-row-62"
+	# Заменяем запятую на точку и извлекаем число
+	rate_text = spans[0].text_content().strip().replace(',', '.')
+	match = re.search(r'(\d+\.?\d*)', rate_text)
+	if not match:
+		return None, f"Не удалось распарсить курс из текста: {rate_text}"
+	return float(match.group(1)), None
+
+
+def _rub_value_from_text(text: str) -> Optional[float]:
+	"""Число в диапазоне курса USD/RUB, если весь текст элемента - это число"""
+	text_clean = "".join(text.split()).replace(',', '.')
+	match = re.search(r'^(\d{2,3}(?:\.\d{1,4})?)$', text_clean)
+	if not match:
+		return None
+	value = float(match.group(1))
+	return value if RUB_RATE_MIN <= value <= RUB_RATE_MAX else None
+
+
+def _has_rub_context(element: Any) -> bool:
+	"""Есть ли в тексте родителя элемента слова про курс/доллар/рубль"""
+	parent = element.getparent()
+	if parent is None:
+		return False
+	parent_text = parent.text_content().lower()
+	return any(word in parent_text for word in _RUB_CONTEXT_WORDS)
+
+
+def _parse_rub_rate(html: str, remembered_xpath: Optional[str] = None) -> Tuple[Optional[float], Optional[str]]:
+	"""
+	Извлекает курс USD→RUB из страницы myfin.by (выполняется в пуле потоков).
+	
+	Args:
+		html: Текст страницы
+		remembered_xpath: XPath элемента, где курс был найден в прошлый раз
+	
+	Returns:
+		(курс, XPath элемента с курсом) или (None, None)
+	"""
+	tree = lxml.html.fromstring(html)
+	root = tree.getroottree()
+	
+	# Сначала проверяем элемент, где курс был в прошлый раз. После изменения верстки по тому же
+	# пути может оказаться другое число, поэтому элемент должен пройти ту же проверку контекста
+	if remembered_xpath:
+		for element in tree.xpath(remembered_xpath):
+			value = _rub_value_from_text(element.text_content())
+			if value is not None and _has_rub_context(element):
+				return value, remembered_xpath
+	
+	# Метод 1: элемент, весь текст которого - число в диапазоне курса;
+	# предпочтение - элементу, рядом с которым есть слова про курс/доллар/рубль
+	first_match: Optional[Tuple[float, str]] = None
+	for element in tree.xpath(_RUB_CANDIDATES_XPATH):
+		value = _rub_value_from_text(element.text_content())
+		if value is None:
+			continue
+		if _has_rub_context(element):
+			return value, root.getpath(element)
+		if first_match is None:
+			first_match = (value, root.getpath(element))
+	if first_match:
+		return first_match
+	
+	# Метод 2: ячейки таблиц с курсами банков
+	for cell in tree.xpath("//table//tr//*[self::td or self::th]"):
+		text = "".join(cell.text_content().split()).replace(',', '.')
+		match = re.search(r'(\d{2}\.\d{2,4})', text)
+		if match:
+			value = float(match.group(1))
+			if RUB_RATE_MIN <= value <= RUB_RATE_MAX:
+				return value, root.getpath(cell)
+	return None, None
+
+
+async def _load_page_cache(currency: str) -> Dict[str, Any]:
+	"""HTTP-кэш страницы курса: из памяти, при первом обращении - из БД"""
+	entry = _page_cache.get(currency)
+	if entry is None:
+		entry = {}
+		try:
+			raw = await get_db().get_setting(f"fx_page_cache_{currency}", None)
+			if raw:
+				entry = json.loads(raw)
+		except Exception as e:
+			logger.warning(f"⚠️ Не удалось загрузить HTTP-кэш курса {currency.upper()}: {e}")
+		_page_cache[currency] = entry
+	return entry
+
+
+async def _save_page_cache(currency: str, entry: Dict[str, Any]) -> None:
+	_page_cache[currency] = entry
+	# Вызывается внутри общего запроса (single-flight) - запись в БД отдельной задачей, без ожидания
+	get_db().run_detached(_persist_page_cache, currency, json.dumps(entry, ensure_ascii=False))
+
+
+async def _persist_page_cache(currency: str, raw: str) -> None:
+	try:
+		await get_db().set_setting(f"fx_page_cache_{currency}", raw)
+	except Exception as e:
+		logger.warning(f"⚠️ Не удалось сохранить HTTP-кэш курса {currency.upper()}: {e}")
+
+
+def _cached_rate_if_fresh(entry: Dict[str, Any]) -> Optional[float]:
+	"""Курс из HTTP-кэша, если он получен не раньше CACHE_DURATION назад"""
+	if entry.get("rate") and time.time() - entry.get("fetched_at", 0) < CACHE_DURATION.total_seconds():
+		return entry["rate"]
+	return None
+
+
+async def _conditional_get(
+	url: str,
+	entry: Dict[str, Any],
+	headers: Optional[Dict[str, str]] = None,
+	timeout: int = 10
+) -> Tuple[int, Optional[str], Dict[str, Any]]:
+	"""
+	GET с If-None-Match/If-Modified-Since по сохраненным валидаторам.
+	
+	Returns:
+		(HTTP статус, текст страницы или None, новые валидаторы и хэш тела)
+	"""
+	request_headers = dict(headers or {})
+	# Валидаторы отправляем только при наличии курса, который можно переиспользовать при 304
+	if entry.get("rate"):
+		if entry.get("etag"):
+			request_headers["If-None-Match"] = entry["etag"]
+		if entry.get("last_modified"):
+			request_headers["If-Modified-Since"] = entry["last_modified"]
+	session = get_http().session
+	async with session.get(url, headers=request_headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+		if response.status != 200:
+			return response.status, None, {}
+		body = await response.read()
+		html = body.decode(response.get_encoding(), errors="replace")
+		return 200, html, {
+			"etag": response.headers.get("ETag"),
+			"last_modified": response.headers.get("Last-Modified"),
+			"body_hash": hashlib.sha256(body).hexdigest(),
+		}
+
+
+async def _fetch_usd_to_byn_rate(bot=None) -> Optional[float]:
+	global _rate_cache_byn, _cache_timestamp_byn, _failure_count_byn, _last_alert_sent_byn, _last_success_byn
 	
 	# Проверяем кэш
 	if _rate_cache_byn and _cache_timestamp_byn:
 		if datetime.now() - _cache_timestamp_byn < CACHE_DURATION:
 			return _rate_cache_byn
 	
-	if not aiohttp or not BeautifulSoup:
-		logger.error("⚠️ Библиотеки aiohttp и BeautifulSoup не установлены. Установите: pip install aiohttp beautifulsoup4")
+	if not aiohttp or not lxml:
+		logger.error("⚠️ Библиотеки aiohttp и lxml не установлены. Установите: pip install aiohttp lxml")
 		return None
 	
+	# После перезапуска берем курс из сохраненного HTTP-кэша, если он еще свежий
+	entry = await _load_page_cache("byn")
+	rate = _cached_rate_if_fresh(entry)
+	if rate:
+		_rate_cache_byn = rate
+		_cache_timestamp_byn = datetime.fromtimestamp(entry["fetched_at"])
+		return rate
+	
 	url = "https://myfin.by/currency/minsk?utm_source=myfin&utm_medium=organic&utm_campaign=menu&working=0"
 	
 	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-				if response.status != 200:
-					logger.warning(f"⚠️ Не удалось получить курс BYN: HTTP {response.status}")
-					_failure_count_byn += 1
-					await _check_and_alert_byn(bot)
-					return None
-				
-				html = await response.text()
-				soup = BeautifulSoup(html, 'html.parser')
-				
-				# Ищем элемент по XPath: //*[@id='bank-row-62']/td[3]/span
-				# Пытаемся найти элемент с id='bank-row-62'
-				bank_row = soup.find(id='bank-row-62')
-				if not bank_row:
-					logger.warning("⚠️ Не найден элемент bank-row-62 на странице myfin.by")
-					_failure_count_byn += 1
-					await _check_and_alert_byn()
-					return None
-				
-				# Ищем третью ячейку (td[3]) и span внутри
-				td_cells = bank_row.find_all('td')
-				if len(td_cells) < 3:
-					logger.warning("⚠️ Не найдено достаточно ячеек в bank-row-62")
-					_failure_count_byn += 1
-					await _check_and_alert_byn()
-					return None
-				
-				span = td_cells[2].find('span')
-				if not span:
-					logger.warning("⚠️ Не найден span с курсом в bank-row-62")
-					_failure_count_byn += 1
-					await _check_and_alert_byn()
-					return None
-				
-				# Извлекаем текст и парсим число
-				rate_text = span.get_text(strip=True)
-				# Заменяем запятую на точку и извлекаем число
-				rate_text = rate_text.replace(',', '.')
-				# Ищем число с точкой
-				match = re.search(r'(\d+\.?\d*)', rate_text)
-				if not match:
-					logger.warning(f"⚠️ Не удалось распарсить курс из текста: {rate_text}")
-					_failure_count_byn += 1
-					await _check_and_alert_byn()
-					return None
-				
-				rate = float(match.group(1))
-				
-				# Проверяем разумность значения (курс BYN обычно 2-4)
-				if rate < 1 or rate > 10:
-					logger.warning(f"⚠️ Получен неразумный курс BYN: {rate}")
-					_failure_count_byn += 1
-					await _check_and_alert_byn()
-					return None
-				
-				# Успешно получили курс
-				_rate_cache_byn = rate
-				_cache_timestamp_byn = datetime.now()
-				_failure_count_byn = 0
-				_last_success_byn = datetime.now()
-				logger.info(f"✅ Курс USD→BYN успешно получен: {rate}")
-				
-				return rate
-				
+		status, html, validators = await _conditional_get(url, entry, timeout=10)
+		if status == 304 or (status == 200 and validators["body_hash"] == entry.get("body_hash") and entry.get("rate")):
+			# Страница не изменилась - курс тот же, разбор не нужен
+			rate = entry["rate"]
+			logger.debug(f"♻️ Страница курса BYN не изменилась (HTTP {status}), разбор пропущен")
+		elif status != 200:
+			logger.warning(f"⚠️ Не удалось получить курс BYN: HTTP {status}")
+			_failure_count_byn += 1
+			await _check_and_alert_byn(bot)
+			return None
+		else:
+			# Разбор страницы - в пуле потоков, чтобы не блокировать event loop
+			rate, problem = await asyncio.to_thread(_parse_byn_rate, html)
+			if rate is None:
+				logger.warning(f"⚠️ {problem}")
+				_failure_count_byn += 1
+				await _check_and_alert_byn(bot)
+				return None
+			
+			# Проверяем разумность значения (курс BYN обычно 2-4)
+			if rate < 1 or rate > 10:
+				logger.warning(f"⚠️ Получен неразумный курс BYN: {rate}")
+				_failure_count_byn += 1
+				await _check_and_alert_byn(bot)
+				return None
+		
+		# Успешно получили курс
+		_rate_cache_byn = rate
+		_cache_timestamp_byn = datetime.now()
+		_failure_count_byn = 0
+		_last_success_byn = datetime.now()
+		await _save_page_cache("byn", {**entry, **validators, "rate": rate, "fetched_at": time.time()})
+		logger.info(f"✅ Курс USD→BYN успешно получен: {rate}")
+		
+		return rate
+	
 	except asyncio.TimeoutError:
 		logger.warning("⚠️ Таймаут при получении курса BYN")
 		_failure_count_byn += 1
@@ -137,17 +298,31 @@ async def get_usd_to_rub_rate(bot=None) -> Optional[float]:
 	Returns:
 		Курс валюты или None в случае ошибки
 	"""
-	global _rate_cache_rub, _cache_timestamp_rub, _failure_count_rub, _last_alert_sent_rub
+	return await _rates_flight.do("USD_RUB", lambda: _fetch_usd_to_rub_rate(bot))
+
+
+async def _fetch_usd_to_rub_rate(bot=None) -> Optional[float]:
+	global _rate_cache_rub, _cache_timestamp_rub, _failure_count_rub, _last_alert_sent_rub, _last_success_rub, _rub_rate_xpath
 	
 	# Проверяем кэш
 	if _rate_cache_rub and _cache_timestamp_rub:
 		if datetime.now() - _cache_timestamp_rub < CACHE_DURATION:
 			return _rate_cache_rub
 	
-	if not aiohttp or not BeautifulSoup:
-		logger.error("⚠️ Библиотеки aiohttp и BeautifulSoup не установлены. Установите: pip install aiohttp beautifulsoup4")
+	if not aiohttp or not lxml:
+		logger.error("⚠️ Библиотеки aiohttp и lxml не установлены. Установите: pip install aiohttp lxml")
 		return None
 	
+	# После перезапуска берем курс из сохраненного HTTP-кэша, если он еще свежий
+	entry = await _load_page_cache("rub")
+	if _rub_rate_xpath is None:
+		_rub_rate_xpath = entry.get("xpath")
+	rate = _cached_rate_if_fresh(entry)
+	if rate:
+		_rate_cache_rub = rate
+		_cache_timestamp_rub = datetime.fromtimestamp(entry["fetched_at"])
+		return rate
+	
 	# Используем myfin.by страницу курса USD/RUB в России
 	url = "https://myfin.by/currency/usdrub/ross"
 	
@@ -155,84 +330,36 @@ async def get_usd_to_rub_rate(bot=None) -> Optional[float]:
 		headers = {
 			'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 		}
-		async with aiohttp.ClientSession() as session:
-			async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=15)) as response:
-				if response.status != 200:
-					logger.warning(f"⚠️ Не удалось получить курс RUB: HTTP {response.status}")
-					_failure_count_rub += 1
-					await _check_and_alert_rub(bot)
-					return None
-				
-				html = await response.text()
-				soup = BeautifulSoup(html, 'html.parser')
-				
-				# Ищем курс на странице USD/RUB
-				# Метод 1: Ищем элемент с классом rate или курсом
-				rate = None
-				
-				# Пробуем найти через data-атрибуты или классы с курсом
-				# Ищем span/div с числом похожим на курс (60-120 для USD/RUB)
-				for tag in soup.find_all(['span', 'div', 'td']):
-					text = tag.get_text(strip=True)
-					# Ищем число с точкой или запятой (формат курса)
-					text_clean = text.replace(',', '.').replace(' ', '')
-					match = re.search(r'^(\d{2,3}(?:\.\d{1,4})?)$', text_clean)
-					if match:
-						try:
-							value = float(match.group(1))
-							# Курс USD/RUB обычно в диапазоне 60-120
-							if 60 <= value <= 120:
-								# Проверяем, что это не просто случайное число
-								# Ищем контекст - рядом должны быть слова про курс/доллар/рубль
-								parent = tag.parent
-								if parent:
-									parent_text = parent.get_text().lower()
-									if any(word in parent_text for word in ['курс', 'usd', 'рубл', 'доллар', 'продаж', 'покупк', 'цб', 'банк']):
-										rate = value
-										break
-								# Если первое найденное значение в диапазоне, используем его
-								if rate is None:
-									rate = value
-						except ValueError:
-							continue
-				
-				# Метод 2: Ищем через более специфичные селекторы
-				if rate is None:
-					# Ищем таблицу с курсами банков
-					tables = soup.find_all('table')
-					for table in tables:
-						rows = table.find_all('tr')
-						for row in rows:
-							cells = row.find_all(['td', 'th'])
-							for cell in cells:
-								text = cell.get_text(strip=True).replace(',', '.').replace(' ', '')
-								match = re.search(r'(\d{2}\.\d{2,4})', text)
-								if match:
-									try:
-										value = float(match.group(1))
-										if 60 <= value <= 120:
-											rate = value
-											break
-									except ValueError:
-										continue
-							if rate:
-								break
-						if rate:
-							break
-				
-				if rate:
-					_rate_cache_rub = rate
-					_cache_timestamp_rub = datetime.now()
-					_failure_count_rub = 0
-					_last_success_rub = datetime.now()
-					logger.info(f"✅ Курс USD→RUB успешно получен: {rate}")
-					return rate
-				
+		status, html, validators = await _conditional_get(url, entry, headers=headers, timeout=15)
+		if status == 304 or (status == 200 and validators["body_hash"] == entry.get("body_hash") and entry.get("rate")):
+			# Страница не изменилась - курс тот же, разбор не нужен
+			rate = entry["rate"]
+			logger.debug(f"♻️ Страница курса RUB не изменилась (HTTP {status}), разбор пропущен")
+		elif status != 200:
+			logger.warning(f"⚠️ Не удалось получить курс RUB: HTTP {status}")
+			_failure_count_rub += 1
+			await _check_and_alert_rub(bot)
+			return None
+		else:
+			# Разбор страницы - в пуле потоков, чтобы не блокировать event loop
+			rate, xpath = await asyncio.to_thread(_parse_rub_rate, html, _rub_rate_xpath)
+			if not rate:
 				logger.warning("⚠️ Не удалось найти курс RUB на странице myfin.by/currency/usdrub/ross")
 				_failure_count_rub += 1
 				await _check_and_alert_rub(bot)
 				return None
-				
+			if xpath != _rub_rate_xpath:
+				logger.debug(f"📌 Курс RUB найден в элементе {xpath}, запоминаем для следующих запросов")
+				_rub_rate_xpath = xpath
+		
+		_rate_cache_rub = rate
+		_cache_timestamp_rub = datetime.now()
+		_failure_count_rub = 0
+		_last_success_rub = datetime.now()
+		await _save_page_cache("rub", {**entry, **validators, "rate": rate, "xpath": _rub_rate_xpath, "fetched_at": time.time()})
+		logger.info(f"✅ Курс USD→RUB успешно получен: {rate}")
+		return rate
+	
 	except asyncio.TimeoutError:
 		logger.warning("⚠️ Таймаут при получении курса RUB")
 		_failure_count_rub += 1
@@ -333,12 +460,19 @@ async def get_rate_with_fallback(currency: str, db, bot=None) -> float:
 			rate = float(rate_str) if rate_str else default_rate
 		except (ValueError, TypeError):
 			rate = default_rate
-	else:
-		# Обновляем значение в БД
-		try:
-			await db.set_setting(setting_key, str(rate))
-			logger.info(f"✅ Курс {currency} обновлен в БД: {rate}")
-		except Exception as e:
-			logger.error(f"❌ Ошибка при обновлении курса в БД: {e}")
+	elif await db.get_setting(setting_key, None) != str(rate):
+		# Курс изменился: сохраняем его отдельной задачей, не занимая писателя транзакцией обработчика
+		db.run_detached(_persist_rate, currency, setting_key, rate)
 	
 	return rate
+
+
+async def _persist_rate(currency: str, setting_key: str, rate: float) -> None:
+	"""Обновляет курс в БД и дописывает его в историю (для пересчета профита старых сделок)"""
+	try:
+		await get_db().set_setting(setting_key, str(rate))
+		logger.info(f"✅ Курс {currency} обновлен в БД: {rate}")
+	except Exception as e:
+		logger.error(f"❌ Ошибка при обновлении курса в БД: {e}")
+	from app.fx_history import record_fx_rate
+	await record_fx_rate(currency, rate)
@@ -1,10 +1,20 @@
 import aiosqlite
+import asyncio
+import contextvars
+import functools
+import inspect
 import os
 import time
 import re
-from typing import Optional, Tuple, List, Dict, Any
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple, List, Dict, Any, AsyncIterator, Awaitable, Callable
 import logging
 
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from app.db_pool import ConnectionRouter
+
 SCHEMA_SQL = """
 PRAGMA foreign_keys = ON;
 
@@ -63,50 +73,166 @@ CREATE INDEX IF NOT EXISTS idx_access_list_role ON access_list(role);
 _logger = logging.getLogger("app.db")
 
 
+class SettingsSnapshot:
+	"""
+	Неизменяемый снимок таблицы settings с типизированным чтением.
+	
+	Снимок соответствует версии кэша настроек (version); после любого
+	set_setting/set_settings Database.get_settings_snapshot() вернет новый снимок.
+	"""
+
+	__slots__ = ("version", "_values")
+
+	def __init__(self, version: int, values: Dict[str, str]) -> None:
+		self.version = version
+		self._values = dict(values)
+
+	def __contains__(self, key: str) -> bool:
+		return key in self._values
+
+	def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+		return self._values.get(key, default)
+
+	def get_float(self, key: str, default: float) -> float:
+		try:
+			value = self._values.get(key)
+			return float(value) if value is not None else default
+		except (ValueError, TypeError):
+			return default
+
+	def get_int(self, key: str, default: int) -> int:
+		return int(self.get_float(key, default))
+
+
+class _UnitOfWork:
+	"""
+	Состояние одной транзакции (см. Database.transaction).
+	
+	Изменения кэшей в памяти (настройки, шаблоны карт) копятся здесь и применяются
+	только после фиксации, чтобы другие обработчики не видели незафиксированное.
+	"""
+
+	__slots__ = ("active", "settings", "cards_changed", "after_commit")
+
+	def __init__(self) -> None:
+		self.active = True
+		self.settings: Dict[str, str] = {}
+		self.cards_changed = False
+		self.after_commit: List[Callable[[], Any]] = []
+
+
 class Database:
-	def __init__(self, path: str) -> None:
+	def __init__(self, path: str, reader_pool_size: int = 0) -> None:
+		"""
+		Args:
+			path: Путь к файлу БД
+			reader_pool_size: Число соединений только для чтения (0 - все запросы через одно соединение)
+		"""
 		self._path = path
-		self._db: Optional[aiosqlite.Connection] = None
+		self._reader_pool_size = reader_pool_size
+		self._db: Optional[ConnectionRouter] = None
+		# Текущая транзакция (unit of work) контекста выполнения, см. transaction()
+		self._uow_var: contextvars.ContextVar[Optional[_UnitOfWork]] = contextvars.ContextVar(
+			f"db_uow_{id(self)}", default=None
+		)
+		self._tx_stats: Dict[str, int] = {
+			"commits": 0,
+			"rollbacks": 0,
+			"flushes": 0,
+		}
+		# Фоновые записи вне транзакций (run_detached) - держим ссылки до завершения
+		self._detached_tasks: set = set()
+		# Кэш таблицы settings: загружается в connect(), обновляется при записи (write-through)
+		self._settings_cache: Optional[Dict[str, str]] = None
+		self._settings_version = 0
+		self._settings_snapshot: Optional[SettingsSnapshot] = None
+		# Скомпилированные шаблоны message_card (см. find_card_by_text)
+		self._card_matcher: Optional[Any] = None
+		self._card_matcher_version = 0
 
 	@property
 	def path(self) -> str:
 		return self._path
 
+	# Миграции схемы: (номер, метод). Номер последней примененной миграции хранится
+	# в PRAGMA user_version, при запуске применяются только миграции с большим номером.
+	# Миграции 1-32 - прежние _ensure_*: они идемпотентны и сами проверяют схему, поэтому
+	# на БД без версии безопасно применяются все. Новое изменение схемы - новый номер в конце
+	# списка (в том числе новые значения настроек по умолчанию).
+	_MIGRATIONS: Tuple[Tuple[int, str], ...] = (
+		(1, "_ensure_cards_user_message"),
+		(2, "_ensure_user_card_multi_bind"),
+		(3, "_ensure_users_last_interaction"),
+		(4, "_ensure_card_delivery_log"),
+		(5, "_ensure_card_columns"),
+		(6, "_migrate_card_columns"),
+		(7, "_ensure_crypto_columns"),
+		(8, "_migrate_crypto_columns"),
+		(9, "_ensure_cash_columns"),
+		(10, "_ensure_card_groups"),
+		(11, "_ensure_settings"),
+		(12, "_ensure_card_requisites"),
+		(13, "_ensure_rate_history"),
+		(14, "_ensure_menu_user"),
+		(15, "_ensure_item_usage_log"),
+		(16, "_ensure_card_replenishments"),
+		(17, "_ensure_orders_table"),
+		(18, "_ensure_buy_deals_table"),
+		(19, "_ensure_sell_orders_table"),
+		(20, "_ensure_order_messages_table"),
+		(21, "_ensure_buy_order_messages_table"),
+		(22, "_ensure_buy_deal_messages_table"),
+		(23, "_ensure_questions_table"),
+		(24, "_ensure_question_messages_table"),
+		(25, "_ensure_debts_table"),
+		(26, "_ensure_user_debts_table"),
+		(27, "_ensure_pending_requisites_table"),
+		(28, "_ensure_deal_alerts_table"),
+		(29, "_ensure_sheets_outbox"),
+		(30, "_ensure_deposit_watches"),
+		(31, "_ensure_price_history"),
+		(32, "_ensure_fx_rate_history"),
+	)
+
 	async def connect(self) -> None:
+		started = time.monotonic()
 		os.makedirs(os.path.dirname(self._path), exist_ok=True)
-		self._db = await aiosqlite.connect(self._path)
+		self._db = ConnectionRouter(await aiosqlite.connect(self._path), self._active_uow)
 		await self._db.execute("PRAGMA journal_mode=WAL;")
+		await self._db.execute("PRAGMA foreign_keys = ON;")
+		version, applied = await self._run_migrations()
+		await self._load_settings_cache()
+		await self._db.open_readers(self._path, self._reader_pool_size)
+		_logger.info(
+			f"Database ready in {(time.monotonic() - started) * 1000:.0f} ms "
+			f"(schema version {version}, migrations applied: {applied})"
+		)
+
+	async def _run_migrations(self) -> Tuple[int, int]:
+		"""
+		Применяет недостающие миграции одной транзакцией.
+		
+		Returns:
+			(версия схемы после запуска, число примененных миграций)
+		"""
+		assert self._db
+		cur = await self._db.execute("PRAGMA user_version")
+		version = (await cur.fetchone())[0]
+		pending = [(number, name) for number, name in self._MIGRATIONS if number > version]
+		if not pending:
+			return version, 0
+		
+		_logger.info(f"Migrating database schema from version {version} to {pending[-1][0]}")
+		# Базовые таблицы (CREATE IF NOT EXISTS); executescript фиксирует транзакцию сам,
+		# поэтому выполняется до нее
 		await self._db.executescript(SCHEMA_SQL)
-		# migrate: add user_message to cards if missing
-		await self._ensure_cards_user_message()
-		await self._ensure_user_card_multi_bind()
-		await self._ensure_users_last_interaction()
-		await self._ensure_card_delivery_log()
-		await self._ensure_card_columns()
-		await self._migrate_card_columns()
-		await self._ensure_crypto_columns()
-		await self._migrate_crypto_columns()
-		await self._ensure_cash_columns()
-		await self._ensure_card_groups()
-		await self._ensure_settings()
-		await self._ensure_card_requisites()
-		await self._ensure_rate_history()
-		await self._ensure_menu_user()
-		await self._ensure_item_usage_log()
-		await self._ensure_card_replenishments()
-		await self._ensure_orders_table()
-		await self._ensure_buy_deals_table()
-		await self._ensure_sell_orders_table()
-		await self._ensure_order_messages_table()
-		await self._ensure_buy_order_messages_table()
-		await self._ensure_buy_deal_messages_table()
-		await self._ensure_questions_table()
-		await self._ensure_question_messages_table()
-		await self._ensure_debts_table()
-		await self._ensure_user_debts_table()
-		await self._ensure_pending_requisites_table()
-		await self._ensure_deal_alerts_table()
-		await self._db.commit()
+		async with self.transaction():
+			# Явный BEGIN: иначе DDL миграций выполнялись бы вне транзакции
+			await self._db.execute("BEGIN")
+			for number, name in pending:
+				await getattr(self, name)()
+			await self._db.execute(f"PRAGMA user_version = {pending[-1][0]}")
+		return pending[-1][0], len(pending)
 
 	async def _ensure_menu_user(self) -> None:
 		"""Создает специального пользователя для логирования выбора карт в меню"""
@@ -380,10 +506,149 @@ class Database:
 			await self._db.close()
 			self._db = None
 
+	def _active_uow(self) -> Optional[_UnitOfWork]:
+		"""Активная транзакция текущего контекста выполнения"""
+		uow = self._uow_var.get()
+		return uow if uow is not None and uow.active else None
+
+	def get_pool_stats(self) -> Dict[str, Any]:
+		"""Статистика пула соединений: запросы и ожидание соединения (см. app.db_pool)"""
+		return self._db.get_stats() if self._db is not None else {}
+
+	async def _write_intent(self) -> None:
+		"""
+		Закрепляет писателя за текущей транзакцией до первого SELECT в методах вида
+		"проверить, затем записать": проверка выполняется на писателе и видит
+		незафиксированные записи своей транзакции, а такая же проверка в другой
+		транзакции ждет ее фиксации (читатели видят только зафиксированные данные).
+		"""
+		uow = self._active_uow()
+		if uow is not None and self._db is not None:
+			await self._db.acquire_writer(uow)
+
+	async def _commit(self) -> None:
+		"""
+		Граница записи в методах БД. Каждый публичный метод выполняется в транзакции
+		(своей или вызывающего кода), фиксация выполняется при ее завершении.
+		"""
+		return None
+
+	@asynccontextmanager
+	async def transaction(self) -> AsyncIterator["Database"]:
+		"""
+		Unit of work: все изменения внутри блока фиксируются одним коммитом в конце,
+		при исключении - откатываются. Вложенный transaction() присоединяется к внешнему.
+		
+		Соединение-писатель закрепляется за транзакцией перед ее первой записью и
+		освобождается после commit/rollback; другие транзакции и записи вне транзакций
+		ждут его. Поэтому в транзакции не стоит ждать задачи, которые сами пишут в БД
+		(для таких записей - run_detached), а перед внешними запросами (Telegram, HTTP)
+		изменения фиксируются через flush() - это делают middleware запросов бота и HTTP-клиент.
+		
+		Пример:
+			async with db.transaction():
+				await db.get_or_create_user(...)
+				await db.log_card_delivery(...)
+		"""
+		if self._active_uow() is not None:
+			yield self
+			return
+		uow = _UnitOfWork()
+		token = self._uow_var.set(uow)
+		try:
+			yield self
+		except BaseException:
+			await self._finish_transaction(uow, success=False)
+			raise
+		else:
+			await self._finish_transaction(uow, success=True)
+		finally:
+			self._uow_var.reset(token)
+
+	async def _finish_transaction(self, uow: _UnitOfWork, success: bool) -> None:
+		uow.active = False
+		router = self._db
+		if router is not None and router.owns_writer(uow):
+			try:
+				if success:
+					try:
+						await asyncio.shield(router.commit())
+					except BaseException:
+						await asyncio.shield(router.rollback())
+						self._tx_stats["rollbacks"] += 1
+						raise
+					self._tx_stats["commits"] += 1
+				else:
+					await asyncio.shield(router.rollback())
+					self._tx_stats["rollbacks"] += 1
+					_logger.warning("Transaction rolled back")
+			finally:
+				router.release_writer(uow)
+		if success:
+			self._apply_committed(uow)
+
+	def _apply_committed(self, uow: _UnitOfWork) -> None:
+		"""Применяет к кэшам изменения зафиксированной транзакции и вызывает after_commit"""
+		if uow.settings:
+			self._update_settings_cache(uow.settings)
+			uow.settings = {}
+		if uow.cards_changed:
+			self._invalidate_card_matcher()
+			uow.cards_changed = False
+		callbacks, uow.after_commit = uow.after_commit, []
+		for callback in callbacks:
+			try:
+				callback()
+			except Exception as e:
+				_logger.warning(f"After-commit callback failed: {e}")
+
+	async def flush(self) -> None:
+		"""
+		Фиксирует изменения текущей транзакции сейчас, не дожидаясь ее конца
+		(транзакция продолжается, следующая запись снова займет писателя).
+		"""
+		uow = self._active_uow()
+		router = self._db
+		if uow is None or router is None:
+			return
+		if router.owns_writer(uow):
+			try:
+				await asyncio.shield(router.commit())
+			finally:
+				router.release_writer(uow)
+			self._tx_stats["flushes"] += 1
+		self._apply_committed(uow)
+
+	def call_after_commit(self, callback: Callable[[], Any]) -> None:
+		"""Вызывает callback после фиксации текущей транзакции (вне транзакции - сразу)"""
+		uow = self._active_uow()
+		if uow is None:
+			callback()
+		else:
+			uow.after_commit.append(callback)
+
+	def run_detached(self, func: Callable[..., Awaitable[Any]], *args: Any) -> asyncio.Task:
+		"""
+		Запускает запись в БД отдельной задачей вне транзакции вызывающего кода, не дожидаясь ее.
+		
+		Нужна в общих запросах (single-flight): их ждут обработчики, которые могут держать
+		писателя, и ожидание записи внутри такого запроса привело бы к взаимной блокировке.
+		"""
+		context = contextvars.copy_context()
+		context.run(self._uow_var.set, None)
+		task = asyncio.create_task(func(*args), context=context)
+		self._detached_tasks.add(task)
+		task.add_done_callback(self._detached_tasks.discard)
+		return task
+
+	def get_transaction_stats(self) -> Dict[str, int]:
+		"""Статистика транзакций: коммиты, откаты, досрочные фиксации (flush)"""
+		return dict(self._tx_stats)
+
 	async def add_card(self, name: str, details: str) -> int:
 		assert self._db
 		cur = await self._db.execute("INSERT INTO cards(name, details) VALUES(?, ?)", (name, details))
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Card added: id={cur.lastrowid} name={name!r}")
 		return cur.lastrowid
 
@@ -395,7 +660,8 @@ class Database:
 	async def delete_card(self, card_id: int) -> None:
 		assert self._db
 		await self._db.execute("DELETE FROM cards WHERE id = ?", (card_id,))
-		await self._db.commit()
+		await self._commit()
+		self._mark_cards_changed()
 		_logger.debug(f"Card deleted: id={card_id}")
 
 	async def create_user_by_name_only(self, full_name: str) -> Optional[int]:
@@ -404,6 +670,7 @@ class Database:
 		Когда пользователь напишет боту, его tg_id будет обновлен через get_or_create_user.
 		"""
 		assert self._db
+		await self._write_intent()
 		_logger.debug(f"create_user_by_name_only: full_name={full_name}")
 		
 		# Проверяем, нет ли уже пользователя с таким именем и NULL tg_id
@@ -421,12 +688,13 @@ class Database:
 			"INSERT INTO users(tg_id, username, full_name, last_interaction_at) VALUES(?, ?, ?, ?)",
 			(None, None, full_name, int(time.time())),
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.info(f"User created by name only: id={cur.lastrowid} full_name={full_name}")
 		return cur.lastrowid
 
 	async def get_or_create_user(self, tg_id: Optional[int], username: Optional[str], full_name: Optional[str]) -> int:
 		assert self._db
+		await self._write_intent()
 		_logger.debug(f"get_or_create_user: tg_id={tg_id} username={username} full_name={full_name}")
 		if tg_id is None:
 			_logger.debug("get_or_create_user skipped: tg_id is None")
@@ -447,7 +715,7 @@ class Database:
 					"UPDATE users SET tg_id = ?, username = COALESCE(?, username), last_interaction_at = ? WHERE id = ?",
 					(tg_id, username, int(time.time()), user_id),
 				)
-				await self._db.commit()
+				await self._commit()
 				return user_id
 		cur = await self._db.execute("SELECT id, username, full_name FROM users WHERE tg_id = ?", (tg_id,))
 		row = await cur.fetchone()
@@ -458,7 +726,7 @@ class Database:
 					"UPDATE users SET username = COALESCE(?, username), full_name = COALESCE(?, full_name) WHERE id = ?",
 					(username, full_name, user_id),
 				)
-				await self._db.commit()
+				await self._commit()
 				_logger.debug(f"User updated: id={user_id} username={username} full_name={full_name}")
 			else:
 				_logger.debug(f"User exists (no update): id={user_id}")
@@ -467,7 +735,7 @@ class Database:
 			"INSERT INTO users(tg_id, username, full_name, last_interaction_at) VALUES(?, ?, ?, ?)",
 			(tg_id, username, full_name, int(time.time())),
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"User created: id={cur.lastrowid} tg_id={tg_id}")
 		return cur.lastrowid
 
@@ -609,7 +877,7 @@ class Database:
 			"INSERT OR IGNORE INTO user_card(user_id, card_id) VALUES(?, ?)",
 			(user_id, card_id),
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"User bound: user_id={user_id} -> card_id={card_id}")
 
 	async def unbind_user_from_card(self, user_id: int, card_id: int) -> None:
@@ -618,7 +886,7 @@ class Database:
 			"DELETE FROM user_card WHERE user_id = ? AND card_id = ?",
 			(user_id, card_id),
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"User unbound: user_id={user_id} -X-> card_id={card_id}")
 
 	async def touch_user(self, user_id: int, when: Optional[int] = None) -> None:
@@ -628,11 +896,12 @@ class Database:
 			"UPDATE users SET last_interaction_at = ? WHERE id = ?",
 			(timestamp, user_id),
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Touched user_id={user_id} at {timestamp}")
 
 	async def touch_user_by_tg(self, tg_id: int, when: Optional[int] = None) -> None:
 		assert self._db
+		await self._write_intent()
 		cur = await self._db.execute("SELECT id FROM users WHERE tg_id = ?", (tg_id,))
 		row = await cur.fetchone()
 		if row:
@@ -756,7 +1025,7 @@ class Database:
 			"INSERT OR REPLACE INTO access_list(tg_id, username, role) VALUES(?, ?, 'user')",
 			(tg_id, uname),
 		)
-		await self._db.commit()
+		await self._commit()
 
 	async def revoke_user_access(self, tg_id: Optional[int] = None, username: Optional[str] = None) -> None:
 		"""
@@ -773,7 +1042,7 @@ class Database:
 			await self._db.execute("DELETE FROM access_list WHERE tg_id = ?", (tg_id,))
 		else:
 			await self._db.execute("DELETE FROM access_list WHERE username = ?", (uname,))
-		await self._db.commit()
+		await self._commit()
 
 	async def list_allowed_users(self) -> List[Dict[str, Any]]:
 		"""Возвращает список пользователей, у которых есть доступ (role='user')."""
@@ -899,7 +1168,7 @@ class Database:
 			"INSERT INTO card_delivery_log(user_id, card_id, delivered_at, admin_id) VALUES(?, ?, ?, ?)",
 			(user_id, card_id, timestamp, admin_id),
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Logged delivery: user_id={user_id}, card_id={card_id}, admin_id={admin_id}, ts={timestamp}")
 
 	async def log_card_delivery_by_tg(
@@ -910,6 +1179,7 @@ class Database:
 		delivered_at: Optional[int] = None,
 	) -> None:
 		assert self._db
+		await self._write_intent()
 		user_id = await self.get_user_id_by_tg(tg_id)
 		if user_id is None:
 			_logger.debug(f"Cannot log delivery: tg_id={tg_id} not found")
@@ -958,6 +1228,7 @@ class Database:
 			delivered_at: Временная метка (по умолчанию текущее время)
 		"""
 		assert self._db
+		await self._write_intent()
 		timestamp = int(delivered_at or time.time())
 		# Получаем user_id специального пользователя для меню
 		cur = await self._db.execute("SELECT id FROM users WHERE tg_id = -1")
@@ -973,7 +1244,7 @@ class Database:
 		)
 		# Также логируем в item_usage_log для быстрого доступа
 		await self.log_item_usage(admin_id, "card", f"card_id_{card_id}")
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Logged card selection: card_id={card_id}, admin_id={admin_id}, ts={timestamp}")
 
 	async def list_cards_for_user(self, user_id: int) -> List[Dict[str, Any]]:
@@ -1090,36 +1361,56 @@ class Database:
 		cur = await self._db.execute(
 			"INSERT INTO message_card(pattern, is_regex, card_id) VALUES(?, ?, ?)", (pattern, 1 if is_regex else 0, card_id)
 		)
-		await self._db.commit()
+		await self._commit()
+		self._mark_cards_changed()
 		return cur.lastrowid
 
+	def _invalidate_card_matcher(self) -> None:
+		"""Сбрасывает скомпилированные шаблоны карт (после фиксации изменения шаблонов или карт)"""
+		self._card_matcher = None
+		self._card_matcher_version += 1
+
+	def _mark_cards_changed(self) -> None:
+		"""Отмечает изменение шаблонов или карт: кэш сбросится после фиксации транзакции"""
+		uow = self._active_uow()
+		if uow is None:
+			self._invalidate_card_matcher()
+		else:
+			uow.cards_changed = True
+
 	async def find_card_by_text(self, text: str) -> Optional[Tuple[int, str, str]]:
+		"""
+		Ищет карту по тексту сообщения среди шаблонов message_card.
+		
+		Шаблоны компилируются при первом вызове (app.card_matcher) и пересобираются
+		только после изменения шаблонов или карт.
+		
+		Returns:
+			(id, name, details) карты или None
+		"""
 		assert self._db
-		cur = await self._db.execute("SELECT id, name, details FROM cards")
-		cards = await cur.fetchall()
-		cur = await self._db.execute("SELECT pattern, is_regex, card_id FROM message_card ORDER BY id DESC")
-		patterns = await cur.fetchall()
-		import re
-		for pattern, is_regex, card_id in patterns:
-			if not is_regex and pattern.lower() in text.lower():
-				for c in cards:
-					if c[0] == card_id:
-						return c
-		for pattern, is_regex, card_id in patterns:
-			if is_regex:
-				try:
-					if re.search(pattern, text):
-						for c in cards:
-							if c[0] == card_id:
-								return c
-				except re.error:
-					continue
-		return None
+		uow = self._active_uow()
+		# Своя транзакция меняла шаблоны - собираем по ее (незафиксированным) данным, без кэша
+		own_changes = uow is not None and uow.cards_changed
+		matcher = None if own_changes else self._card_matcher
+		if matcher is None:
+			from app.card_matcher import CardMatcher
+			version = self._card_matcher_version
+			cur = await self._db.execute("SELECT id, name, details FROM cards")
+			cards = await cur.fetchall()
+			cur = await self._db.execute("SELECT pattern, is_regex, card_id FROM message_card ORDER BY id DESC")
+			patterns = await cur.fetchall()
+			matcher = CardMatcher(cards, patterns)
+			# Если шаблоны изменились во время загрузки, не кэшируем устаревший набор
+			if version == self._card_matcher_version and not own_changes:
+				self._card_matcher = matcher
+			_logger.debug(f"Card matcher built: {len(patterns)} patterns, {len(cards)} cards")
+		return matcher.match(text)
 
 	async def set_card_user_message(self, card_id: int, text: Optional[str]) -> None:
 		assert self._db
 		await self._db.execute("UPDATE cards SET user_message = ? WHERE id = ?", (text, card_id))
-		await self._db.commit()
+		await self._commit()
 
 	async def set_card_name(self, card_id: int, name: str) -> None:
 		"""
@@ -1131,7 +1422,8 @@ class Database:
 		"""
 		assert self._db
 		await self._db.execute("UPDATE cards SET name = ? WHERE id = ?", (name, card_id))
-		await self._db.commit()
+		await self._commit()
+		self._mark_cards_changed()
 
 	async def get_card_user_message(self, card_id: int) -> Optional[str]:
 		assert self._db
@@ -1185,6 +1477,7 @@ class Database:
 
 	async def delete_user(self, user_id: int) -> None:
 		assert self._db
+		await self._write_intent()
 		# Получаем tg_id пользователя для удаления связанных заявок
 		cur = await self._db.execute("SELECT tg_id FROM users WHERE id = ?", (user_id,))
 		row = await cur.fetchone()
@@ -1225,7 +1518,7 @@ class Database:
 		# Удаление пользователя автоматически удалит связанные записи из user_card и card_delivery_log
 		# благодаря ON DELETE CASCADE во внешних ключах
 		await self._db.execute("DELETE FROM users WHERE id = ?", (user_id,))
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"User deleted: id={user_id}, tg_id={tg_id}")
 
 	async def get_all_cards_with_columns_and_groups(self) -> List[Dict[str, Any]]:
@@ -1299,7 +1592,7 @@ class Database:
 			"INSERT OR REPLACE INTO card_columns(card_id, column) VALUES(?, ?)",
 			(card_id, column)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Card column set: card_id={card_id}, column='{column}'")
 		return cur.lastrowid
 
@@ -1352,7 +1645,7 @@ class Database:
 		"""
 		assert self._db
 		await self._db.execute("DELETE FROM card_columns WHERE id = ?", (column_id,))
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Card column deleted: id={column_id}")
 
 	async def get_crypto_column(self, crypto_type: str) -> Optional[str]:
@@ -1417,7 +1710,7 @@ class Database:
 			"INSERT OR REPLACE INTO crypto_columns (crypto_type, column) VALUES (?, ?)",
 			(crypto_type, column)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Crypto column set: crypto_type='{crypto_type}', column='{column}'")
 		return cur.lastrowid
 
@@ -1450,7 +1743,7 @@ class Database:
 		"""
 		assert self._db
 		await self._db.execute("DELETE FROM crypto_columns WHERE crypto_type = ?", (crypto_type,))
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Crypto column deleted: crypto_type='{crypto_type}'")
 
 	async def get_cash_column(self, cash_name: str) -> Optional[Dict[str, Any]]:
@@ -1519,6 +1812,7 @@ class Database:
 			ID созданной или обновленной записи
 		"""
 		assert self._db
+		await self._write_intent()
 		# Если currency или display_name не указаны, получаем текущие значения
 		if currency is None or display_name is None:
 			current = await self.get_cash_column(cash_name)
@@ -1538,7 +1832,7 @@ class Database:
 			"INSERT OR REPLACE INTO cash_columns (cash_name, column, currency, display_name) VALUES (?, ?, ?, ?)",
 			(cash_name, column, currency, display_name)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Cash column set: cash_name='{cash_name}', column='{column}', currency='{currency}', display_name='{display_name}'")
 		return cur.lastrowid
 	
@@ -1555,7 +1849,7 @@ class Database:
 			"UPDATE cash_columns SET currency = ? WHERE cash_name = ?",
 			(currency, cash_name)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Cash currency updated: cash_name='{cash_name}', currency='{currency}'")
 	
 	async def update_cash_display_name(self, cash_name: str, display_name: str) -> None:
@@ -1571,7 +1865,7 @@ class Database:
 			"UPDATE cash_columns SET display_name = ? WHERE cash_name = ?",
 			(display_name, cash_name)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Cash display_name updated: cash_name='{cash_name}', display_name='{display_name}'")
 
 	async def list_cash_columns(self) -> List[Dict[str, Any]]:
@@ -1605,7 +1899,7 @@ class Database:
 		"""
 		assert self._db
 		await self._db.execute("DELETE FROM cash_columns WHERE cash_name = ?", (cash_name,))
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Cash column deleted: cash_name='{cash_name}'")
 
 	async def add_card_group(self, name: str) -> int:
@@ -1623,7 +1917,7 @@ class Database:
 			"INSERT INTO card_groups(name) VALUES(?)",
 			(name,)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Card group added: id={cur.lastrowid} name={name!r}")
 		return cur.lastrowid
 
@@ -1749,7 +2043,7 @@ class Database:
 			"UPDATE cards SET group_id = ? WHERE id = ?",
 			(group_id, card_id)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Card {card_id} set to group {group_id}")
 
 	async def delete_card_group(self, group_id: int) -> None:
@@ -1767,7 +2061,7 @@ class Database:
 		)
 		# Затем удаляем саму группу
 		await self._db.execute("DELETE FROM card_groups WHERE id = ?", (group_id,))
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Card group deleted: id={group_id}")
 
 	async def get_cards_by_group(self, group_id: int) -> List[Tuple[int, str, str]]:
@@ -1863,7 +2157,7 @@ class Database:
 			"INSERT INTO rate_history(created_at, note, operations) VALUES(?, ?, ?)",
 			(created_at, note, operations)
 		)
-		await self._db.commit()
+		await self._commit()
 		return cur.lastrowid
 	
 	async def get_last_rate_history(self) -> Optional[Dict[str, Any]]:
@@ -1887,6 +2181,53 @@ class Database:
 			}
 		return None
 	
+	async def get_last_rate_histories(self, limit: int) -> List[Dict[str, Any]]:
+		"""
+		Получает последние записи из истории операций /rate (от новых к старым).
+		
+		Args:
+			limit: Количество записей
+		
+		Returns:
+			Список словарей с данными записей
+		"""
+		assert self._db
+		cur = await self._db.execute(
+			"SELECT id, created_at, note, operations FROM rate_history ORDER BY created_at DESC, id DESC LIMIT ?",
+			(max(1, limit),)
+		)
+		rows = await cur.fetchall()
+		return [
+			{
+				"id": row[0],
+				"created_at": row[1],
+				"note": row[2],
+				"operations": row[3]
+			}
+			for row in rows
+		]
+	
+	async def delete_rate_histories(self, history_ids: List[int]) -> int:
+		"""
+		Удаляет несколько записей из истории операций /rate одной транзакцией.
+		
+		Args:
+			history_ids: ID записей для удаления
+		
+		Returns:
+			Количество удаленных записей
+		"""
+		assert self._db
+		if not history_ids:
+			return 0
+		placeholders = ",".join("?" for _ in history_ids)
+		cur = await self._db.execute(
+			f"DELETE FROM rate_history WHERE id IN ({placeholders})",
+			tuple(history_ids)
+		)
+		await self._commit()
+		return cur.rowcount
+	
 	async def delete_rate_history(self, history_id: int) -> bool:
 		"""
 		Удаляет запись из истории операций /rate.
@@ -1902,9 +2243,490 @@ class Database:
 			"DELETE FROM rate_history WHERE id = ?",
 			(history_id,)
 		)
-		await self._db.commit()
+		await self._commit()
 		return cur.rowcount > 0
 
+	async def _ensure_sheets_outbox(self) -> None:
+		"""Создает таблицу очереди отложенной записи в Google Sheets (/add, /rate, /move)"""
+		assert self._db
+		cur = await self._db.execute(
+			"SELECT name FROM sqlite_master WHERE type='table' AND name='sheets_outbox'"
+		)
+		if not await cur.fetchone():
+			await self._db.execute(
+				"""
+				CREATE TABLE sheets_outbox (
+					id INTEGER PRIMARY KEY AUTOINCREMENT,
+					mode TEXT NOT NULL,
+					payload TEXT NOT NULL,
+					chat_id INTEGER,
+					message_id INTEGER,
+					status TEXT NOT NULL DEFAULT 'pending',
+					attempts INTEGER NOT NULL DEFAULT 0,
+					last_error TEXT,
+					result TEXT,
+					next_attempt_at INTEGER NOT NULL DEFAULT 0,
+					created_at INTEGER NOT NULL,
+					updated_at INTEGER NOT NULL
+				)
+				"""
+			)
+			await self._db.execute(
+				"CREATE INDEX IF NOT EXISTS idx_sheets_outbox_status ON sheets_outbox(status, next_attempt_at, id)"
+			)
+			_logger.debug("Created table sheets_outbox")
+	
+	async def add_sheets_outbox_entry(
+		self,
+		mode: str,
+		payload: str,
+		chat_id: Optional[int] = None,
+		message_id: Optional[int] = None
+	) -> int:
+		"""
+		Сохраняет операцию записи в очередь Google Sheets.
+		
+		Args:
+			mode: Режим операции ("add", "move", "rate")
+			payload: JSON строка с данными для записи
+			chat_id: ID чата, куда отправить отчет
+			message_id: ID сообщения, которое нужно заменить отчетом
+		
+		Returns:
+			ID записи в очереди
+		"""
+		assert self._db
+		now = int(time.time())
+		cur = await self._db.execute(
+			"""
+			INSERT INTO sheets_outbox(mode, payload, chat_id, message_id, status, created_at, updated_at)
+			VALUES(?, ?, ?, ?, 'pending', ?, ?)
+			""",
+			(mode, payload, chat_id, message_id, now, now)
+		)
+		await self._commit()
+		return cur.lastrowid
+	
+	async def claim_sheets_outbox_entries(self, limit: int = 20) -> List[Dict[str, Any]]:
+		"""
+		Забирает готовые к отправке записи очереди (в порядке добавления) и помечает их как processing.
+		
+		Returns:
+			Список словарей с полями записи
+		"""
+		assert self._db
+		await self._write_intent()
+		now = int(time.time())
+		cur = await self._db.execute(
+			"""
+			SELECT id, mode, payload, chat_id, message_id, attempts, created_at
+			FROM sheets_outbox
+			WHERE status = 'pending' AND next_attempt_at <= ?
+			ORDER BY id
+			LIMIT ?
+			""",
+			(now, limit)
+		)
+		rows = await cur.fetchall()
+		if not rows:
+			return []
+		ids = [row[0] for row in rows]
+		placeholders = ",".join("?" * len(ids))
+		await self._db.execute(
+			f"UPDATE sheets_outbox SET status = 'processing', updated_at = ? WHERE id IN ({placeholders})",
+			(now, *ids)
+		)
+		await self._commit()
+		return [
+			{
+				"id": row[0],
+				"mode": row[1],
+				"payload": row[2],
+				"chat_id": row[3],
+				"message_id": row[4],
+				"attempts": row[5],
+				"created_at": row[6]
+			}
+			for row in rows
+		]
+	
+	async def release_sheets_outbox_entries(self, entry_ids: List[int]) -> None:
+		"""Возвращает забранные, но не обработанные записи очереди в статус pending"""
+		assert self._db
+		if not entry_ids:
+			return
+		placeholders = ",".join("?" * len(entry_ids))
+		await self._db.execute(
+			f"UPDATE sheets_outbox SET status = 'pending', updated_at = ? WHERE id IN ({placeholders}) AND status = 'processing'",
+			(int(time.time()), *entry_ids)
+		)
+		await self._commit()
+	
+	async def complete_sheets_outbox_entry(self, entry_id: int, result: str) -> None:
+		"""Помечает запись очереди как успешно записанную в Google Sheets"""
+		assert self._db
+		await self._db.execute(
+			"""
+			UPDATE sheets_outbox
+			SET status = 'done', attempts = attempts + 1, result = ?, last_error = NULL, updated_at = ?
+			WHERE id = ?
+			""",
+			(result, int(time.time()), entry_id)
+		)
+		await self._commit()
+	
+	async def retry_sheets_outbox_entry(
+		self,
+		entry_id: int,
+		error: str,
+		next_attempt_at: int,
+		payload: Optional[str] = None
+	) -> None:
+		"""
+		Откладывает запись очереди до следующей попытки после временной ошибки.
+		
+		Args:
+			payload: Новые данные записи (после частичной записи - только незаписанная часть)
+		"""
+		assert self._db
+		await self._db.execute(
+			"""
+			UPDATE sheets_outbox
+			SET status = 'pending', attempts = attempts + 1, last_error = ?, next_attempt_at = ?,
+				payload = COALESCE(?, payload), updated_at = ?
+			WHERE id = ?
+			""",
+			(error, next_attempt_at, payload, int(time.time()), entry_id)
+		)
+		await self._commit()
+	
+	async def fail_sheets_outbox_entry(self, entry_id: int, error: str, payload: Optional[str] = None) -> None:
+		"""Помечает запись очереди как окончательно не записанную (payload - новые данные записи, если изменились)"""
+		assert self._db
+		await self._db.execute(
+			"""
+			UPDATE sheets_outbox
+			SET status = 'failed', attempts = attempts + 1, last_error = ?, payload = COALESCE(?, payload), updated_at = ?
+			WHERE id = ?
+			""",
+			(error, payload, int(time.time()), entry_id)
+		)
+		await self._commit()
+	
+	async def requeue_stale_sheets_outbox_entries(self) -> int:
+		"""
+		Возвращает в очередь записи, оставшиеся в статусе processing после перезапуска бота.
+		
+		Returns:
+			Количество возвращенных записей
+		"""
+		assert self._db
+		cur = await self._db.execute(
+			"UPDATE sheets_outbox SET status = 'pending', updated_at = ? WHERE status = 'processing'",
+			(int(time.time()),)
+		)
+		await self._commit()
+		return cur.rowcount
+	
+	async def count_pending_sheets_outbox_entries(self) -> int:
+		"""Возвращает количество записей, ожидающих отправки в Google Sheets"""
+		assert self._db
+		cur = await self._db.execute(
+			"SELECT COUNT(*) FROM sheets_outbox WHERE status IN ('pending', 'processing')"
+		)
+		row = await cur.fetchone()
+		return row[0] if row else 0
+
+	async def _ensure_deposit_watches(self) -> None:
+		"""Создает таблицу адресов, ожидающих зачисления (оповещение о зачислении BTC)"""
+		assert self._db
+		cur = await self._db.execute(
+			"SELECT name FROM sqlite_master WHERE type='table' AND name='deposit_watches'"
+		)
+		if not await cur.fetchone():
+			await self._db.execute(
+				"""
+				CREATE TABLE deposit_watches (
+					id INTEGER PRIMARY KEY AUTOINCREMENT,
+					wallet_address TEXT NOT NULL,
+					user_tg_id INTEGER NOT NULL,
+					deal_id INTEGER NOT NULL,
+					status TEXT NOT NULL DEFAULT 'pending',
+					attempts INTEGER NOT NULL DEFAULT 0,
+					last_error TEXT,
+					next_check_at INTEGER NOT NULL DEFAULT 0,
+					created_at INTEGER NOT NULL,
+					updated_at INTEGER NOT NULL,
+					UNIQUE(deal_id, wallet_address)
+				)
+				"""
+			)
+			await self._db.execute(
+				"CREATE INDEX IF NOT EXISTS idx_deposit_watches_status ON deposit_watches(status, next_check_at)"
+			)
+			_logger.debug("Created table deposit_watches")
+	
+	async def add_deposit_watch(self, wallet_address: str, user_tg_id: int, deal_id: int, next_check_at: int) -> bool:
+		"""
+		Добавляет адрес в список ожидающих зачисления.
+		
+		Args:
+			wallet_address: Адрес кошелька
+			user_tg_id: Telegram ID пользователя, которого нужно оповестить
+			deal_id: ID сделки
+			next_check_at: Время первой проверки (unix time)
+		
+		Returns:
+			True, если адрес добавлен (False - эта сделка уже отслеживается)
+		"""
+		assert self._db
+		now = int(time.time())
+		cur = await self._db.execute(
+			"""
+			INSERT OR IGNORE INTO deposit_watches(wallet_address, user_tg_id, deal_id, status, next_check_at, created_at, updated_at)
+			VALUES(?, ?, ?, 'pending', ?, ?, ?)
+			""",
+			(wallet_address, user_tg_id, deal_id, next_check_at, now, now)
+		)
+		await self._commit()
+		return cur.rowcount > 0
+	
+	async def get_due_deposit_watches(self, limit: int = 50) -> List[Dict[str, Any]]:
+		"""
+		Возвращает отслеживаемые адреса, которые пора проверить (раньше всех - самые просроченные).
+		
+		Returns:
+			Список словарей с полями записи
+		"""
+		assert self._db
+		cur = await self._db.execute(
+			"""
+			SELECT id, wallet_address, user_tg_id, deal_id, attempts
+			FROM deposit_watches
+			WHERE status = 'pending' AND next_check_at <= ?
+			ORDER BY next_check_at, id
+			LIMIT ?
+			""",
+			(int(time.time()), limit)
+		)
+		rows = await cur.fetchall()
+		return [
+			{
+				"id": row[0],
+				"wallet_address": row[1],
+				"user_tg_id": row[2],
+				"deal_id": row[3],
+				"attempts": row[4],
+			}
+			for row in rows
+		]
+	
+	async def reschedule_deposit_watches(self, items: List[Tuple[int, int, Optional[str]]]) -> None:
+		"""
+		Откладывает проверку адресов после безуспешной попытки.
+		
+		Args:
+			items: Список (id, next_check_at, ошибка или None)
+		"""
+		assert self._db
+		if not items:
+			return
+		now = int(time.time())
+		await self._db.executemany(
+			"""
+			UPDATE deposit_watches
+			SET attempts = attempts + 1, next_check_at = ?, last_error = ?, updated_at = ?
+			WHERE id = ?
+			""",
+			[(next_check_at, error, now, watch_id) for watch_id, next_check_at, error in items]
+		)
+		await self._commit()
+	
+	async def finish_deposit_watches(self, watch_ids: List[int], status: str) -> None:
+		"""Завершает отслеживание адресов со статусом 'found' (зачисление найдено) или 'expired'"""
+		assert self._db
+		if not watch_ids:
+			return
+		placeholders = ",".join("?" * len(watch_ids))
+		await self._db.execute(
+			f"""
+			UPDATE deposit_watches
+			SET status = ?, attempts = attempts + 1, updated_at = ?
+			WHERE id IN ({placeholders})
+			""",
+			(status, int(time.time()), *watch_ids)
+		)
+		await self._commit()
+	
+	async def count_pending_deposit_watches(self) -> int:
+		"""Возвращает количество адресов, ожидающих зачисления"""
+		assert self._db
+		cur = await self._db.execute("SELECT COUNT(*) FROM deposit_watches WHERE status = 'pending'")
+		row = await cur.fetchone()
+		return row[0] if row else 0
+
+	async def _ensure_price_history(self) -> None:
+		"""
+		Создает таблицу истории курсов криптовалют.
+		resolution - шаг точки в секундах: 0 - исходные точки, иначе - усредненные по интервалу
+		"""
+		assert self._db
+		await self._db.execute(
+			"""
+			CREATE TABLE IF NOT EXISTS price_history (
+				coin TEXT NOT NULL,
+				resolution INTEGER NOT NULL DEFAULT 0,
+				ts INTEGER NOT NULL,
+				price REAL NOT NULL,
+				PRIMARY KEY (coin, resolution, ts)
+			) WITHOUT ROWID
+			"""
+		)
+	
+	async def add_price_points(self, points: List[Tuple[str, int, float]]) -> None:
+		"""
+		Добавляет исходные точки в историю курсов.
+		
+		Args:
+			points: Список (монета, время unix, курс в USD)
+		"""
+		assert self._db
+		if not points:
+			return
+		await self._db.executemany(
+			"INSERT OR REPLACE INTO price_history(coin, resolution, ts, price) VALUES(?, 0, ?, ?)",
+			points
+		)
+		await self._commit()
+	
+	async def get_price_at(self, coin: str, ts: int) -> Optional[Tuple[int, float]]:
+		"""
+		Возвращает ближайшую по времени точку истории курса.
+		
+		Args:
+			coin: Код монеты ("btc")
+			ts: Время unix
+		
+		Returns:
+			(время точки, курс) или None, если истории нет
+		"""
+		assert self._db
+		cur = await self._db.execute(
+			"""
+			SELECT ts, price FROM (
+				SELECT ts, price FROM price_history WHERE coin = ? AND ts <= ? ORDER BY ts DESC LIMIT 1
+			)
+			UNION ALL
+			SELECT ts, price FROM (
+				SELECT ts, price FROM price_history WHERE coin = ? AND ts > ? ORDER BY ts LIMIT 1
+			)
+			""",
+			(coin, ts, coin, ts)
+		)
+		rows = await cur.fetchall()
+		if not rows:
+			return None
+		best = min(rows, key=lambda row: abs(row[0] - ts))
+		return best[0], best[1]
+	
+	async def get_price_history(self, coin: str, start_ts: int, end_ts: int) -> List[Tuple[int, float]]:
+		"""Возвращает точки истории курса за период (все разрешения, по времени)"""
+		assert self._db
+		cur = await self._db.execute(
+			"SELECT ts, price FROM price_history WHERE coin = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+			(coin, start_ts, end_ts)
+		)
+		return [(row[0], row[1]) for row in await cur.fetchall()]
+	
+	async def downsample_price_history(self, source_resolution: int, target_resolution: int, older_than: int) -> int:
+		"""
+		Заменяет точки истории старше older_than средними по интервалам target_resolution секунд.
+		
+		Returns:
+			Количество удаленных исходных точек
+		"""
+		assert self._db
+		await self._write_intent()
+		# Граница по целому интервалу, чтобы интервал не усреднялся частями в разные проходы
+		older_than = (older_than // target_resolution) * target_resolution
+		await self._db.execute(
+			"""
+			INSERT OR REPLACE INTO price_history(coin, resolution, ts, price)
+			SELECT coin, ?, (ts / ?) * ?, AVG(price)
+			FROM price_history
+			WHERE resolution = ? AND ts < ?
+			GROUP BY coin, ts / ?
+			""",
+			(target_resolution, target_resolution, target_resolution, source_resolution, older_than, target_resolution)
+		)
+		cur = await self._db.execute(
+			"DELETE FROM price_history WHERE resolution = ? AND ts < ?",
+			(source_resolution, older_than)
+		)
+		await self._commit()
+		return cur.rowcount
+
+	async def _ensure_fx_rate_history(self) -> None:
+		"""Создает таблицу истории курсов валют (USD_BYN, USD_RUB): курс действует с ts до следующей записи"""
+		assert self._db
+		await self._db.execute(
+			"""
+			CREATE TABLE IF NOT EXISTS fx_rate_history (
+				pair TEXT NOT NULL,
+				ts INTEGER NOT NULL,
+				rate REAL NOT NULL,
+				PRIMARY KEY (pair, ts)
+			) WITHOUT ROWID
+			"""
+		)
+	
+	async def add_fx_rate(self, pair: str, ts: int, rate: float) -> bool:
+		"""
+		Добавляет курс в историю, если он отличается от последнего записанного.
+		
+		Args:
+			pair: Валютная пара ("USD_BYN")
+			ts: Время unix, с которого действует курс
+			rate: Курс
+		
+		Returns:
+			True, если добавлена новая запись
+		"""
+		assert self._db
+		await self._write_intent()
+		cur = await self._db.execute(
+			"SELECT rate FROM fx_rate_history WHERE pair = ? ORDER BY ts DESC LIMIT 1",
+			(pair,)
+		)
+		row = await cur.fetchone()
+		if row and row[0] == rate:
+			return False
+		await self._db.execute(
+			"INSERT OR REPLACE INTO fx_rate_history(pair, ts, rate) VALUES(?, ?, ?)",
+			(pair, ts, rate)
+		)
+		await self._commit()
+		return True
+	
+	async def get_fx_rates_since(self, pair: str, start_ts: int) -> List[Tuple[int, float]]:
+		"""
+		Возвращает записи истории курса, действующие с момента start_ts:
+		последнюю запись до start_ts и все последующие (по времени).
+		"""
+		assert self._db
+		cur = await self._db.execute(
+			"""
+			SELECT ts, rate FROM (
+				SELECT ts, rate FROM fx_rate_history WHERE pair = ? AND ts <= ? ORDER BY ts DESC LIMIT 1
+			)
+			UNION ALL
+			SELECT ts, rate FROM fx_rate_history WHERE pair = ? AND ts > ?
+			ORDER BY ts
+			""",
+			(pair, start_ts, pair, start_ts)
+		)
+		return [(row[0], row[1]) for row in await cur.fetchall()]
+
 	async def _ensure_item_usage_log(self) -> None:
 		"""Создает таблицу для логирования использования элементов (криптовалют, карт, наличных)"""
 		assert self._db
@@ -1947,7 +2769,7 @@ class Database:
 			""",
 			(admin_id, item_type, item_id, timestamp)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Logged item usage: admin_id={admin_id}, type={item_type}, id={item_id}")
 
 	async def get_recent_items_by_admin(self, admin_id: int, limit: int = 6) -> List[Dict[str, Any]]:
@@ -2002,7 +2824,7 @@ class Database:
 		if has_old_table and not has_new_table:
 			# Переименовываем старую таблицу в новую
 			await self._db.execute("ALTER TABLE google_sheets_settings RENAME TO settings")
-			await self._db.commit()
+			await self._commit()
 			_logger.info("✅ Migrated table google_sheets_settings to settings")
 			has_new_table = True
 		elif has_old_table and has_new_table:
@@ -2239,9 +3061,34 @@ class Database:
 					"INSERT INTO settings(key, value) VALUES('users_per_page', '10')"
 				)
 
+	async def _load_settings_cache(self) -> None:
+		"""Загружает всю таблицу settings в память"""
+		assert self._db
+		cur = await self._db.execute("SELECT key, value FROM settings")
+		rows = await cur.fetchall()
+		self._settings_cache = {row[0]: row[1] for row in rows}
+		self._settings_version += 1
+		_logger.debug(f"Settings cache loaded: {len(rows)} keys")
+
+	def _update_settings_cache(self, items: Dict[str, str]) -> None:
+		if self._settings_cache is None:
+			return
+		self._settings_cache.update(items)
+		self._settings_version += 1
+
+	def _stage_settings(self, items: Dict[str, str]) -> None:
+		"""Изменения настроек попадают в общий кэш только после фиксации транзакции"""
+		# В БД колонка TEXT - храним так же, как вернет SELECT
+		values = {key: str(value) for key, value in items.items()}
+		uow = self._active_uow()
+		if uow is None:
+			self._update_settings_cache(values)
+		else:
+			uow.settings.update(values)
+
 	async def get_setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
 		"""
-		Получает значение настройки.
+		Получает значение настройки (из кэша в памяти, без запроса к БД).
 		
 		Args:
 			key: Ключ настройки
@@ -2250,6 +3097,11 @@ class Database:
 		Returns:
 			Значение настройки или default
 		"""
+		uow = self._active_uow()
+		if uow is not None and key in uow.settings:
+			return uow.settings[key]
+		if self._settings_cache is not None:
+			return self._settings_cache.get(key, default)
 		assert self._db
 		cur = await self._db.execute(
 			"SELECT value FROM settings WHERE key = ?",
@@ -2260,6 +3112,42 @@ class Database:
 			return row[0]
 		return default
 
+	async def get_settings(self, keys: List[str], defaults: Optional[Dict[str, str]] = None) -> Dict[str, Optional[str]]:
+		"""
+		Получает несколько настроек сразу.
+		
+		Args:
+			keys: Ключи настроек
+			defaults: Значения по умолчанию {ключ: значение} для отсутствующих настроек
+		
+		Returns:
+			Словарь {ключ: значение или default/None}
+		"""
+		defaults = defaults or {}
+		if self._settings_cache is None:
+			await self._load_settings_cache()
+		assert self._settings_cache is not None
+		uow = self._active_uow()
+		pending = uow.settings if uow is not None else {}
+		return {key: pending.get(key, self._settings_cache.get(key, defaults.get(key))) for key in keys}
+
+	def get_settings_snapshot(self) -> SettingsSnapshot:
+		"""
+		Типизированный снимок всех настроек текущей версии кэша.
+		
+		Снимок пересоздается только после изменения настроек, поэтому
+		его можно запрашивать на каждый расчет. Незафиксированные изменения
+		текущей транзакции видны только в ее собственном (некэшируемом) снимке.
+		"""
+		uow = self._active_uow()
+		if uow is not None and uow.settings:
+			return SettingsSnapshot(self._settings_version, {**(self._settings_cache or {}), **uow.settings})
+		snapshot = self._settings_snapshot
+		if snapshot is None or snapshot.version != self._settings_version:
+			snapshot = SettingsSnapshot(self._settings_version, self._settings_cache or {})
+			self._settings_snapshot = snapshot
+		return snapshot
+
 	async def set_setting(self, key: str, value: str) -> None:
 		"""
 		Устанавливает значение настройки.
@@ -2273,7 +3161,25 @@ class Database:
 			"INSERT OR REPLACE INTO settings(key, value) VALUES(?, ?)",
 			(key, value)
 		)
-		await self._db.commit()
+		await self._commit()
+		self._stage_settings({key: value})
+	
+	async def set_settings(self, items: Dict[str, str]) -> None:
+		"""
+		Устанавливает несколько настроек одной транзакцией.
+		
+		Args:
+			items: Словарь {ключ: значение}
+		"""
+		assert self._db
+		if not items:
+			return
+		await self._db.executemany(
+			"INSERT OR REPLACE INTO settings(key, value) VALUES(?, ?)",
+			list(items.items())
+		)
+		await self._commit()
+		self._stage_settings(items)
 	
 	# Обратная совместимость (deprecated)
 	async def get_google_sheets_setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
@@ -2301,7 +3207,7 @@ class Database:
 			"INSERT INTO card_requisites(card_id, requisite_text) VALUES(?, ?)",
 			(card_id, requisite_text)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Card requisite added: card_id={card_id}, id={cur.lastrowid}")
 		return cur.lastrowid
 
@@ -2346,7 +3252,7 @@ class Database:
 			"UPDATE card_requisites SET requisite_text = ? WHERE id = ?",
 			(requisite_text, requisite_id)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Card requisite updated: id={requisite_id}")
 	
 	async def delete_card_requisite(self, requisite_id: int) -> None:
@@ -2358,7 +3264,7 @@ class Database:
 		"""
 		assert self._db
 		await self._db.execute("DELETE FROM card_requisites WHERE id = ?", (requisite_id,))
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Card requisite deleted: id={requisite_id}")
 	
 	async def _ensure_card_replenishments(self) -> None:
@@ -2402,7 +3308,7 @@ class Database:
 			"INSERT INTO card_replenishments(card_id, amount, created_at) VALUES(?, ?, ?)",
 			(card_id, amount, created_at)
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Card replenishment logged: card_id={card_id}, amount={amount}")
 	
 	async def get_card_replenishment_stats(self, card_id: int) -> Dict[str, float]:
@@ -2665,6 +3571,7 @@ class Database:
 		Номер заявки - это количество заявок за сегодня + 1.
 		"""
 		assert self._db
+		await self._write_intent()
 		
 		# Получаем количество заявок за сегодня
 		today_start = int(time.time()) - (int(time.time()) % 86400)  # Начало дня (00:00:00)
@@ -2694,7 +3601,7 @@ class Database:
 				proof_request_message_id, proof_confirmation_message_id
 			)
 		)
-		await self._db.commit()
+		await self._commit()
 		order_id = cur.lastrowid
 		_logger.debug(f"Created order: id={order_id}, order_number={order_number}, user_tg_id={user_tg_id}")
 		return order_id
@@ -2717,7 +3624,7 @@ class Database:
 			""",
 			(user_tg_id, user_name, user_username, status, user_message_id)
 		)
-		await self._db.commit()
+		await self._commit()
 		deal_id = cur.lastrowid
 		_logger.debug(f"Created buy_deal: id={deal_id}, user_tg_id={user_tg_id}, status={status}")
 		return deal_id
@@ -2725,6 +3632,8 @@ class Database:
 	async def get_buy_deal_by_id(self, deal_id: int) -> Optional[Dict[str, Any]]:
 		"""Получает сделку на покупку по ID."""
 		assert self._db
+		# Обработчики проверяют статус сделки перед его сменой - читаем на писателе
+		await self._write_intent()
 		cur = await self._db.execute(
 			"""
 			SELECT id, user_tg_id, user_name, user_username, country_code,
@@ -2767,6 +3676,8 @@ class Database:
 	async def get_active_buy_deal_by_user(self, user_tg_id: int) -> Optional[int]:
 		"""Возвращает активную сделку пользователя (не завершена/не отменена)."""
 		assert self._db
+		# Обработчики проверяют статус сделки перед его сменой - читаем на писателе
+		await self._write_intent()
 		cur = await self._db.execute(
 			"""
 			SELECT id FROM buy_deals
@@ -2793,7 +3704,7 @@ class Database:
 			f"UPDATE buy_deals SET {columns} WHERE id = ?",
 			values
 		)
-		await self._db.commit()
+		await self._commit()
 
 	async def update_buy_deal_user_message_id(self, deal_id: int, user_message_id: int) -> None:
 		"""Обновляет user_message_id для сделки на покупку."""
@@ -2814,7 +3725,7 @@ class Database:
 			""",
 			(deal_id, sender_type, message_text)
 		)
-		await self._db.commit()
+		await self._commit()
 		message_id = cur.lastrowid
 		_logger.debug(f"Added buy_deal_message: id={message_id}, deal_id={deal_id}, sender_type={sender_type}")
 		return message_id
@@ -2899,12 +3810,13 @@ class Database:
 				"UPDATE orders SET completed_at = ? WHERE id = ?",
 				(int(time.time()), order_id)
 			)
-		await self._db.commit()
+		await self._commit()
 		return cur.rowcount > 0
 	
 	async def update_user_last_order(self, user_tg_id: int, order_id: int, profit: Optional[float] = None) -> None:
 		"""Обновляет информацию о последней сделке и профите пользователя"""
 		assert self._db
+		await self._write_intent()
 		# Получаем user_id по tg_id
 		user_id = await self.get_user_id_by_tg(user_tg_id)
 		if not user_id:
@@ -2922,7 +3834,7 @@ class Database:
 				"UPDATE users SET last_order_id = ? WHERE id = ?",
 				(order_id, user_id)
 			)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Обновлена информация о последней сделке для пользователя tg_id={user_tg_id}: order_id={order_id}, profit={profit}")
 	
 	async def get_user_monthly_profit(self, user_tg_id: int) -> Optional[float]:
@@ -3059,6 +3971,7 @@ class Database:
 		Номер заявки - это количество заявок на продажу за сегодня + 1.
 		"""
 		assert self._db
+		await self._write_intent()
 		
 		# Получаем количество заявок на продажу за сегодня
 		today_start = int(time.time()) - (int(time.time()) % 86400)
@@ -3084,7 +3997,7 @@ class Database:
 				currency_symbol, admin_message_id
 			)
 		)
-		await self._db.commit()
+		await self._commit()
 		order_id = cur.lastrowid
 		_logger.debug(f"Created sell_order: id={order_id}, order_number={order_number}, user_tg_id={user_tg_id}")
 		return order_id
@@ -3138,7 +4051,7 @@ class Database:
 			""",
 			(sell_order_id, sender_type, message_text)
 		)
-		await self._db.commit()
+		await self._commit()
 		message_id = cur.lastrowid
 		_logger.debug(f"Added order message: id={message_id}, sell_order_id={sell_order_id}, sender_type={sender_type}")
 		return message_id
@@ -3173,7 +4086,7 @@ class Database:
 			"UPDATE sell_orders SET completed_at = ? WHERE id = ?",
 			(int(time.time()), order_id)
 		)
-		await self._db.commit()
+		await self._commit()
 		return cur.rowcount > 0
 	
 	async def update_sell_order_user_message_id(self, order_id: int, user_message_id: int) -> bool:
@@ -3183,7 +4096,7 @@ class Database:
 			"UPDATE sell_orders SET user_message_id = ? WHERE id = ?",
 			(user_message_id, order_id)
 		)
-		await self._db.commit()
+		await self._commit()
 		return cur.rowcount > 0
 	
 	async def get_active_sell_order_by_user(self, user_tg_id: int) -> Optional[int]:
@@ -3364,6 +4277,7 @@ class Database:
 		Номер вопроса - это количество вопросов за сегодня + 1.
 		"""
 		assert self._db
+		await self._write_intent()
 		
 		# Получаем количество вопросов за сегодня
 		today_start = int(time.time()) - (int(time.time()) % 86400)
@@ -3382,7 +4296,7 @@ class Database:
 			""",
 			(question_number, user_tg_id, user_name, user_username, question_text, admin_message_id, initiated_by_admin)
 		)
-		await self._db.commit()
+		await self._commit()
 		question_id = cur.lastrowid
 		
 		# Сохраняем первое сообщение (вопрос пользователя), если это не инициировано админом
@@ -3435,7 +4349,7 @@ class Database:
 			""",
 			(question_id, sender_type, message_text)
 		)
-		await self._db.commit()
+		await self._commit()
 		message_id = cur.lastrowid
 		_logger.debug(f"Added question message: question_id={question_id}, sender_type={sender_type}, message_id={message_id}")
 		return message_id
@@ -3470,7 +4384,7 @@ class Database:
 			"UPDATE questions SET admin_message_id = ? WHERE id = ?",
 			(admin_message_id, question_id)
 		)
-		await self._db.commit()
+		await self._commit()
 		return cur.rowcount > 0
 	
 	async def update_question_user_message_id(self, question_id: int, user_message_id: int) -> bool:
@@ -3480,7 +4394,7 @@ class Database:
 			"UPDATE questions SET user_message_id = ? WHERE id = ?",
 			(user_message_id, question_id)
 		)
-		await self._db.commit()
+		await self._commit()
 		return cur.rowcount > 0
 	
 	async def get_active_question_by_user(self, user_tg_id: int) -> Optional[int]:
@@ -3513,7 +4427,7 @@ class Database:
 			""",
 			(order_id, sender_type, message_text)
 		)
-		await self._db.commit()
+		await self._commit()
 		message_id = cur.lastrowid
 		_logger.debug(f"Added buy order message: id={message_id}, order_id={order_id}, sender_type={sender_type}")
 		return message_id
@@ -3548,7 +4462,7 @@ class Database:
 			"UPDATE orders SET admin_message_id = ? WHERE id = ?",
 			(admin_message_id, order_id)
 		)
-		await self._db.commit()
+		await self._commit()
 		return cur.rowcount > 0
 	
 	async def create_debt(self, order_id: int, user_tg_id: int, debt_amount: float, currency_symbol: str) -> int:
@@ -3558,7 +4472,7 @@ class Database:
 			"INSERT INTO debts (order_id, user_tg_id, debt_amount, currency_symbol) VALUES (?, ?, ?, ?)",
 			(order_id, user_tg_id, debt_amount, currency_symbol)
 		)
-		await self._db.commit()
+		await self._commit()
 		debt_id = cur.lastrowid
 		_logger.debug(f"Created debt: id={debt_id}, order_id={order_id}, user_tg_id={user_tg_id}, amount={debt_amount} {currency_symbol}")
 		return debt_id
@@ -3612,7 +4526,7 @@ class Database:
 			"INSERT INTO user_debts(user_tg_id, amount, currency_symbol) VALUES(?, ?, ?)",
 			(user_tg_id, amount, currency_symbol)
 		)
-		await self._db.commit()
+		await self._commit()
 		return True
 
 	async def clear_user_debts(self, user_tg_id: int) -> None:
@@ -3620,7 +4534,7 @@ class Database:
 		assert self._db
 		await self._db.execute("DELETE FROM debts WHERE user_tg_id = ?", (user_tg_id,))
 		await self._db.execute("DELETE FROM user_debts WHERE user_tg_id = ?", (user_tg_id,))
-		await self._db.commit()
+		await self._commit()
 
 	async def save_pending_requisites(
 		self,
@@ -3644,7 +4558,7 @@ class Database:
 			""",
 			(user_tg_id, message_id, crypto_type, crypto_display, amount, final_amount, currency_symbol, wallet_address)
 		)
-		await self._db.commit()
+		await self._commit()
 		return True
 
 	async def get_pending_requisites(self, user_tg_id: int) -> Optional[Dict[str, Any]]:
@@ -3680,7 +4594,7 @@ class Database:
 			"DELETE FROM pending_requisites WHERE user_tg_id = ?",
 			(user_tg_id,)
 		)
-		await self._db.commit()
+		await self._commit()
 
 	async def update_pending_requisites_message_id(self, user_tg_id: int, message_id: int) -> None:
 		"""Обновляет message_id для ожидающих реквизитов"""
@@ -3689,7 +4603,7 @@ class Database:
 			"UPDATE pending_requisites SET message_id = ? WHERE user_tg_id = ?",
 			(message_id, user_tg_id)
 		)
-		await self._db.commit()
+		await self._commit()
 
 	async def _ensure_deal_alerts_table(self) -> None:
 		"""Создает таблицу для хранения deal alerts (для восстановления после перезапуска)"""
@@ -3724,7 +4638,7 @@ class Database:
 			""",
 			(deal_id, admin_id, message_id, alert_type, int(time.time()))
 		)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Saved deal alert: deal_id={deal_id}, admin_id={admin_id}, message_id={message_id}")
 	
 	async def delete_deal_alert(self, deal_id: int, admin_id: int = None, alert_type: str = "buy_deal") -> None:
@@ -3740,7 +4654,7 @@ class Database:
 				"DELETE FROM deal_alerts WHERE deal_id = ? AND alert_type = ?",
 				(deal_id, alert_type)
 			)
-		await self._db.commit()
+		await self._commit()
 		_logger.debug(f"Deleted deal alert: deal_id={deal_id}, admin_id={admin_id}")
 	
 	async def get_deal_alerts(self, deal_id: int = None, alert_type: str = "buy_deal") -> List[Dict[str, Any]]:
@@ -3803,7 +4717,7 @@ class Database:
 			"UPDATE orders SET user_message_id = ? WHERE id = ?",
 			(user_message_id, order_id)
 		)
-		await self._db.commit()
+		await self._commit()
 		return cur.rowcount > 0
 	
 	async def get_active_order_by_user(self, user_tg_id: int) -> Optional[int]:
@@ -3828,6 +4742,50 @@ class Database:
 			"UPDATE questions SET completed_at = ? WHERE id = ?",
 			(int(time.time()), question_id)
 		)
-		await self._db.commit()
+		await self._commit()
 		return cur.rowcount > 0
-	
\ No newline at end of file
+	
+
+def _in_transaction(method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+	"""Выполняет метод БД в транзакции вызывающего кода, а вне ее - в собственной"""
+	@functools.wraps(method)
+	async def wrapper(self: Database, *args: Any, **kwargs: Any) -> Any:
+		if self._active_uow() is not None:
+			return await method(self, *args, **kwargs)
+		async with self.transaction():
+			return await method(self, *args, **kwargs)
+	return wrapper
+
+
+# Каждый публичный метод Database атомарен: его записи фиксируются вместе
+for _name, _method in list(vars(Database).items()):
+	if (
+		not _name.startswith("_")
+		and _name not in ("connect", "close", "flush")
+		and inspect.iscoroutinefunction(_method)
+	):
+		setattr(Database, _name, _in_transaction(_method))
+
+class DbTransactionMiddleware(BaseMiddleware):
+	"""Middleware: каждое обновление Telegram обрабатывается в одной транзакции БД (Database.transaction)"""
+
+	def __init__(self, db: Database) -> None:
+		self._database = db
+
+	async def __call__(self, handler, event, data: dict) -> Any:
+		async with self._database.transaction():
+			return await handler(event, data)
+
+
+class DbFlushRequestMiddleware(BaseRequestMiddleware):
+	"""
+	Middleware запросов к Telegram API: перед отправкой фиксирует транзакцию обработчика
+	(Database.flush), чтобы писатель не был занят на время сетевого запроса.
+	"""
+
+	def __init__(self, db: Database) -> None:
+		self._database = db
+
+	async def __call__(self, make_request, bot, method) -> Any:
+		await self._database.flush()
+		return await make_request(bot, method)
@@ -0,0 +1,233 @@
+"""
+Пул соединений SQLite: одно соединение-писатель и несколько соединений только для чтения.
+
+aiosqlite выполняет все запросы соединения в одном потоке по очереди, поэтому тяжелые
+SELECT (статистика /stat_u) задерживали запись сделок. ConnectionRouter подменяет
+соединение в Database: SELECT уходят в свободное соединение-читатель (WAL позволяет
+читать параллельно с записью), все остальное - в писателя.
+
+Чтение своих же изменений: если писатель закреплен за текущей транзакцией (у нее есть
+незафиксированные записи), SELECT выполняется на писателе - читатели видят только
+зафиксированные данные.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+import aiosqlite
+
+logger = logging.getLogger("app.db_pool")
+
+_READ_PREFIXES = ("SELECT", "WITH")
+
+
+def _is_read_query(sql: str) -> bool:
+	return sql.lstrip().upper().startswith(_READ_PREFIXES)
+
+
+class _FetchedCursor:
+	"""Результат SELECT на читателе: строки уже получены, соединение возвращено в пул"""
+
+	rowcount = -1
+	lastrowid = None
+
+	def __init__(self, rows: List[Any], description: Any) -> None:
+		self._rows = rows
+		self._position = 0
+		self.description = description
+
+	async def fetchone(self) -> Optional[Any]:
+		if self._position >= len(self._rows):
+			return None
+		row = self._rows[self._position]
+		self._position += 1
+		return row
+
+	async def fetchmany(self, size: int = 1) -> List[Any]:
+		rows = self._rows[self._position:self._position + size]
+		self._position += len(rows)
+		return rows
+
+	async def fetchall(self) -> List[Any]:
+		rows = self._rows[self._position:]
+		self._position = len(self._rows)
+		return rows
+
+	async def close(self) -> None:
+		pass
+
+	def __aiter__(self) -> "_FetchedCursor":
+		return self
+
+	async def __anext__(self) -> Any:
+		row = await self.fetchone()
+		if row is None:
+			raise StopAsyncIteration
+		return row
+
+
+class _WaitStats:
+	"""Счетчики ожидания соединения"""
+
+	def __init__(self) -> None:
+		self.count = 0
+		self.wait_total = 0.0
+		self.wait_max = 0.0
+
+	def add(self, wait: float) -> None:
+		self.count += 1
+		self.wait_total += wait
+		if wait > self.wait_max:
+			self.wait_max = wait
+
+	def as_dict(self) -> Dict[str, Any]:
+		return {
+			"count": self.count,
+			"wait_avg_ms": round(self.wait_total / self.count * 1000, 2) if self.count else 0.0,
+			"wait_max_ms": round(self.wait_max * 1000, 2),
+		}
+
+
+class ConnectionRouter:
+	"""
+	Соединение для Database: интерфейс aiosqlite.Connection (execute, executemany,
+	executescript, commit, rollback, close), запросы распределяются между писателем и читателями.
+
+	Писатель принадлежит одной транзакции (unit of work) от ее первой записи до commit/rollback:
+	остальные пишущие ждут его освобождения, поэтому чужой commit не фиксирует и чужой
+	rollback не отменяет незавершенные изменения транзакции. Запись вне транзакции
+	выполняется отдельным коротким захватом писателя с немедленной фиксацией.
+	"""
+
+	def __init__(self, writer: aiosqlite.Connection, owner_getter: Callable[[], Optional[Hashable]]) -> None:
+		"""
+		Args:
+			writer: Соединение для записи (и миграций)
+			owner_getter: Активная транзакция текущего контекста (None - вне транзакции)
+		"""
+		self.writer = writer
+		self._owner_getter = owner_getter
+		self._readers: List[aiosqlite.Connection] = []
+		self._idle_readers: Optional[asyncio.Queue] = None
+		self._writer_owner: Optional[Hashable] = None
+		# Срабатывает при каждой смене владельца писателя (захват или освобождение)
+		self._writer_changed = asyncio.Event()
+		self._read_stats = _WaitStats()
+		self._write_stats = _WaitStats()
+		self._reads_on_writer = 0
+
+	async def open_readers(self, path: str, size: int) -> None:
+		"""Открывает соединения только для чтения (после миграций схемы)"""
+		if size <= 0:
+			return
+		self._idle_readers = asyncio.Queue()
+		for _ in range(size):
+			reader = await aiosqlite.connect(path)
+			await reader.execute("PRAGMA query_only=ON;")
+			self._readers.append(reader)
+			self._idle_readers.put_nowait(reader)
+		logger.debug(f"SQLite reader pool opened: {size} connections")
+
+	def owns_writer(self, owner: Optional[Hashable]) -> bool:
+		"""Принадлежит ли писатель транзакции owner (у нее есть незафиксированные записи)"""
+		return owner is not None and self._writer_owner is owner
+
+	def _notify_writer_changed(self) -> None:
+		self._writer_changed.set()
+		self._writer_changed = asyncio.Event()
+
+	async def acquire_writer(self, owner: Hashable) -> None:
+		"""
+		Закрепляет писателя за транзакцией до release_writer (ждет, пока он занят другой).
+		Несколько задач одной транзакции могут ждать одновременно: после каждой смены
+		владельца ожидающие перепроверяют его, и задача, чья транзакция уже получила
+		писателя, продолжает работу, а не ждет освобождения от самой себя.
+		"""
+		if self._writer_owner is owner:
+			return
+		started = time.monotonic()
+		while self._writer_owner is not None and self._writer_owner is not owner:
+			await self._writer_changed.wait()
+		if self._writer_owner is None:
+			self._writer_owner = owner
+			self._write_stats.add(time.monotonic() - started)
+			self._notify_writer_changed()
+
+	def release_writer(self, owner: Hashable) -> None:
+		if self._writer_owner is owner:
+			self._writer_owner = None
+			self._notify_writer_changed()
+
+	async def _read(self, sql: str, parameters: Optional[Iterable[Any]]) -> _FetchedCursor:
+		assert self._idle_readers is not None
+		started = time.monotonic()
+		reader = await self._idle_readers.get()
+		self._read_stats.add(time.monotonic() - started)
+		try:
+			cursor = await reader.execute(sql, parameters)
+			rows = await cursor.fetchall()
+			description = cursor.description
+			await cursor.close()
+		finally:
+			self._idle_readers.put_nowait(reader)
+		return _FetchedCursor(rows, description)
+
+	async def _write(self, method: str, *args: Any) -> Any:
+		owner = self._owner_getter()
+		if owner is not None:
+			# Писатель закрепляется за транзакцией до выполнения запроса
+			await self.acquire_writer(owner)
+			return await getattr(self.writer, method)(*args)
+		token = object()
+		await self.acquire_writer(token)
+		try:
+			result = await getattr(self.writer, method)(*args)
+			if self.writer.in_transaction:
+				await self.writer.commit()
+			return result
+		except BaseException:
+			if self.writer.in_transaction:
+				await asyncio.shield(self.writer.rollback())
+			raise
+		finally:
+			self.release_writer(token)
+
+	async def execute(self, sql: str, parameters: Optional[Iterable[Any]] = None) -> Any:
+		if _is_read_query(sql):
+			if self._idle_readers is not None:
+				if not self.owns_writer(self._owner_getter()):
+					return await self._read(sql, parameters)
+				self._reads_on_writer += 1
+			return await self.writer.execute(sql, parameters)
+		return await self._write("execute", sql, parameters)
+
+	async def executemany(self, sql: str, parameters: Iterable[Iterable[Any]]) -> Any:
+		return await self._write("executemany", sql, parameters)
+
+	async def executescript(self, sql_script: str) -> Any:
+		return await self._write("executescript", sql_script)
+
+	async def commit(self) -> None:
+		"""Фиксирует транзакцию писателя (вызывает владелец писателя)"""
+		await self.writer.commit()
+
+	async def rollback(self) -> None:
+		"""Откатывает транзакцию писателя (вызывает владелец писателя)"""
+		await self.writer.rollback()
+
+	async def close(self) -> None:
+		for reader in self._readers:
+			await reader.close()
+		self._readers = []
+		self._idle_readers = None
+		await self.writer.close()
+
+	def get_stats(self) -> Dict[str, Any]:
+		"""Статистика: число запросов и ожидание соединения у читателей и писателя"""
+		return {
+			"readers": len(self._readers),
+			"reads": self._read_stats.as_dict(),
+			"writer": self._write_stats.as_dict(),
+			"reads_on_writer": self._reads_on_writer,
+		}
@@ -0,0 +1,238 @@
+"""Отслеживание зачислений BTC на адреса клиентов (оповещение о зачислении).
+
+Вместо отдельной задачи на каждую сделку все ожидающие адреса хранятся в таблице
+deposit_watches, а один фоновый воркер проверяет их раундами через mempool.space:
+одинаковые адреса проверяются один раз за раунд, запросы идут с ограничением
+скорости, а интервал между проверками адреса растет с числом попыток
+(сначала часто, потом реже). Отслеживание переживает перезапуск бота.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.di import get_db
+
+logger = logging.getLogger("app.deposit_watcher")
+
+# Сколько адресов забирать за один раунд
+DEPOSIT_BATCH_SIZE = 50
+# Максимум запросов к mempool.space в секунду
+DEPOSIT_CHECKS_PER_SECOND = 2.0
+# Интервал опроса таблицы, если воркер не был разбужен новым адресом (секунды)
+DEPOSIT_POLL_INTERVAL = 5
+# Рост интервала между проверками адреса с каждой попыткой и его верхняя граница (секунды)
+DEPOSIT_INTERVAL_GROWTH = 1.25
+DEPOSIT_MAX_INTERVAL = 600
+
+_wakeup_event: Optional[asyncio.Event] = None
+_stats: Dict[str, Any] = {
+	"rounds": 0,
+	"checks": 0,
+	"coalesced": 0,
+	"found": 0,
+	"expired": 0,
+	"errors": 0,
+	"notify_errors": 0,
+	"check_seconds": 0.0,
+}
+
+
+def _get_wakeup_event() -> asyncio.Event:
+	global _wakeup_event
+	if _wakeup_event is None:
+		_wakeup_event = asyncio.Event()
+	return _wakeup_event
+
+
+async def _get_watch_settings() -> Tuple[float, int, float]:
+	"""
+	Настройки проверки из БД (раздел "Мемпул" в настройках).
+
+	Returns:
+		(базовый интервал в секундах, максимум попыток, отсрочка первой проверки в секундах)
+	"""
+	db = get_db()
+	check_interval_str = await db.get_setting("mempool_check_interval_minutes", "0.5")
+	max_attempts_str = await db.get_setting("mempool_max_attempts", "20")
+	initial_delay_str = await db.get_setting("mempool_initial_delay_minutes", "0.17")
+	try:
+		check_interval_minutes = float(check_interval_str) if check_interval_str else 0.5
+	except (ValueError, TypeError):
+		check_interval_minutes = 0.5
+	try:
+		max_attempts = int(max_attempts_str) if max_attempts_str else 20
+	except (ValueError, TypeError):
+		max_attempts = 20
+	try:
+		initial_delay_minutes = float(initial_delay_str) if initial_delay_str else 0.17
+	except (ValueError, TypeError):
+		initial_delay_minutes = 0.17
+	return check_interval_minutes * 60, max_attempts, initial_delay_minutes * 60
+
+
+def _next_interval(base_interval: float, attempts: int) -> float:
+	"""Интервал до следующей проверки: базовый для первых попыток, дальше растет до DEPOSIT_MAX_INTERVAL"""
+	return min(base_interval * DEPOSIT_INTERVAL_GROWTH ** attempts, max(base_interval, DEPOSIT_MAX_INTERVAL))
+
+
+async def watch_deposit(wallet_address: str, user_tg_id: int, deal_id: int) -> bool:
+	"""
+	Ставит адрес на отслеживание зачисления и будит воркер.
+
+	Args:
+		wallet_address: Адрес кошелька Bitcoin
+		user_tg_id: Telegram ID пользователя для оповещения
+		deal_id: ID сделки
+
+	Returns:
+		True, если адрес поставлен на отслеживание (False - сделка уже отслеживается)
+	"""
+	_, _, initial_delay = await _get_watch_settings()
+	db = get_db()
+	added = await db.add_deposit_watch(wallet_address, user_tg_id, deal_id, int(time.time() + initial_delay))
+	if added:
+		logger.info(f"🔄 Адрес {wallet_address} поставлен на отслеживание зачисления: deal_id={deal_id}")
+		# Воркер читает зафиксированные данные - будим его после фиксации транзакции
+		db.call_after_commit(_get_wakeup_event().set)
+	return added
+
+
+async def _check_addresses(addresses: List[str]) -> Dict[str, Tuple[bool, Optional[str]]]:
+	"""Проверяет адреса с ограничением скорости запросов"""
+	from app.mempool_check import check_btc_transaction
+
+	tasks = {}
+	for index, address in enumerate(addresses):
+		if index:
+			await asyncio.sleep(1 / DEPOSIT_CHECKS_PER_SECOND)
+		tasks[address] = asyncio.create_task(check_btc_transaction(address))
+	results = {}
+	for address, task in tasks.items():
+		try:
+			results[address] = await task
+		except Exception as e:
+			results[address] = (False, str(e))
+	return results
+
+
+async def _notify_deposit(bot: Any, watch: Dict[str, Any]) -> None:
+	mempool_url = f"https://mempool.space/address/{watch['wallet_address']}"
+	await bot.send_message(
+		chat_id=watch["user_tg_id"],
+		text=f"✅ Получено первое подтверждение транзакции!\n\n🔗 Проверить: {mempool_url}"
+	)
+	logger.info(
+		f"✅ Оповещение о зачислении отправлено пользователю {watch['user_tg_id']} "
+		f"для deal_id={watch['deal_id']} (попытка {watch['attempts'] + 1})"
+	)
+
+
+async def _run_round(bot: Any, watches: List[Dict[str, Any]]) -> None:
+	"""Один раунд: каждый адрес проверяется один раз, результат применяется ко всем его сделкам"""
+	db = get_db()
+	base_interval, max_attempts, _ = await _get_watch_settings()
+
+	by_address: Dict[str, List[Dict[str, Any]]] = {}
+	for watch in watches:
+		by_address.setdefault(watch["wallet_address"], []).append(watch)
+
+	started = time.monotonic()
+	results = await _check_addresses(list(by_address))
+	_stats["rounds"] += 1
+	_stats["checks"] += len(by_address)
+	_stats["coalesced"] += len(watches) - len(by_address)
+	_stats["check_seconds"] += time.monotonic() - started
+
+	found_ids: List[int] = []
+	expired_ids: List[int] = []
+	retry: List[Tuple[int, int, Optional[str]]] = []
+	now = time.time()
+	for address, address_watches in by_address.items():
+		has_transactions, error = results[address]
+		if error:
+			_stats["errors"] += 1
+		# {user_tg_id: ошибка отправки или None} - одно оповещение на пользователя
+		notified_users: Dict[int, Optional[str]] = {}
+		for watch in address_watches:
+			if has_transactions:
+				user_tg_id = watch["user_tg_id"]
+				if user_tg_id not in notified_users:
+					try:
+						await _notify_deposit(bot, watch)
+						notified_users[user_tg_id] = None
+					except Exception as e:
+						_stats["notify_errors"] += 1
+						notified_users[user_tg_id] = f"Оповещение не отправлено: {e}"
+						logger.warning(f"⚠️ Не удалось отправить оповещение о зачислении deal_id={watch['deal_id']}: {e}")
+				notify_error = notified_users[user_tg_id]
+				if notify_error is None:
+					found_ids.append(watch["id"])
+				elif watch["attempts"] + 1 >= max_attempts:
+					# Зачисление найдено, но пользователь так и не получил оповещение - больше не пытаемся
+					found_ids.append(watch["id"])
+					logger.error(
+						f"❌ Оповещение о зачислении deal_id={watch['deal_id']} не доставлено "
+						f"за {max_attempts} попыток: {notify_error}"
+					)
+				else:
+					# Оставляем адрес в очереди: оповещение повторится в следующем раунде
+					retry.append((watch["id"], int(now + _next_interval(base_interval, 0)), notify_error))
+			elif watch["attempts"] + 1 >= max_attempts:
+				expired_ids.append(watch["id"])
+				logger.warning(
+					f"⚠️ Превышено максимальное количество попыток ({max_attempts}) для deal_id={watch['deal_id']}, "
+					f"транзакция не найдена"
+				)
+			else:
+				delay = _next_interval(base_interval, watch["attempts"] + 1)
+				retry.append((watch["id"], int(now + delay), error))
+
+	await db.finish_deposit_watches(found_ids, "found")
+	await db.finish_deposit_watches(expired_ids, "expired")
+	await db.reschedule_deposit_watches(retry)
+	_stats["found"] += len(found_ids)
+	_stats["expired"] += len(expired_ids)
+	logger.debug(
+		f"🔍 Раунд проверки зачислений: адресов {len(by_address)} (сделок {len(watches)}), "
+		f"найдено {len(found_ids)}, {get_deposit_watcher_stats()['checks_per_second']} проверок/сек"
+	)
+
+
+def get_deposit_watcher_stats() -> Dict[str, Any]:
+	"""Статистика воркера: раунды, проверки адресов, объединенные проверки, скорость"""
+	stats = dict(_stats)
+	seconds = stats.pop("check_seconds")
+	stats["checks_per_second"] = round(stats["checks"] / seconds, 2) if seconds else 0.0
+	return stats
+
+
+async def run_deposit_watcher(bot: Any) -> None:
+	"""
+	Фоновый воркер отслеживания зачислений.
+
+	Args:
+		bot: Bot для отправки оповещений пользователям
+	"""
+	db = get_db()
+	pending = await db.count_pending_deposit_watches()
+	if pending:
+		logger.info(f"🔄 Адресов, ожидающих зачисления: {pending}")
+
+	wakeup = _get_wakeup_event()
+	while True:
+		try:
+			wakeup.clear()
+			watches = await db.get_due_deposit_watches(DEPOSIT_BATCH_SIZE)
+			if not watches:
+				try:
+					await asyncio.wait_for(wakeup.wait(), timeout=DEPOSIT_POLL_INTERVAL)
+				except asyncio.TimeoutError:
+					pass
+				continue
+			await _run_round(bot, watches)
+		except asyncio.CancelledError:
+			break
+		except Exception as e:
+			logger.warning(f"⚠️ Ошибка в воркере отслеживания зачислений: {e}")
+			await asyncio.sleep(DEPOSIT_POLL_INTERVAL)
@@ -1,7 +1,9 @@
 from typing import Optional, List
 from app.db import Database
+from app.http_client import HttpClient
 
 _db: Optional[Database] = None
+_http: Optional[HttpClient] = None
 _admin_ids: List[int] = []
 _admin_usernames: List[str] = []
 
@@ -18,6 +20,16 @@ def get_db() -> Database:
 	return _db
 
 
+def set_http_client(http: HttpClient) -> None:
+	global _http
+	_http = http
+
+
+def get_http() -> HttpClient:
+	assert _http is not None, "HTTP client is not initialized"
+	return _http
+
+
 def get_admin_ids() -> List[int]:
 	return _admin_ids
 
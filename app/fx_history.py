@@ -0,0 +1,119 @@
+"""История курсов валют USD→BYN и USD→RUB на момент времени.
+
+Каждый полученный из интернета курс дописывается в таблицу fx_rate_history (только при
+изменении). Курс действует с момента записи до следующей записи, поэтому курс на момент
+сделки - последняя запись не позже времени сделки. Для моментов раньше первой записи
+курс неизвестен.
+
+Для пересчета профита по множеству старых сделок история пары загружается в память
+одним запросом (интервальный кэш), а курсы на нужные моменты ищутся бинарным поиском.
+"""
+import bisect
+import logging
+import time
+from typing import Dict, List, Optional
+
+from app.di import get_db
+
+logger = logging.getLogger("app.fx_history")
+
+# Валюта -> валютная пара в истории
+FX_PAIRS = {"BYN": "USD_BYN", "RUB": "USD_RUB"}
+
+
+class _FxIntervalCache:
+	"""Записи истории одной пары, действующие начиная с loaded_from (до текущего момента)"""
+
+	def __init__(self) -> None:
+		self.loaded_from: Optional[int] = None
+		self.ts: List[int] = []
+		self.rates: List[float] = []
+
+	def covers(self, ts: int) -> bool:
+		return self.loaded_from is not None and ts >= self.loaded_from
+
+	def load(self, start_ts: int, rows: List[tuple]) -> None:
+		self.loaded_from = start_ts
+		self.ts = [row[0] for row in rows]
+		self.rates = [row[1] for row in rows]
+
+	def append(self, ts: int, rate: float) -> None:
+		if self.loaded_from is None:
+			return
+		if self.ts and ts <= self.ts[-1]:
+			# Запись задним числом - проще перечитать при следующем обращении
+			self.loaded_from = None
+			return
+		self.ts.append(ts)
+		self.rates.append(rate)
+
+	def lookup(self, ts: int) -> Optional[float]:
+		index = bisect.bisect_right(self.ts, ts) - 1
+		# Сделка раньше начала истории - курс на тот момент неизвестен
+		return self.rates[index] if index >= 0 else None
+
+
+_caches: Dict[str, _FxIntervalCache] = {pair: _FxIntervalCache() for pair in FX_PAIRS.values()}
+
+
+def _pair(currency: str) -> str:
+	pair = FX_PAIRS.get(currency.upper())
+	if pair is None:
+		raise ValueError(f"Неизвестная валюта: {currency}")
+	return pair
+
+
+async def record_fx_rate(currency: str, rate: float, ts: Optional[float] = None) -> None:
+	"""
+	Дописывает курс в историю (если он изменился).
+
+	Args:
+		currency: 'BYN' или 'RUB'
+		rate: Курс USD→валюта
+		ts: Время курса (по умолчанию - сейчас)
+	"""
+	pair = _pair(currency)
+	ts = int(time.time() if ts is None else ts)
+	try:
+		db = get_db()
+		if await db.add_fx_rate(pair, ts, rate):
+			db.call_after_commit(lambda: _caches[pair].append(ts, rate))
+	except Exception as e:
+		logger.warning(f"⚠️ Не удалось записать курс {pair} в историю: {e}")
+
+
+async def _ensure_loaded(pair: str, start_ts: int) -> _FxIntervalCache:
+	cache = _caches[pair]
+	if not cache.covers(start_ts):
+		rows = await get_db().get_fx_rates_since(pair, start_ts)
+		cache.load(start_ts, rows)
+		logger.debug(f"📚 История курса {pair} загружена с {start_ts}: {len(rows)} записей")
+	return cache
+
+
+async def get_fx_rate_at(currency: str, ts: float) -> Optional[float]:
+	"""
+	Курс USD→валюта, действовавший в момент ts.
+
+	Returns:
+		Курс или None, если истории курса на этот момент нет
+	"""
+	cache = await _ensure_loaded(_pair(currency), int(ts))
+	return cache.lookup(int(ts))
+
+
+async def get_fx_rates_at(currency: str, timestamps: List[float]) -> List[Optional[float]]:
+	"""
+	Курсы USD→валюта на множество моментов времени: один запрос к БД на всю выборку.
+
+	Args:
+		currency: 'BYN' или 'RUB'
+		timestamps: Моменты времени unix (например, время создания сделок)
+
+	Returns:
+		Список курсов в том же порядке (None - момент раньше начала истории)
+	"""
+	if not timestamps:
+		return []
+	cache = await _ensure_loaded(_pair(currency), int(min(timestamps)))
+	return [cache.lookup(int(ts)) for ts in timestamps]
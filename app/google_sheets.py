@@ -3,14 +3,22 @@
 """
 import logging
 import asyncio
+import os
+import threading
 import time
 import re
-from typing import Optional, Dict, Any, List
+import heapq
+import itertools
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
 import gspread
 from google.oauth2.service_account import Credentials
-import aiohttp
 
 from app.di import get_db
+from app.sheets_api import get_async_sheets_client, SheetsAPIError
+from app.sheets_fake import get_fake_sheets_backend
+from app.single_flight import get_single_flight
 
 logger = logging.getLogger("app.google_sheets")
 
@@ -54,69 +62,468 @@ def _get_worksheet(spreadsheet: gspread.Spreadsheet, sheet_name: Optional[str] =
 		return spreadsheet.sheet1
 
 
-async def _get_btc_from_binance() -> Optional[float]:
-	"""Получает курс BTC/USDT с Binance API"""
+# ============ Пул клиентов Google Sheets ============
+
+class _SheetsClientPool:
+	"""
+	Долгоживущий пул авторизованных клиентов и листов Google Sheets.
+
+	Клиент gspread кэшируется по пути к файлу учетных данных, объекты листов -
+	по ключу (credentials_path, sheet_id, sheet_name). Повторные операции не делают
+	ни авторизацию, ни open_by_key, ни запрос метаданных листа.
+	Токен обновляется автоматически (AuthorizedSession внутри gspread),
+	при изменении файла учетных данных клиент и листы пересоздаются.
+	"""
+
+	def __init__(self) -> None:
+		self._lock = threading.RLock()
+		self._clients: Dict[str, Tuple[float, gspread.Client]] = {}  # {credentials_path: (mtime, client)}
+		self._worksheets: Dict[Tuple[str, str, str], gspread.Worksheet] = {}
+
+	@staticmethod
+	def _credentials_mtime(credentials_path: str) -> float:
+		try:
+			return os.path.getmtime(credentials_path)
+		except OSError:
+			return 0.0
+
+	def get_client(self, credentials_path: str) -> Optional[gspread.Client]:
+		"""Возвращает авторизованный клиент, создавая его только при первом обращении"""
+		mtime = self._credentials_mtime(credentials_path)
+		with self._lock:
+			cached = self._clients.get(credentials_path)
+			if cached and cached[0] == mtime:
+				return cached[1]
+			if cached:
+				logger.info("🔄 Файл учетных данных Google Sheets изменился, пересоздаем клиент")
+				self._drop_worksheets(credentials_path)
+			client = _get_google_sheets_client(credentials_path)
+			if client is None:
+				return None
+			self._clients[credentials_path] = (mtime, client)
+			logger.info("✅ Клиент Google Sheets авторизован и сохранен в пуле")
+			return client
+
+	def get_worksheet(
+		self,
+		credentials_path: str,
+		sheet_id: str,
+		sheet_name: Optional[str] = None
+	) -> Optional[gspread.Worksheet]:
+		"""Возвращает закэшированный лист; open_by_key выполняется один раз на ключ"""
+		client = self.get_client(credentials_path)
+		if client is None:
+			return None
+		key = (credentials_path, sheet_id, (sheet_name or "").strip())
+		with self._lock:
+			worksheet = self._worksheets.get(key)
+			if worksheet is not None:
+				return worksheet
+			spreadsheet = client.open_by_key(sheet_id)
+			worksheet = _get_worksheet(spreadsheet, sheet_name)
+			self._worksheets[key] = worksheet
+			logger.debug(f"✅ Лист Google Sheets сохранен в пуле: sheet_id={sheet_id}, sheet_name='{key[2]}'")
+			return worksheet
+
+	def _drop_worksheets(self, credentials_path: str) -> None:
+		for key in [k for k in self._worksheets if k[0] == credentials_path]:
+			del self._worksheets[key]
+
+
+_sheets_pool = _SheetsClientPool()
+
+
+def _open_worksheet(
+	sheet_id: str,
+	credentials_path: str,
+	sheet_name: Optional[str] = None
+) -> Optional[gspread.Worksheet]:
+	"""
+	Возвращает лист Google Sheets из пула клиентов.
+	В потоке _run_sheets_io лист обернут так, что каждый запрос ждет квоту планировщика.
+
+	Returns:
+		Объект листа или None, если не удалось создать клиент
+	"""
+	fake_backend = get_fake_sheets_backend()
+	if fake_backend is not None:
+		# Локальная таблица в памяти (GOOGLE_SHEETS_BACKEND=fake)
+		worksheet = fake_backend.worksheet(sheet_id, sheet_name)
+	else:
+		worksheet = _sheets_pool.get_worksheet(credentials_path, sheet_id, sheet_name)
+	io_call = getattr(_sheets_io_local, "call", None)
+	if worksheet is not None and io_call is not None:
+		# Внутри _run_sheets_io каждый запрос листа проходит через планировщик квот
+		return _MeteredWorksheet(worksheet, io_call)
+	return worksheet
+
+
+# Чтение идет через асинхронный клиент (app.sheets_api), а блокирующие вызовы gspread
+# (запись и поиск строк) выполняются в отдельном небольшом пуле потоков,
+# чтобы не занимать стандартный executor event loop
+_SHEETS_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gsheets")
+
+
+# ============ Планировщик квот Google Sheets API ============
+
+# Приоритеты запросов (меньше - раньше): интерактивные записи /add, /rate, /move, /del,
+# затем чтения для отчетов, затем чтения для статистики (/stat_bk, /stat_k, /cons)
+SHEETS_PRIORITY_WRITE = 0
+SHEETS_PRIORITY_READ = 1
+SHEETS_PRIORITY_STATS = 2
+
+# Пауза всей очереди после 429: 2, 4, 8, ... но не более 64 секунд
+_SHEETS_BACKOFF_START = 2.0
+_SHEETS_BACKOFF_MAX = 64.0
+# Сколько раз повторять запрос чтения после 429
+_SHEETS_RATE_LIMIT_RETRIES = 5
+# Ожидание квоты дольше этого значения логируется как насыщение
+_SHEETS_SLOW_WAIT_SECONDS = 5.0
+
+
+class _TokenBucket:
+	"""Token bucket под поминутную квоту: пополняется равномерно, допускает небольшой всплеск"""
+
+	def __init__(self, per_minute: int) -> None:
+		per_minute = max(1, per_minute)
+		self.rate = per_minute / 60.0
+		self.capacity = max(1.0, per_minute / 4.0)
+		self.tokens = self.capacity
+		self.updated = time.monotonic()
+
+	def _refill(self, now: float) -> None:
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+
+	def try_take(self, now: float) -> bool:
+		self._refill(now)
+		if self.tokens >= 1.0:
+			self.tokens -= 1.0
+			return True
+		return False
+
+	def time_until_token(self, now: float) -> float:
+		self._refill(now)
+		return max(0.0, (1.0 - self.tokens) / self.rate)
+
+
+class _SheetsQuotaScheduler:
+	"""
+	Общая очередь запросов к Google Sheets API.
+
+	Чтения и записи расходуют отдельные token bucket (квоты на чтение и запись в минуту
+	из настроек GOOGLE_SHEETS_READ_QUOTA / GOOGLE_SHEETS_WRITE_QUOTA). Ожидающие запросы
+	выдаются в порядке приоритета, а 429 ставит на паузу всю очередь с экспоненциальной
+	задержкой вместо отдельных sleep в каждой функции.
+	"""
+
+	def __init__(self) -> None:
+		self._buckets: Optional[Dict[str, _TokenBucket]] = None
+		self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []  # heap: (priority, seq, kind, future)
+		self._seq = itertools.count()
+		self._pause_until = 0.0
+		self._backoff = 0.0
+		self._timer: Optional[asyncio.TimerHandle] = None
+		self._timer_at = 0.0
+		self.granted = 0
+		self.total_wait = 0.0
+		self.max_wait = 0.0
+		self.rate_limited = 0
+
+	def _get_buckets(self) -> Dict[str, _TokenBucket]:
+		if self._buckets is None:
+			from app.config import get_settings
+			settings = get_settings()
+			self._buckets = {
+				"read": _TokenBucket(settings.google_sheets_read_quota),
+				"write": _TokenBucket(settings.google_sheets_write_quota)
+			}
+		return self._buckets
+
+	async def acquire(self, kind: str, priority: int) -> None:
+		"""Ждет свободную квоту для запроса вида kind ("read" или "write")"""
+		future = asyncio.get_running_loop().create_future()
+		enqueued_at = time.monotonic()
+		heapq.heappush(self._waiters, (priority, next(self._seq), kind, future))
+		self._dispatch()
+		await future
+		waited = time.monotonic() - enqueued_at
+		self.granted += 1
+		self.total_wait += waited
+		self.max_wait = max(self.max_wait, waited)
+		if waited >= _SHEETS_SLOW_WAIT_SECONDS:
+			logger.warning(
+				f"⏳ Запрос к Google Sheets ({kind}, приоритет {priority}) ждал квоту {waited:.1f} сек, "
+				f"в очереди: {len(self._waiters)}"
+			)
+
+	def _dispatch(self) -> None:
+		now = time.monotonic()
+		if now < self._pause_until:
+			self._schedule(self._pause_until - now)
+			return
+		buckets = self._get_buckets()
+		blocked = set()
+		pending = []
+		for item in sorted(self._waiters):
+			kind, future = item[2], item[3]
+			if future.done():
+				# Запрос отменен, пока ждал в очереди
+				continue
+			if kind not in blocked and buckets[kind].try_take(now):
+				future.set_result(None)
+			else:
+				# Квота этого вида исчерпана - запросы с меньшим приоритетом ждут дальше
+				blocked.add(kind)
+				pending.append(item)
+		self._waiters = pending  # отсортированный список - корректная куча
+		if pending:
+			self._schedule(min(buckets[kind].time_until_token(now) for kind in blocked))
+
+	def _schedule(self, delay: float) -> None:
+		at = time.monotonic() + delay
+		if self._timer is not None:
+			if self._timer_at <= at:
+				return
+			self._timer.cancel()
+		self._timer_at = at
+		self._timer = asyncio.get_running_loop().call_later(max(delay, 0.01), self._on_timer)
+
+	def _on_timer(self) -> None:
+		self._timer = None
+		self._dispatch()
+
+	def report_rate_limited(self) -> None:
+		"""Google вернул 429: ставим на паузу всю очередь"""
+		now = time.monotonic()
+		self.rate_limited += 1
+		if now < self._pause_until:
+			# Пауза уже выставлена другим запросом из той же волны
+			return
+		self._backoff = min(self._backoff * 2, _SHEETS_BACKOFF_MAX) if self._backoff else _SHEETS_BACKOFF_START
+		self._pause_until = now + self._backoff
+		# После паузы запросы снова выдаются равномерно, без всплеска
+		for bucket in self._get_buckets().values():
+			bucket._refill(now)
+			bucket.tokens = 0.0
+		logger.warning(
+			f"🚦 Google Sheets API вернул 429: пауза всей очереди на {self._backoff:.0f} сек, "
+			f"в очереди: {len(self._waiters)}"
+		)
+
+	def report_success(self) -> None:
+		if time.monotonic() >= self._pause_until:
+			self._backoff = 0.0
+
+	def stats(self) -> Dict[str, Any]:
+		depth = {"read": 0, "write": 0}
+		for _, _, kind, future in self._waiters:
+			if not future.done():
+				depth[kind] = depth.get(kind, 0) + 1
+		return {
+			"queue_depth": depth,
+			"granted": self.granted,
+			"avg_wait": (self.total_wait / self.granted) if self.granted else 0.0,
+			"max_wait": self.max_wait,
+			"rate_limited": self.rate_limited,
+			"paused_for": max(0.0, self._pause_until - time.monotonic())
+		}
+
+
+_sheets_scheduler = _SheetsQuotaScheduler()
+
+
+def get_sheets_scheduler_stats() -> Dict[str, Any]:
+	"""
+	Состояние очереди запросов к Google Sheets API.
+
+	Returns:
+		{"queue_depth": {"read": int, "write": int}, "granted": int, "avg_wait": float,
+		"max_wait": float, "rate_limited": int, "paused_for": float}
+	"""
+	return _sheets_scheduler.stats()
+
+
+def _is_rate_limit_error(e: Exception) -> bool:
+	if isinstance(e, SheetsAPIError):
+		return e.status == 429
+	if isinstance(e, gspread.exceptions.APIError):
+		response = getattr(e, "response", None)
+		return getattr(response, "status_code", None) == 429
+	return False
+
+
+async def _flush_db_before_io() -> None:
+	"""Фиксирует транзакцию обработчика перед запросом к Google Sheets, чтобы писатель БД не ждал сеть"""
 	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				"https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT",
-				timeout=aiohttp.ClientTimeout(total=5)
-			) as response:
-				if response.status == 200:
-					data = await response.json()
-					price = float(data["price"])
-					logger.info(f"✅ Binance: курс BTC = ${price:,.2f} USD")
-					return price
-	except Exception as e:
-		logger.debug(f"Binance API недоступен: {e}")
-	return None
+		db = get_db()
+	except AssertionError:
+		# БД не инициализирована (скрипты и бенчмарки без бота)
+		return
+	await db.flush()
 
 
-async def _get_btc_from_coinbase() -> Optional[float]:
-	"""Получает курс BTC/USD с Coinbase API"""
+async def _run_sheets_api(
+	call,
+	kind: str = "read",
+	priority: int = SHEETS_PRIORITY_READ,
+	retry_rate_limited: bool = True
+):
+	"""
+	Выполняет запрос к Google Sheets API через планировщик квот.
+
+	Args:
+		call: Функция без аргументов, возвращающая awaitable с запросом
+		kind: "read" или "write" - какую квоту расходует запрос
+		priority: SHEETS_PRIORITY_*
+		retry_rate_limited: Повторять ли запрос после 429 (после общей паузы очереди)
+	"""
+	await _flush_db_before_io()
+	attempts = _SHEETS_RATE_LIMIT_RETRIES if retry_rate_limited else 1
+	for attempt in range(1, attempts + 1):
+		await _sheets_scheduler.acquire(kind, priority)
+		try:
+			result = await call()
+		except Exception as e:
+			if _is_rate_limit_error(e):
+				_sheets_scheduler.report_rate_limited()
+				if attempt < attempts:
+					continue
+			raise
+		_sheets_scheduler.report_success()
+		if kind == "write":
+			# Бот изменил таблицу - балансы и профиты в снапшоте статистики больше не актуальны
+			_stats_snapshot.invalidate()
+		return result
+
+
+# Методы gspread.Worksheet, каждый вызов которых - отдельный запрос к API
+_WORKSHEET_READ_METHODS = frozenset({
+	"get", "batch_get", "acell", "cell", "get_all_values", "get_values", "row_values", "col_values"
+})
+_WORKSHEET_WRITE_METHODS = frozenset({
+	"update", "batch_update", "batch_clear", "clear", "update_acell", "update_cell", "append_row", "delete_rows"
+})
+
+# Вызов _run_sheets_io, выполняемый в текущем потоке пула Google Sheets
+_sheets_io_local = threading.local()
+
+
+class _SheetsIoCall:
+	"""Один вызов _run_sheets_io: через него запросы из потока пула получают квоту у планировщика"""
+
+	def __init__(self, loop: asyncio.AbstractEventLoop, priority: int) -> None:
+		self.loop = loop
+		self.priority = priority
+		self.writes = 0
+
+	def request(self, kind: str, method, *args, **kwargs):
+		"""Выполняет один запрос к API (из потока пула), предварительно дождавшись токена"""
+		asyncio.run_coroutine_threadsafe(_sheets_scheduler.acquire(kind, self.priority), self.loop).result()
+		try:
+			result = method(*args, **kwargs)
+		except Exception as e:
+			if _is_rate_limit_error(e):
+				# Пауза всей очереди выставляется сразу, а не после выхода из функции записи
+				self.loop.call_soon_threadsafe(_sheets_scheduler.report_rate_limited)
+			raise
+		self.loop.call_soon_threadsafe(_sheets_scheduler.report_success)
+		if kind == "write":
+			self.writes += 1
+		return result
+
+
+class _MeteredWorksheet:
+	"""Лист gspread, каждый запрос которого расходует свой токен планировщика квот"""
+
+	def __init__(self, worksheet: gspread.Worksheet, io_call: _SheetsIoCall) -> None:
+		self._worksheet = worksheet
+		self._io_call = io_call
+
+	def __getattr__(self, name: str):
+		attr = getattr(self._worksheet, name)
+		if name in _WORKSHEET_READ_METHODS:
+			kind = "read"
+		elif name in _WORKSHEET_WRITE_METHODS:
+			kind = "write"
+		else:
+			return attr
+
+		@functools.wraps(attr)
+		def metered(*args, **kwargs):
+			return self._io_call.request(kind, attr, *args, **kwargs)
+
+		return metered
+
+
+async def _run_sheets_io(
+	func,
+	*args,
+	sheets_priority: int = SHEETS_PRIORITY_WRITE,
+	**kwargs
+):
+	"""
+	Выполняет блокирующую функцию gspread в пуле потоков Google Sheets.
+	Листы, полученные функцией через _open_worksheet, ждут квоту планировщика на каждый
+	запрос (чтение или запись отдельно). 429 сразу ставит очередь на паузу и пробрасывается:
+	функции записи сами решают, повторять ли операцию.
+	"""
+	await _flush_db_before_io()
+	loop = asyncio.get_running_loop()
+	io_call = _SheetsIoCall(loop, sheets_priority)
+
+	def run():
+		_sheets_io_local.call = io_call
+		try:
+			return func(*args, **kwargs)
+		finally:
+			_sheets_io_local.call = None
+
 	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				"https://api.coinbase.com/v2/exchange-rates?currency=BTC",
-				timeout=aiohttp.ClientTimeout(total=5)
-			) as response:
-				if response.status == 200:
-					data = await response.json()
-					price = float(data["data"]["rates"]["USD"])
-					logger.info(f"✅ Coinbase: курс BTC = ${price:,.2f} USD")
-					return price
-	except Exception as e:
-		logger.debug(f"Coinbase API недоступен: {e}")
-	return None
+		return await loop.run_in_executor(_SHEETS_EXECUTOR, run)
+	finally:
+		if io_call.writes:
+			# Бот изменил таблицу - балансы и профиты в снапшоте статистики больше не актуальны
+			_stats_snapshot.invalidate()
 
 
-async def _get_btc_from_coingecko() -> Optional[float]:
-	"""Получает курс BTC/USD с CoinGecko API"""
+async def warm_up_google_sheets(
+	sheet_id: str,
+	credentials_path: str,
+	sheet_name: Optional[str] = None
+) -> bool:
+	"""
+	Заранее авторизует клиент и открывает лист, чтобы первая команда
+	(/add, /rate, /del, /stat_*) не тратила время на авторизацию.
+	"""
+	if not sheet_id or not credentials_path:
+		return False
 	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				"https://api.coingecko.com/api/v3/simple/price?ids=bitcoin&vs_currencies=usd",
-				timeout=aiohttp.ClientTimeout(total=5)
-			) as response:
-				if response.status == 200:
-					data = await response.json()
-					price = float(data["bitcoin"]["usd"])
-					logger.info(f"✅ CoinGecko: курс BTC = ${price:,.2f} USD")
-					return price
+		worksheet = await _run_sheets_io(
+			_open_worksheet, sheet_id, credentials_path, sheet_name,
+			sheets_priority=SHEETS_PRIORITY_READ
+		)
+		# Получаем токен и названия листов для асинхронного клиента чтения
+		client = get_async_sheets_client(credentials_path)
+		await _run_sheets_api(lambda: client.get_sheet_titles(sheet_id), "read", SHEETS_PRIORITY_READ)
+		return worksheet is not None
 	except Exception as e:
-		logger.debug(f"CoinGecko API недоступен: {e}")
-	return None
+		logger.warning(f"⚠️ Не удалось заранее открыть Google Sheets: {e}")
+		return False
 
 
 # ============ Кэширование курсов криптовалют ============
 
-# Локальный кэш в памяти (для быстрого доступа между запросами к БД)
+# Локальный кэш в памяти: {монета: {"price": курс, "updated": время получения курса}}
 _crypto_cache = {
 	"btc": {"price": None, "updated": 0},
 	"ltc": {"price": None, "updated": 0},
 	"xmr": {"price": None, "updated": 0},
 }
-_MEMORY_CACHE_TTL = 30  # Кэш в памяти на 30 секунд
+# Жесткий предел устаревания курса по умолчанию (минуты): старше - не отдаем, ждем API
+_CRYPTO_PRICE_MAX_STALE_MINUTES = 30
+# Обновления курсов: не больше одного одновременного запроса к API на монету
+_crypto_price_flight = get_single_flight("crypto_prices")
 
 
 async def _get_crypto_rate_update_interval() -> int:
@@ -129,317 +536,218 @@ async def _get_crypto_rate_update_interval() -> int:
 		return 5
 
 
-async def _get_cached_crypto_price(crypto: str) -> Optional[float]:
+async def _get_crypto_price_max_stale_minutes() -> int:
+	"""Получает жесткий предел устаревания курса (в минутах)"""
+	try:
+		db = get_db()
+		value_str = await db.get_setting("crypto_price_max_stale_minutes", str(_CRYPTO_PRICE_MAX_STALE_MINUTES))
+		return int(float(value_str)) if value_str else _CRYPTO_PRICE_MAX_STALE_MINUTES
+	except Exception:
+		return _CRYPTO_PRICE_MAX_STALE_MINUTES
+
+
+async def _load_cached_crypto_price(crypto: str) -> Tuple[Optional[float], float]:
 	"""
-	Получает курс криптовалюты из кэша (БД).
-	Возвращает None если кэш устарел или отсутствует.
+	Последний известный курс и время его получения: из памяти, при первом обращении - из БД.
+	Срок давности не проверяется.
 	"""
-	global _crypto_cache
-	
-	# Сначала проверяем локальный кэш в памяти
-	now = time.time()
-	if _crypto_cache[crypto]["price"] and (now - _crypto_cache[crypto]["updated"]) < _MEMORY_CACHE_TTL:
-		return _crypto_cache[crypto]["price"]
-	
+	cached = _crypto_cache.get(crypto)
+	if cached and cached["price"]:
+		return cached["price"], cached["updated"]
 	try:
-		db = get_db()
-		
-		# Получаем интервал обновления
-		update_interval = await _get_crypto_rate_update_interval()
-		
-		# Получаем время последнего обновления
-		last_update_str = await db.get_setting(f"crypto_{crypto}_last_update", "0")
-		last_update = float(last_update_str) if last_update_str else 0
-		
-		# Проверяем, не устарел ли кэш
-		if (now - last_update) > (update_interval * 60):
-			return None  # Кэш устарел, нужно обновить
-		
-		# Получаем цену из БД
-		price_str = await db.get_setting(f"crypto_{crypto}_price", None)
+		price_key, update_key = f"crypto_{crypto}_price", f"crypto_{crypto}_last_update"
+		values = await get_db().get_settings([price_key, update_key], {update_key: "0"})
+		price_str, last_update_str = values[price_key], values[update_key]
 		if price_str:
 			price = float(price_str)
-			# Обновляем локальный кэш
-			_crypto_cache[crypto]["price"] = price
-			_crypto_cache[crypto]["updated"] = now
-			return price
+			updated = float(last_update_str) if last_update_str else 0.0
+			_crypto_cache[crypto] = {"price": price, "updated": updated}
+			return price, updated
 	except Exception as e:
 		logger.warning(f"⚠️ Ошибка получения кэшированного курса {crypto.upper()}: {e}")
-	
-	return None
+	return None, 0.0
 
 
 async def _save_crypto_price_to_cache(crypto: str, price: float) -> None:
 	"""Сохраняет курс криптовалюты в кэш (БД)"""
-	global _crypto_cache
-	
 	try:
-		db = get_db()
 		now = time.time()
-		
-		await db.set_setting(f"crypto_{crypto}_price", str(price))
-		await db.set_setting(f"crypto_{crypto}_last_update", str(now))
+		await get_db().set_settings({
+			f"crypto_{crypto}_price": str(price),
+			f"crypto_{crypto}_last_update": str(now),
+		})
 		
 		# Обновляем локальный кэш
-		_crypto_cache[crypto]["price"] = price
-		_crypto_cache[crypto]["updated"] = now
+		_crypto_cache[crypto] = {"price": price, "updated": now}
+		
+		from app.price_history import record_prices
+		await record_prices({crypto: price}, now)
 		
 		logger.debug(f"✅ Курс {crypto.upper()} сохранён в кэш: ${price:,.2f}")
 	except Exception as e:
 		logger.warning(f"⚠️ Ошибка сохранения курса {crypto.upper()} в кэш: {e}")
 
 
-async def _fetch_btc_price_from_api() -> Optional[float]:
-	"""Получает курс BTC из API (Binance -> Coinbase -> CoinGecko)"""
-	price = await _get_btc_from_binance()
-	if price:
-		return price
-	price = await _get_btc_from_coinbase()
-	if price:
-		return price
-	price = await _get_btc_from_coingecko()
-	if price:
-		return price
-	return None
+async def _get_last_known_crypto_price(crypto: str) -> Optional[float]:
+	"""Последний сохраненный курс (без учета срока давности) - для отбраковки выбросов"""
+	price, _ = await _load_cached_crypto_price(crypto)
+	return price
 
 
-async def _fetch_ltc_price_from_api() -> Optional[float]:
-	"""Получает курс LTC из API (Binance -> Coinbase -> CoinGecko)"""
-	price = await _get_ltc_from_binance()
-	if price:
-		return price
-	price = await _get_ltc_from_coinbase()
-	if price:
-		return price
-	price = await _get_ltc_from_coingecko()
-	if price:
-		return price
-	return None
+async def _fetch_crypto_price_from_api(crypto: str) -> Optional[float]:
+	"""Получает курс криптовалюты из API: параллельные запросы к Binance, Coinbase и CoinGecko"""
+	from app.price_oracle import fetch_crypto_price
+	last_known = await _get_last_known_crypto_price(crypto)
+	return await fetch_crypto_price(crypto, last_known)
 
 
-async def _fetch_xmr_price_from_api() -> Optional[float]:
-	"""Получает курс XMR из API (Binance -> Coinbase -> CoinGecko)"""
-	price = await _get_xmr_from_binance()
-	if price:
-		return price
-	price = await _get_xmr_from_coinbase()
-	if price:
-		return price
-	price = await _get_xmr_from_coingecko()
+async def _refresh_crypto_price(crypto: str) -> Optional[float]:
+	"""Получает курс из API и сохраняет в кэш"""
+	try:
+		price = await _fetch_crypto_price_from_api(crypto)
+	except Exception as e:
+		logger.warning(f"⚠️ Ошибка обновления курса {crypto.upper()}: {e}")
+		return None
 	if price:
-		return price
-	return None
+		# Запрос общий (single-flight) - запись в БД отдельной задачей, без ожидания
+		_crypto_cache[crypto] = {"price": price, "updated": time.time()}
+		get_db().run_detached(_save_crypto_price_to_cache, crypto, price)
+	return price
 
 
-async def update_all_crypto_rates() -> Dict[str, Optional[float]]:
-	"""
-	Обновляет все курсы криптовалют из API и сохраняет в кэш.
-	Возвращает словарь с курсами.
-	"""
-	rates = {}
-	
-	# BTC
-	btc_price = await _fetch_btc_price_from_api()
-	if btc_price:
-		await _save_crypto_price_to_cache("btc", btc_price)
-		rates["btc"] = btc_price
-		logger.info(f"✅ Курс BTC обновлён: ${btc_price:,.2f}")
-	else:
-		rates["btc"] = None
-		logger.warning("⚠️ Не удалось обновить курс BTC")
-	
-	# LTC
-	ltc_price = await _fetch_ltc_price_from_api()
-	if ltc_price:
-		await _save_crypto_price_to_cache("ltc", ltc_price)
-		rates["ltc"] = ltc_price
-		logger.info(f"✅ Курс LTC обновлён: ${ltc_price:,.2f}")
-	else:
-		rates["ltc"] = None
-		logger.warning("⚠️ Не удалось обновить курс LTC")
-	
-	# XMR
-	xmr_price = await _fetch_xmr_price_from_api()
-	if xmr_price:
-		await _save_crypto_price_to_cache("xmr", xmr_price)
-		rates["xmr"] = xmr_price
-		logger.info(f"✅ Курс XMR обновлён: ${xmr_price:,.2f}")
-	else:
-		rates["xmr"] = None
-		logger.warning("⚠️ Не удалось обновить курс XMR")
-	
-	return rates
+def _start_crypto_price_refresh(crypto: str) -> asyncio.Task:
+	"""Запускает обновление курса, если оно еще не идет; возвращает задачу обновления"""
+	return _crypto_price_flight.start(crypto, lambda: _refresh_crypto_price(crypto))
 
 
-async def get_btc_price_usd() -> Optional[float]:
+async def get_crypto_price_with_age(crypto: str) -> Tuple[Optional[float], Optional[float]]:
 	"""
-	Получает курс BTC в USD.
-	Сначала проверяет кэш, если устарел - обновляет из API.
-	"""
-	# Пробуем получить из кэша
-	cached_price = await _get_cached_crypto_price("btc")
-	if cached_price:
-		return cached_price
+	Получает курс криптовалюты в USD в режиме stale-while-revalidate.
 	
-	# Кэш устарел, получаем из API
-	price = await _fetch_btc_price_from_api()
-	if price:
-		await _save_crypto_price_to_cache("btc", price)
-		logger.info(f"✅ Binance: курс BTC = ${price:,.2f} USD")
-		return price
+	Свежий курс (моложе crypto_rates_update_interval) отдается сразу.
+	Устаревший, но моложе crypto_price_max_stale_minutes - тоже отдается сразу,
+	а в фоне запускается одно обновление. Ожидание API - только если пригодного курса нет.
 	
-	logger.error("❌ Не удалось получить курс BTC ни с одного источника")
-	return None
+	Args:
+		crypto: Код монеты ("btc", "ltc", "xmr")
+	
+	Returns:
+		(курс, возраст курса в секундах) или (None, None), если курс получить не удалось
+	"""
+	crypto = crypto.lower()
+	price, updated = await _load_cached_crypto_price(crypto)
+	# Тик из потока курсов (app.price_stream) свежее кэша - берем его, если он проходит
+	# ту же проверку на выброс, что и ответы провайдеров оракула
+	from app.price_history import get_latest_tick
+	from app.price_oracle import is_price_outlier
+	tick = get_latest_tick(crypto)
+	if tick and (not price or tick[1] > updated):
+		if price and is_price_outlier(tick[0], price):
+			logger.warning(f"⚠️ Тик потока {crypto.upper()} = {tick[0]} слишком далек от курса {price}, пропускаем")
+		else:
+			price, updated = tick
+	if price:
+		age = max(0.0, time.time() - updated)
+		if age <= await _get_crypto_rate_update_interval() * 60:
+			return price, age
+		if age <= await _get_crypto_price_max_stale_minutes() * 60:
+			_start_crypto_price_refresh(crypto)
+			logger.debug(f"🔄 Курс {crypto.upper()} устарел ({age:.0f} сек), отдаем последний и обновляем в фоне")
+			return price, age
+	
+	# Пригодного курса нет - ждем обновления (общего для всех одновременных запросов)
+	price = await asyncio.shield(_start_crypto_price_refresh(crypto))
+	if price:
+		return price, 0.0
+	logger.error(f"❌ Не удалось получить курс {crypto.upper()} ни с одного источника")
+	return None, None
 
 
-async def _get_ltc_from_binance() -> Optional[float]:
-	"""Получает курс LTC/USDT с Binance API"""
-	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				"https://api.binance.com/api/v3/ticker/price?symbol=LTCUSDT",
-				timeout=aiohttp.ClientTimeout(total=5)
-			) as response:
-				if response.status == 200:
-					data = await response.json()
-					price = float(data["price"])
-					logger.info(f"✅ Binance: курс LTC = ${price:,.2f} USD")
-					return price
-	except Exception as e:
-		logger.debug(f"Binance API недоступен для LTC: {e}")
-	return None
+def format_crypto_price_age(age: Optional[float]) -> str:
+	"""Возраст курса для сообщений: "только что", "40 сек назад", "7 мин назад" """
+	if age is None:
+		return "нет данных"
+	if age < 5:
+		return "только что"
+	if age < 60:
+		return f"{int(age)} сек назад"
+	return f"{int(age // 60)} мин назад"
 
 
-async def _get_ltc_from_coinbase() -> Optional[float]:
-	"""Получает курс LTC/USD с Coinbase API"""
-	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				"https://api.coinbase.com/v2/exchange-rates?currency=LTC",
-				timeout=aiohttp.ClientTimeout(total=5)
-			) as response:
-				if response.status == 200:
-					data = await response.json()
-					price = float(data["data"]["rates"]["USD"])
-					logger.info(f"✅ Coinbase: курс LTC = ${price:,.2f} USD")
-					return price
-	except Exception as e:
-		logger.debug(f"Coinbase API недоступен для LTC: {e}")
-	return None
+# Монеты, курс которых обновляется всегда (используются в /rate, /add и статистике)
+_BASE_RATE_COINS = ["btc", "ltc", "xmr"]
 
 
-async def _get_ltc_from_coingecko() -> Optional[float]:
-	"""Получает курс LTC/USD с CoinGecko API"""
+async def _get_rate_coins() -> List[str]:
+	"""
+	Список монет для обновления курсов: базовые + все монеты из таблицы crypto_columns.
+	Номера кошельков отбрасываются (XMR-1, XMR-2 -> xmr), новые монеты не требуют правок кода.
+	"""
+	coins = list(_BASE_RATE_COINS)
 	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				"https://api.coingecko.com/api/v3/simple/price?ids=litecoin&vs_currencies=usd",
-				timeout=aiohttp.ClientTimeout(total=5)
-			) as response:
-				if response.status == 200:
-					data = await response.json()
-					price = float(data["litecoin"]["usd"])
-					logger.info(f"✅ CoinGecko: курс LTC = ${price:,.2f} USD")
-					return price
+		for item in await get_db().list_crypto_columns():
+			coin = re.sub(r"[-_ ]?\d+$", "", item["crypto_type"] or "").strip().lower()
+			if coin and coin not in coins:
+				coins.append(coin)
 	except Exception as e:
-		logger.debug(f"CoinGecko API недоступен для LTC: {e}")
-	return None
+		logger.warning(f"⚠️ Не удалось получить список монет из crypto_columns: {e}")
+	return coins
 
 
-async def get_ltc_price_usd() -> Optional[float]:
+async def update_all_crypto_rates() -> Dict[str, Optional[float]]:
 	"""
-	Получает курс LTC в USD.
-	Сначала проверяет кэш, если устарел - обновляет из API.
+	Обновляет все курсы криптовалют из API и сохраняет в кэш.
+	Каждый провайдер получает один запрос на все монеты, провайдеры опрашиваются параллельно,
+	все курсы сохраняются в БД одной транзакцией.
+	Возвращает словарь с курсами.
 	"""
-	# Пробуем получить из кэша
-	cached_price = await _get_cached_crypto_price("ltc")
-	if cached_price:
-		return cached_price
+	from app.price_oracle import fetch_crypto_prices
+	coins = await _get_rate_coins()
+	last_known = {coin: await _get_last_known_crypto_price(coin) for coin in coins}
+	rates = await fetch_crypto_prices(coins, last_known)
 	
-	# Кэш устарел, получаем из API
-	price = await _fetch_ltc_price_from_api()
-	if price:
-		await _save_crypto_price_to_cache("ltc", price)
-		logger.info(f"✅ Binance: курс LTC = ${price:,.2f} USD")
-		return price
-	
-	logger.error("❌ Не удалось получить курс LTC ни с одного источника")
-	return None
-
-
-async def _get_xmr_from_binance() -> Optional[float]:
-	"""Получает курс XMR/USDT с Binance API"""
+	now = time.time()
+	settings = {}
+	for coin, price in rates.items():
+		if not price:
+			continue
+		settings[f"crypto_{coin}_price"] = str(price)
+		settings[f"crypto_{coin}_last_update"] = str(now)
 	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				"https://api.binance.com/api/v3/ticker/price?symbol=XMRUSDT",
-				timeout=aiohttp.ClientTimeout(total=5)
-			) as response:
-				if response.status == 200:
-					data = await response.json()
-					price = float(data["price"])
-					logger.info(f"✅ Binance: курс XMR = ${price:,.2f} USD")
-					return price
+		await get_db().set_settings(settings)
 	except Exception as e:
-		logger.debug(f"Binance API недоступен для XMR: {e}")
-	return None
+		logger.warning(f"⚠️ Ошибка сохранения курсов криптовалют в кэш: {e}")
+		return rates
+	
+	for coin, price in rates.items():
+		if price:
+			_crypto_cache[coin] = {"price": price, "updated": now}
+	
+	from app.price_history import record_prices
+	await record_prices(rates, now)
+	
+	updated = [coin.upper() for coin, price in rates.items() if price]
+	failed = [coin.upper() for coin, price in rates.items() if not price]
+	logger.info(f"✅ Курсы обновлены: {', '.join(updated) or '-'}" + (f"; не удалось: {', '.join(failed)}" if failed else ""))
+	return rates
 
 
-async def _get_xmr_from_coinbase() -> Optional[float]:
-	"""Получает курс XMR/USD с Coinbase API"""
-	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				"https://api.coinbase.com/v2/exchange-rates?currency=XMR",
-				timeout=aiohttp.ClientTimeout(total=5)
-			) as response:
-				if response.status == 200:
-					data = await response.json()
-					price = float(data["data"]["rates"]["USD"])
-					logger.info(f"✅ Coinbase: курс XMR = ${price:,.2f} USD")
-					return price
-	except Exception as e:
-		logger.debug(f"Coinbase API недоступен для XMR: {e}")
-	return None
+async def get_btc_price_usd() -> Optional[float]:
+	"""Получает курс BTC в USD (см. get_crypto_price_with_age)"""
+	price, _ = await get_crypto_price_with_age("btc")
+	return price
 
 
-async def _get_xmr_from_coingecko() -> Optional[float]:
-	"""Получает курс XMR/USD с CoinGecko API"""
-	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				"https://api.coingecko.com/api/v3/simple/price?ids=monero&vs_currencies=usd",
-				timeout=aiohttp.ClientTimeout(total=5)
-			) as response:
-				if response.status == 200:
-					data = await response.json()
-					price = float(data["monero"]["usd"])
-					logger.info(f"✅ CoinGecko: курс XMR = ${price:,.2f} USD")
-					return price
-	except Exception as e:
-		logger.debug(f"CoinGecko API недоступен для XMR: {e}")
-	return None
+async def get_ltc_price_usd() -> Optional[float]:
+	"""Получает курс LTC в USD (см. get_crypto_price_with_age)"""
+	price, _ = await get_crypto_price_with_age("ltc")
+	return price
 
 
 async def get_xmr_price_usd() -> Optional[float]:
-	"""
-	Получает курс XMR в USD.
-	Сначала проверяет кэш, если устарел - обновляет из API.
-	"""
-	# Пробуем получить из кэша
-	cached_price = await _get_cached_crypto_price("xmr")
-	if cached_price:
-		return cached_price
-	
-	# Кэш устарел, получаем из API
-	price = await _fetch_xmr_price_from_api()
-	if price:
-		await _save_crypto_price_to_cache("xmr", price)
-		logger.info(f"✅ Binance: курс XMR = ${price:,.2f} USD")
-		return price
-	
-	logger.error("❌ Не удалось получить курс XMR ни с одного источника")
-	return None
+	"""Получает курс XMR в USD (см. get_crypto_price_with_age)"""
+	price, _ = await get_crypto_price_with_age("xmr")
+	return price
 
 
 def _find_empty_cell_in_column(sheet: gspread.Worksheet, column: str, start_row: int = 348, max_row: Optional[int] = None) -> int:
@@ -447,6 +755,7 @@ def _find_empty_cell_in_column(sheet: gspread.Worksheet, column: str, start_row:
 	Находит первую пустую ячейку в указанном столбце, начиная с start_row.
 	Возвращает номер строки первой пустой ячейки.
 	Использует batch чтение для оптимизации (читает по 50 строк за раз).
+	Ошибки API пробрасываются: недоступность таблицы не должна выглядеть как "нет места".
 	
 	Args:
 		sheet: Рабочий лист Google Sheets
@@ -454,8 +763,8 @@ def _find_empty_cell_in_column(sheet: gspread.Worksheet, column: str, start_row:
 		start_row: Номер строки, с которой начинать поиск
 		max_row: Максимальный номер строки для поиска (если None, ищет до start_row + 1000)
 	"""
+	t0 = time.perf_counter()
 	try:
-		t0 = time.perf_counter()
 		batch_size = 50
 		row = start_row
 		
@@ -470,59 +779,41 @@ def _find_empty_cell_in_column(sheet: gspread.Worksheet, column: str, start_row:
 			end_row = min(row + batch_size - 1, search_limit)
 			range_str = f"{column}{row}:{column}{end_row}"
 			
+			# ВАЖНО: pad_values=True гарантирует сохранение "пустых" строк внутри диапазона,
+			# чтобы не приходилось делать медленные acell() в цикле.
 			try:
-				# ВАЖНО: pad_values=True гарантирует сохранение "пустых" строк внутри диапазона,
-				# чтобы не приходилось делать медленные acell() в цикле.
-				try:
-					values = sheet.get(range_str, pad_values=True)
-				except TypeError:
-					# fallback на старую сигнатуру gspread (на всякий случай)
-					values = sheet.get(range_str)
-
-				expected_rows = end_row - row + 1
-				received_rows = len(values) if values else 0
-				logger.debug(f"🔍 Прочитан диапазон {range_str}: ожидалось {expected_rows} строк, получено {received_rows} значений")
-				
-				# Если values пустой или None, значит все ячейки в диапазоне пустые
-				if not values or len(values) == 0:
-					logger.debug(f"✅ Диапазон {range_str} полностью пустой, возвращаем первую строку {row}")
-					return row
-
-				# Проверяем каждую строку диапазона, сохраняя индексы (pad_values=True)
-				for i in range(expected_rows):
-					current_row = row + i
-					cell_list = values[i] if i < len(values) else []
-					
-					# Проверяем, не превысили ли лимит
-					if max_row is not None and current_row > max_row:
-						logger.warning(f"⚠️ Достигнут лимит строки {max_row} в столбце {column}, начиная с {start_row}")
-						return max_row + 1  # Возвращаем значение больше лимита, чтобы показать, что места нет
-					
-					cell_value = cell_list[0] if cell_list and len(cell_list) > 0 else None
-					cell_str = str(cell_value).strip() if cell_value is not None else ""
-					if cell_str == "":
-						logger.debug(f"✅ Найдена пустая ячейка в строке {current_row}")
-						return current_row
-					
-					logger.debug(f"Строка {current_row}: значение='{cell_value}' (тип: {type(cell_value)})")
+				values = sheet.get(range_str, pad_values=True)
+			except TypeError:
+				# fallback на старую сигнатуру gspread (на всякий случай)
+				values = sheet.get(range_str)
+
+			expected_rows = end_row - row + 1
+			received_rows = len(values) if values else 0
+			logger.debug(f"🔍 Прочитан диапазон {range_str}: ожидалось {expected_rows} строк, получено {received_rows} значений")
+			
+			# Если values пустой или None, значит все ячейки в диапазоне пустые
+			if not values or len(values) == 0:
+				logger.debug(f"✅ Диапазон {range_str} полностью пустой, возвращаем первую строку {row}")
+				return row
+
+			# Проверяем каждую строку диапазона, сохраняя индексы (pad_values=True)
+			for i in range(expected_rows):
+				current_row = row + i
+				cell_list = values[i] if i < len(values) else []
 				
-				# Если в этом batch не нашли пустую, переходим к следующему
-				row = end_row + 1
+				cell_value = cell_list[0] if cell_list and len(cell_list) > 0 else None
+				cell_str = str(cell_value).strip() if cell_value is not None else ""
+				if cell_str == "":
+					logger.debug(f"✅ Найдена пустая ячейка в строке {current_row}")
+					return current_row
 				
-			except Exception as e:
-				logger.warning(f"Ошибка чтения диапазона {range_str}: {e}")
-				if max_row is not None and row > max_row:
-					logger.warning(f"Достигнут лимит строки {max_row} в столбце {column}, начиная с {start_row}")
-					return max_row + 1
-				# если чтение сломалось, продолжаем со следующего batch (не делаем acell() в цикле)
-				row = end_row + 1
+				logger.debug(f"Строка {current_row}: значение='{cell_value}' (тип: {type(cell_value)})")
+			
+			# Если в этом batch не нашли пустую, переходим к следующему
+			row = end_row + 1
 		
 		logger.warning(f"Не найдена пустая ячейка в столбце {column}, начиная с {start_row} до {search_limit}")
 		return search_limit + 1
-		
-	except Exception as e:
-		logger.exception(f"Ошибка поиска пустой ячейки: {e}")
-		return start_row
 	finally:
 		dt = time.perf_counter() - t0
 		if dt > 1.0:
@@ -542,9 +833,10 @@ def _find_empty_row_in_range(sheet: gspread.Worksheet, range_str: str, start_row
 		
 	Returns:
 		Номер первой пустой строки или None, если не найдена
+		(ошибки API пробрасываются)
 	"""
+	t0 = time.perf_counter()
 	try:
-		t0 = time.perf_counter()
 		# Извлекаем начальный и конечный столбцы из диапазона (например, "A:BB" -> "A" и "BB")
 		parts = range_str.split(":")
 		if len(parts) != 2:
@@ -563,58 +855,223 @@ def _find_empty_row_in_range(sheet: gspread.Worksheet, range_str: str, start_row
 			range_to_check = f"{start_col}{row}:{end_col}{end_row}"
 			
 			try:
-				try:
-					values = sheet.get(range_to_check, pad_values=True)
-				except TypeError:
-					values = sheet.get(range_to_check)
-				logger.debug(f"🔍 Проверка диапазона {range_to_check}: получено {len(values) if values else 0} строк")
-				
-				# Если values пустой или None, значит все строки в диапазоне пустые
-				if not values or len(values) == 0:
-					logger.debug(f"✅ Диапазон {range_to_check} полностью пустой, возвращаем первую строку {row}")
-					return row
+				values = sheet.get(range_to_check, pad_values=True)
+			except TypeError:
+				values = sheet.get(range_to_check)
+			logger.debug(f"🔍 Проверка диапазона {range_to_check}: получено {len(values) if values else 0} строк")
+			
+			# Если values пустой или None, значит все строки в диапазоне пустые
+			if not values or len(values) == 0:
+				logger.debug(f"✅ Диапазон {range_to_check} полностью пустой, возвращаем первую строку {row}")
+				return row
+			
+			# Проверяем каждую строку в batch
+			expected_rows = end_row - row + 1
+			for i in range(expected_rows):
+				current_row = row + i
 				
-				# Проверяем каждую строку в batch
-				expected_rows = end_row - row + 1
-				for i in range(expected_rows):
-					current_row = row + i
-					
-					if current_row > max_row:
-						logger.warning(f"⚠️ Достигнут лимит строки {max_row}")
-						return None
-					
-					row_data = values[i] if i < len(values) else []
-					row_is_empty = True
-					if row_data:
-						for cell_value in row_data:
-							if cell_value is not None and str(cell_value).strip() != "":
-								row_is_empty = False
-								break
-					
-					if row_is_empty:
-						logger.debug(f"✅ Найдена пустая строка {current_row} в диапазоне {range_str}")
-						return current_row
+				if current_row > max_row:
+					logger.warning(f"⚠️ Достигнут лимит строки {max_row}")
+					return None
 				
-				# Если в этом batch не нашли пустую, переходим к следующему
-				row = end_row + 1
+				row_data = values[i] if i < len(values) else []
+				row_is_empty = True
+				if row_data:
+					for cell_value in row_data:
+						if cell_value is not None and str(cell_value).strip() != "":
+							row_is_empty = False
+							break
 				
-			except Exception as e:
-				logger.warning(f"⚠️ Ошибка чтения диапазона {range_to_check}: {e}")
-				# без дорогостоящих построчных запросов просто продолжаем поиск дальше
-				row = end_row + 1
+				if row_is_empty:
+					logger.debug(f"✅ Найдена пустая строка {current_row} в диапазоне {range_str}")
+					return current_row
+			
+			# Если в этом batch не нашли пустую, переходим к следующему
+			row = end_row + 1
 		
 		logger.warning(f"⚠️ Не найдена пустая строка в диапазоне {range_str}, строки {start_row}-{max_row}")
 		return None
-		
-	except Exception as e:
-		logger.exception(f"❌ Ошибка поиска пустой строки в диапазоне {range_str}: {e}")
-		return None
 	finally:
 		dt = time.perf_counter() - t0
 		if dt > 1.0:
 			logger.info(f"⏱️ Поиск пустой строки в {range_str}: заняло {dt:.2f}s (start_row={start_row}, max_row={max_row})")
 
 
+# ============ Индекс занятости строк (/add, /move) ============
+
+_ROW_INDEX_RECONCILE_SECONDS = 300  # Как часто сверять индекс с таблицей (в секундах)
+
+
+class _RowOccupancyIndex:
+	"""
+	Битовая карта занятости строк одного блока (лист, диапазон столбцов, строки start-max).
+
+	Заполняется одним чтением всего блока, затем обновляется локально при каждой
+	записи/очистке строки ботом и периодически сверяется с таблицей.
+	Следующая свободная строка возвращается без запросов к API.
+	"""
+
+	def __init__(self, start_row: int, max_row: int) -> None:
+		self.start_row = start_row
+		self.max_row = max_row
+		self.lock = threading.Lock()
+		self.seeded_at: Optional[float] = None
+		self._rows = bytearray(max(max_row - start_row + 1, 0))
+		self._cursor = 0  # Индекс первой свободной строки
+
+	def is_stale(self) -> bool:
+		if self.seeded_at is None:
+			return True
+		return (time.monotonic() - self.seeded_at) > _ROW_INDEX_RECONCILE_SECONDS
+
+	def seed(self, values: Optional[List[List[Any]]]) -> None:
+		"""Заполняет карту по значениям блока (values[i] - строка start_row + i)"""
+		values = values or []
+		for i in range(len(self._rows)):
+			row_data = values[i] if i < len(values) else []
+			self._rows[i] = 1 if _is_row_filled(row_data) else 0
+		self._cursor = 0
+		self._advance()
+		self.seeded_at = time.monotonic()
+
+	def reset(self) -> None:
+		self.seeded_at = None
+
+	def _advance(self) -> None:
+		while self._cursor < len(self._rows) and self._rows[self._cursor]:
+			self._cursor += 1
+
+	def next_free(self) -> Optional[int]:
+		if self._cursor >= len(self._rows):
+			return None
+		return self.start_row + self._cursor
+
+	def mark_filled(self, row: int) -> None:
+		i = row - self.start_row
+		if 0 <= i < len(self._rows):
+			self._rows[i] = 1
+			if i == self._cursor:
+				self._advance()
+
+	def mark_empty(self, row: int) -> None:
+		i = row - self.start_row
+		if 0 <= i < len(self._rows):
+			self._rows[i] = 0
+			self._cursor = min(self._cursor, i)
+
+
+_row_indexes: Dict[Tuple[str, str, str, int, int], _RowOccupancyIndex] = {}
+_row_indexes_lock = threading.Lock()
+
+
+def _is_row_filled(row_data: Optional[List[Any]]) -> bool:
+	"""Проверяет, есть ли в строке хотя бы одна непустая ячейка"""
+	if not row_data:
+		return False
+	for cell_value in row_data:
+		if cell_value is not None and str(cell_value).strip() != "":
+			return True
+	return False
+
+
+def _get_row_index(
+	sheet_id: str,
+	sheet_name: Optional[str],
+	range_str: str,
+	start_row: int,
+	max_row: int
+) -> _RowOccupancyIndex:
+	key = (sheet_id, (sheet_name or "").strip(), range_str.strip().upper(), start_row, max_row)
+	with _row_indexes_lock:
+		index = _row_indexes.get(key)
+		if index is None:
+			index = _RowOccupancyIndex(start_row, max_row)
+			_row_indexes[key] = index
+		return index
+
+
+def _mark_row_in_indexes(
+	sheet_id: str,
+	sheet_name: Optional[str],
+	range_str: str,
+	row: int,
+	filled: bool
+) -> None:
+	"""Обновляет все индексы листа/диапазона, в блок которых попадает строка"""
+	prefix = (sheet_id, (sheet_name or "").strip(), range_str.strip().upper())
+	with _row_indexes_lock:
+		indexes = [idx for key, idx in _row_indexes.items() if key[:3] == prefix and key[3] <= row <= key[4]]
+	for index in indexes:
+		with index.lock:
+			if filled:
+				index.mark_filled(row)
+			else:
+				index.mark_empty(row)
+
+
+def invalidate_row_indexes() -> None:
+	"""Сбрасывает индексы занятости строк (следующий поиск перечитает блок из таблицы)"""
+	with _row_indexes_lock:
+		for index in _row_indexes.values():
+			index.reset()
+
+
+def _reserve_empty_row(
+	sheet: gspread.Worksheet,
+	sheet_id: str,
+	sheet_name: Optional[str],
+	range_str: str,
+	start_row: int,
+	max_row: int
+) -> Optional[int]:
+	"""
+	Находит первую пустую строку блока по индексу занятости и сразу помечает ее занятой,
+	чтобы параллельная запись не получила ту же строку.
+	При устаревшем индексе блок перечитывается одним запросом.
+	Если индекс заполнить не удалось, используется постраничный поиск.
+
+	Returns:
+		Номер строки или None, если свободных строк нет (ошибки API пробрасываются)
+	"""
+	parts = range_str.split(":")
+	if len(parts) != 2:
+		logger.error(f"❌ Неверный формат диапазона: {range_str}")
+		return None
+	start_col = parts[0].strip()
+	end_col = parts[1].strip()
+
+	index = _get_row_index(sheet_id, sheet_name, range_str, start_row, max_row)
+	with index.lock:
+		if index.is_stale():
+			block_range = f"{start_col}{start_row}:{end_col}{max_row}"
+			try:
+				t0 = time.perf_counter()
+				try:
+					values = sheet.get(block_range, pad_values=True)
+				except TypeError:
+					values = sheet.get(block_range)
+				index.seed(values)
+				logger.info(f"🗂️ Индекс занятости строк {block_range} обновлен за {time.perf_counter() - t0:.2f}s")
+			except gspread.exceptions.APIError:
+				# Таблица недоступна (429/503 и т.п.) - это не "нет свободных строк", пусть решает вызывающий
+				index.reset()
+				raise
+			except Exception as e:
+				logger.warning(f"⚠️ Не удалось заполнить индекс занятости {block_range}: {e}, используем поиск по диапазону")
+				index.reset()
+				row = _find_empty_row_in_range(sheet, range_str, start_row=start_row, max_row=max_row)
+				return row
+		row = index.next_free()
+		if row is not None:
+			index.mark_filled(row)
+		return row
+
+
+def _release_reserved_row(sheet_id: str, sheet_name: Optional[str], range_str: str, row: int) -> None:
+	"""Снимает резервирование строки, если запись в нее не состоялась"""
+	_mark_row_in_indexes(sheet_id, sheet_name, range_str, row, filled=False)
+
+
 def _find_empty_row_in_column(sheet: gspread.Worksheet, column: str, start_row: int = 5) -> int:
 	"""
 	Находит первую строку с 0 в указанном столбце, начиная с start_row.
@@ -765,27 +1222,21 @@ def _write_to_google_sheet_sync(
 	Returns:
 		True если успешно, False в противном случае
 	"""
-	try:
-		# Создаем клиент
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return False
-		
-		# Получаем email сервисного аккаунта для отладки
-		import json
-		with open(credentials_path, 'r') as f:
-			creds_data = json.load(f)
-			service_account_email = creds_data.get('client_email', 'не найден')
-		logger.info(f"Используется сервисный аккаунт: {service_account_email}")
-		
-		# Открываем таблицу
+	try:
+		# Берем лист из пула клиентов (без повторной авторизации и open_by_key)
 		try:
-			spreadsheet = client.open_by_key(sheet_id)
-			worksheet = _get_worksheet(spreadsheet, sheet_name)
+			worksheet = _open_worksheet(sheet_id, credentials_path, sheet_name)
 		except PermissionError as e:
+			# Получаем email сервисного аккаунта для отладки
+			import json
+			with open(credentials_path, 'r') as f:
+				creds_data = json.load(f)
+				service_account_email = creds_data.get('client_email', 'не найден')
 			logger.error(f"Ошибка доступа к таблице. Убедитесь, что сервисный аккаунт {service_account_email} добавлен в список пользователей с доступом к таблице.")
 			raise
+		if worksheet is None:
+			logger.error("Не удалось создать клиент Google Sheets")
+			return False
 		
 		# Логируем входящие данные
 		logger.info(f"📊 Данные для записи: crypto={crypto_data}, cash={cash_data}, card={card_data}, btc_price={btc_price}, ltc_price={ltc_price}")
@@ -913,7 +1364,7 @@ async def write_to_google_sheet(
 					logger.warning(f"⚠️ Не найден столбец для криптовалюты '{crypto_currency}'")
 		
 		# Выполняем синхронную запись в отдельном потоке
-		return await asyncio.to_thread(
+		return await _run_sheets_io(
 			_write_to_google_sheet_sync,
 			sheet_id,
 			credentials_path,
@@ -1018,7 +1469,7 @@ async def write_xmr_to_google_sheet(
 		
 		# Выполняем синхронную запись в отдельном потоке
 		# Передаем None для xmr_price, так как он больше не используется
-		return await asyncio.to_thread(
+		return await _run_sheets_io(
 			_write_xmr_to_google_sheet_sync,
 			sheet_id,
 			credentials_path,
@@ -1064,19 +1515,15 @@ def _write_xmr_to_google_sheet_sync(
 		Словарь с результатами: {"success": bool, "usd_amount": int | None}
 	"""
 	try:
-		# Создаем клиент
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return {"success": False, "usd_amount": None}
-		
-		# Открываем таблицу
+		# Берем лист из пула клиентов (без повторной авторизации и open_by_key)
 		try:
-			spreadsheet = client.open_by_key(sheet_id)
-			worksheet = _get_worksheet(spreadsheet, sheet_name)
+			worksheet = _open_worksheet(sheet_id, credentials_path, sheet_name)
 		except PermissionError as e:
 			logger.error(f"Ошибка доступа к таблице: {e}")
 			raise
+		if worksheet is None:
+			logger.error("Не удалось создать клиент Google Sheets")
+			return {"success": False, "usd_amount": None}
 		
 		# Логируем входящие данные
 		logger.info(f"📊 Данные XMR-{xmr_number} для записи: crypto={crypto_data}, cash={cash_data}, card={card_data}, xmr_price={xmr_price}")
@@ -1135,7 +1582,9 @@ async def write_all_to_google_sheet_one_row(
 	bot: Optional[Any] = None,  # Bot объект для отправки уведомлений
 	chat_id: Optional[int] = None,  # ID чата для отправки уведомлений
 	profit_column: Optional[str] = None,  # Столбец для записи профита
-	calculated_profit: Optional[int] = None  # Рассчитанный профит для записи
+	calculated_profit: Optional[int] = None,  # Рассчитанный профит для записи
+	weekday: Optional[int] = None,  # День недели для режима add (по умолчанию - текущий)
+	max_retries: int = 5  # Количество попыток при временных ошибках API
 ) -> Dict[str, Any]:
 	"""
 	Записывает все данные в одну строку Google Sheets.
@@ -1148,6 +1597,9 @@ async def write_all_to_google_sheet_one_row(
 		xmr_list: Список XMR данных
 		cash_list: Список наличных
 		card_list: Список карт
+		weekday: День недели (0 = понедельник), в блок которого пишется /add.
+			Очередь записи передает день подтверждения операции.
+		max_retries: Количество попыток; очередь записи передает 1 и повторяет сама
 		
 	Returns:
 		Словарь с результатами: {"success": bool}
@@ -1225,8 +1677,8 @@ async def write_all_to_google_sheet_one_row(
 			logger.info(f"📅 Режим move: start_row={start_row}, max_row={max_row}, delete_range={delete_range}")
 		else:
 			# Для режима add используем настройки дней недели
-			today = datetime.now()
-			weekday = today.weekday()  # 0 = Monday, 6 = Sunday
+			if weekday is None:
+				weekday = datetime.now().weekday()  # 0 = Monday, 6 = Sunday
 			day_names = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
 			day_name = day_names[weekday]
 			
@@ -1241,7 +1693,7 @@ async def write_all_to_google_sheet_one_row(
 			logger.info(f"📅 День недели: {day_name}, start_row={start_row}, max_row={max_row}, delete_range={delete_range}")
 		
 		# Выполняем синхронную запись в отдельном потоке с retry логикой
-		max_retries = 5
+		max_retries = max(1, max_retries)
 		last_error = None
 		
 		for attempt in range(1, max_retries + 1):
@@ -1256,7 +1708,7 @@ async def write_all_to_google_sheet_one_row(
 					except Exception:
 						pass  # Игнорируем ошибки отправки уведомлений
 				
-				result = await asyncio.to_thread(
+				result = await _run_sheets_io(
 					_write_all_to_google_sheet_one_row_sync,
 					sheet_id,
 					credentials_path,
@@ -1309,7 +1761,9 @@ async def write_all_to_google_sheet_one_row(
 					
 					# Если это не последняя попытка, ждем перед повтором
 					if attempt < max_retries:
-						await asyncio.sleep(2 * attempt)  # Экспоненциальная задержка
+						# При 429 паузу для всей очереди уже выставил планировщик квот
+						if error_code != 429:
+							await asyncio.sleep(2 * attempt)  # Экспоненциальная задержка
 						continue
 					else:
 						# Последняя попытка не удалась
@@ -1322,7 +1776,7 @@ async def write_all_to_google_sheet_one_row(
 							except Exception:
 								pass
 						logger.error(f"❌ Все попытки исчерпаны. Последняя ошибка: {e}")
-						return {"success": False, "error": str(e)}
+						return {"success": False, "error": str(e), "transient": True}
 				else:
 					# Для других ошибок не делаем retry
 					logger.error(f"❌ Ошибка Google Sheets API (не retry): {e}")
@@ -1358,13 +1812,14 @@ async def write_all_to_google_sheet_one_row(
 							)
 						except Exception:
 							pass
-					return {"success": False, "error": str(e)}
+					# Сетевые ошибки временные, ошибка доступа к таблице - нет
+					return {"success": False, "error": str(e), "transient": not isinstance(e, PermissionError)}
 		
 		# Если дошли сюда, все попытки исчерпаны
 		return {"success": False, "error": str(last_error) if last_error else "Unknown error"}
 	except Exception as e:
 		logger.exception(f"Ошибка записи всех данных в Google Sheet: {e}")
-		return {"success": False}
+		return {"success": False, "error": str(e)}
 
 
 def _write_all_to_google_sheet_one_row_sync(
@@ -1390,26 +1845,30 @@ def _write_all_to_google_sheet_one_row_sync(
 		profit_column: Столбец для записи профита (например "BC")
 		calculated_profit: Рассчитанный профит для записи
 	"""
+	reserved_row = None
 	try:
-		# Создаем клиент
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return {"success": False, "written_cells": [], "written_entries": []}
-		
-		# Открываем таблицу
+		# Берем лист из пула клиентов (без повторной авторизации и open_by_key)
 		try:
-			spreadsheet = client.open_by_key(sheet_id)
-			worksheet = _get_worksheet(spreadsheet, sheet_name)
+			worksheet = _open_worksheet(sheet_id, credentials_path, sheet_name)
 		except PermissionError as e:
 			logger.error(f"Ошибка доступа к таблице: {e}")
 			raise
+		if worksheet is None:
+			logger.error("Не удалось создать клиент Google Sheets")
+			return {"success": False, "written_cells": [], "written_entries": []}
 		
-		# Находим одну свободную строку во всем диапазоне delete_range
-		empty_row = _find_empty_row_in_range(worksheet, delete_range, start_row=start_row, max_row=max_row)
+		# Находим одну свободную строку во всем диапазоне delete_range (по индексу занятости)
+		empty_row = _reserve_empty_row(worksheet, sheet_id, sheet_name, delete_range, start_row=start_row, max_row=max_row)
+		reserved_row = empty_row
 		if empty_row is None or empty_row > max_row:
 			logger.error(f"❌ Не найдена свободная строка в диапазоне {start_row}-{max_row} для диапазона {delete_range}")
-			return {"success": False, "written_cells": [], "written_entries": []}
+			return {
+				"success": False,
+				"error": f"Нет свободной строки в диапазоне {start_row}-{max_row}",
+				"no_free_row": True,
+				"written_cells": [],
+				"written_entries": []
+			}
 		logger.info(f"📍 Найдена свободная строка для объединенной записи: {empty_row} (диапазон: {start_row}-{max_row}, проверяемый диапазон: {delete_range})")
 		
 		written_cells = []  # Список записанных ячеек для отчета
@@ -1579,26 +2038,38 @@ def _write_all_to_google_sheet_one_row_sync(
 			})
 			logger.info(f"✅ Подготовлено к записи профит {calculated_profit} USD в ячейку {profit_cell_address}")
 		
-		# Выполняем batch-запись всех ячеек одним запросом
-		if batch_updates:
-			try:
-				logger.info(f"🚀 Выполняем batch-запись {len(batch_updates)} ячеек одним запросом")
-				worksheet.batch_update(batch_updates)
-				logger.info(f"✅ Успешно записано {len(batch_updates)} ячеек одним batch-запросом")
-			except Exception as e:
-				logger.error(f"❌ Ошибка batch-записи: {e}, пробуем записать по одной ячейке")
-				# Fallback: записываем по одной ячейке в случае ошибки
-				for update in batch_updates:
-					try:
-						worksheet.update(update['range'], update['values'])
-					except Exception as e2:
-						logger.error(f"❌ Ошибка записи ячейки {update['range']}: {e2}")
+		if not batch_updates:
+			# В строку нечего записать - возвращаем ее в индекс как свободную
+			_release_reserved_row(sheet_id, sheet_name, delete_range, empty_row)
+			logger.error("❌ Нет ни одной ячейки для записи (не найдены столбцы или все суммы нулевые)")
+			return {
+				"success": False,
+				"error": "Нет ни одной ячейки для записи",
+				"written_cells": [],
+				"written_entries": []
+			}
+		
+		# Выполняем batch-запись всех ячеек одним запросом. При ошибке не пишем по одной ячейке:
+		# это частично заполненная строка и лишние запросы под 429/503 - повторяет вызывающий
+		logger.info(f"🚀 Выполняем batch-запись {len(batch_updates)} ячеек одним запросом")
+		try:
+			worksheet.batch_update(batch_updates)
+		except gspread.exceptions.APIError:
+			# batch_update атомарен: строка осталась пустой
+			_release_reserved_row(sheet_id, sheet_name, delete_range, empty_row)
+			reserved_row = None
+			raise
+		logger.info(f"✅ Успешно записано {len(batch_updates)} ячеек одним batch-запросом")
 		
 		return {"success": True, "written_cells": written_cells, "written_entries": written_entries, "row": empty_row, "calculated_profit": calculated_profit}
 		
 	except Exception as e:
 		logger.exception(f"Ошибка записи всех данных в Google Sheet: {e}")
-		return {"success": False}
+		if reserved_row is not None:
+			# Состояние строки неизвестно - перечитаем блок при следующем поиске
+			invalidate_row_indexes()
+		# Ошибку разбирает асинхронная обертка (повтор при 429/503, в очереди - отложенный повтор)
+		raise
 
 
 async def write_order_to_google_sheet(
@@ -1811,7 +2282,7 @@ async def delete_last_row_from_google_sheet(
 		logger.info(f"📅 Удаление строки: день недели={day_name}, start_row={start_row}, max_row={max_row}, delete_range={delete_range}")
 		
 		# Выполняем синхронное удаление в отдельном потоке
-		return await asyncio.to_thread(
+		return await _run_sheets_io(
 			_delete_last_row_from_google_sheet_sync,
 			sheet_id,
 			credentials_path,
@@ -1829,6 +2300,8 @@ def _find_last_filled_row_in_range(sheet: gspread.Worksheet, range_str: str, sta
 	"""
 	Находит последнюю заполненную строку в указанном диапазоне.
 	Проверяет, что в строке есть хотя бы одна непустая ячейка.
+	Весь блок читается одним запросом (API не возвращает пустые строки в конце диапазона),
+	ошибки чтения пробрасываются вызывающему коду без построчного перебора.
 	
 	Args:
 		sheet: Рабочий лист Google Sheets
@@ -1839,91 +2312,32 @@ def _find_last_filled_row_in_range(sheet: gspread.Worksheet, range_str: str, sta
 	Returns:
 		Номер последней заполненной строки или None, если не найдена
 	"""
-	try:
-		# Извлекаем начальный и конечный столбцы из диапазона (например, "A:BB" -> "A" и "BB")
-		parts = range_str.split(":")
-		if len(parts) != 2:
-			logger.error(f"❌ Неверный формат диапазона: {range_str}")
-			return None
-		
-		start_col = parts[0].strip()
-		end_col = parts[1].strip()
-		
-		# Ищем последнюю заполненную строку, начиная с max_row и идя вниз к start_row
-		batch_size = 50
-		row = max_row
-		
-		while row >= start_row:
-			# Читаем batch строк за один запрос (идем снизу вверх)
-			begin_row = max(row - batch_size + 1, start_row)
-			range_to_check = f"{start_col}{begin_row}:{end_col}{row}"
-			
-			try:
-				values = sheet.get(range_to_check)
-				logger.info(f"🔍 Проверка диапазона {range_to_check}: получено {len(values) if values else 0} строк")
-				
-				if not values or len(values) == 0:
-					# Если нет значений, переходим к предыдущему batch
-					row = begin_row - 1
-					continue
-				
-				# Проверяем каждую строку в batch (снизу вверх)
-				for i in range(len(values) - 1, -1, -1):
-					current_row = begin_row + i
-					
-					if current_row < start_row:
-						break
-					
-					# Проверяем, заполнена ли строка
-					row_data = values[i] if i < len(values) else []
-					row_is_filled = False
-					
-					if row_data:
-						for cell_value in row_data:
-							if cell_value is not None and str(cell_value).strip() != "":
-								row_is_filled = True
-								break
-					
-					if row_is_filled:
-						logger.info(f"✅ Найдена последняя заполненная строка {current_row} в диапазоне {range_str}")
-						return current_row
-				
-				# Если в этом batch не нашли заполненную, переходим к предыдущему
-				row = begin_row - 1
-				
-			except Exception as e:
-				logger.warning(f"⚠️ Ошибка чтения диапазона {range_to_check}: {e}, пробуем по одной строке")
-				# Fallback: проверяем по одной строке
-				for check_row in range(row, max(start_row - 1, begin_row - 1), -1):
-					try:
-						row_range = f"{start_col}{check_row}:{end_col}{check_row}"
-						row_values = sheet.get(row_range)
-						
-						# Проверяем, заполнена ли строка
-						is_filled = False
-						if row_values and len(row_values) > 0:
-							row_data = row_values[0] if row_values else []
-							if row_data:
-								for cell_value in row_data:
-									if cell_value is not None and str(cell_value).strip() != "":
-										is_filled = True
-										break
-						
-						if is_filled:
-							logger.info(f"✅ Найдена последняя заполненная строка {check_row} в диапазоне {range_str}")
-							return check_row
-					except Exception as e2:
-						logger.warning(f"⚠️ Ошибка проверки строки {check_row}: {e2}")
-						continue
-				
-				row = begin_row - 1
-		
-		logger.warning(f"⚠️ Не найдена заполненная строка в диапазоне {range_str}, строки {start_row}-{max_row}")
+	# Извлекаем начальный и конечный столбцы из диапазона (например, "A:BB" -> "A" и "BB")
+	parts = range_str.split(":")
+	if len(parts) != 2:
+		logger.error(f"❌ Неверный формат диапазона: {range_str}")
 		return None
-		
-	except Exception as e:
-		logger.exception(f"❌ Ошибка поиска последней заполненной строки в диапазоне {range_str}: {e}")
+	
+	start_col = parts[0].strip()
+	end_col = parts[1].strip()
+	
+	if max_row < start_row:
 		return None
+	
+	block_range = f"{start_col}{start_row}:{end_col}{max_row}"
+	t0 = time.perf_counter()
+	values = sheet.get(block_range)
+	logger.info(f"🔍 Проверка диапазона {block_range}: получено {len(values) if values else 0} строк за {time.perf_counter() - t0:.2f}s")
+	
+	# Идем снизу вверх: values[i] - строка start_row + i
+	for i in range(len(values or []) - 1, -1, -1):
+		if _is_row_filled(values[i]):
+			last_row = start_row + i
+			logger.info(f"✅ Найдена последняя заполненная строка {last_row} в диапазоне {range_str}")
+			return last_row
+	
+	logger.warning(f"⚠️ Не найдена заполненная строка в диапазоне {range_str}, строки {start_row}-{max_row}")
+	return None
 
 
 def _delete_last_row_from_google_sheet_sync(
@@ -1938,19 +2352,15 @@ def _delete_last_row_from_google_sheet_sync(
 	Синхронная функция для удаления последней заполненной строки из Google Sheets.
 	"""
 	try:
-		# Создаем клиент
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return {"success": False, "deleted_row": None, "message": "Не удалось создать клиент Google Sheets"}
-		
-		# Открываем таблицу
+		# Берем лист из пула клиентов (без повторной авторизации и open_by_key)
 		try:
-			spreadsheet = client.open_by_key(sheet_id)
-			worksheet = _get_worksheet(spreadsheet, sheet_name)
+			worksheet = _open_worksheet(sheet_id, credentials_path, sheet_name)
 		except PermissionError as e:
 			logger.error(f"Ошибка доступа к таблице: {e}")
 			raise
+		if worksheet is None:
+			logger.error("Не удалось создать клиент Google Sheets")
+			return {"success": False, "deleted_row": None, "message": "Не удалось создать клиент Google Sheets"}
 		
 		logger.info(f"🔍 Поиск последней заполненной строки в диапазоне {delete_range}, строки {start_row}-{max_row}")
 		
@@ -1982,6 +2392,9 @@ def _delete_last_row_from_google_sheet_sync(
 			# Если batch_clear не поддерживается, используем clear
 			worksheet.clear(range_to_delete)
 		
+		# Строка снова свободна - обновляем индекс занятости без перечитывания блока
+		_mark_row_in_indexes(sheet_id, sheet_name, delete_range, last_filled_row, filled=False)
+		
 		logger.info(f"✅ Успешно удалена строка {last_filled_row}")
 		return {"success": True, "deleted_row": last_filled_row, "message": f"Успешно удалена строка {last_filled_row}"}
 		
@@ -2023,7 +2436,7 @@ async def delete_last_move_row_from_google_sheet(
 		logger.info(f"📅 Удаление передвижения: start_row={start_row}, max_row={max_row}, delete_range={delete_range}")
 		
 		# Выполняем синхронное удаление в отдельном потоке
-		return await asyncio.to_thread(
+		return await _run_sheets_io(
 			_delete_last_row_from_google_sheet_sync,
 			sheet_id,
 			credentials_path,
@@ -2047,7 +2460,8 @@ async def write_to_google_sheet_rate_mode(
 	sheet_name: Optional[str] = None,
 	note: Optional[str] = None,
 	bot: Optional[Any] = None,  # Bot объект для отправки уведомлений
-	chat_id: Optional[int] = None  # ID чата для отправки уведомлений
+	chat_id: Optional[int] = None,  # ID чата для отправки уведомлений
+	max_retries: int = 5  # Количество попыток при временных ошибках API
 ) -> Dict[str, Any]:
 	"""
 	Записывает данные в режиме rate: каждая запись идет в первую пустую ячейку соответствующего столбца,
@@ -2060,6 +2474,7 @@ async def write_to_google_sheet_rate_mode(
 		xmr_list: Список XMR данных
 		cash_list: Список наличных
 		card_cash_pairs: Список пар карта-наличные
+		max_retries: Количество попыток; очередь записи передает 1 и повторяет сама
 		
 	Returns:
 		Словарь с результатами: {"success": bool, "written_cells": list}
@@ -2151,8 +2566,9 @@ async def write_to_google_sheet_rate_mode(
 		rate_start_row = int(rate_start_row_str) if rate_start_row_str else 407
 		
 		# Выполняем синхронную запись в отдельном потоке с retry логикой
-		max_retries = 5
+		max_retries = max(1, max_retries)
 		last_error = None
+		result = None
 		
 		for attempt in range(1, max_retries + 1):
 			try:
@@ -2166,7 +2582,7 @@ async def write_to_google_sheet_rate_mode(
 					except Exception:
 						pass  # Игнорируем ошибки отправки уведомлений
 				
-				result = await asyncio.to_thread(
+				result = await _run_sheets_io(
 					_write_to_google_sheet_rate_mode_sync,
 					sheet_id,
 					credentials_path,
@@ -2181,13 +2597,9 @@ async def write_to_google_sheet_rate_mode(
 					sheet_name
 				)
 				
-				# Если успешно, возвращаем результат
-				if result.get("success"):
-					return result
-				
-				# Если не успешно, но это не исключение, возвращаем результат без retry
-				# (например, если не найдена свободная ячейка)
-				return result
+				# Результат получен (успешный или без retry, например, если не найдена свободная ячейка):
+				# выходим из цикла, чтобы сохранить историю операции для /del_rate
+				break
 				
 			except gspread.exceptions.APIError as e:
 				last_error = e
@@ -2216,7 +2628,9 @@ async def write_to_google_sheet_rate_mode(
 					
 					# Если это не последняя попытка, ждем перед повтором
 					if attempt < max_retries:
-						await asyncio.sleep(2 * attempt)  # Экспоненциальная задержка
+						# При 429 паузу для всей очереди уже выставил планировщик квот
+						if error_code != 429:
+							await asyncio.sleep(2 * attempt)  # Экспоненциальная задержка
 						continue
 					else:
 						# Последняя попытка не удалась
@@ -2229,7 +2643,7 @@ async def write_to_google_sheet_rate_mode(
 							except Exception:
 								pass
 						logger.error(f"❌ Все попытки исчерпаны. Последняя ошибка: {e}")
-						return {"success": False, "error": str(e)}
+						return {"success": False, "error": str(e), "transient": True}
 				else:
 					# Для других ошибок не делаем retry
 					logger.error(f"❌ Ошибка Google Sheets API (не retry): {e}")
@@ -2265,13 +2679,15 @@ async def write_to_google_sheet_rate_mode(
 							)
 						except Exception:
 							pass
-					return {"success": False, "error": str(e)}
+					# Сетевые ошибки временные, ошибка доступа к таблице - нет
+					return {"success": False, "error": str(e), "transient": not isinstance(e, PermissionError)}
 		
-		# Если дошли сюда, все попытки исчерпаны
-		if last_error:
-			result = {"success": False, "error": str(last_error)}
-		else:
-			result = {"success": False, "error": "Unknown error"}
+		# Если результата нет, все попытки исчерпаны
+		if result is None:
+			if last_error:
+				result = {"success": False, "error": str(last_error)}
+			else:
+				result = {"success": False, "error": "Unknown error"}
 		
 		# В режиме rate всегда начинаем с rate_start_row (по умолчанию 407), не сохраняем последние использованные строки
 		# (убрано сохранение rate_last_row_{column} для каждого столбца)
@@ -2289,7 +2705,7 @@ async def write_to_google_sheet_rate_mode(
 		return result
 	except Exception as e:
 		logger.exception(f"Ошибка записи данных в режиме rate: {e}")
-		return {"success": False, "written_cells": []}
+		return {"success": False, "error": str(e), "written_cells": []}
 
 
 def _write_to_google_sheet_rate_mode_sync(
@@ -2309,26 +2725,26 @@ def _write_to_google_sheet_rate_mode_sync(
 	Синхронная функция для записи данных в режиме rate.
 	Каждая запись идет в первую пустую ячейку соответствующего столбца, начиная со строки start_row (по умолчанию 348).
 	Если найденная пустая ячейка превышает rate_max_row, запись не выполняется.
+	
+	Ошибка API до первой записанной ячейки пробрасывается (операцию можно безопасно повторить);
+	после нее возвращается частичный результат с историей уже записанных ячеек для /del_rate
+	и незаписанными элементами в "remaining" - очередь записи повторит только их.
 	"""
+	written_cells = []
+	failed_writes = []  # Список данных, которые не удалось записать (лимит строк, нет столбца, ошибка API)
+	column_rows = {}  # Словарь {column: row} для обновления последних строк (не используется, но оставлен для совместимости)
+	operations_history = []  # Список операций для истории: [{"cell": "A123", "value": 100}, ...]
+	handled = {"crypto_list": 0, "xmr_list": 0, "card_cash_pairs": 0, "cash_list": 0}  # Сколько элементов каждого списка уже обработано
 	try:
-		# Создаем клиент
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return {"success": False, "written_cells": []}
-		
-		# Открываем таблицу
+		# Берем лист из пула клиентов (без повторной авторизации и open_by_key)
 		try:
-			spreadsheet = client.open_by_key(sheet_id)
-			worksheet = _get_worksheet(spreadsheet, sheet_name)
+			worksheet = _open_worksheet(sheet_id, credentials_path, sheet_name)
 		except PermissionError as e:
 			logger.error(f"Ошибка доступа к таблице: {e}")
 			raise
-		
-		written_cells = []
-		failed_writes = []  # Список данных, которые не удалось записать из-за лимита
-		column_rows = {}  # Словарь {column: row} для обновления последних строк (не используется, но оставлен для совместимости)
-		operations_history = []  # Список операций для истории: [{"cell": "A123", "value": 100}, ...]
+		if worksheet is None:
+			logger.error("Не удалось создать клиент Google Sheets")
+			return {"success": False, "written_cells": []}
 		
 		# Записываем криптовалюты (любые типы из базы данных)
 		for crypto in crypto_list:
@@ -2361,6 +2777,7 @@ def _write_to_google_sheet_rate_mode_sync(
 				else:
 					failed_writes.append(f"{currency}: {usd_amount_rounded} USD (не указан адрес столбца)")
 					logger.warning(f"⚠️ Не записано {currency}: {usd_amount_rounded} USD - не указан адрес столбца")
+			handled["crypto_list"] += 1
 		
 		# Записываем XMR
 		for xmr in xmr_list:
@@ -2388,6 +2805,7 @@ def _write_to_google_sheet_rate_mode_sync(
 							"xmr_number": xmr_number
 						})
 						logger.info(f"✅ Записано {usd_amount_rounded} USD в ячейку {cell_address} (XMR-{xmr_number})")
+			handled["xmr_list"] += 1
 		
 		# Записываем наличные для каждой карты
 		for pair in card_cash_pairs:
@@ -2418,6 +2836,7 @@ def _write_to_google_sheet_rate_mode_sync(
 							"currency": cash_currency
 						})
 						logger.info(f"✅ Записано {cash_amount} {cash_currency} в ячейку {cell_address} (карта: {card_name})")
+			handled["card_cash_pairs"] += 1
 		
 		# Записываем наличные без карты
 		logger.info(f"🔍 Запись наличных без карты: cash_list={cash_list}, len={len(cash_list)}")
@@ -2455,6 +2874,7 @@ def _write_to_google_sheet_rate_mode_sync(
 				logger.warning(f"⚠️ Не записано {cash_amount} {cash_currency} для наличных {cash_name} - не указан адрес столбца")
 			elif cash_amount == 0:
 				logger.warning(f"⚠️ Пропущено наличные {cash_name}: сумма равна 0")
+			handled["cash_list"] += 1
 		
 		return {
 			"success": len(written_cells) > 0 or len(failed_writes) == 0,
@@ -2466,7 +2886,32 @@ def _write_to_google_sheet_rate_mode_sync(
 		
 	except Exception as e:
 		logger.exception(f"Ошибка записи данных в режиме rate: {e}")
-		return {"success": False, "written_cells": []}
+		if not operations_history:
+			# В таблицу ничего не записано - ошибку разбирает асинхронная обертка (повтор при 429/503)
+			raise
+		# Часть ячеек уже записана: повтор всей операции продублировал бы их, поэтому
+		# возвращаем записанное (для истории /del_rate) и отдельно - что осталось записать
+		error_code = getattr(getattr(e, "response", None), "status_code", None)
+		if isinstance(e, gspread.exceptions.APIError):
+			transient = error_code in [503, 429, 500, 502, 504] or "unavailable" in str(e).lower()
+		else:
+			transient = not isinstance(e, PermissionError)
+		lists = {
+			"crypto_list": crypto_list,
+			"xmr_list": xmr_list,
+			"card_cash_pairs": card_cash_pairs,
+			"cash_list": cash_list
+		}
+		return {
+			"success": True,
+			"written_cells": written_cells,
+			"failed_writes": failed_writes,
+			"column_rows": column_rows,
+			"operations_history": operations_history,
+			"remaining": {key: items[handled[key]:] for key, items in lists.items()},
+			"error": f"Ошибка Google Sheets API: {e}",
+			"transient": transient
+		}
 
 
 async def delete_last_rate_operation(
@@ -2476,20 +2921,22 @@ async def delete_last_rate_operation(
 	sheet_name: Optional[str] = None
 ) -> Dict[str, Any]:
 	"""
-	Удаляет последнюю операцию /rate из Google Sheets.
-	Очищает ячейки, указанные в operations_history.
+	Удаляет одну или несколько последних операций /rate из Google Sheets.
+	Очищает ячейки, указанные в operations_history: значения читаются одним batch_get,
+	затем ячейки очищаются одним batch_clear в рамках одного запроса к планировщику.
 	
 	Args:
 		sheet_id: ID Google Sheet
 		credentials_path: Путь к файлу с учетными данными
 		operations_history: Список операций из истории [{"cell": "A123", "value": 100}, ...]
+			(для нескольких операций - объединенный список их ячеек)
 		sheet_name: Имя листа (опционально)
 		
 	Returns:
 		Словарь с результатами: {"success": bool, "deleted_cells": list, "message": str}
 	"""
 	try:
-		return await asyncio.to_thread(
+		return await _run_sheets_io(
 			_delete_last_rate_operation_sync,
 			sheet_id,
 			credentials_path,
@@ -2508,64 +2955,54 @@ def _delete_last_rate_operation_sync(
 	sheet_name: Optional[str] = None
 ) -> Dict[str, Any]:
 	"""
-	Синхронная функция для удаления последней операции /rate из Google Sheets.
-	Перед удалением читает значения из ячеек для формирования отчета.
+	Синхронная функция для удаления последних операций /rate из Google Sheets.
+	Перед удалением читает значения из ячеек одним batch_get для формирования отчета.
 	"""
 	try:
-		# Создаем клиент
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return {"success": False, "deleted_cells": [], "message": "Не удалось создать клиент Google Sheets"}
-		
-		# Открываем таблицу
+		# Берем лист из пула клиентов (без повторной авторизации и open_by_key)
 		try:
-			spreadsheet = client.open_by_key(sheet_id)
-			worksheet = _get_worksheet(spreadsheet, sheet_name)
+			worksheet = _open_worksheet(sheet_id, credentials_path, sheet_name)
 		except PermissionError as e:
 			logger.error(f"Ошибка доступа к таблице: {e}")
 			raise
+		if worksheet is None:
+			logger.error("Не удалось создать клиент Google Sheets")
+			return {"success": False, "deleted_cells": [], "message": "Не удалось создать клиент Google Sheets"}
 		
 		deleted_cells_info = []  # Список с информацией о ячейках: [{"cell": "A123", "value": 100, "type": "crypto", ...}, ...]
 		cells_to_clear = []
 		
-		# Читаем значения из ячеек перед удалением
 		for operation in operations_history:
 			cell_address = operation.get("cell")
-			if cell_address:
-				try:
-					# Читаем текущее значение из ячейки
-					cell = worksheet.acell(cell_address)
-					current_value = cell.value if cell and cell.value else None
-					
-					# Формируем информацию о ячейке для отчета
-					cell_info = {
-						"cell": cell_address,
-						"value": current_value,
-						"type": operation.get("type", ""),
-						"currency": operation.get("currency", ""),
-						"crypto_type": operation.get("currency", ""),  # Для криптовалют
-						"xmr_number": operation.get("xmr_number"),
-						"card_name": operation.get("card_name", ""),
-						"cash_name": operation.get("cash_name", "")
-					}
-					deleted_cells_info.append(cell_info)
-					cells_to_clear.append(cell_address)
-					logger.info(f"🗑️ Подготовка к удалению ячейки {cell_address}, текущее значение: {current_value}")
-				except Exception as e:
-					logger.warning(f"⚠️ Ошибка чтения ячейки {cell_address}: {e}")
-					# Все равно добавляем ячейку для удаления
-					deleted_cells_info.append({
-						"cell": cell_address,
-						"value": None,
-						"type": operation.get("type", ""),
-						"currency": operation.get("currency", ""),
-						"crypto_type": operation.get("currency", ""),
-						"xmr_number": operation.get("xmr_number"),
-						"card_name": operation.get("card_name", ""),
-						"cash_name": operation.get("cash_name", "")
-					})
-					cells_to_clear.append(cell_address)
+			if not cell_address:
+				continue
+			deleted_cells_info.append({
+				"cell": cell_address,
+				"value": None,
+				"type": operation.get("type", ""),
+				"currency": operation.get("currency", ""),
+				"crypto_type": operation.get("currency", ""),  # Для криптовалют
+				"xmr_number": operation.get("xmr_number"),
+				"card_name": operation.get("card_name", ""),
+				"cash_name": operation.get("cash_name", "")
+			})
+			if cell_address not in cells_to_clear:
+				cells_to_clear.append(cell_address)
+		
+		if cells_to_clear:
+			# Читаем текущие значения всех ячеек одним batch запросом перед удалением
+			try:
+				ranges_data = worksheet.batch_get(cells_to_clear)
+				current_values = {}
+				for cell_address, range_data in zip(cells_to_clear, ranges_data):
+					value = range_data[0][0] if range_data and range_data[0] else None
+					current_values[cell_address] = value if value not in ("", None) else None
+				for cell_info in deleted_cells_info:
+					cell_info["value"] = current_values.get(cell_info["cell"])
+				logger.info(f"🗑️ Подготовка к удалению ячеек: {current_values}")
+			except Exception as e:
+				# Все равно удаляем ячейки, просто без значений в отчете
+				logger.warning(f"⚠️ Ошибка чтения ячеек {cells_to_clear}: {e}")
 		
 		if not cells_to_clear:
 			return {"success": False, "deleted_cells": [], "message": "Нет ячеек для удаления"}
@@ -2594,292 +3031,132 @@ def _delete_last_rate_operation_sync(
 		return {"success": False, "deleted_cells": [], "message": f"Ошибка: {str(e)}"}
 
 
-def _get_crypto_values_from_row_4_sync(
-	sheet_id: str,
-	credentials_path: str,
-	crypto_columns: List[Dict[str, str]],
-	sheet_name: Optional[str] = None
-) -> Dict[str, Optional[str]]:
-	"""
-	Синхронная функция для чтения значений криптовалют из строки 4 Google Sheets.
-	
-	Args:
-		sheet_id: ID Google Sheets таблицы
-		credentials_path: Путь к файлу с учетными данными
-		crypto_columns: Список словарей с ключами crypto_type и column
-	
-	Returns:
-		Словарь {crypto_type: value} с значениями из строки 4
-	"""
-	result = {}
-	
-	if not sheet_id or not credentials_path:
-		logger.warning("Google Sheets не настроен для чтения криптовалют")
-		return result
-	
-	try:
-		# Создаем клиент Google Sheets
-		client = _get_google_sheets_client(credentials_path)
-		
-		if not client:
-			logger.warning("Не удалось создать клиент Google Sheets")
-			return result
-		
-		# Открываем таблицу
-		spreadsheet = client.open_by_key(sheet_id)
-		worksheet = _get_worksheet(spreadsheet, sheet_name)
-		
-		# Собираем адреса ячеек для batch чтения
-		cell_addresses = []
-		crypto_mapping = {}  # {cell_address: crypto_type}
-		
-		for crypto in crypto_columns:
-			crypto_type = crypto.get("crypto_type", "")
-			column = crypto.get("column", "")
-			
-			if not column:
-				logger.warning(f"Пропущена криптовалюта {crypto_type}: нет столбца")
-				continue
-			
-			cell_address = f"{column}4"
-			cell_addresses.append(cell_address)
-			crypto_mapping[cell_address] = crypto_type
-		
-		# Читаем все значения одним batch запросом
-		logger.info(f"Начинаем batch чтение значений криптовалют из строки 4. Всего криптовалют: {len(cell_addresses)}")
-		
-		if cell_addresses:
-			try:
-				# Используем batch_get для чтения всех ячеек за один запрос
-				values = worksheet.batch_get(cell_addresses)
-				
-				# Обрабатываем результаты
-				for i, cell_address in enumerate(cell_addresses):
-					crypto_type = crypto_mapping[cell_address]
-					
-					try:
-						# values[i] - это список строк для данной ячейки (обычно одна строка)
-						# values[i][0] - первая строка
-						# values[i][0][0] - первое значение в строке
-						if i < len(values) and values[i] and len(values[i]) > 0:
-							row = values[i][0]
-							if row and len(row) > 0:
-								value = str(row[0]).strip()
-								# Если значение пустое после strip, считаем его None
-								if not value:
-									value = None
-								logger.debug(f"Прочитано значение для {crypto_type} из {cell_address}: '{value}'")
-							else:
-								value = None
-								logger.debug(f"Ячейка {cell_address} для {crypto_type} пустая")
-						else:
-							value = None
-							logger.debug(f"Ячейка {cell_address} для {crypto_type} не найдена в ответе")
-						
-						result[crypto_type] = value
-						
-					except (IndexError, TypeError) as e:
-						logger.warning(f"Ошибка обработки ячейки {cell_address} для {crypto_type}: {e}")
-						result[crypto_type] = None
-			except Exception as e:
-				logger.exception(f"Ошибка batch чтения криптовалют: {e}")
-				# В случае ошибки batch чтения, помечаем все как None
-				for cell_address, crypto_type in crypto_mapping.items():
-					result[crypto_type] = None
-		
-	except Exception as e:
-		logger.exception(f"Ошибка чтения значений криптовалют из строки 4: {e}")
-	
-	return result
+# Одновременные batch чтения одних и тех же ячеек (например, /stat_bk у двух админов)
+_sheets_read_flight = get_single_flight("sheets_batch_get")
 
 
-async def get_crypto_values_from_row_4(
+async def _read_cells_batch(
 	sheet_id: str,
 	credentials_path: str,
-	crypto_columns: List[Dict[str, str]],
-	sheet_name: Optional[str] = None
+	cell_addresses: List[str],
+	sheet_name: Optional[str] = None,
+	priority: int = SHEETS_PRIORITY_READ
 ) -> Dict[str, Optional[str]]:
 	"""
-	Читает значения криптовалют из строки 4 Google Sheets.
-	
-	Args:
-		sheet_id: ID Google Sheets таблицы
-		credentials_path: Путь к файлу с учетными данными
-		crypto_columns: Список словарей с ключами crypto_type и column
+	Читает первые значения из нескольких ячеек одним запросом values:batchGet
+	(через планировщик квот). Одновременные чтения тех же ячеек объединяются в один запрос.
+	Ошибки API пробрасываются вызывающему коду.
 	
 	Returns:
-		Словарь {crypto_type: value} с значениями из строки 4
+		Словарь {адрес_ячейки: значение или None, если ячейка пустая}
 	"""
-	loop = asyncio.get_event_loop()
-	return await loop.run_in_executor(
-		None,
-		_get_crypto_values_from_row_4_sync,
-		sheet_id,
-		credentials_path,
-		crypto_columns,
-		sheet_name
+	key = (sheet_id, sheet_name or "", tuple(cell_addresses))
+	result = await _sheets_read_flight.do(
+		key,
+		lambda: _read_cells_batch_uncoalesced(sheet_id, credentials_path, cell_addresses, sheet_name, priority)
 	)
+	# Каждый вызывающий получает свою копию, общий результат не меняется
+	return dict(result)
 
 
-def _read_card_balance_sync(
+async def _read_cells_batch_uncoalesced(
 	sheet_id: str,
 	credentials_path: str,
-	column: str,
-	balance_row: int = 4,
-	sheet_name: Optional[str] = None
-) -> Optional[str]:
-	"""
-	Синхронная функция для чтения баланса карты из указанной строки.
-	
-	Args:
-		sheet_id: ID Google Sheets таблицы
-		credentials_path: Путь к файлу с учетными данными
-		column: Столбец карты (например, "D")
-		balance_row: Номер строки с балансом (по умолчанию 4)
+	cell_addresses: List[str],
+	sheet_name: Optional[str],
+	priority: int
+) -> Dict[str, Optional[str]]:
+	client = get_async_sheets_client(credentials_path)
+	values = await _run_sheets_api(
+		lambda: client.values_batch_get(sheet_id, cell_addresses, sheet_name),
+		"read",
+		priority
+	)
 	
-	Returns:
-		Значение баланса или None
-	"""
-	cell_address = f"{column}{balance_row}"  # Определяем сразу, чтобы использовать в except
-	try:
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return None
-		
-		spreadsheet = client.open_by_key(sheet_id)
-		worksheet = _get_worksheet(spreadsheet, sheet_name)
-		
-		logger.info(f"🔍 Чтение баланса карты из ячейки {cell_address}")
-		
-		cell = worksheet.acell(cell_address)
-		if cell and cell.value:
-			value = str(cell.value).strip()
-			logger.info(f"✅ Прочитан баланс из {cell_address}: '{value}'")
-			return value
-		else:
-			logger.info(f"⚠️ Ячейка {cell_address} пустая или не найдена")
-			return None
-	except Exception as e:
-		logger.exception(f"❌ Ошибка чтения баланса из {cell_address}: {e}")
-		return None
+	result = {}
+	for i, cell_address in enumerate(cell_addresses):
+		try:
+			# values[i] - это список строк для данной ячейки (обычно одна строка)
+			# values[i][0] - первая строка
+			# values[i][0][0] - первое значение в строке
+			if i < len(values) and values[i] and values[i][0]:
+				result[cell_address] = str(values[i][0][0])
+			else:
+				result[cell_address] = None
+		except (IndexError, TypeError) as e:
+			logger.warning(f"⚠️ Ошибка обработки ячейки {cell_address}: {e}")
+			result[cell_address] = None
+	return result
 
 
-def _read_profits_batch_sync(
+async def get_crypto_values_from_row_4(
 	sheet_id: str,
 	credentials_path: str,
-	cell_addresses: List[str],
-	sheet_name: Optional[str] = None
+	crypto_columns: List[Dict[str, str]],
+	sheet_name: Optional[str] = None,
+	priority: int = SHEETS_PRIORITY_READ
 ) -> Dict[str, Optional[str]]:
 	"""
-	Синхронная функция для batch чтения профитов из Google Sheets.
+	Читает значения криптовалют из строки 4 Google Sheets.
 	
 	Args:
 		sheet_id: ID Google Sheets таблицы
 		credentials_path: Путь к файлу с учетными данными
-		cell_addresses: Список адресов ячеек (например, ["BD225", "BD275"])
-		sheet_name: Название листа (опционально)
+		crypto_columns: Список словарей с ключами crypto_type и column
+		priority: Приоритет в очереди запросов (SHEETS_PRIORITY_STATS для статистики)
 	
 	Returns:
-		Словарь {cell_address: value} с значениями из ячеек
+		Словарь {crypto_type: value} с значениями из строки 4
 	"""
 	result = {}
 	
-	if not sheet_id or not credentials_path or not cell_addresses:
+	if not sheet_id or not credentials_path:
+		logger.warning("Google Sheets не настроен для чтения криптовалют")
 		return result
 	
-	try:
-		# Создаем клиент Google Sheets
-		client = _get_google_sheets_client(credentials_path)
-		
-		if not client:
-			logger.warning("Не удалось создать клиент Google Sheets")
-			return result
-		
-		# Открываем таблицу
-		spreadsheet = client.open_by_key(sheet_id)
-		worksheet = _get_worksheet(spreadsheet, sheet_name)
+	# Собираем адреса ячеек для batch чтения
+	cell_addresses = []
+	crypto_mapping = {}  # {cell_address: crypto_type}
+	
+	for crypto in crypto_columns:
+		crypto_type = crypto.get("crypto_type", "")
+		column = crypto.get("column", "")
 		
-		# Читаем все значения одним batch запросом
-		logger.info(f"Начинаем batch чтение профитов. Всего ячеек: {len(cell_addresses)}")
+		if not column:
+			logger.warning(f"Пропущена криптовалюта {crypto_type}: нет столбца")
+			continue
 		
+		cell_address = f"{column}4"
+		cell_addresses.append(cell_address)
+		crypto_mapping[cell_address] = crypto_type
+	
+	# Читаем все значения одним batch запросом
+	logger.info(f"Начинаем batch чтение значений криптовалют из строки 4. Всего криптовалют: {len(cell_addresses)}")
+	
+	if cell_addresses:
 		try:
-			# Используем batch_get для чтения всех ячеек за один запрос
-			values = worksheet.batch_get(cell_addresses)
-			
-			# Обрабатываем результаты
-			for i, cell_address in enumerate(cell_addresses):
-				try:
-					# values[i] - это список строк для данной ячейки (обычно одна строка)
-					# values[i][0] - первая строка
-					# values[i][0][0] - первое значение в строке
-					if i < len(values) and values[i] and len(values[i]) > 0:
-						row = values[i][0]
-						if row and len(row) > 0:
-							value = str(row[0]).strip()
-							# Если значение пустое после strip, считаем его None
-							if not value:
-								value = None
-							logger.debug(f"Прочитано значение из {cell_address}: '{value}'")
-						else:
-							value = None
-							logger.debug(f"Ячейка {cell_address} пустая")
-					else:
-						value = None
-						logger.debug(f"Ячейка {cell_address} не найдена в ответе")
-					
-					result[cell_address] = value
-					
-				except (IndexError, TypeError) as e:
-					logger.warning(f"Ошибка обработки ячейки {cell_address}: {e}")
-					result[cell_address] = None
+			values = await _read_cells_batch(sheet_id, credentials_path, cell_addresses, sheet_name, priority)
+			for cell_address, crypto_type in crypto_mapping.items():
+				value = values.get(cell_address)
+				# Если значение пустое после strip, считаем его None
+				result[crypto_type] = (value.strip() or None) if value else None
+				logger.debug(f"Прочитано значение для {crypto_type} из {cell_address}: '{result[crypto_type]}'")
 		except Exception as e:
-			logger.exception(f"Ошибка batch чтения профитов: {e}")
+			logger.exception(f"Ошибка batch чтения криптовалют: {e}")
 			# В случае ошибки batch чтения, помечаем все как None
-			for cell_address in cell_addresses:
-				result[cell_address] = None
-		
-	except Exception as e:
-		logger.exception(f"Ошибка чтения профитов: {e}")
+			for cell_address, crypto_type in crypto_mapping.items():
+				result[crypto_type] = None
 	
 	return result
 
 
-async def read_profits_batch(
-	sheet_id: str,
-	credentials_path: str,
-	cell_addresses: List[str],
-	sheet_name: Optional[str] = None
-) -> Dict[str, Optional[str]]:
-	"""
-	Читает профиты из Google Sheets batch запросом.
-	
-	Args:
-		sheet_id: ID Google Sheets таблицы
-		credentials_path: Путь к файлу с учетными данными
-		cell_addresses: Список адресов ячеек (например, ["BD225", "BD275"])
-		sheet_name: Название листа (опционально)
-	
-	Returns:
-		Словарь {cell_address: value} с значениями из ячеек
-	"""
-	loop = asyncio.get_event_loop()
-	return await loop.run_in_executor(
-		None,
-		_read_profits_batch_sync,
-		sheet_id,
-		credentials_path,
-		cell_addresses,
-		sheet_name
-	)
-
-
 async def read_card_balance(
 	sheet_id: str,
 	credentials_path: str,
 	column: str,
 	balance_row: int = 4,
-	sheet_name: Optional[str] = None
+	sheet_name: Optional[str] = None,
+	priority: int = SHEETS_PRIORITY_READ
 ) -> Optional[str]:
 	"""
 	Читает баланс карты из указанной строки.
@@ -2889,76 +3166,52 @@ async def read_card_balance(
 		credentials_path: Путь к файлу с учетными данными
 		column: Столбец карты (например, "D")
 		balance_row: Номер строки с балансом (по умолчанию 4)
+		priority: Приоритет в очереди запросов (SHEETS_PRIORITY_STATS для статистики)
 	
 	Returns:
 		Значение баланса или None
 	"""
-	loop = asyncio.get_event_loop()
-	return await loop.run_in_executor(
-		None,
-		_read_card_balance_sync,
-		sheet_id,
-		credentials_path,
-		column,
-		balance_row,
-		sheet_name
-	)
+	cell_address = f"{column}{balance_row}"
+	try:
+		logger.info(f"🔍 Чтение баланса карты из ячейки {cell_address}")
+		values = await _read_cells_batch(sheet_id, credentials_path, [cell_address], sheet_name, priority)
+		value = values.get(cell_address)
+		if value:
+			value = value.strip()
+			logger.info(f"✅ Прочитан баланс из {cell_address}: '{value}'")
+			return value
+		logger.info(f"⚠️ Ячейка {cell_address} пустая или не найдена")
+		return None
+	except Exception as e:
+		logger.exception(f"❌ Ошибка чтения баланса из {cell_address}: {e}")
+		return None
 
 
-def _read_card_balances_batch_sync(
+async def read_card_balances_batch(
 	sheet_id: str,
 	credentials_path: str,
 	cell_addresses: List[str],
-	sheet_name: Optional[str] = None
+	sheet_name: Optional[str] = None,
+	priority: int = SHEETS_PRIORITY_READ
 ) -> Dict[str, Optional[str]]:
 	"""
-	Синхронная функция для чтения балансов нескольких карт за один запрос.
+	Читает балансы нескольких карт за один запрос.
 	
 	Args:
 		sheet_id: ID Google Sheets таблицы
 		credentials_path: Путь к файлу с учетными данными
 		cell_addresses: Список адресов ячеек (например, ["D4", "E4", "F4"])
+		priority: Приоритет в очереди запросов (SHEETS_PRIORITY_STATS для статистики)
 	
 	Returns:
-		Словарь {адрес_ячейки: значение} или None при ошибке
+		Словарь {адрес_ячейки: значение}
 	"""
+	if not cell_addresses:
+		return {}
 	try:
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return {}
-		
-		spreadsheet = client.open_by_key(sheet_id)
-		worksheet = _get_worksheet(spreadsheet, sheet_name)
-		
 		logger.info(f"🔍 Batch чтение балансов из {len(cell_addresses)} ячеек")
-		
-		# Используем batch_get для чтения нескольких ячеек за один запрос
-		# batch_get возвращает список списков: [[['value1']], [['value2']], ...]
-		values = worksheet.batch_get(cell_addresses)
-		
-		result = {}
-		for i, cell_address in enumerate(cell_addresses):
-			try:
-				# values[i] - это список строк для данной ячейки (обычно одна строка)
-				# values[i][0] - первая строка
-				# values[i][0][0] - первое значение в строке
-				if i < len(values) and values[i] and len(values[i]) > 0:
-					row = values[i][0]
-					if row and len(row) > 0:
-						value = str(row[0]).strip()
-						result[cell_address] = value
-						logger.debug(f"✅ Прочитан баланс из {cell_address}: '{value}'")
-					else:
-						result[cell_address] = None
-						logger.debug(f"⚠️ Ячейка {cell_address} пустая")
-				else:
-					result[cell_address] = None
-					logger.debug(f"⚠️ Ячейка {cell_address} не найдена в ответе")
-			except (IndexError, TypeError) as e:
-				logger.warning(f"⚠️ Ошибка обработки ячейки {cell_address}: {e}")
-				result[cell_address] = None
-		
+		values = await _read_cells_batch(sheet_id, credentials_path, cell_addresses, sheet_name, priority)
+		result = {address: (value.strip() if value is not None else None) for address, value in values.items()}
 		logger.info(f"✅ Batch чтение завершено: прочитано {len([v for v in result.values() if v])} значений из {len(cell_addresses)} ячеек")
 		return result
 	except Exception as e:
@@ -2966,162 +3219,68 @@ def _read_card_balances_batch_sync(
 		return {}
 
 
-async def read_card_balances_batch(
-	sheet_id: str,
-	credentials_path: str,
-	cell_addresses: List[str],
-	sheet_name: Optional[str] = None
-) -> Dict[str, Optional[str]]:
-	"""
-	Читает балансы нескольких карт за один запрос.
-	
-	Args:
-		sheet_id: ID Google Sheets таблицы
-		credentials_path: Путь к файлу с учетными данными
-		cell_addresses: Список адресов ячеек (например, ["D4", "E4", "F4"])
-	
-	Returns:
-		Словарь {адрес_ячейки: значение}
-	"""
-	loop = asyncio.get_event_loop()
-	return await loop.run_in_executor(
-		None,
-		_read_card_balances_batch_sync,
-		sheet_id,
-		credentials_path,
-		cell_addresses,
-		sheet_name
-	)
-
-
-def _read_profit_sync(
+async def read_profit(
 	sheet_id: str,
 	credentials_path: str,
 	row: int,
 	profit_column: str = "BC",
-	sheet_name: Optional[str] = None
+	sheet_name: Optional[str] = None,
+	priority: int = SHEETS_PRIORITY_READ
 ) -> Optional[str]:
 	"""
-	Синхронная функция для чтения профита из указанного столбца.
+	Читает профит из указанного столбца.
 	
 	Args:
 		sheet_id: ID Google Sheets таблицы
 		credentials_path: Путь к файлу с учетными данными
 		row: Номер строки, куда записали данные
 		profit_column: Столбец с профитом (по умолчанию "BC")
+		priority: Приоритет в очереди запросов (SHEETS_PRIORITY_STATS для статистики)
 	
 	Returns:
 		Значение профита или None
 	"""
+	cell_address = f"{profit_column}{row}"
 	try:
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return None
-		
-		spreadsheet = client.open_by_key(sheet_id)
-		worksheet = _get_worksheet(spreadsheet, sheet_name)
-		
-		cell_address = f"{profit_column}{row}"
 		logger.info(f"🔍 Чтение профита из ячейки {cell_address}")
-		
-		cell = worksheet.acell(cell_address)
-		if cell and cell.value:
-			value = str(cell.value).strip()
+		values = await _read_cells_batch(sheet_id, credentials_path, [cell_address], sheet_name, priority)
+		value = values.get(cell_address)
+		if value:
+			value = value.strip()
 			logger.info(f"✅ Прочитан профит из {cell_address}: '{value}'")
 			return value
-		else:
-			logger.info(f"⚠️ Ячейка {cell_address} пустая или не найдена")
-			return None
+		logger.info(f"⚠️ Ячейка {cell_address} пустая или не найдена")
+		return None
 	except Exception as e:
 		logger.exception(f"❌ Ошибка чтения профита из {cell_address}: {e}")
 		return None
 
 
-async def read_profit(
-	sheet_id: str,
-	credentials_path: str,
-	row: int,
-	profit_column: str = "BC",
-	sheet_name: Optional[str] = None
-) -> Optional[str]:
-	"""
-	Читает профит из указанного столбца.
-	
-	Args:
-		sheet_id: ID Google Sheets таблицы
-		credentials_path: Путь к файлу с учетными данными
-		row: Номер строки, куда записали данные
-		profit_column: Столбец с профитом (по умолчанию "BC")
-	
-	Returns:
-		Значение профита или None
-	"""
-	loop = asyncio.get_event_loop()
-	return await loop.run_in_executor(
-		None,
-		_read_profit_sync,
-		sheet_id,
-		credentials_path,
-		row,
-		profit_column,
-		sheet_name
-	)
-
-
-def _read_profits_batch_sync(
+async def read_profits_batch(
 	sheet_id: str,
 	credentials_path: str,
 	cell_addresses: List[str],
-	sheet_name: Optional[str] = None
+	sheet_name: Optional[str] = None,
+	priority: int = SHEETS_PRIORITY_READ
 ) -> Dict[str, Optional[str]]:
 	"""
-	Синхронная функция для чтения профитов из нескольких ячеек за один запрос.
+	Читает профиты из нескольких ячеек за один запрос.
 	
 	Args:
 		sheet_id: ID Google Sheets таблицы
 		credentials_path: Путь к файлу с учетными данными
 		cell_addresses: Список адресов ячеек (например, ["BC123", "BC124", "BC125"])
+		priority: Приоритет в очереди запросов (SHEETS_PRIORITY_STATS для статистики)
 	
 	Returns:
 		Словарь {адрес_ячейки: значение}
 	"""
+	if not sheet_id or not credentials_path or not cell_addresses:
+		return {}
 	try:
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return {}
-		
-		spreadsheet = client.open_by_key(sheet_id)
-		worksheet = _get_worksheet(spreadsheet, sheet_name)
-		
 		logger.info(f"🔍 Batch чтение профитов из {len(cell_addresses)} ячеек")
-		
-		# Используем batch_get для чтения нескольких ячеек за один запрос
-		values = worksheet.batch_get(cell_addresses)
-		
-		result = {}
-		for i, cell_address in enumerate(cell_addresses):
-			try:
-				# values[i] - это список строк для данной ячейки (обычно одна строка)
-				# values[i][0] - первая строка
-				# values[i][0][0] - первое значение в строке
-				if i < len(values) and values[i] and len(values[i]) > 0:
-					row = values[i][0]
-					if row and len(row) > 0:
-						value = str(row[0]).strip()
-						result[cell_address] = value
-						logger.debug(f"✅ Прочитан профит из {cell_address}: '{value}'")
-					else:
-						result[cell_address] = None
-						logger.debug(f"⚠️ Ячейка {cell_address} пустая")
-				else:
-					result[cell_address] = None
-					logger.debug(f"⚠️ Ячейка {cell_address} не найдена в ответе")
-			except (IndexError, TypeError) as e:
-				logger.warning(f"⚠️ Ошибка обработки ячейки {cell_address}: {e}")
-				result[cell_address] = None
-		
+		values = await _read_cells_batch(sheet_id, credentials_path, cell_addresses, sheet_name, priority)
+		result = {address: ((value.strip() or None) if value is not None else None) for address, value in values.items()}
 		logger.info(f"✅ Batch чтение профитов завершено: прочитано {len([v for v in result.values() if v])} значений из {len(cell_addresses)} ячеек")
 		return result
 	except Exception as e:
@@ -3129,108 +3288,393 @@ def _read_profits_batch_sync(
 		return {}
 
 
-async def read_profits_batch(
-	sheet_id: str,
-	credentials_path: str,
-	cell_addresses: List[str],
-	sheet_name: Optional[str] = None
-) -> Dict[str, Optional[str]]:
-	"""
-	Читает профиты из нескольких ячеек за один запрос.
-	
-	Args:
-		sheet_id: ID Google Sheets таблицы
-		credentials_path: Путь к файлу с учетными данными
-		cell_addresses: Список адресов ячеек (например, ["BC123", "BC124", "BC125"])
-	
-	Returns:
-		Словарь {адрес_ячейки: значение}
-	"""
-	loop = asyncio.get_event_loop()
-	return await loop.run_in_executor(
-		None,
-		_read_profits_batch_sync,
-		sheet_id,
-		credentials_path,
-		cell_addresses,
-		sheet_name
-	)
-
-
-def _read_cell_value_sync(
+async def read_cell_value(
 	sheet_id: str,
 	credentials_path: str,
 	cell_address: str,
-	sheet_name: Optional[str] = None
+	sheet_name: Optional[str] = None,
+	priority: int = SHEETS_PRIORITY_READ
 ) -> Optional[str]:
 	"""
-	Синхронная функция для чтения значения одной ячейки из Google Sheets.
+	Асинхронная функция для чтения значения одной ячейки из Google Sheets.
 	
 	Args:
 		sheet_id: ID Google Sheets таблицы
 		credentials_path: Путь к файлу с учетными данными
 		cell_address: Адрес ячейки (например, "BD420")
 		sheet_name: Название листа (опционально)
+		priority: Приоритет в очереди запросов (SHEETS_PRIORITY_STATS для статистики)
 	
 	Returns:
 		Значение ячейки или None при ошибке
 	"""
 	try:
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return None
-		
-		spreadsheet = client.open_by_key(sheet_id)
-		sheet = _get_worksheet(spreadsheet, sheet_name)
-		
-		cell_value = sheet.acell(cell_address).value
+		values = await _read_cells_batch(sheet_id, credentials_path, [cell_address], sheet_name, priority)
+		cell_value = values.get(cell_address)
 		return cell_value if cell_value else None
 	except Exception as e:
 		logger.exception(f"Ошибка чтения ячейки {cell_address}: {e}")
 		return None
 
 
-async def read_cell_value(
+# Снапшот ячеек для /stat_bk и /stat_k: балансы строки balance_row, строки 4 и профиты дней.
+# Время жизни по умолчанию (секунды), настраивается через STATS_SNAPSHOT_TTL
+STATS_SNAPSHOT_TTL_DEFAULT = 60
+# Фоновое обновление продолжается, пока статистику запрашивали не позже этого срока (секунды)
+STATS_SNAPSHOT_IDLE_SECONDS = 600
+
+
+class _StatsSnapshot:
+	"""
+	Кэш значений ячеек статистики с временем чтения.
+	
+	Свежие значения (моложе ttl) отдаются без запроса к таблице, устаревшие перечитываются.
+	Запись ботом в таблицу помечает весь снапшот устаревшим и будит фоновое обновление,
+	чтобы следующая команда снова получила данные мгновенно.
+	"""
+
+	def __init__(self) -> None:
+		self.ttl = STATS_SNAPSHOT_TTL_DEFAULT
+		# {(sheet_id, sheet_name, cell): (значение, время чтения time.time())}
+		self._cells: Dict[Tuple[str, str, str], Tuple[Optional[str], float]] = {}
+		# {(sheet_id, sheet_name): (credentials_path, {cell, ...}, время последнего запроса)}
+		self._watched: Dict[Tuple[str, str], Tuple[str, set, float]] = {}
+		self._refresh_event: Optional[asyncio.Event] = None
+		# Растет при каждой записи ботом в таблицу: результат чтения, начатого до записи, не кэшируем
+		self.generation = 0
+		self.hits = 0
+		self.misses = 0
+		self.refreshes = 0
+
+	def get_refresh_event(self) -> asyncio.Event:
+		if self._refresh_event is None:
+			self._refresh_event = asyncio.Event()
+		return self._refresh_event
+
+	def watch(self, sheet_id: str, credentials_path: str, sheet_name: Optional[str], cells: List[str]) -> None:
+		"""Запоминает ячейки, которые нужно поддерживать свежими в фоне"""
+		key = (sheet_id, sheet_name or "")
+		_, watched_cells, _ = self._watched.get(key, (credentials_path, set(), 0.0))
+		watched_cells.update(cells)
+		self._watched[key] = (credentials_path, watched_cells, time.time())
+
+	def lookup(
+		self,
+		sheet_id: str,
+		sheet_name: Optional[str],
+		cells: List[str]
+	) -> Tuple[Dict[str, Optional[str]], List[str], Optional[float]]:
+		"""
+		Returns:
+			(свежие значения, устаревшие/отсутствующие ячейки, время чтения самого старого из свежих значений)
+		"""
+		now = time.time()
+		values = {}
+		stale = []
+		as_of = None
+		for cell in cells:
+			cached = self._cells.get((sheet_id, sheet_name or "", cell))
+			if cached is not None and self.ttl > 0 and now - cached[1] < self.ttl:
+				values[cell] = cached[0]
+				as_of = cached[1] if as_of is None else min(as_of, cached[1])
+			else:
+				stale.append(cell)
+		if stale:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return values, stale, as_of
+
+	def needs_refresh(self, sheet_id: str, sheet_name: Optional[str], cells: List[str], max_age: float) -> bool:
+		"""Есть ли среди ячеек отсутствующие или прочитанные раньше, чем max_age секунд назад"""
+		now = time.time()
+		for cell in cells:
+			cached = self._cells.get((sheet_id, sheet_name or "", cell))
+			if cached is None or now - cached[1] >= max_age:
+				return True
+		return False
+
+	def store(
+		self,
+		sheet_id: str,
+		sheet_name: Optional[str],
+		values: Dict[str, Optional[str]],
+		fetched_at: float,
+		generation: int
+	) -> None:
+		"""
+		Сохраняет прочитанные значения.
+		
+		Args:
+			fetched_at: Время начала чтения (значения не новее этого момента)
+			generation: Значение generation до начала чтения; если за время чтения бот
+				записал в таблицу, значения могли устареть и не сохраняются
+		"""
+		if generation != self.generation:
+			return
+		for cell, value in values.items():
+			self._cells[(sheet_id, sheet_name or "", cell)] = (value, fetched_at)
+
+	def invalidate(self) -> None:
+		"""Помечает все значения устаревшими (после записи ботом в таблицу)"""
+		self.generation += 1
+		if not self._cells:
+			return
+		self._cells = {key: (value, 0.0) for key, (value, _) in self._cells.items()}
+		if self._refresh_event is not None:
+			self._refresh_event.set()
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"ttl": self.ttl,
+			"cells": len(self._cells),
+			"hits": self.hits,
+			"misses": self.misses,
+			"refreshes": self.refreshes,
+		}
+
+
+_stats_snapshot = _StatsSnapshot()
+
+
+def get_stats_snapshot_stats() -> Dict[str, Any]:
+	"""Возвращает счетчики снапшота статистики (для диагностики)"""
+	return _stats_snapshot.stats()
+
+
+async def read_stats_snapshot(
 	sheet_id: str,
 	credentials_path: str,
-	cell_address: str,
+	cell_addresses: List[str],
 	sheet_name: Optional[str] = None
-) -> Optional[str]:
+) -> Tuple[Dict[str, Optional[str]], float]:
 	"""
-	Асинхронная функция для чтения значения одной ячейки из Google Sheets.
+	Читает ячейки статистики через снапшот: свежие значения берутся из памяти,
+	устаревшие перечитываются одним batch запросом с приоритетом статистики.
+	Ошибки API пробрасываются вызывающему коду.
 	
 	Args:
 		sheet_id: ID Google Sheets таблицы
 		credentials_path: Путь к файлу с учетными данными
-		cell_address: Адрес ячейки (например, "BD420")
+		cell_addresses: Список адресов ячеек
 		sheet_name: Название листа (опционально)
 	
 	Returns:
-		Значение ячейки или None при ошибке
+		(словарь {адрес_ячейки: значение или None}, время актуальности данных time.time())
+	"""
+	if not cell_addresses:
+		return {}, time.time()
+	_stats_snapshot.watch(sheet_id, credentials_path, sheet_name, cell_addresses)
+	values, stale, as_of = _stats_snapshot.lookup(sheet_id, sheet_name, cell_addresses)
+	if stale:
+		# Время и поколение снапшота фиксируем до чтения: запись ботом во время чтения не должна
+		# оставить в кэше значения, помеченные как прочитанные после нее
+		fetched_at = time.time()
+		generation = _stats_snapshot.generation
+		fetched = await _read_cells_batch(sheet_id, credentials_path, stale, sheet_name, SHEETS_PRIORITY_STATS)
+		_stats_snapshot.store(sheet_id, sheet_name, fetched, fetched_at, generation)
+		values.update(fetched)
+		as_of = fetched_at if as_of is None else min(as_of, fetched_at)
+	return values, as_of
+
+
+async def _refresh_stats_snapshot(max_age: float) -> None:
+	"""Перечитывает наблюдаемые ячейки, если какая-то из них старше max_age секунд"""
+	now = time.time()
+	for (sheet_id, sheet_name), (credentials_path, cells, last_requested) in list(_stats_snapshot._watched.items()):
+		if now - last_requested > STATS_SNAPSHOT_IDLE_SECONDS:
+			# Статистику давно не смотрели - не тратим квоту чтения
+			continue
+		cell_list = sorted(cells)
+		if not _stats_snapshot.needs_refresh(sheet_id, sheet_name, cell_list, max_age):
+			continue
+		fetched_at = time.time()
+		generation = _stats_snapshot.generation
+		fetched = await _read_cells_batch(sheet_id, credentials_path, cell_list, sheet_name or None, SHEETS_PRIORITY_STATS)
+		_stats_snapshot.store(sheet_id, sheet_name, fetched, fetched_at, generation)
+		_stats_snapshot.refreshes += 1
+		logger.debug(f"🔄 Снапшот статистики обновлен в фоне: {len(cell_list)} ячеек")
+
+
+async def run_stats_snapshot_refresher(ttl: int = STATS_SNAPSHOT_TTL_DEFAULT) -> None:
+	"""
+	Фоновая задача: перечитывает ячейки снапшота статистики незадолго до истечения ttl
+	и сразу после записи ботом в таблицу.
+	
+	Args:
+		ttl: Время жизни снапшота в секундах (0 - снапшот отключен)
+	"""
+	_stats_snapshot.ttl = max(0, ttl)
+	if _stats_snapshot.ttl <= 0:
+		logger.info("ℹ️ Снапшот статистики Google Sheets отключен (STATS_SNAPSHOT_TTL=0)")
+		return
+	event = _stats_snapshot.get_refresh_event()
+	# Проверяем чаще, чем истекает ttl, чтобы обновить значения до того, как они устареют
+	check_interval = max(1.0, _stats_snapshot.ttl / 4)
+	while True:
+		try:
+			try:
+				await asyncio.wait_for(event.wait(), timeout=check_interval)
+				# Даем записи завершиться целиком (несколько запросов подряд), прежде чем перечитывать
+				await asyncio.sleep(2)
+			except asyncio.TimeoutError:
+				pass
+			event.clear()
+			await _refresh_stats_snapshot(_stats_snapshot.ttl - check_interval)
+		except asyncio.CancelledError:
+			break
+		except Exception as e:
+			logger.warning(f"⚠️ Ошибка фонового обновления снапшота статистики: {e}")
+			await asyncio.sleep(check_interval)
+
+
+# Все слагаемые формулы профита лежат в столбцах B:BB одной строки,
+# поэтому строка (или блок строк) читается одним запросом
+_PROFIT_FIRST_COLUMN = "B"
+_PROFIT_LAST_COLUMN = "BB"
+
+
+def _column_letter_to_number(column: str) -> int:
+	"""Преобразует букву столбца в номер: A -> 1, AA -> 27"""
+	number = 0
+	for char in column.upper():
+		number = number * 26 + (ord(char) - ord('A') + 1)
+	return number
+
+
+def _column_number_to_letter(number: int) -> str:
+	"""Преобразует номер столбца в букву: 1 -> A, 27 -> AA"""
+	result = ""
+	while number > 0:
+		number -= 1
+		result = chr(number % 26 + ord('A')) + result
+		number //= 26
+	return result
+
+
+def _parse_profit_cell(cell_value) -> float:
+	"""Парсит значение ячейки для расчета профита (пустые и нечисловые значения = 0)"""
+	if not cell_value:
+		return 0.0
+	try:
+		return float(str(cell_value).replace(",", ".").replace(" ", ""))
+	except (ValueError, TypeError):
+		return 0.0
+
+
+def _calculate_profit_from_values(
+	row: int,
+	row_values: List[Any],
+	usd_to_byn_rate: float,
+	usd_to_rub_rate: float,
+	log_details: bool = True
+) -> float:
 	"""
-	loop = asyncio.get_event_loop()
-	return await loop.run_in_executor(
-		None,
-		_read_cell_value_sync,
-		sheet_id,
-		credentials_path,
-		cell_address,
-		sheet_name
+	Рассчитывает профит строки по уже прочитанным значениям B:BB.
+	Формула: ОКРУГЛ(СУММ(G9:AP9)/$BF$9-СУММ(AU9:BB9)-СУММ(AS9)+СУММ(B9:E9)/$BF$10+AQ9;0)
+	
+	Args:
+		row: Номер строки (для адресов ячеек в логе)
+		row_values: Значения строки, начиная со столбца B (хвостовые пустые ячейки могут отсутствовать)
+		usd_to_byn_rate: Курс USD→BYN (BF9)
+		usd_to_rub_rate: Курс USD→RUB (BF10)
+		log_details: Писать подробный расчет в лог (для одиночной строки)
+	
+	Returns:
+		Рассчитанный профит (округленный до целого)
+	"""
+	first_number = _column_letter_to_number(_PROFIT_FIRST_COLUMN)
+	
+	def cell_value(column: str) -> float:
+		index = _column_letter_to_number(column) - first_number
+		return _parse_profit_cell(row_values[index]) if 0 <= index < len(row_values) else 0.0
+	
+	def collect_range_values(start_col: str, end_col: str):
+		"""Собирает ненулевые значения с адресами ячеек из диапазона столбцов"""
+		cells_with_values = []
+		total = 0.0
+		for number in range(_column_letter_to_number(start_col), _column_letter_to_number(end_col) + 1):
+			col_letter = _column_number_to_letter(number)
+			value = cell_value(col_letter)
+			if value != 0:
+				cells_with_values.append((value, f"{col_letter}{row}"))
+				total += value
+		return total, cells_with_values
+	
+	# G9:AP9 - доходы в BYN (карты для Беларуси)
+	sum_byn, byn_cells = collect_range_values("G", "AP")
+	# B9:E9 - доходы в RUB (карты для России)
+	sum_rub, rub_cells = collect_range_values("B", "E")
+	# AU9:BB9 - расходы по LTC/XMR/USDT
+	sum_crypto, crypto_cells = collect_range_values("AU", "BB")
+	# AS9 - расходы по BTC
+	cell_btc = f"AS{row}"
+	btc_value = cell_value("AS")
+	# AQ9 - наличные в USD
+	cell_cash_usd = f"AQ{row}"
+	cash_usd_value = cell_value("AQ")
+	
+	# Рассчитываем компоненты формулы
+	byn_usd = sum_byn / usd_to_byn_rate if usd_to_byn_rate else 0
+	rub_usd = sum_rub / usd_to_rub_rate if usd_to_rub_rate else 0
+	
+	# Рассчитываем профит по формуле
+	# ОКРУГЛ(СУММ(G9:AP9)/$BF$9 - СУММ(AU9:BB9) - СУММ(AS9) + СУММ(B9:E9)/$BF$10 + AQ9; 0)
+	profit = byn_usd - sum_crypto - btc_value + rub_usd + cash_usd_value
+	
+	# Округляем до целого
+	profit_rounded = round(profit)
+	
+	if not log_details:
+		return float(profit_rounded)
+	
+	# Формируем подробный расчет для лога
+	calc_parts = []
+	
+	# Доходы BYN (делим на курс)
+	if byn_cells:
+		byn_parts = "+".join([f"{v}({addr})" for v, addr in byn_cells])
+		calc_parts.append(f"({byn_parts})/{usd_to_byn_rate}={byn_usd:.2f}")
+	
+	# Доходы RUB (делим на курс)
+	if rub_cells:
+		rub_parts = "+".join([f"{v}({addr})" for v, addr in rub_cells])
+		calc_parts.append(f"+({rub_parts})/{usd_to_rub_rate}={rub_usd:.2f}")
+	
+	# Расходы криптовалют AU:BB (вычитаем)
+	if crypto_cells:
+		crypto_parts = "+".join([f"{v}({addr})" for v, addr in crypto_cells])
+		calc_parts.append(f"-({crypto_parts})=-{sum_crypto:.0f}")
+	
+	# Расходы BTC (вычитаем)
+	if btc_value != 0:
+		calc_parts.append(f"-{btc_value:.0f}({cell_btc})")
+	
+	# Наличные USD (прибавляем)
+	if cash_usd_value != 0:
+		calc_parts.append(f"+{cash_usd_value:.0f}({cell_cash_usd})")
+	
+	calc_str = " ".join(calc_parts) if calc_parts else "0"
+	
+	logger.info(
+		f"📊 Расчет профита для строки {row}:\n"
+		f"   Формула: {calc_str} = {profit_rounded} USD"
 	)
+	
+	return float(profit_rounded)
 
 
-def _calculate_profit_from_row_sync(
+async def calculate_profit_from_row(
 	sheet_id: str,
 	credentials_path: str,
 	row: int,
 	usd_to_byn_rate: float,
 	usd_to_rub_rate: float,
-	sheet_name: Optional[str] = None
+	sheet_name: Optional[str] = None,
+	priority: int = SHEETS_PRIORITY_WRITE
 ) -> Optional[float]:
 	"""
-	Синхронная функция для расчета профита по формуле из Google Sheets.
-	Формула: ОКРУГЛ(СУММ(G9:AP9)/$BF$9-СУММ(AU9:BB9)-СУММ(AS9)+СУММ(B9:E9)/$BF$10+AQ9;0)
+	Рассчитывает профит строки по формуле из Google Sheets, читая B:BB одним запросом.
 	
 	Args:
 		sheet_id: ID Google Sheets таблицы
@@ -3239,143 +3683,79 @@ def _calculate_profit_from_row_sync(
 		usd_to_byn_rate: Курс USD→BYN (BF9)
 		usd_to_rub_rate: Курс USD→RUB (BF10)
 		sheet_name: Название листа (опционально)
+		priority: Приоритет в очереди запросов
 	
 	Returns:
 		Рассчитанный профит или None при ошибке
 	"""
 	try:
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets")
-			return None
-		
-		spreadsheet = client.open_by_key(sheet_id)
-		worksheet = _get_worksheet(spreadsheet, sheet_name)
-		
-		# Читаем диапазоны из строки
-		# G9:AP9 - доходы в BYN (карты для Беларуси)
-		range_byn = f"G{row}:AP{row}"
-		# B9:E9 - доходы в RUB (карты для России)
-		range_rub = f"B{row}:E{row}"
-		# AU9:BB9 - расходы по LTC/XMR/USDT
-		range_crypto = f"AU{row}:BB{row}"
-		# AS9 - расходы по BTC
-		cell_btc = f"AS{row}"
-		# AQ9 - наличные в USD
-		cell_cash_usd = f"AQ{row}"
-		
-		# Читаем все диапазоны
-		values_byn = worksheet.get(range_byn)
-		values_rub = worksheet.get(range_rub)
-		values_crypto = worksheet.get(range_crypto)
-		value_btc = worksheet.acell(cell_btc).value
-		value_cash_usd = worksheet.acell(cell_cash_usd).value
-		
-		# Функция для парсинга значения ячейки
-		def parse_cell_value(cell_value) -> float:
-			if not cell_value:
-				return 0.0
-			try:
-				return float(str(cell_value).replace(",", ".").replace(" ", ""))
-			except (ValueError, TypeError):
-				return 0.0
-		
-		# Собираем значения из диапазонов с адресами ячеек
-		def collect_range_values(values, start_col: str, row_num: int):
-			"""Собирает значения с адресами ячеек из диапазона"""
-			cells_with_values = []
-			total = 0.0
-			if values:
-				col_index = 0
-				for row_data in values:
-					if row_data:
-						for cell_value in row_data:
-							# Вычисляем букву столбца
-							col_letter = _get_column_letter(start_col, col_index)
-							value = parse_cell_value(cell_value)
-							if value != 0:
-								cells_with_values.append((value, f"{col_letter}{row_num}"))
-								total += value
-							col_index += 1
-			return total, cells_with_values
-		
-		# Вспомогательная функция для вычисления буквы столбца
-		def _get_column_letter(start_col: str, offset: int) -> str:
-			"""Вычисляет букву столбца с учетом смещения"""
-			# Преобразуем начальный столбец в число
-			col_num = 0
-			for char in start_col.upper():
-				col_num = col_num * 26 + (ord(char) - ord('A') + 1)
-			# Добавляем смещение
-			col_num += offset
-			# Преобразуем обратно в буквы
-			result = ""
-			while col_num > 0:
-				col_num -= 1
-				result = chr(col_num % 26 + ord('A')) + result
-				col_num //= 26
-			return result
-		
-		# Собираем данные из диапазонов
-		sum_byn, byn_cells = collect_range_values(values_byn, "G", row)
-		sum_rub, rub_cells = collect_range_values(values_rub, "B", row)
-		sum_crypto, crypto_cells = collect_range_values(values_crypto, "AU", row)
-		
-		# Получаем значения из отдельных ячеек
-		btc_value = parse_cell_value(value_btc)
-		cash_usd_value = parse_cell_value(value_cash_usd)
-		
-		# Рассчитываем компоненты формулы
-		byn_usd = sum_byn / usd_to_byn_rate if usd_to_byn_rate else 0
-		rub_usd = sum_rub / usd_to_rub_rate if usd_to_rub_rate else 0
-		
-		# Рассчитываем профит по формуле
-		# ОКРУГЛ(СУММ(G9:AP9)/$BF$9 - СУММ(AU9:BB9) - СУММ(AS9) + СУММ(B9:E9)/$BF$10 + AQ9; 0)
-		profit = byn_usd - sum_crypto - btc_value + rub_usd + cash_usd_value
-		
-		# Округляем до целого
-		profit_rounded = round(profit)
-		
-		# Формируем подробный расчет для лога
-		calc_parts = []
-		
-		# Доходы BYN (делим на курс)
-		if byn_cells:
-			byn_parts = "+".join([f"{v}({addr})" for v, addr in byn_cells])
-			calc_parts.append(f"({byn_parts})/{usd_to_byn_rate}={byn_usd:.2f}")
-		
-		# Доходы RUB (делим на курс)
-		if rub_cells:
-			rub_parts = "+".join([f"{v}({addr})" for v, addr in rub_cells])
-			calc_parts.append(f"+({rub_parts})/{usd_to_rub_rate}={rub_usd:.2f}")
-		
-		# Расходы криптовалют AU:BB (вычитаем)
-		if crypto_cells:
-			crypto_parts = "+".join([f"{v}({addr})" for v, addr in crypto_cells])
-			calc_parts.append(f"-({crypto_parts})=-{sum_crypto:.0f}")
-		
-		# Расходы BTC (вычитаем)
-		if btc_value != 0:
-			calc_parts.append(f"-{btc_value:.0f}({cell_btc})")
-		
-		# Наличные USD (прибавляем)
-		if cash_usd_value != 0:
-			calc_parts.append(f"+{cash_usd_value:.0f}({cell_cash_usd})")
-		
-		calc_str = " ".join(calc_parts) if calc_parts else "0"
-		
-		logger.info(
-			f"📊 Расчет профита для строки {row}:\n"
-			f"   Формула: {calc_str} = {profit_rounded} USD"
+		client = get_async_sheets_client(credentials_path)
+		values = await _run_sheets_api(
+			lambda: client.values_get(sheet_id, f"{_PROFIT_FIRST_COLUMN}{row}:{_PROFIT_LAST_COLUMN}{row}", sheet_name),
+			"read",
+			priority
 		)
-		
-		return float(profit_rounded)
-		
+		row_values = values[0] if values else []
+		return _calculate_profit_from_values(row, row_values, usd_to_byn_rate, usd_to_rub_rate)
 	except Exception as e:
 		logger.exception(f"❌ Ошибка расчета профита для строки {row}: {e}")
 		return None
 
 
+async def calculate_profits_for_rows(
+	sheet_id: str,
+	credentials_path: str,
+	start_row: int,
+	end_row: int,
+	usd_to_byn_rate: float,
+	usd_to_rub_rate: float,
+	sheet_name: Optional[str] = None,
+	priority: int = SHEETS_PRIORITY_STATS
+) -> Dict[int, float]:
+	"""
+	Рассчитывает профит для всех заполненных строк диапазона (например, блока дня недели)
+	одним запросом B{start_row}:BB{end_row}.
+	
+	Args:
+		sheet_id: ID Google Sheets таблицы
+		credentials_path: Путь к файлу с учетными данными
+		start_row: Первая строка диапазона
+		end_row: Последняя строка диапазона
+		usd_to_byn_rate: Курс USD→BYN
+		usd_to_rub_rate: Курс USD→RUB
+		sheet_name: Название листа (опционально)
+		priority: Приоритет в очереди запросов
+	
+	Returns:
+		Словарь {номер_строки: профит}; пустые строки пропускаются, при ошибке - пустой словарь
+	"""
+	if end_row < start_row:
+		return {}
+	try:
+		client = get_async_sheets_client(credentials_path)
+		values = await _run_sheets_api(
+			lambda: client.values_get(
+				sheet_id,
+				f"{_PROFIT_FIRST_COLUMN}{start_row}:{_PROFIT_LAST_COLUMN}{end_row}",
+				sheet_name
+			),
+			"read",
+			priority
+		)
+	except Exception as e:
+		logger.exception(f"❌ Ошибка чтения строк {start_row}-{end_row} для расчета профита: {e}")
+		return {}
+	
+	profits = {}
+	for offset, row_values in enumerate(values):
+		if not _is_row_filled(row_values):
+			continue
+		row = start_row + offset
+		profits[row] = _calculate_profit_from_values(row, row_values, usd_to_byn_rate, usd_to_rub_rate, log_details=False)
+	logger.info(f"📊 Рассчитан профит для {len(profits)} строк диапазона {start_row}-{end_row}")
+	return profits
+
+
 async def calculate_and_write_profit(
 	sheet_id: str,
 	credentials_path: str,
@@ -3401,9 +3781,8 @@ async def calculate_and_write_profit(
 		Рассчитанный профит или None при ошибке
 	"""
 	try:
-		# Рассчитываем профит
-		profit = await asyncio.to_thread(
-			_calculate_profit_from_row_sync,
+		# Рассчитываем профит (одно чтение строки B:BB)
+		profit = await calculate_profit_from_row(
 			sheet_id,
 			credentials_path,
 			row,
@@ -3416,16 +3795,18 @@ async def calculate_and_write_profit(
 			return None
 		
 		# Записываем профит в столбец BC
-		client = _get_google_sheets_client(credentials_path)
-		if not client:
-			logger.error("Не удалось создать клиент Google Sheets для записи профита")
-			return None
-		
-		spreadsheet = client.open_by_key(sheet_id)
-		worksheet = _get_worksheet(spreadsheet, sheet_name)
-		
 		cell_address = f"{profit_column}{row}"
-		worksheet.update(cell_address, [[int(profit)]])
+		client = get_async_sheets_client(credentials_path)
+		await _run_sheets_api(
+			lambda: client.values_batch_update(
+				sheet_id,
+				[{"range": cell_address, "values": [[int(profit)]]}],
+				sheet_name,
+				value_input_option="RAW"
+			),
+			"write",
+			SHEETS_PRIORITY_WRITE
+		)
 		logger.info(f"✅ Профит {int(profit)} USD записан в ячейку {cell_address}")
 		
 		return profit
@@ -3439,7 +3820,9 @@ async def calculate_profit_from_deal_data(
 	deal: Dict[str, Any],
 	db: Any,
 	usd_to_byn_rate: float,
-	usd_to_rub_rate: float
+	usd_to_rub_rate: float,
+	crypto_price_usd: Optional[float] = None,
+	log_details: bool = True
 ) -> Optional[float]:
 	"""
 	Рассчитывает профит на основе данных сделки.
@@ -3451,6 +3834,8 @@ async def calculate_profit_from_deal_data(
 		db: Экземпляр базы данных
 		usd_to_byn_rate: Курс USD→BYN
 		usd_to_rub_rate: Курс USD→RUB
+		crypto_price_usd: Курс криптовалюты (по умолчанию - текущий)
+		log_details: Логировать расчет (отключается при массовом пересчете)
 	
 	Returns:
 		Рассчитанный профит или None при ошибке
@@ -3465,9 +3850,10 @@ async def calculate_profit_from_deal_data(
 		if not amount_currency or not crypto_type or not crypto_amount:
 			return None
 		
-		# Получаем текущий курс криптовалюты
-		crypto_price_usd = 0.0
-		if crypto_type == "BTC":
+		# Получаем текущий курс криптовалюты (если не передан курс на момент сделки)
+		if crypto_price_usd:
+			pass
+		elif crypto_type == "BTC":
 			crypto_price_usd = await get_btc_price_usd() or 0.0
 		elif crypto_type == "LTC":
 			crypto_price_usd = await get_ltc_price_usd() or 0.0
@@ -3476,7 +3862,7 @@ async def calculate_profit_from_deal_data(
 		elif crypto_type == "USDT":
 			crypto_price_usd = 1.0  # USDT = 1 USD
 		
-		if crypto_price_usd == 0:
+		if not crypto_price_usd:
 			logger.warning(f"⚠️ Не удалось получить курс {crypto_type}")
 			return None
 		
@@ -3495,12 +3881,13 @@ async def calculate_profit_from_deal_data(
 		# Округляем до целого
 		profit_rounded = round(profit)
 		
-		logger.info(
-			f"📊 Расчет профита для deal_id={deal.get('id')}: "
-			f"{amount_currency} {country_code} / {usd_to_byn_rate if country_code == 'BYN' else usd_to_rub_rate} = {income_usd:.2f} USD (доход) - "
-			f"({crypto_amount} {crypto_type} × {crypto_price_usd:.2f} + 1 комиссия) = {crypto_cost_usd:.2f} USD (расход) = "
-			f"{profit_rounded} USD (профит)"
-		)
+		if log_details:
+			logger.info(
+				f"📊 Расчет профита для deal_id={deal.get('id')}: "
+				f"{amount_currency} {country_code} / {usd_to_byn_rate if country_code == 'BYN' else usd_to_rub_rate} = {income_usd:.2f} USD (доход) - "
+				f"({crypto_amount} {crypto_type} × {crypto_price_usd:.2f} + 1 комиссия) = {crypto_cost_usd:.2f} USD (расход) = "
+				f"{profit_rounded} USD (профит)"
+			)
 		
 		return float(profit_rounded)
 		
@@ -3509,6 +3896,79 @@ async def calculate_profit_from_deal_data(
 		return None
 
 
+async def recalculate_deal_profits(
+	deals: List[Dict[str, Any]],
+	db: Any
+) -> Dict[int, Optional[float]]:
+	"""
+	Пересчитывает профит старых сделок по курсам на момент создания каждой сделки.
+	
+	Курсы валют и криптовалют берутся из истории (app.fx_history, app.price_history)
+	одной выборкой на пару/монету для всех сделок, без обращений к сети.
+	Сделки, для которых курса на момент создания в истории нет (раньше начала истории
+	валюты или без точки курса крипты поблизости), не пересчитываются текущими курсами,
+	а возвращаются как отсутствующие (None).
+	
+	Args:
+		deals: Список сделок (словари buy_deals с полем created_at)
+		db: Экземпляр базы данных
+	
+	Returns:
+		Словарь {deal_id: профит или None}
+	"""
+	from app.fx_history import get_fx_rates_at
+	from app.price_history import get_prices_at
+	
+	if not deals:
+		return {}
+	timestamps = [float(deal.get("created_at") or time.time()) for deal in deals]
+	byn_rates = await get_fx_rates_at("BYN", timestamps)
+	rub_rates = await get_fx_rates_at("RUB", timestamps)
+	
+	# Курсы криптовалют: одна выборка истории на монету
+	crypto_prices: List[Optional[float]] = [None] * len(deals)
+	by_coin: Dict[str, List[int]] = {}
+	for index, deal in enumerate(deals):
+		crypto_type = (deal.get("crypto_type") or "").upper()
+		if crypto_type == "USDT":
+			crypto_prices[index] = 1.0
+		elif crypto_type:
+			by_coin.setdefault(crypto_type.lower(), []).append(index)
+	for coin, indexes in by_coin.items():
+		prices = await get_prices_at(coin, [timestamps[i] for i in indexes])
+		for index, price in zip(indexes, prices):
+			crypto_prices[index] = price
+	
+	result: Dict[int, Optional[float]] = {}
+	missing_fx: List[Any] = []
+	missing_prices: List[Any] = []
+	for index, deal in enumerate(deals):
+		deal_id = deal.get("id")
+		fx_rate = byn_rates[index] if deal.get("country_code", "BYN") == "BYN" else rub_rates[index]
+		if fx_rate is None:
+			missing_fx.append(deal_id)
+			result[deal_id] = None
+			continue
+		if crypto_prices[index] is None:
+			missing_prices.append(deal_id)
+			result[deal_id] = None
+			continue
+		result[deal_id] = await calculate_profit_from_deal_data(
+			deal,
+			db,
+			byn_rates[index] or 0.0,
+			rub_rates[index] or 0.0,
+			crypto_price_usd=crypto_prices[index],
+			log_details=False
+		)
+	logger.info(f"📊 Пересчитан профит {len(deals) - len(missing_fx) - len(missing_prices)} из {len(deals)} сделок по историческим курсам")
+	if missing_fx:
+		logger.warning(f"⚠️ Нет истории курса валюты на момент сделок, профит не пересчитан: deal_id={missing_fx}")
+	if missing_prices:
+		logger.warning(f"⚠️ Нет истории курса крипты на момент сделок, профит не пересчитан: deal_id={missing_prices}")
+	return result
+
+
 def calculate_profit_from_add_data(
 	crypto_list: List[Dict[str, Any]],
 	xmr_list: List[Dict[str, Any]],
@@ -0,0 +1,102 @@
+"""
+Общий HTTP-клиент приложения для внешних запросов (курсы валют, биржи, mempool.space).
+
+Одна aiohttp-сессия на все время работы бота: keep-alive соединения переиспользуются,
+DNS-ответы кэшируются, число соединений к одному хосту ограничено.
+Создается в main(), передается через app.di и закрывается при остановке.
+Google Sheets API использует собственную сессию (app.sheets_api).
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger("app.http_client")
+
+# Общий лимит соединений и лимит на один хост
+HTTP_CONNECTION_LIMIT = 100
+HTTP_CONNECTION_LIMIT_PER_HOST = 8
+# Сколько секунд держать простаивающее соединение открытым
+HTTP_KEEPALIVE_TIMEOUT = 60
+# Время жизни DNS-кэша (секунды)
+HTTP_DNS_CACHE_TTL = 300
+# Таймауты по умолчанию (отдельные запросы могут передавать свои)
+HTTP_DEFAULT_TIMEOUT = 15
+HTTP_CONNECT_TIMEOUT = 5
+
+
+class HttpClient:
+	"""Долгоживущая aiohttp-сессия со счетчиками переиспользования соединений"""
+
+	def __init__(self) -> None:
+		self._session: Optional[aiohttp.ClientSession] = None
+		self.requests = 0
+		self.connections_created = 0
+		self.connections_reused = 0
+		self.dns_cache_hits = 0
+		self.dns_cache_misses = 0
+		# Вызывается перед каждым запросом (main передает Database.flush: писатель БД
+		# не должен быть занят транзакцией обработчика на время сетевого запроса)
+		self.before_request: Optional[Callable[[], Awaitable[None]]] = None
+
+	def _trace_config(self) -> aiohttp.TraceConfig:
+		trace = aiohttp.TraceConfig()
+
+		async def on_request_start(session, ctx, params):
+			self.requests += 1
+			if self.before_request is not None:
+				await self.before_request()
+
+		async def on_connection_create_end(session, ctx, params):
+			self.connections_created += 1
+
+		async def on_connection_reuseconn(session, ctx, params):
+			self.connections_reused += 1
+
+		async def on_dns_cache_hit(session, ctx, params):
+			self.dns_cache_hits += 1
+
+		async def on_dns_cache_miss(session, ctx, params):
+			self.dns_cache_misses += 1
+
+		trace.on_request_start.append(on_request_start)
+		trace.on_connection_create_end.append(on_connection_create_end)
+		trace.on_connection_reuseconn.append(on_connection_reuseconn)
+		trace.on_dns_cache_hit.append(on_dns_cache_hit)
+		trace.on_dns_cache_miss.append(on_dns_cache_miss)
+		return trace
+
+	@property
+	def session(self) -> aiohttp.ClientSession:
+		"""Возвращает общую сессию (создается при первом обращении внутри event loop)"""
+		if self._session is None or self._session.closed:
+			connector = aiohttp.TCPConnector(
+				limit=HTTP_CONNECTION_LIMIT,
+				limit_per_host=HTTP_CONNECTION_LIMIT_PER_HOST,
+				keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+				ttl_dns_cache=HTTP_DNS_CACHE_TTL
+			)
+			self._session = aiohttp.ClientSession(
+				connector=connector,
+				timeout=aiohttp.ClientTimeout(total=HTTP_DEFAULT_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+				trace_configs=[self._trace_config()]
+			)
+		return self._session
+
+	def stats(self) -> Dict[str, Any]:
+		"""Счетчики запросов и переиспользования соединений"""
+		opened = self.connections_created + self.connections_reused
+		return {
+			"requests": self.requests,
+			"connections_created": self.connections_created,
+			"connections_reused": self.connections_reused,
+			"reuse_ratio": round(self.connections_reused / opened, 3) if opened else 0.0,
+			"dns_cache_hits": self.dns_cache_hits,
+			"dns_cache_misses": self.dns_cache_misses,
+		}
+
+	async def close(self) -> None:
+		if self._session is not None and not self._session.closed:
+			await self._session.close()
+		self._session = None
+		logger.info(f"🔌 HTTP-клиент закрыт: {self.stats()}")
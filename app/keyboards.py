@@ -1339,6 +1339,8 @@ def buy_calc_settings_kb(settings: dict) -> InlineKeyboardMarkup:
 	# Интервал обновления курсов криптовалют
 	crypto_interval = settings.get('crypto_rates_update_interval', 5)
 	kb.button(text=f"🪙 Обновление курсов: {crypto_interval} мин", callback_data="settings:buy_calc:edit:crypto_rates_update_interval")
+	max_stale = settings.get('crypto_price_max_stale_minutes', 30)
+	kb.button(text=f"⏳ Макс. возраст курса: {max_stale} мин", callback_data="settings:buy_calc:edit:crypto_price_max_stale_minutes")
 	kb.button(text="⬅️ Назад", callback_data="admin:settings")
 	kb.adjust(1)
 	return kb.as_markup()
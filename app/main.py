@@ -24,7 +24,8 @@ from app.db import Database
 from app.admin import admin_router, is_admin
 from app.keyboards import admin_menu_kb, client_menu_kb, buy_country_kb, buy_country_inline_kb, buy_crypto_kb, buy_crypto_inline_kb, buy_deal_confirm_kb, buy_deal_paid_kb, buy_deal_paid_reply_kb, buy_delivery_method_kb, buy_payment_confirmed_kb, order_action_kb, user_access_request_kb, sell_crypto_kb, sell_confirmation_kb, sell_order_user_reply_kb, question_user_reply_kb, question_reply_kb, order_user_reply_kb, bot_disabled_kb
 from app.di import get_admin_ids, get_admin_usernames
-from app.di import set_dependencies
+from app.di import set_dependencies, set_http_client
+from app.http_client import HttpClient
 from app.notifications import notification_ids
 
 
@@ -1566,12 +1567,19 @@ async def main() -> None:
 	if not settings.telegram_bot_token:
 		raise RuntimeError("TELEGRAM_BOT_TOKEN не задан. Создайте .env с токеном.")
 
-	db = Database(settings.database_path)
+	db = Database(settings.database_path, settings.db_reader_pool_size)
 	await db.connect()
 	set_dependencies(db, settings.admin_ids, settings.admin_usernames)
+	# Общий HTTP-клиент для внешних API (курсы, биржи, mempool.space)
+	http = HttpClient()
+	http.before_request = db.flush
+	set_http_client(http)
 	logger.debug("Database connected and dependencies set")
 
 	bot = Bot(token=settings.telegram_bot_token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+	# Перед каждым запросом к Telegram фиксируем транзакцию обработчика (освобождаем писателя БД)
+	from app.db import DbFlushRequestMiddleware
+	bot.session.middleware(DbFlushRequestMiddleware(db))
 	dp = Dispatcher(storage=MemoryStorage())
 	
 	# Инициализируем глобальные словари
@@ -1587,6 +1595,10 @@ async def main() -> None:
 	from app.rate_limiter import init_rate_limiters, RateLimitMiddleware, CallbackRateLimitMiddleware, periodic_cleanup as rate_limiter_cleanup
 	init_rate_limiters(settings)
 	
+	# Все изменения БД при обработке одного обновления - одной транзакцией
+	from app.db import DbTransactionMiddleware
+	dp.update.outer_middleware(DbTransactionMiddleware(db))
+	
 	# Добавляем rate limiting middleware для защиты от flood атак
 	dp.message.middleware(RateLimitMiddleware())
 	dp.callback_query.middleware(CallbackRateLimitMiddleware())
@@ -2007,19 +2019,20 @@ async def main() -> None:
 		if not is_valid:
 			await message.answer(error_msg)
 			return
-		from app.google_sheets import get_btc_price_usd, get_ltc_price_usd, get_xmr_price_usd
+		from app.google_sheets import get_crypto_price_with_age, format_crypto_price_age
 		crypto_price_usd = None
+		crypto_price_age = 0.0
 		if crypto_type == "BTC":
-			crypto_price_usd = await get_btc_price_usd()
+			crypto_price_usd, crypto_price_age = await get_crypto_price_with_age("btc")
 			crypto_symbol = "₿"
 		elif crypto_type == "LTC":
-			crypto_price_usd = await get_ltc_price_usd()
+			crypto_price_usd, crypto_price_age = await get_crypto_price_with_age("ltc")
 			crypto_symbol = "Ł"
 		elif crypto_type == "USDT":
 			crypto_price_usd = 1.0
 			crypto_symbol = "₮"
 		else:
-			crypto_price_usd = await get_xmr_price_usd()
+			crypto_price_usd, crypto_price_age = await get_crypto_price_with_age("xmr")
 			crypto_symbol = "ɱ"
 		if crypto_price_usd is None:
 			await message.answer("❌ Не удалось получить курс криптовалюты. Попробуйте позже.")
@@ -2123,6 +2136,7 @@ async def main() -> None:
 			crypto_type=crypto_type,
 			crypto_symbol=crypto_symbol,
 			crypto_price_usd=crypto_price_usd,
+			crypto_price_age=crypto_price_age,
 			crypto_price_with_markup=crypto_price_with_markup,
 			markup_percent=markup_percent,
 			total_usd=total_usd,
@@ -2169,7 +2183,8 @@ async def main() -> None:
 				f"🚨 <b>Крупная заявка</b>\n\n"
 				f"Пользователь: {message.from_user.full_name or 'Не указано'} (@{message.from_user.username or 'нет'})\n"
 				f"Крипта: {crypto_display}\n"
-				f"Кол-во: {amount} {crypto_display}\n\n"
+				f"Кол-во: {amount} {crypto_display}\n"
+				f"Курс: ${crypto_price_usd:,.2f} ({format_crypto_price_age(crypto_price_age)})\n\n"
 				f"📍 Этап: Согласование цены"
 			)
 			from app.keyboards import deal_alert_admin_kb
@@ -7652,12 +7667,49 @@ async def main() -> None:
 	
 	# Запускаем задачу обновления курсов в фоне
 	asyncio.create_task(periodic_crypto_rates_update())
-	
+
+	# Заранее авторизуем клиент Google Sheets, чтобы первая команда не ждала авторизацию
+	from app.google_sheets import warm_up_google_sheets
+	asyncio.create_task(warm_up_google_sheets(
+		settings.google_sheet_id,
+		settings.google_credentials_path,
+		settings.google_sheet_name
+	))
+
+	# Фоновый воркер очереди записи в Google Sheets (/add, /rate, /move)
+	from app.sheets_outbox import run_sheets_outbox_worker
+	from app.admin import on_sheets_outbox_done, on_sheets_outbox_failed
+	asyncio.create_task(run_sheets_outbox_worker(bot, on_sheets_outbox_done, on_sheets_outbox_failed))
+
+	# Отслеживание зачислений BTC (оповещение о зачислении)
+	from app.deposit_watcher import run_deposit_watcher
+	asyncio.create_task(run_deposit_watcher(bot))
+
+	# История курсов: прореживание старых точек и (если настроен) поток тикеров
+	from app.price_history import run_price_history_downsampler
+	asyncio.create_task(run_price_history_downsampler())
+	if settings.price_stream_url:
+		from app.price_stream import run_price_stream
+		asyncio.create_task(run_price_stream(settings.price_stream_url))
+
+	# Фоновое обновление снапшота балансов и профитов для /stat_bk и /stat_k
+	from app.google_sheets import run_stats_snapshot_refresher
+	asyncio.create_task(run_stats_snapshot_refresher(settings.stats_snapshot_ttl))
+
 	logger.debug("Starting polling...")
 	try:
 		await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 	finally:
 		logger.debug("Shutting down, closing DB")
+		from app.sheets_api import close_async_sheets_clients
+		await close_async_sheets_clients()
+		from app.single_flight import get_single_flight_stats
+		logger.info(f"🔗 Объединенные запросы: {get_single_flight_stats()}")
+		from app.google_sheets import get_sheets_scheduler_stats
+		logger.info(f"🚦 Очередь запросов Google Sheets: {get_sheets_scheduler_stats()}")
+		logger.info(f"💾 Транзакции БД: {db.get_transaction_stats()}")
+		logger.info(f"💾 Пул соединений БД: {db.get_pool_stats()}")
+		await http.close()
 		await db.close()
 
 
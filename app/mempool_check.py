@@ -3,6 +3,8 @@ import aiohttp
 import logging
 from typing import Optional
 
+from app.di import get_http
+
 logger = logging.getLogger("app.mempool_check")
 
 
@@ -24,20 +26,20 @@ async def check_btc_transaction(wallet_address: str) -> tuple[bool, Optional[str
 	api_url = f"https://mempool.space/api/address/{wallet_address}"
 	
 	try:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(api_url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-				if response.status == 200:
-					data = await response.json()
-					chain_stats = data.get("chain_stats", {})
-					tx_count = chain_stats.get("tx_count", 0)
-					
-					has_transactions = tx_count >= 1
-					logger.info(f"✅ Проверка адреса {wallet_address}: tx_count={tx_count}, has_transactions={has_transactions}")
-					return has_transactions, None
-				else:
-					error_msg = f"Ошибка API: статус {response.status}"
-					logger.warning(f"⚠️ {error_msg} для адреса {wallet_address}")
-					return False, error_msg
+		session = get_http().session
+		async with session.get(api_url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+			if response.status == 200:
+				data = await response.json()
+				chain_stats = data.get("chain_stats", {})
+				tx_count = chain_stats.get("tx_count", 0)
+				
+				has_transactions = tx_count >= 1
+				logger.info(f"✅ Проверка адреса {wallet_address}: tx_count={tx_count}, has_transactions={has_transactions}")
+				return has_transactions, None
+			else:
+				error_msg = f"Ошибка API: статус {response.status}"
+				logger.warning(f"⚠️ {error_msg} для адреса {wallet_address}")
+				return False, error_msg
 	except aiohttp.ClientError as e:
 		error_msg = f"Ошибка подключения к API: {e}"
 		logger.warning(f"⚠️ {error_msg}")
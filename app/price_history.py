@@ -0,0 +1,142 @@
+"""История курсов криптовалют.
+
+Каждый полученный курс (периодическое обновление, запрос из API, тик WebSocket-потока)
+дописывается в таблицу price_history. Старые точки периодически усредняются:
+исходные точки хранятся сутки, 5-минутные средние - 30 дней, дальше - часовые.
+Последний тик каждой монеты хранится в памяти для расчета заявок без обращения к БД.
+"""
+import asyncio
+import bisect
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.di import get_db
+
+logger = logging.getLogger("app.price_history")
+
+# Ступени прореживания: (исходное разрешение, итоговое разрешение, возраст точек в секундах)
+PRICE_HISTORY_DOWNSAMPLING = [
+	(0, 300, 24 * 3600),
+	(300, 3600, 30 * 24 * 3600),
+]
+# Как часто прореживать историю (секунды)
+PRICE_HISTORY_DOWNSAMPLE_INTERVAL = 3600
+# Точка истории дальше этого расстояния от запрошенного момента не считается курсом на этот момент:
+# шаг самой грубой ступени прореживания (секунды)
+PRICE_HISTORY_MAX_GAP = PRICE_HISTORY_DOWNSAMPLING[-1][1]
+
+# Последний тик по монете: {монета: (курс, время unix)}
+_latest_ticks: Dict[str, Tuple[float, float]] = {}
+
+
+def update_latest_tick(coin: str, price: float, ts: Optional[float] = None) -> None:
+	"""Запоминает последний курс монеты в памяти (без записи в БД)"""
+	ts = time.time() if ts is None else ts
+	current = _latest_ticks.get(coin)
+	if current is None or ts >= current[1]:
+		_latest_ticks[coin] = (price, ts)
+
+
+def get_latest_tick(coin: str) -> Optional[Tuple[float, float]]:
+	"""
+	Последний известный тик курса монеты.
+
+	Returns:
+		(курс, время unix) или None
+	"""
+	return _latest_ticks.get(coin.lower())
+
+
+async def record_prices(prices: Dict[str, Optional[float]], ts: Optional[float] = None) -> None:
+	"""
+	Дописывает курсы в историю и обновляет последние тики.
+
+	Args:
+		prices: Словарь {монета: курс в USD}, None пропускаются
+		ts: Время курсов (по умолчанию - сейчас)
+	"""
+	ts = time.time() if ts is None else ts
+	points = []
+	for coin, price in prices.items():
+		if not price:
+			continue
+		update_latest_tick(coin, price, ts)
+		points.append((coin, int(ts), price))
+	try:
+		await get_db().add_price_points(points)
+	except Exception as e:
+		logger.warning(f"⚠️ Не удалось записать курсы в историю: {e}")
+
+
+async def get_price_at(coin: str, ts: float) -> Optional[float]:
+	"""
+	Курс монеты на момент времени (ближайшая точка истории, без обращения к сети).
+
+	Args:
+		coin: Код монеты ("btc")
+		ts: Время unix (например, время сделки)
+
+	Returns:
+		Курс в USD или None, если ближайшая точка дальше PRICE_HISTORY_MAX_GAP (или истории нет)
+	"""
+	point = await get_db().get_price_at(coin.lower(), int(ts))
+	if point is None or abs(point[0] - ts) > PRICE_HISTORY_MAX_GAP:
+		return None
+	return point[1]
+
+
+async def get_prices_at(coin: str, timestamps: List[float]) -> List[Optional[float]]:
+	"""
+	Курсы монеты на множество моментов времени: одна выборка истории на всю выборку.
+
+	Args:
+		coin: Код монеты ("btc")
+		timestamps: Моменты времени unix
+
+	Returns:
+		Список курсов в том же порядке (ближайшая точка истории; None - в пределах
+		PRICE_HISTORY_MAX_GAP точек нет)
+	"""
+	if not timestamps:
+		return []
+	coin = coin.lower()
+	# Запас по краям на шаг прореживания: старые точки усреднены по часу
+	points = await get_db().get_price_history(
+		coin,
+		int(min(timestamps)) - PRICE_HISTORY_MAX_GAP,
+		int(max(timestamps)) + PRICE_HISTORY_MAX_GAP
+	)
+	point_ts = [point[0] for point in points]
+	result: List[Optional[float]] = []
+	for ts in timestamps:
+		index = bisect.bisect_left(point_ts, ts)
+		candidates = [points[i] for i in (index - 1, index) if 0 <= i < len(points)]
+		nearest = min(candidates, key=lambda point: abs(point[0] - ts)) if candidates else None
+		if nearest is not None and abs(nearest[0] - ts) <= PRICE_HISTORY_MAX_GAP:
+			result.append(nearest[1])
+		else:
+			result.append(None)
+	return result
+
+
+async def downsample_price_history() -> None:
+	"""Усредняет старые точки истории по ступеням PRICE_HISTORY_DOWNSAMPLING"""
+	db = get_db()
+	now = int(time.time())
+	for source, target, max_age in PRICE_HISTORY_DOWNSAMPLING:
+		removed = await db.downsample_price_history(source, target, now - max_age)
+		if removed:
+			logger.debug(f"🗜 История курсов: {removed} точек усреднено до шага {target} сек")
+
+
+async def run_price_history_downsampler() -> None:
+	"""Фоновая задача: периодически прореживает историю курсов"""
+	while True:
+		try:
+			await downsample_price_history()
+		except asyncio.CancelledError:
+			break
+		except Exception as e:
+			logger.warning(f"⚠️ Ошибка прореживания истории курсов: {e}")
+		await asyncio.sleep(PRICE_HISTORY_DOWNSAMPLE_INTERVAL)
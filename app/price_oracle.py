@@ -0,0 +1,391 @@
+"""
+Оракул курсов криптовалют: параллельные (hedged) запросы к нескольким биржам.
+
+Провайдеры (Binance, Coinbase, CoinGecko) опрашиваются не по очереди, а с небольшим
+сдвигом: сначала самый быстрый и надежный по статистике, следующий - если первый
+не ответил за ORACLE_HEDGE_DELAY или вернул ошибку. После первого корректного ответа
+оракул ждет еще ORACLE_QUORUM_WINDOW и берет медиану всех полученных цен.
+Цены, слишком далекие от последнего известного курса, отбрасываются как выбросы;
+резкое движение принимается, если его подтверждают два провайдера или несколько
+запросов подряд.
+
+Для периодического обновления всех курсов есть fetch_prices: каждый провайдер
+получает один запрос сразу на все монеты, провайдеры опрашиваются параллельно.
+"""
+import asyncio
+import json
+import logging
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from app.di import get_http
+
+logger = logging.getLogger("app.price_oracle")
+
+# Таймаут одного запроса к провайдеру (секунды)
+ORACLE_REQUEST_TIMEOUT = 5
+# Через сколько секунд без ответа запускать запрос к следующему провайдеру
+ORACLE_HEDGE_DELAY = 0.3
+# Сколько ждать ответов остальных провайдеров после первого корректного (секунды)
+ORACLE_QUORUM_WINDOW = 0.15
+# Максимальное отклонение от последнего известного курса (доля), больше - выброс
+ORACLE_MAX_DEVIATION = 0.2
+# Сколько запросов подряд с согласованными между собой выбросами подтверждают резкое движение
+# курса (для монет, которые котирует один провайдер - иначе такой курс не приняли бы никогда)
+ORACLE_OUTLIER_CONFIRMATIONS = 3
+# Вес нового замера в скользящем среднем задержки и доли ошибок
+ORACLE_EWMA_ALPHA = 0.3
+
+# Идентификаторы монет в CoinGecko (у Binance и Coinbase символ выводится из кода монеты)
+COINGECKO_IDS: Dict[str, str] = {
+	"btc": "bitcoin",
+	"ltc": "litecoin",
+	"xmr": "monero",
+	"usdt": "tether",
+	"eth": "ethereum",
+	"ton": "the-open-network",
+	"trx": "tron",
+	"sol": "solana",
+}
+# Монеты, которые сами являются котировочной валютой Binance (пары XUSDT для них нет)
+_BINANCE_QUOTE_COINS = {"usdt"}
+
+
+def provider_symbol(provider: str, coin: str) -> Optional[str]:
+	"""Символ монеты у провайдера или None, если провайдер ее не котирует"""
+	coin = coin.lower()
+	if provider == "binance":
+		return None if coin in _BINANCE_QUOTE_COINS else f"{coin.upper()}USDT"
+	if provider == "coinbase":
+		return coin.upper()
+	if provider == "coingecko":
+		return COINGECKO_IDS.get(coin)
+	return None
+
+
+async def _get_json(url: str, params: Optional[Dict[str, str]] = None) -> Any:
+	session = get_http().session
+	async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=ORACLE_REQUEST_TIMEOUT)) as response:
+		if response.status != 200:
+			raise RuntimeError(f"HTTP {response.status}")
+		return await response.json(content_type=None)
+
+
+async def _prices_from_binance(symbols: List[str]) -> Dict[str, float]:
+	"""Курсы нескольких пар одним запросом ticker/price?symbols=[...]"""
+	url = "https://api.binance.com/api/v3/ticker/price"
+	if len(symbols) == 1:
+		data = [await _get_json(url, {"symbol": symbols[0]})]
+	else:
+		try:
+			data = await _get_json(url, {"symbols": json.dumps(symbols, separators=(",", ":"))})
+		except RuntimeError:
+			# Binance отклоняет весь запрос, если хотя бы одной пары нет (HTTP 400) -
+			# берем полный список тикеров, это тоже один запрос
+			data = await _get_json(url)
+	wanted = set(symbols)
+	return {item["symbol"]: float(item["price"]) for item in data if item.get("symbol") in wanted}
+
+
+async def _prices_from_coinbase(symbols: List[str]) -> Dict[str, float]:
+	"""Курсы всех монет одним запросом: курсы USD к монетам, цена = 1 / курс"""
+	data = await _get_json("https://api.coinbase.com/v2/exchange-rates", {"currency": "USD"})
+	rates = data["data"]["rates"]
+	result = {}
+	for symbol in symbols:
+		rate = float(rates.get(symbol) or 0)
+		if rate > 0:
+			result[symbol] = 1 / rate
+	return result
+
+
+async def _prices_from_coingecko(symbols: List[str]) -> Dict[str, float]:
+	"""Курсы нескольких монет одним запросом simple/price?ids=..."""
+	data = await _get_json(
+		"https://api.coingecko.com/api/v3/simple/price",
+		{"ids": ",".join(symbols), "vs_currencies": "usd"}
+	)
+	return {symbol: float(data[symbol]["usd"]) for symbol in symbols if "usd" in data.get(symbol, {})}
+
+
+# Провайдер получает список своих символов и возвращает {символ: цена в USD}
+ProviderFunc = Callable[[List[str]], Awaitable[Dict[str, float]]]
+
+_PROVIDERS: Dict[str, ProviderFunc] = {
+	"binance": _prices_from_binance,
+	"coinbase": _prices_from_coinbase,
+	"coingecko": _prices_from_coingecko,
+}
+
+
+class _ProviderStats:
+	"""Скользящая статистика провайдера: задержка и доля ошибок"""
+
+	def __init__(self) -> None:
+		self.requests = 0
+		self.errors = 0
+		self.outliers = 0
+		self.latency = 0.5  # Начальная оценка, чтобы новые провайдеры не считались медленными
+		self.error_rate = 0.0
+
+	def record(self, latency: float, ok: bool) -> None:
+		self.requests += 1
+		if not ok:
+			self.errors += 1
+		self.latency = (1 - ORACLE_EWMA_ALPHA) * self.latency + ORACLE_EWMA_ALPHA * latency
+		self.error_rate = (1 - ORACLE_EWMA_ALPHA) * self.error_rate + ORACLE_EWMA_ALPHA * (0.0 if ok else 1.0)
+
+	def score(self) -> float:
+		"""Чем меньше, тем раньше провайдер опрашивается: задержка со штрафом за ошибки"""
+		return self.latency * (1 + 4 * self.error_rate)
+
+
+class PriceOracle:
+	"""Параллельный опрос провайдеров курса с учетом их статистики"""
+
+	def __init__(self, providers: Optional[Dict[str, ProviderFunc]] = None) -> None:
+		self._providers = providers if providers is not None else _PROVIDERS
+		self._stats: Dict[str, _ProviderStats] = {name: _ProviderStats() for name in self._providers}
+		# Неподтвержденное резкое движение курса: {монета: (цена выбросов, запросов подряд)}
+		self._pending_moves: Dict[str, Tuple[float, int]] = {}
+
+	def provider_order(self, coin: str) -> List[str]:
+		names = [name for name in self._providers if provider_symbol(name, coin)]
+		return sorted(names, key=lambda name: self._stats[name].score())
+
+	async def _query(self, provider: str, coin: str) -> Tuple[str, Optional[float]]:
+		symbol = provider_symbol(provider, coin)
+		started = time.monotonic()
+		try:
+			price = (await self._providers[provider]([symbol])).get(symbol)
+			if not price or price <= 0:
+				raise ValueError(f"некорректная цена {price}")
+		except asyncio.CancelledError:
+			raise
+		except Exception as e:
+			self._stats[provider].record(time.monotonic() - started, ok=False)
+			logger.debug(f"{provider} API недоступен для {coin.upper()}: {e}")
+			return provider, None
+		self._stats[provider].record(time.monotonic() - started, ok=True)
+		return provider, price
+
+	def _is_outlier(self, price: float, last_known: Optional[float]) -> bool:
+		return bool(last_known) and abs(price / last_known - 1) > ORACLE_MAX_DEVIATION
+
+	def _accept_outliers(self, coin: str, outliers: List[Tuple[str, float]]) -> bool:
+		"""
+		Решает, принять ли выбросы как реальное движение курса: их согласованно показывают
+		несколько провайдеров или ORACLE_OUTLIER_CONFIRMATIONS запросов подряд дают
+		близкие друг к другу выбросы.
+		"""
+		if not outliers:
+			return False
+		price = statistics.median(p for _, p in outliers)
+		pending = self._pending_moves.get(coin)
+		if pending and abs(price / pending[0] - 1) <= ORACLE_MAX_DEVIATION:
+			count = pending[1] + 1
+		else:
+			count = 1
+		if len(outliers) >= 2 or count >= ORACLE_OUTLIER_CONFIRMATIONS:
+			self._pending_moves.pop(coin, None)
+			logger.warning(
+				f"⚠️ Курс {coin.upper()} резко изменился "
+				f"(провайдеров: {len(outliers)}, запросов подряд: {count}), принимаем"
+			)
+			return True
+		self._pending_moves[coin] = (price, count)
+		return False
+
+	async def fetch_price(self, coin: str, last_known: Optional[float] = None) -> Optional[float]:
+		"""
+		Получает курс монеты в USD.
+
+		Args:
+			coin: Код монеты ("btc", "ltc", "xmr")
+			last_known: Последний известный курс (для отбраковки выбросов)
+
+		Returns:
+			Курс (медиана корректных ответов) или None, если ни один провайдер не ответил
+		"""
+		order = self.provider_order(coin)
+		if not order:
+			logger.warning(f"⚠️ Нет провайдеров курса для {coin.upper()}")
+			return None
+
+		pending: Dict[asyncio.Task, str] = {}
+		prices: List[Tuple[str, float]] = []
+		outliers: List[Tuple[str, float]] = []
+		next_index = 0
+		first_answer_at: Optional[float] = None
+
+		def launch_next() -> None:
+			nonlocal next_index
+			if next_index < len(order):
+				provider = order[next_index]
+				next_index += 1
+				pending[asyncio.create_task(self._query(provider, coin))] = provider
+
+		launch_next()
+		try:
+			while pending:
+				if first_answer_at is not None:
+					timeout = max(0.0, first_answer_at + ORACLE_QUORUM_WINDOW - time.monotonic())
+				elif next_index < len(order):
+					timeout = ORACLE_HEDGE_DELAY
+				else:
+					timeout = None
+				done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+				if not done:
+					if first_answer_at is not None:
+						break  # Окно ожидания остальных ответов истекло
+					launch_next()  # Текущие провайдеры медлят - подключаем следующего
+					continue
+				for task in done:
+					pending.pop(task)
+					provider, price = task.result()
+					if price is None:
+						if first_answer_at is None:
+							launch_next()  # Ошибка - сразу пробуем следующего провайдера
+						continue
+					if self._is_outlier(price, last_known):
+						self._stats[provider].outliers += 1
+						outliers.append((provider, price))
+						logger.warning(
+							f"⚠️ {provider}: курс {coin.upper()} ${price:,.2f} отличается от последнего "
+							f"${last_known:,.2f} более чем на {ORACLE_MAX_DEVIATION:.0%}, ответ отброшен"
+						)
+						if first_answer_at is None:
+							launch_next()
+						continue
+					prices.append((provider, price))
+					if first_answer_at is None:
+						first_answer_at = time.monotonic()
+				if first_answer_at is None and not pending and next_index < len(order):
+					launch_next()
+		finally:
+			for task in pending:
+				task.cancel()
+
+		if prices:
+			self._pending_moves.pop(coin, None)
+		elif self._accept_outliers(coin, outliers):
+			# Резкое движение подтверждено - это не выброс, а рынок
+			prices = outliers
+		if not prices:
+			return None
+
+		price = statistics.median(p for _, p in prices)
+		sources = ", ".join(f"{name}=${p:,.2f}" for name, p in prices)
+		logger.info(f"✅ Курс {coin.upper()} = ${price:,.2f} USD ({sources})")
+		return price
+
+	async def _query_batch(self, provider: str, symbols: List[str]) -> Dict[str, float]:
+		started = time.monotonic()
+		try:
+			prices = await self._providers[provider](symbols)
+		except asyncio.CancelledError:
+			raise
+		except Exception as e:
+			self._stats[provider].record(time.monotonic() - started, ok=False)
+			logger.debug(f"{provider} API недоступен для {', '.join(symbols)}: {e}")
+			return {}
+		self._stats[provider].record(time.monotonic() - started, ok=True)
+		return {symbol: price for symbol, price in prices.items() if price and price > 0}
+
+	async def fetch_prices(
+		self,
+		coins: List[str],
+		last_known: Optional[Dict[str, Optional[float]]] = None
+	) -> Dict[str, Optional[float]]:
+		"""
+		Получает курсы нескольких монет: один запрос на провайдера, провайдеры параллельно.
+
+		Args:
+			coins: Коды монет ("btc", "ltc", ...)
+			last_known: Последние известные курсы по монетам (для отбраковки выбросов)
+
+		Returns:
+			Словарь {монета: курс (медиана ответов провайдеров) или None}
+		"""
+		last_known = last_known or {}
+		coins = list(dict.fromkeys(coin.lower() for coin in coins))
+		requests: Dict[str, Dict[str, str]] = {}  # провайдер -> {символ: монета}
+		for coin in coins:
+			for provider in self._providers:
+				symbol = provider_symbol(provider, coin)
+				if symbol:
+					requests.setdefault(provider, {})[symbol] = coin
+
+		names = list(requests)
+		answers = await asyncio.gather(*(self._query_batch(name, list(requests[name])) for name in names))
+
+		quotes: Dict[str, List[Tuple[str, float]]] = {coin: [] for coin in coins}
+		for provider, prices in zip(names, answers):
+			for symbol, price in prices.items():
+				quotes[requests[provider][symbol]].append((provider, price))
+
+		result: Dict[str, Optional[float]] = {}
+		for coin in coins:
+			known = last_known.get(coin)
+			prices = [(name, p) for name, p in quotes[coin] if not self._is_outlier(p, known)]
+			outliers = [(name, p) for name, p in quotes[coin] if self._is_outlier(p, known)]
+			for name, _ in outliers:
+				self._stats[name].outliers += 1
+			if outliers and prices:
+				logger.warning(
+					f"⚠️ Курс {coin.upper()}: отброшены выбросы "
+					f"{', '.join(f'{name}=${p:,.2f}' for name, p in outliers)} (последний ${known:,.2f})"
+				)
+			if prices:
+				self._pending_moves.pop(coin, None)
+			elif self._accept_outliers(coin, outliers):
+				prices = outliers
+			if not prices:
+				logger.warning(f"⚠️ Не удалось получить курс {coin.upper()} ни у одного провайдера")
+				result[coin] = None
+				continue
+			result[coin] = statistics.median(p for _, p in prices)
+			sources = ", ".join(f"{name}=${p:,.2f}" for name, p in prices)
+			logger.info(f"✅ Курс {coin.upper()} = ${result[coin]:,.2f} USD ({sources})")
+		return result
+
+	def stats(self) -> Dict[str, Dict[str, Any]]:
+		return {
+			name: {
+				"requests": s.requests,
+				"errors": s.errors,
+				"outliers": s.outliers,
+				"error_rate": round(s.error_rate, 3),
+				"latency_ms": round(s.latency * 1000),
+			}
+			for name, s in self._stats.items()
+		}
+
+
+_oracle = PriceOracle()
+
+
+async def fetch_crypto_price(coin: str, last_known: Optional[float] = None) -> Optional[float]:
+	"""Получает курс монеты в USD через общий оракул (см. PriceOracle.fetch_price)"""
+	return await _oracle.fetch_price(coin, last_known)
+
+
+async def fetch_crypto_prices(
+	coins: List[str],
+	last_known: Optional[Dict[str, Optional[float]]] = None
+) -> Dict[str, Optional[float]]:
+	"""Получает курсы нескольких монет через общий оракул (см. PriceOracle.fetch_prices)"""
+	return await _oracle.fetch_prices(coins, last_known)
+
+
+def is_price_outlier(price: float, last_known: Optional[float]) -> bool:
+	"""Слишком ли далек курс от последнего известного (та же проверка, что у провайдеров оракула)"""
+	return _oracle._is_outlier(price, last_known)
+
+
+def get_price_oracle_stats() -> Dict[str, Dict[str, Any]]:
+	"""Возвращает статистику провайдеров курса: запросы, ошибки, задержка"""
+	return _oracle.stats()
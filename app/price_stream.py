@@ -0,0 +1,209 @@
+"""Потоковое получение курсов через WebSocket (необязательный режим).
+
+Подключается к потоку тикеров в формате Binance (miniTicker, combined stream),
+обновляет последние тики в памяти (app.price_history) и раз в
+PRICE_STREAM_FLUSH_INTERVAL секунд дописывает последний тик каждой монеты в историю.
+При обрыве соединения переподключается с растущей задержкой.
+
+Включается настройкой PRICE_STREAM_URL, например wss://stream.binance.com:9443/stream.
+Значение "fake" поднимает локальный поток со случайным блужданием курса
+(start_fake_ticker_feed) - для тестов и разработки без сети; оно допускается только
+вместе с GOOGLE_SHEETS_BACKEND=fake, чтобы случайные курсы не попали в настоящую таблицу.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from app.di import get_db, get_http
+from app.price_history import update_latest_tick
+
+logger = logging.getLogger("app.price_stream")
+
+# Как часто записывать накопленные тики в историю (секунды)
+PRICE_STREAM_FLUSH_INTERVAL = 10
+# Задержка переподключения: от минимальной, удваивается до максимальной (секунды)
+PRICE_STREAM_RECONNECT_MIN = 1
+PRICE_STREAM_RECONNECT_MAX = 60
+
+_stats: Dict[str, Any] = {
+	"connected": False,
+	"messages": 0,
+	"ticks": 0,
+	"reconnects": 0,
+	"flushed_points": 0,
+}
+
+
+def _stream_url(base_url: str, coins: List[str]) -> str:
+	streams = "/".join(f"{coin}usdt@miniTicker" for coin in coins)
+	separator = "&" if "?" in base_url else "?"
+	return f"{base_url}{separator}streams={streams}"
+
+
+def _parse_ticker_message(message: Dict[str, Any]) -> Optional[Tuple[str, float, float]]:
+	"""
+	Разбирает сообщение miniTicker (обернутое в combined stream или нет).
+
+	Returns:
+		(монета, курс, время unix) или None, если это не тикер пары к USDT
+	"""
+	payload = message.get("data", message)
+	symbol = str(payload.get("s") or "")
+	if not symbol.endswith("USDT") or "c" not in payload:
+		return None
+	price = float(payload["c"])
+	if price <= 0:
+		return None
+	event_ms = payload.get("E")
+	ts = event_ms / 1000 if event_ms else time.time()
+	return symbol[:-4].lower(), price, ts
+
+
+async def _flush_ticks(pending: Dict[str, Tuple[float, float]]) -> None:
+	if not pending:
+		return
+	points = [(coin, int(ts), price) for coin, (price, ts) in pending.items()]
+	pending.clear()
+	try:
+		await get_db().add_price_points(points)
+		_stats["flushed_points"] += len(points)
+	except Exception as e:
+		logger.warning(f"⚠️ Не удалось записать тики в историю курсов: {e}")
+
+
+async def _consume(url: str) -> None:
+	"""Читает поток до обрыва соединения"""
+	pending: Dict[str, Tuple[float, float]] = {}
+	last_flush = time.monotonic()
+	session = get_http().session
+	async with session.ws_connect(url, heartbeat=30) as ws:
+		_stats["connected"] = True
+		logger.info(f"📡 Подключен поток курсов: {url}")
+		try:
+			async for msg in ws:
+				if msg.type != aiohttp.WSMsgType.TEXT:
+					if msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+						break
+					continue
+				_stats["messages"] += 1
+				try:
+					tick = _parse_ticker_message(json.loads(msg.data))
+				except (TypeError, ValueError) as e:
+					logger.debug(f"Некорректное сообщение потока курсов: {e}")
+					continue
+				if tick is None:
+					continue
+				coin, price, ts = tick
+				_stats["ticks"] += 1
+				update_latest_tick(coin, price, ts)
+				pending[coin] = (price, ts)
+				if time.monotonic() - last_flush >= PRICE_STREAM_FLUSH_INTERVAL:
+					await _flush_ticks(pending)
+					last_flush = time.monotonic()
+		finally:
+			_stats["connected"] = False
+			await _flush_ticks(pending)
+
+
+async def run_price_stream(base_url: str) -> None:
+	"""
+	Фоновая задача потокового получения курсов.
+
+	Args:
+		base_url: Адрес combined stream (wss://.../stream) или "fake" для локального потока
+	"""
+	from app.config import get_settings
+	from app.google_sheets import _get_rate_coins
+
+	if base_url == "fake" and get_settings().google_sheets_backend.strip().lower() != "fake":
+		logger.error("❌ PRICE_STREAM_URL=fake допускается только с GOOGLE_SHEETS_BACKEND=fake, поток курсов не запущен")
+		return
+	coins = [coin for coin in await _get_rate_coins() if coin != "usdt"]
+	fake_runner = None
+	if base_url == "fake":
+		fake_runner, base_url = await start_fake_ticker_feed(coins)
+	url = _stream_url(base_url, coins)
+	delay = PRICE_STREAM_RECONNECT_MIN
+	try:
+		while True:
+			started = time.monotonic()
+			try:
+				await _consume(url)
+			except asyncio.CancelledError:
+				raise
+			except Exception as e:
+				logger.warning(f"⚠️ Поток курсов недоступен: {e}")
+			if time.monotonic() - started > PRICE_STREAM_RECONNECT_MAX:
+				delay = PRICE_STREAM_RECONNECT_MIN  # Соединение долго работало - начинаем задержки сначала
+			_stats["reconnects"] += 1
+			logger.info(f"🔁 Переподключение к потоку курсов через {delay} сек")
+			await asyncio.sleep(delay)
+			delay = min(delay * 2, PRICE_STREAM_RECONNECT_MAX)
+	except asyncio.CancelledError:
+		pass
+	finally:
+		if fake_runner is not None:
+			await fake_runner.cleanup()
+
+
+def get_price_stream_stats() -> Dict[str, Any]:
+	"""Статистика потока: подключение, сообщения, тики, переподключения, записанные точки"""
+	return dict(_stats)
+
+
+async def start_fake_ticker_feed(
+	coins: List[str],
+	prices: Optional[Dict[str, float]] = None,
+	interval: float = 0.5,
+	host: str = "127.0.0.1",
+	port: int = 0
+) -> Tuple[Any, str]:
+	"""
+	Поднимает локальный WebSocket-поток тикеров в формате Binance (случайное блуждание курса).
+
+	Args:
+		coins: Монеты потока
+		prices: Начальные курсы (по умолчанию 100 для неизвестных монет)
+		interval: Пауза между тиками одной монеты (секунды)
+		host: Адрес сервера
+		port: Порт (0 - любой свободный)
+
+	Returns:
+		(aiohttp AppRunner для остановки через cleanup(), адрес потока ws://host:port/stream)
+	"""
+	from aiohttp import web
+
+	defaults = {"btc": 60000.0, "ltc": 80.0, "xmr": 150.0}
+	current = {coin: (prices or {}).get(coin) or defaults.get(coin, 100.0) for coin in coins}
+
+	async def handler(request: web.Request) -> web.WebSocketResponse:
+		ws = web.WebSocketResponse()
+		await ws.prepare(request)
+		try:
+			while not ws.closed:
+				for coin in current:
+					current[coin] *= 1 + random.uniform(-0.001, 0.001)
+					symbol = f"{coin.upper()}USDT"
+					await ws.send_json({
+						"stream": f"{coin}usdt@miniTicker",
+						"data": {"e": "24hrMiniTicker", "E": int(time.time() * 1000), "s": symbol, "c": f"{current[coin]:.8f}"},
+					})
+				await asyncio.sleep(interval)
+		except ConnectionResetError:
+			pass  # Клиент отключился
+		return ws
+
+	app = web.Application()
+	app.router.add_get("/stream", handler)
+	runner = web.AppRunner(app)
+	await runner.setup()
+	site = web.TCPSite(runner, host, port)
+	await site.start()
+	bound_port = site._server.sockets[0].getsockname()[1]
+	logger.info(f"🧪 Локальный поток курсов запущен: ws://{host}:{bound_port}/stream")
+	return runner, f"ws://{host}:{bound_port}/stream"
@@ -0,0 +1,272 @@
+"""
+Асинхронный клиент Google Sheets API v4 поверх aiohttp.
+
+Используется вместо gspread в потоках для операций чтения: запросы идут
+через долгоживущую aiohttp-сессию с keep-alive соединениями, а ответы
+урезаются масками fields=. HTTP/1.1 pipelining aiohttp не поддерживает,
+поэтому параллельные запросы распределяются по нескольким keep-alive
+соединениям пула (SHEETS_CONNECTION_LIMIT).
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import aiohttp
+from google.auth.transport.requests import Request as _AuthRequest
+from google.oauth2.service_account import Credentials
+
+logger = logging.getLogger("app.sheets_api")
+
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+SHEETS_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+# Количество одновременно открытых keep-alive соединений к sheets.googleapis.com
+SHEETS_CONNECTION_LIMIT = 8
+# Сколько секунд держать простаивающее соединение открытым
+SHEETS_KEEPALIVE_TIMEOUT = 75
+# Таймаут одного запроса к API (секунды)
+SHEETS_REQUEST_TIMEOUT = 30
+
+
+class SheetsAPIError(Exception):
+	"""Ошибка ответа Google Sheets API (status - HTTP код ответа)"""
+
+	def __init__(self, status: int, message: str) -> None:
+		super().__init__(f"[{status}] {message}")
+		self.status = status
+		self.message = message
+
+
+def a1_range(sheet_title: Optional[str], address: str) -> str:
+	"""Добавляет к адресу название листа: ("Лист 1", "A1:B2") -> "'Лист 1'!A1:B2" """
+	if not sheet_title or "!" in address:
+		return address
+	escaped = sheet_title.replace("'", "''")
+	return f"'{escaped}'!{address}"
+
+
+def _error_message(body: str) -> str:
+	try:
+		data = json.loads(body)
+		return data.get("error", {}).get("message") or body
+	except (ValueError, AttributeError):
+		return body
+
+
+class AsyncSheetsClient:
+	"""
+	Клиент Sheets API v4 для одного файла учетных данных сервисного аккаунта.
+
+	Токен хранится в памяти и обновляется только по истечении срока действия
+	(или при 401), метаданные листов запрашиваются один раз на таблицу.
+	"""
+
+	def __init__(self, credentials_path: str) -> None:
+		self._credentials_path = credentials_path
+		self._credentials: Optional[Credentials] = None
+		self._credentials_mtime = 0.0
+		self._token_lock = asyncio.Lock()
+		self._session: Optional[aiohttp.ClientSession] = None
+		self._sheet_titles: Dict[str, List[str]] = {}  # {sheet_id: [title, ...]}
+		self.requests_sent = 0
+
+	def _get_session(self) -> aiohttp.ClientSession:
+		if self._session is None or self._session.closed:
+			connector = aiohttp.TCPConnector(
+				limit=SHEETS_CONNECTION_LIMIT,
+				keepalive_timeout=SHEETS_KEEPALIVE_TIMEOUT,
+				ttl_dns_cache=300
+			)
+			self._session = aiohttp.ClientSession(
+				connector=connector,
+				timeout=aiohttp.ClientTimeout(total=SHEETS_REQUEST_TIMEOUT),
+				headers={"Accept-Encoding": "gzip"}
+			)
+		return self._session
+
+	async def _get_token(self, force_refresh: bool = False) -> str:
+		async with self._token_lock:
+			try:
+				mtime = os.path.getmtime(self._credentials_path)
+			except OSError:
+				mtime = 0.0
+			if self._credentials is None or mtime != self._credentials_mtime:
+				self._credentials = await asyncio.to_thread(
+					Credentials.from_service_account_file,
+					self._credentials_path,
+					scopes=SHEETS_SCOPES
+				)
+				self._credentials_mtime = mtime
+			if force_refresh or not self._credentials.valid:
+				await asyncio.to_thread(self._credentials.refresh, _AuthRequest())
+			return self._credentials.token
+
+	async def _request(
+		self,
+		method: str,
+		url: str,
+		params: Optional[List[Tuple[str, str]]] = None,
+		payload: Optional[Dict[str, Any]] = None
+	) -> Dict[str, Any]:
+		force_refresh = False
+		for attempt in (1, 2):
+			token = await self._get_token(force_refresh)
+			headers = {"Authorization": f"Bearer {token}"}
+			async with self._get_session().request(method, url, params=params, json=payload, headers=headers) as response:
+				self.requests_sent += 1
+				if response.status == 401 and attempt == 1:
+					# Токен отозван раньше срока - обновляем и повторяем один раз
+					force_refresh = True
+					continue
+				body = await response.text()
+				if response.status >= 400:
+					raise SheetsAPIError(response.status, _error_message(body))
+				return json.loads(body) if body else {}
+		raise SheetsAPIError(401, "Не удалось авторизоваться в Google Sheets API")
+
+	async def get_sheet_titles(self, sheet_id: str) -> List[str]:
+		"""Возвращает названия листов таблицы (запрашиваются один раз)"""
+		titles = self._sheet_titles.get(sheet_id)
+		if titles is None:
+			data = await self._request(
+				"GET",
+				f"{SHEETS_API_URL}/{sheet_id}",
+				params=[("fields", "sheets.properties.title")]
+			)
+			titles = [s.get("properties", {}).get("title", "") for s in data.get("sheets", [])]
+			self._sheet_titles[sheet_id] = titles
+		return titles
+
+	async def resolve_sheet_title(self, sheet_id: str, sheet_name: Optional[str] = None) -> Optional[str]:
+		"""
+		Возвращает название листа по имени или первый лист по умолчанию
+		(так же, как _get_worksheet в google_sheets.py).
+		"""
+		titles = await self.get_sheet_titles(sheet_id)
+		if sheet_name and sheet_name.strip():
+			if sheet_name.strip() in titles:
+				return sheet_name.strip()
+			logger.warning(f"⚠️ Лист '{sheet_name}' не найден, используется первый лист")
+		return titles[0] if titles else None
+
+	async def values_batch_get(
+		self,
+		sheet_id: str,
+		ranges: List[str],
+		sheet_name: Optional[str] = None,
+		value_render_option: str = "FORMATTED_VALUE"
+	) -> List[List[List[Any]]]:
+		"""
+		Читает несколько диапазонов одним запросом.
+
+		Returns:
+			Список значений для каждого диапазона в том же порядке (как worksheet.batch_get)
+		"""
+		if not ranges:
+			return []
+		title = await self.resolve_sheet_title(sheet_id, sheet_name)
+		params = [("ranges", a1_range(title, r)) for r in ranges]
+		params.append(("valueRenderOption", value_render_option))
+		params.append(("fields", "valueRanges(values)"))
+		data = await self._request("GET", f"{SHEETS_API_URL}/{sheet_id}/values:batchGet", params=params)
+		value_ranges = data.get("valueRanges", [])
+		return [vr.get("values", []) for vr in value_ranges]
+
+	async def values_get(
+		self,
+		sheet_id: str,
+		range_str: str,
+		sheet_name: Optional[str] = None,
+		value_render_option: str = "FORMATTED_VALUE"
+	) -> List[List[Any]]:
+		"""Читает один диапазон"""
+		title = await self.resolve_sheet_title(sheet_id, sheet_name)
+		data = await self._request(
+			"GET",
+			f"{SHEETS_API_URL}/{sheet_id}/values/{quote(a1_range(title, range_str), safe='')}",
+			params=[("valueRenderOption", value_render_option), ("fields", "values")]
+		)
+		return data.get("values", [])
+
+	async def values_batch_update(
+		self,
+		sheet_id: str,
+		data: List[Dict[str, Any]],
+		sheet_name: Optional[str] = None,
+		value_input_option: str = "USER_ENTERED"
+	) -> int:
+		"""
+		Записывает несколько диапазонов одним запросом.
+
+		Args:
+			data: Список {"range": "A1", "values": [[...]]}
+
+		Returns:
+			Количество обновленных ячеек
+		"""
+		if not data:
+			return 0
+		title = await self.resolve_sheet_title(sheet_id, sheet_name)
+		body = {
+			"valueInputOption": value_input_option,
+			"data": [{"range": a1_range(title, item["range"]), "values": item["values"]} for item in data]
+		}
+		result = await self._request(
+			"POST",
+			f"{SHEETS_API_URL}/{sheet_id}/values:batchUpdate",
+			params=[("fields", "totalUpdatedCells")],
+			payload=body
+		)
+		return int(result.get("totalUpdatedCells", 0))
+
+	async def values_batch_clear(
+		self,
+		sheet_id: str,
+		ranges: List[str],
+		sheet_name: Optional[str] = None
+	) -> None:
+		"""Очищает несколько диапазонов одним запросом"""
+		if not ranges:
+			return
+		title = await self.resolve_sheet_title(sheet_id, sheet_name)
+		await self._request(
+			"POST",
+			f"{SHEETS_API_URL}/{sheet_id}/values:batchClear",
+			params=[("fields", "clearedRanges")],
+			payload={"ranges": [a1_range(title, r) for r in ranges]}
+		)
+
+	async def close(self) -> None:
+		if self._session is not None and not self._session.closed:
+			await self._session.close()
+		self._session = None
+
+
+_clients: Dict[str, AsyncSheetsClient] = {}
+
+
+def get_async_sheets_client(credentials_path: str) -> AsyncSheetsClient:
+	"""Возвращает общий асинхронный клиент для файла учетных данных"""
+	from app.sheets_fake import get_fake_sheets_backend
+	backend = get_fake_sheets_backend()
+	if backend is not None:
+		# Локальная таблица в памяти (GOOGLE_SHEETS_BACKEND=fake)
+		return backend.async_client()
+	client = _clients.get(credentials_path)
+	if client is None:
+		client = AsyncSheetsClient(credentials_path)
+		_clients[credentials_path] = client
+	return client
+
+
+async def close_async_sheets_clients() -> None:
+	"""Закрывает сессии всех асинхронных клиентов (при остановке бота)"""
+	for client in list(_clients.values()):
+		try:
+			await client.close()
+		except Exception as e:
+			logger.warning(f"⚠️ Ошибка закрытия клиента Google Sheets API: {e}")
+	_clients.clear()
@@ -0,0 +1,444 @@
+"""
+Локальная замена Google Sheets для тестов и бенчмарков без сети.
+
+FakeSheetsBackend хранит таблицы в памяти и отдает два интерфейса:
+- FakeWorksheet - поверхность gspread.Worksheet, которой пользуется app.google_sheets
+  (get, batch_get, update, batch_update, batch_clear, clear, acell);
+- FakeAsyncSheetsClient - поверхность AsyncSheetsClient из app.sheets_api.
+
+Каждый запрос может ждать заданную задержку и случайно завершаться 429 или 503,
+чтобы проверять поиск строк, повторы и батчинг в реалистичных условиях.
+Формулы не вычисляются: ячейки хранят записанные значения, чтение возвращает их
+строками, как FORMATTED_VALUE.
+
+Включается настройкой GOOGLE_SHEETS_BACKEND=fake (GOOGLE_SHEET_ID и
+GOOGLE_CREDENTIALS_PATH при этом должны быть непустыми, но файл не читается).
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from gspread.cell import Cell
+from gspread.exceptions import APIError
+
+from app.sheets_api import SheetsAPIError
+
+logger = logging.getLogger("app.sheets_fake")
+
+FAKE_DEFAULT_SHEET_TITLE = "Лист1"
+
+_A1_RE = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+
+def _column_to_number(column: str) -> int:
+	number = 0
+	for char in column.upper():
+		number = number * 26 + (ord(char) - ord("A") + 1)
+	return number
+
+
+def _split_sheet_title(range_name: str) -> Tuple[Optional[str], str]:
+	"""'Лист 1'!A1:B2 -> ("Лист 1", "A1:B2")"""
+	if "!" not in range_name:
+		return None, range_name
+	title, address = range_name.rsplit("!", 1)
+	if title.startswith("'") and title.endswith("'"):
+		title = title[1:-1].replace("''", "'")
+	return title, address
+
+
+def _parse_a1_part(part: str) -> Tuple[Optional[int], Optional[int]]:
+	"""'BB12' -> (12, 54); 'BB' -> (None, 54); '12' -> (12, None)"""
+	match = _A1_RE.match(part.strip())
+	if not match or not part.strip():
+		raise ValueError(f"Некорректный адрес ячейки: {part}")
+	letters, digits = match.groups()
+	return (int(digits) if digits else None), (_column_to_number(letters) if letters else None)
+
+
+def _format_value(value: Any) -> str:
+	if isinstance(value, bool):
+		return "TRUE" if value else "FALSE"
+	if isinstance(value, float) and value.is_integer():
+		return str(int(value))
+	return str(value)
+
+
+class _FakeSheet:
+	"""Сетка значений одного листа: {(строка, столбец): значение}"""
+
+	def __init__(self) -> None:
+		self.cells: Dict[Tuple[int, int], Any] = {}
+
+	def max_row(self) -> int:
+		return max((row for row, _ in self.cells), default=0)
+
+	def max_col(self) -> int:
+		return max((col for _, col in self.cells), default=0)
+
+	def bounds(self, address: str) -> Tuple[int, int, int, int]:
+		"""Возвращает (первая строка, первый столбец, последняя строка, последний столбец) диапазона"""
+		parts = address.split(":")
+		if len(parts) > 2:
+			raise ValueError(f"Некорректный диапазон: {address}")
+		start_row, start_col = _parse_a1_part(parts[0])
+		end_row, end_col = _parse_a1_part(parts[-1])
+		start_row = start_row or 1
+		start_col = start_col or 1
+		end_row = end_row or max(self.max_row(), start_row)
+		end_col = end_col or max(self.max_col(), start_col)
+		return start_row, start_col, end_row, end_col
+
+	def read(self, address: str, pad_values: bool = False) -> List[List[str]]:
+		"""Читает диапазон как Sheets API: без хвостовых пустых строк и ячеек (если не pad_values)"""
+		start_row, start_col, end_row, end_col = self.bounds(address)
+		rows = []
+		for row in range(start_row, end_row + 1):
+			values = []
+			for col in range(start_col, end_col + 1):
+				value = self.cells.get((row, col))
+				values.append("" if value is None else _format_value(value))
+			rows.append(values)
+		if pad_values:
+			return rows
+		for values in rows:
+			while values and values[-1] == "":
+				values.pop()
+		while rows and not rows[-1]:
+			rows.pop()
+		return rows
+
+	def write(self, address: str, values: List[List[Any]]) -> int:
+		start_row, start_col, _, _ = self.bounds(address.split(":")[0])
+		updated = 0
+		for i, row_values in enumerate(values or []):
+			for j, value in enumerate(row_values):
+				key = (start_row + i, start_col + j)
+				if value is None or value == "":
+					self.cells.pop(key, None)
+				else:
+					self.cells[key] = value
+				updated += 1
+		return updated
+
+	def clear(self, address: str) -> None:
+		start_row, start_col, end_row, end_col = self.bounds(address)
+		for key in [k for k in self.cells if start_row <= k[0] <= end_row and start_col <= k[1] <= end_col]:
+			del self.cells[key]
+
+
+class FakeSheetsBackend:
+	"""
+	Хранилище таблиц в памяти с имитацией задержки и ошибок API.
+
+	Args:
+		latency: Задержка каждого запроса в секундах
+		jitter: Случайная добавка к задержке (0..jitter секунд)
+		rate_limit_error_rate: Доля запросов, завершающихся 429
+		unavailable_error_rate: Доля запросов, завершающихся 503
+		seed: Seed генератора ошибок и задержек (для воспроизводимых бенчмарков)
+	"""
+
+	def __init__(
+		self,
+		latency: float = 0.0,
+		jitter: float = 0.0,
+		rate_limit_error_rate: float = 0.0,
+		unavailable_error_rate: float = 0.0,
+		seed: Optional[int] = None
+	) -> None:
+		self.latency = latency
+		self.jitter = jitter
+		self.rate_limit_error_rate = rate_limit_error_rate
+		self.unavailable_error_rate = unavailable_error_rate
+		self._random = random.Random(seed)
+		self._lock = threading.RLock()
+		self._spreadsheets: Dict[str, Dict[str, _FakeSheet]] = {}
+		self.requests: Counter = Counter()  # {метод: количество запросов}
+		self.errors: Counter = Counter()  # {HTTP код: количество}
+
+	def _sheet(self, sheet_id: str, title: Optional[str] = None) -> _FakeSheet:
+		with self._lock:
+			sheets = self._spreadsheets.setdefault(sheet_id, {})
+			if not sheets:
+				sheets[FAKE_DEFAULT_SHEET_TITLE] = _FakeSheet()
+			if title and title.strip() in sheets:
+				return sheets[title.strip()]
+			return next(iter(sheets.values()))
+
+	def add_sheet(self, sheet_id: str, title: str) -> None:
+		"""Добавляет лист (первый добавленный лист считается листом по умолчанию)"""
+		with self._lock:
+			self._spreadsheets.setdefault(sheet_id, {}).setdefault(title, _FakeSheet())
+
+	def sheet_titles(self, sheet_id: str) -> List[str]:
+		self._sheet(sheet_id)
+		with self._lock:
+			return list(self._spreadsheets[sheet_id].keys())
+
+	def load_cells(self, sheet_id: str, cells: Dict[str, Any], sheet_name: Optional[str] = None) -> None:
+		"""Заполняет ячейки: {"A1": 100, "BC5": "12"}"""
+		sheet = self._sheet(sheet_id, sheet_name)
+		with self._lock:
+			for address, value in cells.items():
+				sheet.write(address, [[value]])
+
+	def load_json(self, path: str) -> None:
+		"""Загружает данные из JSON: {sheet_id: {название_листа: {"A1": значение}}}"""
+		with open(path, "r", encoding="utf-8") as f:
+			data = json.load(f)
+		for sheet_id, sheets in data.items():
+			for title, cells in sheets.items():
+				self.add_sheet(sheet_id, title)
+				self.load_cells(sheet_id, cells, title)
+
+	def _next_failure(self, method: str) -> Tuple[float, Optional[int]]:
+		"""Регистрирует запрос и решает, сколько ему ждать и чем он закончится"""
+		with self._lock:
+			self.requests[method] += 1
+			delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter > 0 else 0.0)
+			roll = self._random.random()
+			status = None
+			if roll < self.rate_limit_error_rate:
+				status = 429
+			elif roll < self.rate_limit_error_rate + self.unavailable_error_rate:
+				status = 503
+			if status:
+				self.errors[status] += 1
+			return delay, status
+
+	def execute(self, method: str, func, *args):
+		"""Выполняет операцию синхронно (для FakeWorksheet в потоке)"""
+		delay, status = self._next_failure(method)
+		if delay > 0:
+			time.sleep(delay)
+		if status:
+			raise _gspread_api_error(status)
+		with self._lock:
+			return func(*args)
+
+	async def execute_async(self, method: str, func, *args):
+		"""Выполняет операцию асинхронно (для FakeAsyncSheetsClient)"""
+		delay, status = self._next_failure(method)
+		if delay > 0:
+			await asyncio.sleep(delay)
+		if status:
+			raise SheetsAPIError(status, _error_text(status))
+		with self._lock:
+			return func(*args)
+
+	def worksheet(self, sheet_id: str, sheet_name: Optional[str] = None) -> "FakeWorksheet":
+		titles = self.sheet_titles(sheet_id)
+		title = sheet_name.strip() if sheet_name and sheet_name.strip() in titles else titles[0]
+		return FakeWorksheet(self, sheet_id, title)
+
+	def async_client(self) -> "FakeAsyncSheetsClient":
+		return FakeAsyncSheetsClient(self)
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			return {
+				"requests": dict(self.requests),
+				"errors": dict(self.errors),
+				"total_requests": sum(self.requests.values()),
+			}
+
+
+def _error_text(status: int) -> str:
+	if status == 429:
+		return "Quota exceeded for quota metric 'Read requests' (fake backend)"
+	return "The service is currently unavailable. (fake backend)"
+
+
+def _gspread_api_error(status: int) -> APIError:
+	"""Создает gspread APIError с настоящим объектом ответа (response.status_code доступен)"""
+	response = requests.Response()
+	response.status_code = status
+	response._content = json.dumps({
+		"error": {"code": status, "message": _error_text(status), "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"}
+	}).encode("utf-8")
+	return APIError(response)
+
+
+class FakeWorksheet:
+	"""Поверхность gspread.Worksheet поверх FakeSheetsBackend"""
+
+	def __init__(self, backend: FakeSheetsBackend, sheet_id: str, title: str) -> None:
+		self._backend = backend
+		self._sheet_id = sheet_id
+		self.title = title
+
+	@property
+	def _grid(self) -> _FakeSheet:
+		return self._backend._sheet(self._sheet_id, self.title)
+
+	def get(self, range_name: Optional[str] = None, pad_values: bool = False, **kwargs) -> List[List[str]]:
+		return self._backend.execute("get", lambda: self._grid.read(range_name or "A1:ZZ", pad_values))
+
+	def batch_get(self, ranges: List[str], **kwargs) -> List[List[List[str]]]:
+		return self._backend.execute("batch_get", lambda: [self._grid.read(r) for r in ranges])
+
+	def update(self, range_name=None, values=None, **kwargs) -> Dict[str, Any]:
+		# gspread 6 принимает и update(values, range_name), и update(range_name, values)
+		if not isinstance(range_name, str):
+			range_name, values = values, range_name
+		updated = self._backend.execute("update", lambda: self._grid.write(range_name, values))
+		return {"updatedCells": updated}
+
+	def batch_update(self, data: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+		def apply():
+			return sum(self._grid.write(item["range"], item["values"]) for item in data)
+		return {"totalUpdatedCells": self._backend.execute("batch_update", apply)}
+
+	def batch_clear(self, ranges: List[str]) -> None:
+		def apply():
+			for r in ranges:
+				self._grid.clear(r)
+		self._backend.execute("batch_clear", apply)
+
+	def clear(self, range_name: Optional[str] = None) -> None:
+		self._backend.execute("clear", lambda: self._grid.clear(range_name or "A1:ZZ"))
+
+	def acell(self, label: str, **kwargs) -> Cell:
+		def read():
+			row, col = _parse_a1_part(label)
+			values = self._grid.read(label)
+			value = values[0][0] if values and values[0] else None
+			return Cell(row, col, value)
+		return self._backend.execute("acell", read)
+
+
+class FakeAsyncSheetsClient:
+	"""Поверхность AsyncSheetsClient (app.sheets_api) поверх FakeSheetsBackend"""
+
+	def __init__(self, backend: FakeSheetsBackend) -> None:
+		self._backend = backend
+		self.requests_sent = 0
+
+	def _grid(self, sheet_id: str, range_name: str, sheet_name: Optional[str]) -> Tuple[_FakeSheet, str]:
+		title, address = _split_sheet_title(range_name)
+		return self._backend._sheet(sheet_id, title or sheet_name), address
+
+	async def get_sheet_titles(self, sheet_id: str) -> List[str]:
+		self.requests_sent += 1
+		return await self._backend.execute_async("get_sheet_titles", self._backend.sheet_titles, sheet_id)
+
+	async def resolve_sheet_title(self, sheet_id: str, sheet_name: Optional[str] = None) -> Optional[str]:
+		titles = self._backend.sheet_titles(sheet_id)
+		if sheet_name and sheet_name.strip() in titles:
+			return sheet_name.strip()
+		return titles[0] if titles else None
+
+	async def values_batch_get(
+		self,
+		sheet_id: str,
+		ranges: List[str],
+		sheet_name: Optional[str] = None,
+		value_render_option: str = "FORMATTED_VALUE"
+	) -> List[List[List[Any]]]:
+		if not ranges:
+			return []
+		self.requests_sent += 1
+
+		def read():
+			result = []
+			for r in ranges:
+				grid, address = self._grid(sheet_id, r, sheet_name)
+				result.append(grid.read(address))
+			return result
+		return await self._backend.execute_async("values_batch_get", read)
+
+	async def values_get(
+		self,
+		sheet_id: str,
+		range_str: str,
+		sheet_name: Optional[str] = None,
+		value_render_option: str = "FORMATTED_VALUE"
+	) -> List[List[Any]]:
+		self.requests_sent += 1
+
+		def read():
+			grid, address = self._grid(sheet_id, range_str, sheet_name)
+			return grid.read(address)
+		return await self._backend.execute_async("values_get", read)
+
+	async def values_batch_update(
+		self,
+		sheet_id: str,
+		data: List[Dict[str, Any]],
+		sheet_name: Optional[str] = None,
+		value_input_option: str = "USER_ENTERED"
+	) -> int:
+		if not data:
+			return 0
+		self.requests_sent += 1
+
+		def write():
+			updated = 0
+			for item in data:
+				grid, address = self._grid(sheet_id, item["range"], sheet_name)
+				updated += grid.write(address, item["values"])
+			return updated
+		return await self._backend.execute_async("values_batch_update", write)
+
+	async def values_batch_clear(self, sheet_id: str, ranges: List[str], sheet_name: Optional[str] = None) -> None:
+		if not ranges:
+			return
+		self.requests_sent += 1
+
+		def clear():
+			for r in ranges:
+				grid, address = self._grid(sheet_id, r, sheet_name)
+				grid.clear(address)
+		await self._backend.execute_async("values_batch_clear", clear)
+
+	async def close(self) -> None:
+		pass
+
+
+_backend: Optional[FakeSheetsBackend] = None
+_backend_resolved = False
+_backend_lock = threading.Lock()
+
+
+def get_fake_sheets_backend() -> Optional[FakeSheetsBackend]:
+	"""
+	Возвращает локальный бэкенд, если он выбран в настройках (GOOGLE_SHEETS_BACKEND=fake)
+	или установлен через set_fake_sheets_backend, иначе None.
+	"""
+	global _backend, _backend_resolved
+	if _backend_resolved:
+		return _backend
+	with _backend_lock:
+		if not _backend_resolved:
+			from app.config import get_settings
+			settings = get_settings()
+			if settings.google_sheets_backend.strip().lower() == "fake":
+				_backend = FakeSheetsBackend(
+					latency=settings.google_sheets_fake_latency_ms / 1000.0,
+					rate_limit_error_rate=settings.google_sheets_fake_429_rate,
+					unavailable_error_rate=settings.google_sheets_fake_503_rate
+				)
+				if settings.google_sheets_fake_data_path:
+					_backend.load_json(settings.google_sheets_fake_data_path)
+				logger.warning(
+					f"🧪 Google Sheets работает на локальном бэкенде: задержка {settings.google_sheets_fake_latency_ms} мс, "
+					f"429 - {settings.google_sheets_fake_429_rate:.0%}, 503 - {settings.google_sheets_fake_503_rate:.0%}"
+				)
+			_backend_resolved = True
+	return _backend
+
+
+def set_fake_sheets_backend(backend: Optional[FakeSheetsBackend]) -> None:
+	"""Явно включает (или выключает, если None) локальный бэкенд - для тестов и бенчмарков"""
+	global _backend, _backend_resolved
+	with _backend_lock:
+		_backend = backend
+		_backend_resolved = True
@@ -0,0 +1,271 @@
+"""Очередь отложенной записи в Google Sheets (write-behind outbox).
+
+Подтвержденные операции /add, /rate и /move сразу сохраняются в таблицу
+sheets_outbox в SQLite, а фоновый воркер переносит их в Google Sheets
+с повторами при временных ошибках API. Записи, не дошедшие до таблицы
+к моменту перезапуска бота, отправляются после старта.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.di import get_db
+
+logger = logging.getLogger("app.sheets_outbox")
+
+# Сколько записей забирать из очереди за один проход воркера
+OUTBOX_BATCH_SIZE = 20
+# Максимальное количество попыток записи одной операции
+OUTBOX_MAX_ATTEMPTS = 8
+# Интервал опроса очереди, если воркер не был разбужен новой записью (секунды)
+OUTBOX_POLL_INTERVAL = 5
+# Задержка перед повтором после временной ошибки: 5, 10, 20, ... но не более 5 минут
+OUTBOX_RETRY_BASE_DELAY = 5
+OUTBOX_RETRY_MAX_DELAY = 300
+
+# Обработчик результата: (bot, entry, result) -> None
+OutboxHandler = Callable[[Any, Dict[str, Any], Dict[str, Any]], Awaitable[None]]
+
+_wakeup_event: Optional[asyncio.Event] = None
+
+
+def _get_wakeup_event() -> asyncio.Event:
+	global _wakeup_event
+	if _wakeup_event is None:
+		_wakeup_event = asyncio.Event()
+	return _wakeup_event
+
+
+async def enqueue_sheets_write(
+	mode: str,
+	payload: Dict[str, Any],
+	chat_id: Optional[int] = None,
+	message_id: Optional[int] = None
+) -> int:
+	"""
+	Сохраняет операцию записи в очередь и будит воркер.
+	Запись фиксируется сразу (вместе с предшествующими изменениями транзакции
+	обработчика), так что после возврата операция переживет перезапуск.
+
+	Args:
+		mode: Режим операции ("add", "move", "rate")
+		payload: Данные для записи (списки crypto/xmr/cash/card_cash_pairs и параметры режима)
+		chat_id: ID чата для отчета
+		message_id: ID сообщения, которое будет заменено отчетом
+
+	Returns:
+		ID записи в очереди
+	"""
+	db = get_db()
+	entry_id = await db.add_sheets_outbox_entry(
+		mode,
+		json.dumps(payload, ensure_ascii=False, default=str),
+		chat_id,
+		message_id
+	)
+	await db.flush()
+	logger.info(f"📥 Операция /{mode} поставлена в очередь записи Google Sheets: id={entry_id}")
+	_get_wakeup_event().set()
+	return entry_id
+
+
+def _retry_delay(attempt: int) -> int:
+	return min(OUTBOX_RETRY_BASE_DELAY * (2 ** max(0, attempt - 1)), OUTBOX_RETRY_MAX_DELAY)
+
+
+def _is_transient_failure(result: Dict[str, Any]) -> bool:
+	"""Временные ошибки (429/5xx, сеть) повторяем, остальные (нет свободной строки, доступ и т.п.) - нет"""
+	return bool(result.get("transient"))
+
+
+def _merge_partial_result(payload: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+	"""
+	Переносит в данные записи то, что уже записано при частичной записи /rate,
+	и оставляет в ней только незаписанные элементы (result["remaining"]).
+	"""
+	written = dict(payload.get("written") or {})
+	written["written_cells"] = written.get("written_cells", []) + result.get("written_cells", [])
+	written["failed_writes"] = written.get("failed_writes", []) + result.get("failed_writes", [])
+	written["column_rows"] = {**written.get("column_rows", {}), **result.get("column_rows", {})}
+	return {**payload, **result["remaining"], "written": written}
+
+
+def _apply_written(payload: Dict[str, Any], result: Dict[str, Any]) -> None:
+	"""Добавляет к результату ячейки, записанные предыдущими частичными попытками"""
+	written = payload.get("written")
+	if not written:
+		return
+	result["written_cells"] = written.get("written_cells", []) + result.get("written_cells", [])
+	result["failed_writes"] = written.get("failed_writes", []) + result.get("failed_writes", [])
+	result["column_rows"] = {**written.get("column_rows", {}), **result.get("column_rows", {})}
+
+
+async def _log_card_replenishments(db: Any, payload: Dict[str, Any]) -> None:
+	"""Сохраняет пополнения карт операции /add (только положительные суммы)"""
+	for pair in payload.get("card_cash_pairs", []):
+		card_data = pair.get("card")
+		cash_data = pair.get("cash")
+		if not card_data or not cash_data:
+			continue
+		card_id = card_data.get("card_id")
+		cash_value = cash_data.get("value", 0)
+		if card_id and cash_value > 0:
+			try:
+				await db.log_card_replenishment(card_id, float(cash_value))
+				logger.info(f"✅ Пополнение сохранено: card_id={card_id}, amount={cash_value}")
+			except Exception as e:
+				logger.warning(f"⚠️ Ошибка сохранения пополнения card_id={card_id}, amount={cash_value}: {e}")
+
+
+async def _perform_sheets_write(mode: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+	"""Выполняет одну попытку записи операции в Google Sheets"""
+	from app.config import get_settings
+	from app.google_sheets import write_all_to_google_sheet_one_row, write_to_google_sheet_rate_mode
+
+	settings = get_settings()
+	if not settings.google_sheet_id or not settings.google_credentials_path:
+		return {"success": False, "message": "Google Sheets не настроен"}
+
+	if mode == "rate":
+		return await write_to_google_sheet_rate_mode(
+			settings.google_sheet_id,
+			settings.google_credentials_path,
+			payload.get("crypto_list", []),
+			payload.get("xmr_list", []),
+			payload.get("cash_list", []),
+			payload.get("card_cash_pairs", []),
+			settings.google_sheet_name,
+			note=payload.get("note"),
+			max_retries=1
+		)
+	return await write_all_to_google_sheet_one_row(
+		settings.google_sheet_id,
+		settings.google_credentials_path,
+		payload.get("crypto_list", []),
+		payload.get("xmr_list", []),
+		payload.get("cash_list", []),
+		payload.get("card_cash_pairs", []),
+		mode=mode,
+		sheet_name=settings.google_sheet_name,
+		profit_column=payload.get("profit_column"),
+		calculated_profit=payload.get("calculated_profit"),
+		weekday=payload.get("weekday"),
+		max_retries=1
+	)
+
+
+async def _process_entry(bot: Any, entry: Dict[str, Any], on_done: OutboxHandler, on_failed: OutboxHandler) -> bool:
+	"""
+	Обрабатывает одну запись очереди.
+
+	Returns:
+		False, если запись отложена из-за временной ошибки (остальные записи пачки лучше не трогать)
+	"""
+	db = get_db()
+	entry_id = entry["id"]
+	mode = entry["mode"]
+	try:
+		payload = json.loads(entry["payload"])
+	except (TypeError, ValueError) as e:
+		logger.error(f"❌ Некорректные данные в очереди записи id={entry_id}: {e}")
+		await db.fail_sheets_outbox_entry(entry_id, f"Некорректные данные: {e}")
+		return True
+	entry["payload"] = payload
+
+	try:
+		result = await _perform_sheets_write(mode, payload)
+	except Exception as e:
+		logger.exception(f"Ошибка записи операции из очереди id={entry_id}: {e}")
+		result = {"success": False, "error": str(e), "transient": True}
+
+	new_payload: Optional[str] = None
+	if result.get("remaining") is not None:
+		# Часть операции /rate записана: в очереди остаются только незаписанные элементы,
+		# уже записанные ячейки попадут в отчет после дозаписи
+		payload = _merge_partial_result(payload, result)
+		entry["payload"] = payload
+		new_payload = json.dumps(payload, ensure_ascii=False, default=str)
+		result = {"success": False, "error": result.get("error"), "transient": result.get("transient")}
+		logger.warning(f"⚠️ Операция /{mode} id={entry_id} записана частично, остаток возвращен в очередь")
+
+	if result.get("success"):
+		_apply_written(payload, result)
+		# Фиксируем успех до отправки отчета, чтобы после перезапуска строка не записалась повторно;
+		# пополнения карт сохраняются в той же транзакции, что и отметка о записи
+		async with db.transaction():
+			await db.complete_sheets_outbox_entry(entry_id, json.dumps(result, ensure_ascii=False, default=str))
+			if mode == "add":
+				await _log_card_replenishments(db, payload)
+		logger.info(f"✅ Операция /{mode} из очереди записана в Google Sheets: id={entry_id}")
+		try:
+			await on_done(bot, entry, result)
+		except Exception as e:
+			logger.exception(f"Ошибка отправки отчета по операции из очереди id={entry_id}: {e}")
+		return True
+
+	attempt = entry.get("attempts", 0) + 1
+	error = result.get("error") or result.get("message") or "Неизвестная ошибка"
+	if _is_transient_failure(result) and attempt < OUTBOX_MAX_ATTEMPTS:
+		delay = _retry_delay(attempt)
+		await db.retry_sheets_outbox_entry(entry_id, error, int(time.time()) + delay, new_payload)
+		logger.warning(
+			f"⚠️ Временная ошибка записи операции id={entry_id} (попытка {attempt}/{OUTBOX_MAX_ATTEMPTS}), "
+			f"повтор через {delay} сек: {error}"
+		)
+		return False
+
+	await db.fail_sheets_outbox_entry(entry_id, error, new_payload)
+	logger.error(f"❌ Операция /{mode} из очереди не записана (id={entry_id}, попыток: {attempt}): {error}")
+	try:
+		await on_failed(bot, entry, result)
+	except Exception as e:
+		logger.exception(f"Ошибка уведомления о неудачной записи id={entry_id}: {e}")
+	return True
+
+
+async def run_sheets_outbox_worker(bot: Any, on_done: OutboxHandler, on_failed: OutboxHandler) -> None:
+	"""
+	Фоновый воркер очереди записи в Google Sheets.
+
+	Забирает записи пачками в порядке добавления и пишет их по одной (каждая операция -
+	один batch_update). При временной ошибке запись откладывается с экспоненциальной
+	задержкой, а остаток пачки возвращается в очередь.
+
+	Args:
+		bot: Bot для отправки отчетов
+		on_done: Вызывается после успешной записи (формирует отчет для администратора)
+		on_failed: Вызывается, когда операцию записать не удалось
+	"""
+	db = get_db()
+	restored = await db.requeue_stale_sheets_outbox_entries()
+	if restored:
+		logger.warning(f"🔁 Возвращено в очередь записи Google Sheets после перезапуска: {restored}")
+	pending = await db.count_pending_sheets_outbox_entries()
+	if pending:
+		logger.info(f"📤 В очереди записи Google Sheets ожидают отправки: {pending}")
+
+	wakeup = _get_wakeup_event()
+	while True:
+		try:
+			wakeup.clear()
+			entries = await db.claim_sheets_outbox_entries(OUTBOX_BATCH_SIZE)
+			if not entries:
+				try:
+					await asyncio.wait_for(wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL)
+				except asyncio.TimeoutError:
+					pass
+				continue
+
+			for index, entry in enumerate(entries):
+				if not await _process_entry(bot, entry, on_done, on_failed):
+					left: List[int] = [e["id"] for e in entries[index + 1:]]
+					await db.release_sheets_outbox_entries(left)
+					await asyncio.sleep(OUTBOX_RETRY_BASE_DELAY)
+					break
+		except asyncio.CancelledError:
+			break
+		except Exception as e:
+			logger.warning(f"⚠️ Ошибка в воркере очереди записи Google Sheets: {e}")
+			await asyncio.sleep(OUTBOX_POLL_INTERVAL)
@@ -0,0 +1,79 @@
+"""
+Объединение одновременных одинаковых запросов (single-flight).
+
+Пока по ключу выполняется запрос (курс BTC, курс USD→BYN, batch чтение ячеек таблицы),
+остальные вызовы с тем же ключом не запускают свой, а ждут результат текущего.
+Отмена одного ожидающего не отменяет общий запрос.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger("app.single_flight")
+
+
+class SingleFlight:
+	"""Группа запросов с общим пространством ключей и счетчиками объединений"""
+
+	def __init__(self, name: str) -> None:
+		self.name = name
+		self._inflight: Dict[Hashable, asyncio.Task] = {}
+		self.calls = 0
+		self.executions = 0
+		self.coalesced = 0
+
+	def start(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+		"""
+		Возвращает задачу запроса по ключу: текущую, если она еще идет, иначе новую.
+
+		Args:
+			key: Ключ ресурса
+			func: Функция без аргументов, возвращающая корутину запроса
+		"""
+		self.calls += 1
+		task = self._inflight.get(key)
+		if task is not None and not task.done():
+			self.coalesced += 1
+			logger.debug(f"🔗 {self.name}: запрос {key} уже выполняется, ждем его результат")
+			return task
+		self.executions += 1
+		task = asyncio.create_task(func())
+		self._inflight[key] = task
+		task.add_done_callback(lambda t, key=key: self._done(key, t))
+		return task
+
+	def _done(self, key: Hashable, task: asyncio.Task) -> None:
+		if self._inflight.get(key) is task:
+			del self._inflight[key]
+		if not task.cancelled() and task.exception() is not None:
+			# Ошибку получают ожидающие вызовы; для фоновых запросов без ожидающих - только лог
+			logger.debug(f"⚠️ {self.name}: запрос {key} завершился ошибкой: {task.exception()}")
+
+	async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+		"""Выполняет запрос по ключу или присоединяется к уже идущему; ошибки пробрасываются"""
+		return await asyncio.shield(self.start(key, func))
+
+	def stats(self) -> Dict[str, int]:
+		return {
+			"calls": self.calls,
+			"executions": self.executions,
+			"coalesced": self.coalesced,
+			"in_flight": len(self._inflight),
+		}
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def get_single_flight(name: str) -> SingleFlight:
+	"""Возвращает группу объединения запросов по имени (создает при первом обращении)"""
+	group = _groups.get(name)
+	if group is None:
+		group = SingleFlight(name)
+		_groups[name] = group
+	return group
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, int]]:
+	"""Статистика всех групп: вызовы, реальные запросы, объединенные вызовы"""
+	return {name: group.stats() for name, group in _groups.items()}
@@ -0,0 +1,140 @@
+"""
+Бенчмарк разбора страниц myfin.by: старый способ (BeautifulSoup + html.parser, обход всех
+span/div/td) против нового (lxml + XPath, запомненный элемент с курсом).
+
+Запуск:
+	python bench_currency_rates.py            # разбор сохраненных страниц из fixtures/myfin
+	python bench_currency_rates.py --save     # скачать и сохранить текущие страницы myfin.by
+
+Файлы fixtures/myfin/byn*.html и rub*.html. Если сохраненных страниц нет,
+используются сгенерированные страницы похожей структуры.
+"""
+import asyncio
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from app.currency_rates import _parse_byn_rate, _parse_rub_rate
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "myfin"
+PAGES = {
+	"byn": "https://myfin.by/currency/minsk?utm_source=myfin&utm_medium=organic&utm_campaign=menu&working=0",
+	"rub": "https://myfin.by/currency/usdrub/ross",
+}
+REPEATS = 20
+
+
+async def save_pages() -> None:
+	import aiohttp
+	FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+	headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
+	stamp = time.strftime("%Y%m%d")
+	async with aiohttp.ClientSession(headers=headers) as session:
+		for name, url in PAGES.items():
+			async with session.get(url) as response:
+				html = await response.text()
+			path = FIXTURES_DIR / f"{name}_{stamp}.html"
+			path.write_text(html, encoding="utf-8")
+			print(f"💾 {path} ({len(html) // 1024} КБ)")
+
+
+def synthetic_page(kind: str) -> str:
+	"""Страница похожей структуры: меню, новости, таблица банков с курсами"""
+	parts = ["<html><head><title>myfin</title></head><body>"]
+	for i in range(300):
+		parts.append(f"<div class='menu'><span>Раздел {i}</span><div><a href='/n/{i}'>Новость {i}</a></div></div>")
+	parts.append("<table class='rates'>")
+	for i in range(120):
+		row_id = f" id='bank-row-{i}'" if kind == "byn" else ""
+		rate = f"{3.1 + i / 1000:.4f}" if kind == "byn" else f"{80 + i / 100:.2f}"
+		parts.append(
+			f"<tr{row_id}><td>Банк {i}</td><td><span>{rate}</span></td><td><span>{rate}</span></td>"
+			f"<td>обновлено 12:{i % 60:02d}</td></tr>"
+		)
+	parts.append("</table>")
+	for i in range(300):
+		parts.append(f"<div class='footer'><span>{i}</span><div>Ссылка {i}</div></div>")
+	parts.append("</body></html>")
+	return "".join(parts)
+
+
+def load_pages():
+	pages = []
+	for kind in ("byn", "rub"):
+		files = sorted(FIXTURES_DIR.glob(f"{kind}*.html")) if FIXTURES_DIR.exists() else []
+		if files:
+			pages.extend((kind, f.name, f.read_text(encoding="utf-8")) for f in files)
+		else:
+			pages.append((kind, "synthetic", synthetic_page(kind)))
+	return pages
+
+
+def old_parse_byn(html: str):
+	soup = BeautifulSoup(html, "html.parser")
+	bank_row = soup.find(id="bank-row-62")
+	if not bank_row:
+		return None
+	td_cells = bank_row.find_all("td")
+	if len(td_cells) < 3 or not td_cells[2].find("span"):
+		return None
+	match = re.search(r"(\d+\.?\d*)", td_cells[2].find("span").get_text(strip=True).replace(",", "."))
+	return float(match.group(1)) if match else None
+
+
+def old_parse_rub(html: str):
+	soup = BeautifulSoup(html, "html.parser")
+	rate = None
+	for tag in soup.find_all(["span", "div", "td"]):
+		text_clean = tag.get_text(strip=True).replace(",", ".").replace(" ", "")
+		match = re.search(r"^(\d{2,3}(?:\.\d{1,4})?)$", text_clean)
+		if match:
+			value = float(match.group(1))
+			if 60 <= value <= 120:
+				parent = tag.parent
+				if parent:
+					parent_text = parent.get_text().lower()
+					if any(word in parent_text for word in ["курс", "usd", "рубл", "доллар", "продаж", "покупк", "цб", "банк"]):
+						return value
+				if rate is None:
+					rate = value
+	return rate
+
+
+def measure(func, *args):
+	timings = []
+	result = None
+	for _ in range(REPEATS):
+		started = time.perf_counter()
+		result = func(*args)
+		timings.append((time.perf_counter() - started) * 1000)
+	return result, statistics.median(timings)
+
+
+def main() -> None:
+	if "--save" in sys.argv:
+		asyncio.run(save_pages())
+		return
+
+	print(f"{'страница':<28}{'размер':>9}{'старый, мс':>13}{'lxml, мс':>11}{'запомн., мс':>14}  курс")
+	for kind, name, html in load_pages():
+		if kind == "byn":
+			old_rate, old_ms = measure(old_parse_byn, html)
+			(new_rate, _), new_ms = measure(_parse_byn_rate, html)
+			cached_ms = new_ms
+		else:
+			old_rate, old_ms = measure(old_parse_rub, html)
+			(new_rate, xpath), new_ms = measure(_parse_rub_rate, html, None)
+			_, cached_ms = measure(_parse_rub_rate, html, xpath)
+		status = "✅" if old_rate == new_rate else f"❌ старый {old_rate}"
+		print(
+			f"{kind + ' ' + name:<28}{len(html) // 1024:>7}КБ{old_ms:>13.1f}{new_ms:>11.1f}{cached_ms:>14.1f}"
+			f"  {new_rate} {status}"
+		)
+
+
+if __name__ == "__main__":
+	main()
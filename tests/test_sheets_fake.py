@@ -0,0 +1,107 @@
+"""Поиск строки /add и batch чтение ячеек на локальном бэкенде Google Sheets (app/sheets_fake.py)"""
+import asyncio
+from typing import List, Optional, Tuple
+
+import gspread
+import pytest
+
+import app.google_sheets as google_sheets
+from app.sheets_api import SheetsAPIError
+from app.sheets_fake import FakeSheetsBackend, set_fake_sheets_backend
+
+SHEET_ID = "test-sheet"
+CREDENTIALS_PATH = "unused.json"
+
+
+class _FlakyBackend(FakeSheetsBackend):
+	"""Бэкенд, у которого первые запросы завершаются заданными ошибками (429/503), а остальные - успешно"""
+
+	def __init__(self, failures: List[int]) -> None:
+		super().__init__()
+		self._failures = list(failures)
+
+	def _next_failure(self, method: str) -> Tuple[float, Optional[int]]:
+		delay, _ = super()._next_failure(method)
+		status = self._failures.pop(0) if self._failures else None
+		if status:
+			self.errors[status] += 1
+		return delay, status
+
+
+@pytest.fixture
+def use_backend(monkeypatch):
+	"""Подключает бэкенд к app.google_sheets и сбрасывает индексы строк и паузу очереди после теста"""
+	# Пауза очереди после 429 в тестах - миллисекунды
+	monkeypatch.setattr(google_sheets, "_SHEETS_BACKOFF_START", 0.01)
+
+	def use(backend: FakeSheetsBackend) -> FakeSheetsBackend:
+		set_fake_sheets_backend(backend)
+		google_sheets.invalidate_row_indexes()
+		return backend
+
+	yield use
+	set_fake_sheets_backend(None)
+	google_sheets.invalidate_row_indexes()
+	google_sheets._sheets_scheduler._pause_until = 0.0
+	google_sheets._sheets_scheduler._backoff = 0.0
+
+
+def test_read_cells_batch_returns_values_and_empty_cells(use_backend):
+	backend = use_backend(FakeSheetsBackend())
+	backend.load_cells(SHEET_ID, {"A4": 100, "BC10": "12,5"})
+
+	values = asyncio.run(google_sheets._read_cells_batch(SHEET_ID, CREDENTIALS_PATH, ["A4", "BC10", "C1"]))
+
+	assert values == {"A4": "100", "BC10": "12,5", "C1": None}
+	assert sum(backend.requests.values()) == 1
+
+
+def test_read_cells_batch_retries_after_429(use_backend):
+	backend = use_backend(_FlakyBackend([429]))
+	backend.load_cells(SHEET_ID, {"A4": 7})
+
+	values = asyncio.run(google_sheets._read_cells_batch(SHEET_ID, CREDENTIALS_PATH, ["A4"]))
+
+	assert values == {"A4": "7"}
+	assert backend.errors[429] == 1
+	assert sum(backend.requests.values()) == 2
+
+
+def test_read_cells_batch_raises_503(use_backend):
+	# 503 не повторяется внутри чтения: решение о повторе принимает вызывающий код
+	backend = use_backend(_FlakyBackend([503]))
+
+	with pytest.raises(SheetsAPIError) as exc_info:
+		asyncio.run(google_sheets._read_cells_batch(SHEET_ID, CREDENTIALS_PATH, ["A4"]))
+
+	assert exc_info.value.status == 503
+	assert sum(backend.requests.values()) == 1
+
+
+def test_reserve_empty_row_skips_filled_and_reserved_rows(use_backend):
+	backend = use_backend(FakeSheetsBackend())
+	backend.load_cells(SHEET_ID, {"A10": "x", "C11": 5})
+	worksheet = backend.worksheet(SHEET_ID)
+
+	first = google_sheets._reserve_empty_row(worksheet, SHEET_ID, None, "A:C", start_row=10, max_row=13)
+	second = google_sheets._reserve_empty_row(worksheet, SHEET_ID, None, "A:C", start_row=10, max_row=13)
+	full = google_sheets._reserve_empty_row(worksheet, SHEET_ID, None, "A:C", start_row=10, max_row=13)
+
+	assert (first, second) == (12, 13)
+	assert full is None
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_reserve_empty_row_raises_api_error_and_recovers(use_backend, status):
+	backend = use_backend(_FlakyBackend([status]))
+	backend.load_cells(SHEET_ID, {"A10": "x"})
+	worksheet = backend.worksheet(SHEET_ID)
+
+	# Ошибка API пробрасывается, чтобы очередь записи повторила операцию
+	with pytest.raises(gspread.exceptions.APIError):
+		google_sheets._reserve_empty_row(worksheet, SHEET_ID, None, "A:C", start_row=10, max_row=20)
+
+	# Индекс не остался наполовину заполненным: повтор перечитывает блок
+	row = google_sheets._reserve_empty_row(worksheet, SHEET_ID, None, "A:C", start_row=10, max_row=20)
+	assert row == 11
+	assert backend.errors[status] == 1